@@ -0,0 +1,347 @@
+import asyncio
+import itertools
+import logging
+import math
+import threading
+import time
+from decimal import ROUND_CEILING, Decimal
+
+RECONCILE_INTERVAL_S = 30.0
+CENT = Decimal("0.01")
+
+PENDING = "pending"  # reserved, order not yet accepted by the venue
+OPEN = "open"        # order resting on the venue, which holds the funds
+
+
+def _amount(per_share: Decimal, size: int) -> Decimal:
+    return (Decimal(per_share) * size).quantize(CENT, rounding=ROUND_CEILING)
+
+
+class Reservation:
+    """Capital set aside on one venue for one order (or FOK leg)."""
+
+    __slots__ = ("reservation_id", "venue", "amount", "strategy", "state")
+
+    def __init__(self, reservation_id: int, venue: str, amount: Decimal, strategy: str):
+        self.reservation_id = reservation_id
+        self.venue = venue
+        self.amount = amount
+        self.strategy = strategy
+        self.state = PENDING
+
+    def __repr__(self):
+        return f"Reservation({self.reservation_id}, {self.venue}, ${self.amount}, {self.strategy}, {self.state})"
+
+
+class Allocation:
+    """A funded opportunity: the size it was funded at and its reservations by venue."""
+
+    __slots__ = ("opportunity", "size", "reservations")
+
+    def __init__(self, opportunity: dict, size: int, reservations: dict[str, Reservation]):
+        self.opportunity = opportunity
+        self.size = size
+        self.reservations = reservations
+
+
+class VenueCapital:
+    """
+    Capital accounting for one venue.
+
+        balance    cash on the venue, including funds held by our open orders
+        pending    reserved for orders we are about to send
+        open       held by our resting orders
+        available  balance - pending - open
+
+    Strategies reserve before sending an order. A rejected or cancelled
+    order releases its reservation; a fill commits it, which removes the
+    reservation and deducts what was actually spent from the balance.
+
+    reconcile() replaces the balance with the venue's reported available
+    cash plus our open orders (which the venue has already deducted), so
+    optimistic local accounting can never drift for longer than one
+    reconcile interval.
+    """
+
+    def __init__(self, venue: str, fetch_balance=None, initial_balance: Decimal | None = None):
+        self.venue = venue
+        self.fetch_balance = fetch_balance
+        self.lock = threading.Lock()
+        self.balance = Decimal(0)
+        self.pending = Decimal(0)
+        self.open = Decimal(0)
+        self.reservations: dict[int, Reservation] = {}
+        self.last_reconcile_ns = 0
+
+        if initial_balance is not None:
+            self.balance = Decimal(initial_balance)
+        elif fetch_balance is not None:
+            self.reconcile()
+
+    def available(self) -> Decimal:
+        with self.lock:
+            return self._available_locked()
+
+    def _available_locked(self) -> Decimal:
+        return self.balance - self.pending - self.open
+
+    def _reserve_locked(self, reservation_id: int, amount: Decimal, strategy: str) -> Reservation | None:
+        if amount > self._available_locked():
+            return None
+        reservation = Reservation(reservation_id, self.venue, amount, strategy)
+        self.reservations[reservation_id] = reservation
+        self.pending += amount
+        return reservation
+
+    def _remove_locked(self, reservation: Reservation) -> bool:
+        if self.reservations.pop(reservation.reservation_id, None) is None:
+            return False
+        if reservation.state == OPEN:
+            self.open -= reservation.amount
+        else:
+            self.pending -= reservation.amount
+        return True
+
+    def mark_open(self, reservation: Reservation):
+        """The order was accepted and is resting; the venue now holds the funds."""
+        with self.lock:
+            if reservation.reservation_id in self.reservations and reservation.state == PENDING:
+                self.pending -= reservation.amount
+                self.open += reservation.amount
+                reservation.state = OPEN
+
+    def release(self, reservation: Reservation):
+        """The order was rejected, cancelled or not sent: return its capital."""
+        with self.lock:
+            self._remove_locked(reservation)
+
+    def commit(self, reservation: Reservation, spent: Decimal | None = None):
+        """
+        The order filled. Deduct *spent* (the reserved amount if None) from
+        the balance and release any unspent remainder of the reservation.
+        """
+        with self.lock:
+            if self._remove_locked(reservation):
+                self.balance -= reservation.amount if spent is None else Decimal(spent)
+
+    def commit_partial(self, reservation: Reservation, spent: Decimal):
+        """
+        Part of the order filled. Deduct *spent* from the balance and from
+        what the reservation still holds; the rest stays reserved for the
+        part still resting.
+        """
+        with self.lock:
+            if reservation.reservation_id not in self.reservations:
+                return
+            spent = min(Decimal(spent), reservation.amount)
+            reservation.amount -= spent
+            if reservation.state == OPEN:
+                self.open -= spent
+            else:
+                self.pending -= spent
+            self.balance -= spent
+
+    def reconcile(self):
+        """Resync the balance with the venue (blocking HTTP call)."""
+        if self.fetch_balance is None:
+            return
+        fetched = Decimal(self.fetch_balance())
+        with self.lock:
+            drift = fetched + self.open - self.balance
+            self.balance = fetched + self.open
+            self.last_reconcile_ns = time.time_ns()
+        return drift
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "balance": self.balance,
+                "pending": self.pending,
+                "open": self.open,
+                "available": self._available_locked(),
+                "reservations": len(self.reservations),
+            }
+
+
+class CapitalAllocator:
+    """
+    Thread-safe capital allocator shared by every strategy, one account per
+    venue.
+
+    Opportunities that need capital on several venues are reserved
+    all-or-nothing: the venue locks are taken in a fixed order, the largest
+    fundable size is computed and every leg is reserved before any lock is
+    released, so concurrent strategies can never oversubscribe a venue.
+
+    allocate() implements global ranking: each strategy collects its
+    opportunities for the cycle, they are pooled, and the allocator funds
+    them greedily by expected profit regardless of which strategy found
+    them. An opportunity is a dict with at least
+        expected_profit    (Decimal) ranking key, at raw_size
+        raw_size           (int)     largest size the books support
+        capital_per_share  (dict)    venue -> dollars needed per share,
+                                     fees included
+        strategy           (str)     owner, for logs and reservations
+    """
+
+    def __init__(self):
+        self.logger = logging.getLogger("capital_allocator")
+        self.venues: dict[str, VenueCapital] = {}
+        self._ids = itertools.count(1)
+
+    @classmethod
+    def from_gateways(cls, kalshi_gateway=None, polymarket_us_gateway=None):
+        """Allocator with Kalshi / Polymarket US accounts synced from the HTTP gateways."""
+        allocator = cls()
+        if kalshi_gateway is not None:
+            # Kalshi reports the balance in cents
+            allocator.add_venue("Kalshi", lambda: Decimal(kalshi_gateway.get_balance()) / Decimal(100))
+        if polymarket_us_gateway is not None:
+            allocator.add_venue("Polymarket_US", lambda: Decimal(str(polymarket_us_gateway.get_balance())))
+        return allocator
+
+    def add_venue(self, venue: str, fetch_balance=None, initial_balance: Decimal | None = None) -> VenueCapital:
+        account = VenueCapital(venue, fetch_balance, initial_balance)
+        self.venues[venue] = account
+        self.logger.info(f"{venue} capital: {account.stats()}")
+        return account
+
+    def available(self, venue: str) -> Decimal:
+        return self.venues[venue].available()
+
+    # ------------------------------------------------------------------ #
+    # Reservation                                                          #
+    # ------------------------------------------------------------------ #
+
+    def reserve(self, amounts: dict[str, Decimal], strategy: str) -> dict[str, Reservation] | None:
+        """Reserve a fixed amount on each venue, all or nothing."""
+        accounts = [self.venues[venue] for venue in sorted(amounts)]
+        for account in accounts:
+            account.lock.acquire()
+        try:
+            if any(Decimal(amounts[a.venue]) > a._available_locked() for a in accounts):
+                return None
+            return {
+                a.venue: a._reserve_locked(next(self._ids), Decimal(amounts[a.venue]), strategy)
+                for a in accounts
+            }
+        finally:
+            for account in reversed(accounts):
+                account.lock.release()
+
+    def reserve_size(self, capital_per_share: dict[str, Decimal], max_size: int, strategy: str) -> tuple[int, dict[str, Reservation]]:
+        """
+        Reserve the largest size up to *max_size* that every venue can fund.
+
+        Returns (size, reservations by venue); size is 0 and reservations
+        empty if not even one share can be funded.
+        """
+        accounts = [self.venues[venue] for venue in sorted(capital_per_share)]
+        for account in accounts:
+            account.lock.acquire()
+        try:
+            size = max_size
+            for account in accounts:
+                per_share = capital_per_share[account.venue]
+                if per_share > 0:
+                    size = min(size, math.floor(account._available_locked() / per_share))
+            # Reservations are whole cents, rounded up; step down if rounding
+            # pushes a venue over its available capital
+            while size >= 1 and any(
+                _amount(capital_per_share[a.venue], size) > a._available_locked() for a in accounts
+            ):
+                size -= 1
+            if size < 1:
+                return 0, {}
+            return size, {
+                a.venue: a._reserve_locked(next(self._ids), _amount(capital_per_share[a.venue], size), strategy)
+                for a in accounts
+            }
+        finally:
+            for account in reversed(accounts):
+                account.lock.release()
+
+    def mark_open(self, reservation: Reservation):
+        self.venues[reservation.venue].mark_open(reservation)
+
+    def release(self, reservation: Reservation):
+        self.venues[reservation.venue].release(reservation)
+
+    def commit(self, reservation: Reservation, spent: Decimal | None = None):
+        self.venues[reservation.venue].commit(reservation, spent)
+
+    def commit_partial(self, reservation: Reservation, spent: Decimal):
+        self.venues[reservation.venue].commit_partial(reservation, spent)
+
+    def release_all(self, reservations: dict[str, Reservation]):
+        for reservation in reservations.values():
+            self.release(reservation)
+
+    # ------------------------------------------------------------------ #
+    # Global ranking                                                       #
+    # ------------------------------------------------------------------ #
+
+    def allocate(self, opportunities: list) -> list[Allocation]:
+        """
+        Fund *opportunities* greedily in descending expected profit (raw_size
+        breaks ties) and return the funded ones in that order. Each
+        allocation holds reservations the caller must commit or release.
+        """
+        ranked = sorted(opportunities, key=lambda o: (o["expected_profit"], o["raw_size"]), reverse=True)
+        allocations = []
+        for opp in ranked:
+            size, reservations = self.reserve_size(opp["capital_per_share"], opp["raw_size"], opp["strategy"])
+            if size >= 1:
+                allocations.append(Allocation(opp, size, reservations))
+        if len(allocations) < len(ranked):
+            self.logger.info(f"Funded {len(allocations)} of {len(ranked)} opportunities this cycle")
+        return allocations
+
+    # ------------------------------------------------------------------ #
+    # Reconciliation                                                       #
+    # ------------------------------------------------------------------ #
+
+    def reconcile_all(self):
+        for venue, account in self.venues.items():
+            try:
+                drift = account.reconcile()
+            except Exception as e:
+                self.logger.error(f"Failed to reconcile {venue} balance: {e}")
+                continue
+            if drift:
+                self.logger.info(f"Reconciled {venue}: drift ${drift:.2f}, {account.stats()}")
+
+    async def run(self, interval_s: float = RECONCILE_INTERVAL_S):
+        """Reconcile every venue against its exchange balance in the background."""
+        while True:
+            await asyncio.sleep(interval_s)
+            await asyncio.to_thread(self.reconcile_all)
+
+
+if __name__ == "__main__":
+    # Example: concurrent strategies cannot oversubscribe a venue
+    from concurrent.futures import ThreadPoolExecutor
+
+    allocator = CapitalAllocator()
+    allocator.add_venue("Kalshi", initial_balance=Decimal(1000))
+    allocator.add_venue("Polymarket_US", initial_balance=Decimal(500))
+
+    def strategy(name):
+        funded = 0
+        for _ in range(1000):
+            size, reservations = allocator.reserve_size(
+                {"Kalshi": Decimal("0.45"), "Polymarket_US": Decimal("0.52")}, 10, name
+            )
+            if size == 0:
+                break
+            funded += size
+            for reservation in reservations.values():
+                allocator.commit(reservation)
+        return funded
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        funded = list(pool.map(strategy, ["a", "b", "c", "d"]))
+
+    print(f"funded per strategy: {funded} (total {sum(funded)})")
+    for venue, account in allocator.venues.items():
+        print(venue, account.stats())
@@ -1,27 +1,85 @@
-import json
 import logging
-import math
+import time
 import uuid
 from decimal import Decimal
 
+import numpy as np
+
+from capital_allocator import Allocation, CapitalAllocator
 from polymarket_us_feed import PolymarketUSWebSocket
 from polymarket_us_http_gateway import PolymarketUSHTTPGateway
 from kalshi_feed import KalshiWebSocket
 from kalshi_http_gateway import KalshiHTTPGateway, load_private_key
 from position_manager import PositionManager
-from utils import get_maker_fees_kalshi, get_taker_fees_kalshi, get_taker_fees_polymarket_us, get_maker_rebate_polymarket_us
-from collections import defaultdict
+from symbol_table import symbols
+from top_of_book import ASK, ASK_SIZE, BID, BID_SIZE, TopOfBookSnapshot
+from utils import (
+    PRICE_SCALE,
+    get_taker_fees_kalshi,
+    get_taker_fees_kalshi_cents,
+    get_taker_fees_polymarket_us,
+    get_taker_fees_polymarket_us_cents,
+    price_ticks,
+)
+
+STRATEGY_NAME = "cross_exchange"
+
+# Venue and action codes used in the vectorized leg arrays
+KALSHI, POLYMARKET_US = 0, 1
+BUY, SELL = 0, 1
+
+_VENUE_NAMES = ("Kalshi", "Polymarket_US")
+_ACTION_NAMES = ("buy", "sell")
+
+# (type, direction) per arb family code
+_FAMILIES = (
+    ("same_side", "buy_kalshi_sell_poly"),   # Strategies 1, 2, 3, 4
+    ("same_side", "buy_poly_sell_kalshi"),
+    ("double_buy", "buy_both_teams"),        # Strategies 5, 6, 9, 10
+    ("double_sell", "sell_both_teams"),      # Strategies 7, 8
+)
+
+
 class CrossExchangeArbitrage:
     """
     Detects arbitrage opportunities between Polymarket US and Kalshi
     for 2-outcome moneyline markets.
 
-    Required orderbook interface:
-        orderbook.get_best_bid() -> (price, size) or (None, None)
-        orderbook.get_best_ask() -> (price, size) or (None, None)
+    --- Arb families ---
+    Every opportunity is two legs that together pay exactly $1 per share in
+    every outcome. Selling a contract at its bid is done by buying the
+    complement at 1 - bid, so each leg is a buy with a cost per share:
+        same_side    buy Kalshi YES at ask, sell Polymarket at bid (and the
+                     mirror), for each team independently
+        double_buy   buy the cheapest ask of team A and of team B
+        double_sell  sell the richest bid of team A and of team B
+    Entry condition: cost(leg 1) + cost(leg 2) + fees_per_share < $1
+
+    --- Vectorized scan ---
+    The mapping is compiled into symbol-id arrays (poly id,
+    kalshi ticker, other poly id, other kalshi ticker). Each cycle gathers
+    the top of book for every row from the snapshot arrays, builds the legs
+    of all four families and scores them in one numpy pass. Prices are
+    converted to integer ticks of 1/PRICE_SCALE dollars and fees use the
+    integer-cent versions of the utils fee functions, so profits match the
+    Decimal calculation exactly. Only profitable rows become opportunity
+    dicts.
+
+    --- Execution priority ---
+    Opportunities are ranked by expected profit at full market size and
+    funded greedily in that order by the shared CapitalAllocator, which
+    reserves each leg's capital on its own venue.
+
+    Subclasses scanning other cross-venue structures (see
+    CrossExchangeSpreadTotalArbitrage) build their own leg arrays and reuse
+    _score_legs and the execution path.
     """
 
-    def __init__(self, polymarket_client: PolymarketUSWebSocket, kalshi_client: KalshiWebSocket, polymarket_us_gateway: PolymarketUSHTTPGateway, kalshi_gateway: KalshiHTTPGateway, position_manager: PositionManager, mapping: dict, min_edge=0.01):
+    strategy_name = STRATEGY_NAME
+    logger_name = "cross_exchange_strategy"
+    families = _FAMILIES
+
+    def __init__(self, polymarket_client: PolymarketUSWebSocket, kalshi_client: KalshiWebSocket, polymarket_us_gateway: PolymarketUSHTTPGateway, kalshi_gateway: KalshiHTTPGateway, position_manager: PositionManager, mapping: dict, min_edge=0.01, capital_allocator: CapitalAllocator | None = None):
         # Market data clients
         self.polymarket_client = polymarket_client
         self.kalshi_client = kalshi_client
@@ -29,498 +87,481 @@ class CrossExchangeArbitrage:
         # Gateways for order execution
         self.polymarket_gateway = polymarket_us_gateway
         self.kalshi_gateway = kalshi_gateway
-        
+
         # Position manager for tracking open positions and PnL
         self.position_manager = position_manager
-        
-        #Temporary balance tracking
-        self.polymarket_us_balance = Decimal(self.polymarket_gateway.get_balance())
-        self.kalshi_balance = Decimal(self.kalshi_gateway.get_balance())
-        
+
         # Tracking overall performance
         self.overall_order_count = Decimal(0)
         self.overall_profit = Decimal(0.0)
 
         self.mapping = mapping
-        self.min_edge = Decimal(min_edge)  # buffer for fees/slippage
-        self.logger = logging.getLogger("cross_exchange_strategy")
-        
-        # Cached balance to avoid API calls on every order (in dollars)
-        self.cached_balance = Decimal(Decimal(kalshi_gateway.get_balance()) / Decimal(100.0))
-        self.cached_balance = 5000
-        
-    def check_and_update_balance(self, required_amount: Decimal):
-        """Check if we have sufficient balance for the trade.
+        self.min_edge = Decimal(str(min_edge))  # buffer for fees/slippage
+        self.logger = logging.getLogger(self.logger_name)
 
-        Args:
-            required_amount: Amount needed in dollars
+        # Per-venue capital shared with the other strategies
+        self.capital_allocator = capital_allocator or CapitalAllocator.from_gateways(
+            kalshi_gateway=kalshi_gateway, polymarket_us_gateway=polymarket_us_gateway
+        )
+
+        # Mapping compiled to parallel arrays of symbol ids, one row per
+        # mapped event: (poly_a, kalshi_a, poly_b, kalshi_b). Replaced as one
+        # tuple by update_mapping() / on_markets_changed(), so a scan on the
+        # strategy thread always sees four arrays of the same length.
+        self._row_ids: dict[tuple, tuple] = {}
+        self._compiled = self._compile_mapping(mapping)
+
+    # ------------------------------------------------------------------ #
+    # Initialization helpers                                               #
+    # ------------------------------------------------------------------ #
+
+    _MAPPING_KEYS = ("polymarket_ticker", "kalshi_ticker", "other_poly_id", "other_kalshi_ticker")
+
+    def _compile_mapping(self, mapping: dict) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Flatten {category: [mapping dicts]} into four symbol-id arrays.
+
+        Only rows not compiled before are interned; rows no longer in the
+        mapping are dropped from self._row_ids.
+
+        Returns:
+            (poly_a, kalshi_a, poly_b, kalshi_b) where row i holds the
+            polymarket_ticker, kalshi_ticker, other_poly_id and
+            other_kalshi_ticker of the i-th mapped event.
+        """
+        rows = {tuple(m[key] for key in self._MAPPING_KEYS): None for mapping_dicts in mapping.values() for m in mapping_dicts}
+        previous = self._row_ids
+        self._row_ids = {
+            row: previous[row] if row in previous else tuple(symbols.intern(name) for name in row)
+            for row in rows
+        }
+        added = sum(row not in previous for row in rows)
+        self.logger.info(
+            f"Compiled {len(rows)} cross-exchange events from {len(mapping)} categories "
+            f"({added} new, {len(previous) - (len(rows) - added)} dropped)"
+        )
+        return self._stack_rows()
+
+    def _stack_rows(self) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        ids = np.array(list(self._row_ids.values()), dtype=np.int32).reshape(-1, 4)
+        return tuple(ids[:, column].copy() for column in range(4))
+
+    # ------------------------------------------------------------------ #
+    # Runtime market changes                                               #
+    # ------------------------------------------------------------------ #
+
+    def update_mapping(self, mapping: dict):
+        """Follow a refreshed cross-exchange mapping, compiling only the new rows."""
+        self.mapping = mapping
+        self._compiled = self._compile_mapping(mapping)
+
+    def on_markets_changed(self, venue: str, added: list, removed: list):
+        """
+        Feed market listener (see FeedHandler.add_market_listener): drop every
+        row with a leg among the *removed* instruments of *venue*. Removing a
+        Polymarket US slug also removes its "-inverse" view.
+        """
+        if not removed:
+            return
+        if venue == self.kalshi_client.venue:
+            columns = (1, 3)
+            gone = set(removed)
+        elif venue == self.polymarket_client.venue:
+            columns = (0, 2)
+            gone = set(removed) | {slug + "-inverse" for slug in removed}
+        else:
+            return
+        stale = [row for row in self._row_ids if any(row[column] in gone for column in columns)]
+        if not stale:
+            return
+        for row in stale:
+            del self._row_ids[row]
+        self._compiled = self._stack_rows()
+        self.logger.info(f"Dropped {len(stale)} cross-exchange events for {len(removed)} removed {venue} markets")
+
+    # ------------------------------------------------------------------ #
+    # Shared helpers                                                       #
+    # ------------------------------------------------------------------ #
+
+    @staticmethod
+    def _top_of_book(snapshot: TopOfBookSnapshot, symbol_ids: np.ndarray) -> tuple:
+        """(bid, bid_size, ask, ask_size) arrays for *symbol_ids*, NaN where missing."""
+        quotes = snapshot.quotes
+        in_range = symbol_ids < len(quotes)
+        rows = np.full((len(symbol_ids), quotes.shape[1]), np.nan)
+        rows[in_range] = quotes[symbol_ids[in_range]]
+        return rows[:, BID], rows[:, BID_SIZE], rows[:, ASK], rows[:, ASK_SIZE]
+
+    @staticmethod
+    def _fees_cents(venues: np.ndarray, cost_ticks: np.ndarray, sizes: np.ndarray) -> np.ndarray:
+        # Fees are symmetric in p and 1 - p, so the cost of the leg can be
+        # used whether it is a buy at the ask or a sell at the bid
+        return np.where(
+            venues == KALSHI,
+            get_taker_fees_kalshi_cents(cost_ticks, sizes),
+            get_taker_fees_polymarket_us_cents(cost_ticks, sizes),
+        )
+
+    @staticmethod
+    def _fee(venue: int, cost: Decimal, size: int) -> Decimal:
+        if venue == KALSHI:
+            return get_taker_fees_kalshi(cost, size)
+        return get_taker_fees_polymarket_us(cost, size)
+
+    # ------------------------------------------------------------------ #
+    # Opportunity collection and scoring                                   #
+    # ------------------------------------------------------------------ #
+
+    def _build_legs(self, kalshi_snapshot: TopOfBookSnapshot, polymarket_snapshot: TopOfBookSnapshot) -> dict:
+        """
+        Build both legs of every candidate of the four arb families.
+
+        Returns a dict of equal-length arrays: family, row, and for each leg
+        venue, symbol id, action (BUY at the ask / SELL at the bid), quoted
+        price and size.
+        """
+        poly_a_ids, kalshi_a_ids, poly_b_ids, kalshi_b_ids = self._compiled
+        n = len(poly_a_ids)
+        rows = np.arange(n)
+        poly_a = self._top_of_book(polymarket_snapshot, poly_a_ids)
+        kalshi_a = self._top_of_book(kalshi_snapshot, kalshi_a_ids)
+        poly_b = self._top_of_book(polymarket_snapshot, poly_b_ids)
+        kalshi_b = self._top_of_book(kalshi_snapshot, kalshi_b_ids)
+
+        parts = []
+
+        def add(family, row, leg_1, leg_2):
+            parts.append((np.full(len(row), family), row) + leg_1 + leg_2)
+
+        def const(value):
+            return np.full(n, value)
+
+        # ---- SAME SIDE ARBS (A and B independently) ----
+        for poly_ids, kalshi_ids, (p_bid, p_bid_size, p_ask, p_ask_size), (k_bid, k_bid_size, k_ask, k_ask_size) in (
+            (poly_a_ids, kalshi_a_ids, poly_a, kalshi_a),
+            (poly_b_ids, kalshi_b_ids, poly_b, kalshi_b),
+        ):
+            # Ask on Kalshi < Bid on Polymarket: buy Kalshi, sell Polymarket
+            add(0, rows,
+                (const(KALSHI), kalshi_ids, const(BUY), k_ask, k_ask_size),
+                (const(POLYMARKET_US), poly_ids, const(SELL), p_bid, p_bid_size))
+            # Ask on Polymarket < Bid on Kalshi: buy Polymarket, sell Kalshi
+            add(1, rows,
+                (const(POLYMARKET_US), poly_ids, const(BUY), p_ask, p_ask_size),
+                (const(KALSHI), kalshi_ids, const(SELL), k_bid, k_bid_size))
+
+        # ---- DOUBLE BUY (synthetic long event): cheapest ask per team ----
+        # ---- DOUBLE SELL (synthetic short event): richest bid per team ----
+        def best(poly_ids, kalshi_ids, poly_price, poly_size, kalshi_price, kalshi_size, prefer_poly):
+            # NaN compares False, so a missing venue falls back to the other
+            use_poly = prefer_poly | np.isnan(kalshi_price)
+            return (
+                np.where(use_poly, POLYMARKET_US, KALSHI),
+                np.where(use_poly, poly_ids, kalshi_ids),
+                np.where(use_poly, poly_price, kalshi_price),
+                np.where(use_poly, poly_size, kalshi_size),
+            )
+
+        with np.errstate(invalid="ignore"):
+            venue_1, ids_1, price_1, size_1 = best(poly_a_ids, kalshi_a_ids, poly_a[2], poly_a[3], kalshi_a[2], kalshi_a[3], poly_a[2] <= kalshi_a[2])
+            venue_2, ids_2, price_2, size_2 = best(poly_b_ids, kalshi_b_ids, poly_b[2], poly_b[3], kalshi_b[2], kalshi_b[3], poly_b[2] <= kalshi_b[2])
+            add(2, rows, (venue_1, ids_1, const(BUY), price_1, size_1), (venue_2, ids_2, const(BUY), price_2, size_2))
+
+            venue_1, ids_1, price_1, size_1 = best(poly_a_ids, kalshi_a_ids, poly_a[0], poly_a[1], kalshi_a[0], kalshi_a[1], poly_a[0] >= kalshi_a[0])
+            venue_2, ids_2, price_2, size_2 = best(poly_b_ids, kalshi_b_ids, poly_b[0], poly_b[1], kalshi_b[0], kalshi_b[1], poly_b[0] >= kalshi_b[0])
+            add(3, rows, (venue_1, ids_1, const(SELL), price_1, size_1), (venue_2, ids_2, const(SELL), price_2, size_2))
+
+        columns = [np.concatenate(column) for column in zip(*parts)]
+        names = ("family", "row",
+                 "venue_1", "id_1", "action_1", "price_1", "size_1",
+                 "venue_2", "id_2", "action_2", "price_2", "size_2")
+        return dict(zip(names, columns))
+
+    def _collect_opportunities(self, kalshi_snapshot: TopOfBookSnapshot, polymarket_snapshot: TopOfBookSnapshot) -> list:
+        """
+        Score every candidate of the four arb families in one vectorized pass
+        and return the profitable ones at unconstrained market liquidity.
 
         Returns:
-            bool: True if sufficient balance, False otherwise
+            List of opportunity dicts. Each dict contains:
+                type, direction  (str)     - arb family (see _FAMILIES)
+                legs             (list)    - two leg dicts: venue, ticker,
+                                             symbol_id, action, price (quoted
+                                             bid/ask) and cost (cost per share
+                                             of the buy that executes it)
+                cost_per_share   (Decimal) - cost of leg 1 + cost of leg 2
+                raw_size         (int)     - max executable size before balance cap
+                fees             (Decimal) - taker fees of both legs at raw_size
+                expected_profit  (Decimal) - raw_size - total_cost (unconstrained)
+                capital_per_share (dict)   - venue -> leg cost + fees per share,
+                                             for the CapitalAllocator
+                strategy         (str)     - STRATEGY_NAME
         """
+        if len(self._compiled[0]) == 0:
+            return []
+        return self._score_legs(self._build_legs(kalshi_snapshot, polymarket_snapshot))
+
+    def _score_legs(self, legs: dict) -> list:
+        """
+        Score candidate leg pairs (as returned by _build_legs) with integer
+        ticks and venue fees, and return the profitable ones as opportunity
+        dicts (see _collect_opportunities).
+        """
+        ticks_1 = price_ticks(legs["price_1"])
+        ticks_2 = price_ticks(legs["price_2"])
+        cost_1 = np.where(legs["action_1"] == BUY, ticks_1, PRICE_SCALE - ticks_1)
+        cost_2 = np.where(legs["action_2"] == BUY, ticks_2, PRICE_SCALE - ticks_2)
+        sizes = np.floor(np.nan_to_num(np.fmin(legs["size_1"], legs["size_2"]), nan=0.0)).astype(np.int64)
+
+        edge_ticks = PRICE_SCALE - cost_1 - cost_2
+        candidate = (
+            (ticks_1 > 0) & (ticks_1 < PRICE_SCALE)
+            & (ticks_2 > 0) & (ticks_2 < PRICE_SCALE)
+            & (sizes >= 1)
+        )
+        if self.min_edge >= 0:
+            # Fees are non-negative, so a profit needs a positive per-share edge
+            candidate &= edge_ticks > 0
+
+        index = np.flatnonzero(candidate)
+        if len(index) == 0:
+            return []
+
+        sizes = sizes[index]
+        fees_1 = self._fees_cents(legs["venue_1"][index], cost_1[index], sizes)
+        fees_2 = self._fees_cents(legs["venue_2"][index], cost_2[index], sizes)
+        fees_cents = fees_1 + fees_2
+        profit_ticks = sizes * edge_ticks[index] - fees_cents * (PRICE_SCALE // 100)
+        profitable = profit_ticks > float(self.min_edge * PRICE_SCALE)
+
+        scale = Decimal(PRICE_SCALE)
+        opportunities = []
+        for i, j in zip(index[profitable].tolist(), np.flatnonzero(profitable).tolist()):
+            opp_type, direction = self.families[legs["family"][i]]
+            size = int(sizes[j])
+            opp_legs = []
+            capital_per_share = {}
+            for leg, ticks, cost, fee in (("1", ticks_1[i], cost_1[i], fees_1[j]), ("2", ticks_2[i], cost_2[i], fees_2[j])):
+                symbol_id = int(legs["id_" + leg][i])
+                venue = _VENUE_NAMES[legs["venue_" + leg][i]]
+                leg_capital = (Decimal(int(cost)) / scale) + Decimal(int(fee)) / 100 / size
+                capital_per_share[venue] = capital_per_share.get(venue, 0) + leg_capital
+                opp_legs.append({
+                    "venue": venue,
+                    "ticker": symbols.name_of(symbol_id),
+                    "symbol_id": symbol_id,
+                    "action": _ACTION_NAMES[legs["action_" + leg][i]],
+                    "price": Decimal(int(ticks)) / scale,
+                    "cost": Decimal(int(cost)) / scale,
+                })
+            opportunities.append({
+                "type": opp_type,
+                "direction": direction,
+                "legs": opp_legs,
+                "cost_per_share": Decimal(int(cost_1[i] + cost_2[i])) / scale,
+                "raw_size": size,
+                "fees": Decimal(int(fees_cents[j])) / 100,
+                "expected_profit": Decimal(int(profit_ticks[j])) / scale,
+                "capital_per_share": capital_per_share,
+                "strategy": self.strategy_name,
+            })
+
+        return opportunities
+
+    # ------------------------------------------------------------------ #
+    # Execution                                                            #
+    # ------------------------------------------------------------------ #
+
+    def _place_leg(self, leg: dict, size: int) -> bool:
+        """
+        Submit one leg as a fill-or-kill limit buy. Returns True if the
+        order was submitted without error.
+
+        Kalshi: buying at the ask is a YES buy; selling at the bid is a NO
+        buy at 1 - bid.
+
+        Polymarket US quotes one book per market; "-inverse" books are the
+        short side of the same market slug. Buying at the ask of the primary
+        book is BUY_LONG and of the inverse book BUY_SHORT; selling at the
+        bid buys the other side at 1 - bid.
+        """
+        cost = leg["cost"]
+        if leg["venue"] == "Kalshi":
+            side = "yes" if leg["action"] == "buy" else "no"
+            order = {
+                "ticker": leg["ticker"],
+                "action": "buy",
+                "side": side,
+                "count": size,
+                "client_order_id": str(uuid.uuid4()),
+                f"{side}_price": int(cost * 100),
+                "type": "limit",
+                "time_in_force": "fill_or_kill",
+            }
+            try:
+                self.kalshi_gateway.create_order(order)
+                return True
+            except Exception as e:
+                self.logger.error(f"Failed to place Kalshi order {leg['ticker']}: {e}")
+                return False
+
+        market_slug = leg["ticker"].removesuffix("-inverse")
+        inverse = market_slug != leg["ticker"]
+        buy_long = (leg["action"] == "buy") != inverse
         try:
-            #balance_response = self.kalshi_gateway.get_balance()
-            #self.cached_balance = balance_response / 100.0 if balance_response != 0 else 0  # Convert dollars to cents
-            return self.cached_balance >= required_amount
+            self.polymarket_gateway.create_order(
+                market_slug=market_slug,
+                price=float(cost),
+                quantity=size,
+                side="BUY_LONG" if buy_long else "BUY_SHORT",
+                tif="FILL_OR_KILL",
+                order_type="LIMIT",
+            )
+            return True
         except Exception as e:
-            self.logger.error(f"Error fetching balance: {e}")
+            self.logger.error(f"Failed to place Polymarket US order {leg['ticker']}: {e}")
             return False
 
-    def _get_books(self, poly_id, kalshi_ticker):
-        poly_ob = self.polymarket_client.orderbooks.get(poly_id)
-        kalshi_ob = self.kalshi_client.orderbooks.get(kalshi_ticker)
-        return poly_ob, kalshi_ob
-
-    def _best_prices(self, orderbook):
-        if not orderbook:
-            return None, None, None, None
-        bid, bid_size = orderbook.get_best_bid()
-        ask, ask_size = orderbook.get_best_ask()
-        return bid, bid_size, ask, ask_size
-
-    def _get_max_size(self, balance:Decimal, price:Decimal):
-        if price == Decimal(0):
-            return Decimal(0)
-        return Decimal(balance / price)
-
-    def _same_side_arb(self, poly_id, kalshi_ticker, poly_bid: Decimal, poly_bid_size, poly_ask: Decimal, poly_ask_size,
-                       kalshi_bid: Decimal, kalshi_bid_size, kalshi_ask: Decimal, kalshi_ask_size):
-        # Ask on Kalshi < Bid on Polymarket (1, 2, 3, 4)
-        # Buy Kalshi, Sell Polymarket
-        if poly_bid and kalshi_ask:
-            # Calculate order size
-            #print(f"Best Ask: {best_ask_size}, Correlated Best Ask: {correlated_best_ask_size}")
-            order_size = int(min(float(poly_bid_size), float(kalshi_ask_size)))
-            
-            # Calculate required balance (cost of both orders)
-            cost_of_single_share = Decimal(kalshi_ask + poly_bid)
-            required_balance = Decimal(cost_of_single_share * order_size)
-            
-            # Check balance before placing orders
-            if self.cached_balance < 0:
-                self.logger.warning(f"Negative balance detected: ${self.cached_balance:.2f}. Skipping trade.")
-                return
-            if not self.cached_balance > required_balance:
-                #self.logger.warning(f"Insufficient balance. Required: ${required_balance:.2f}, Available: ${self.cached_balance:.2f}")
-                order_size = math.floor(Decimal(str(self.cached_balance)) / cost_of_single_share)
-                
-            if order_size >= 1:
-                
-                # Track profit
-                self.overall_order_count += order_size
-                self.overall_profit += max((Decimal("1.0") - cost_of_single_share) * order_size , 0)
-                
-                # Calculate cost of trade (including fees) and potential profit
-                fees = Decimal(get_taker_fees_kalshi(Decimal(kalshi_ask), order_size) + get_taker_fees_polymarket_us(Decimal(poly_bid), order_size))
-                combined_price = Decimal(poly_bid * order_size) - Decimal(kalshi_ask * order_size) - fees
-
-                if combined_price > self.min_edge:
-                    self.logger.info({
-                        "type": "same_side",
-                        "direction": "buy_kalshi_sell_poly",
-                        "poly_id": poly_id,
-                        "kalshi_ticker": kalshi_ticker,
-                        "buy_price": kalshi_ask,
-                        "sell_price": poly_bid,
-                        "edge": combined_price,
-                        "size": int(order_size)
-                    })
-                    # Send orders to gateway for execution
-                    # Kalshi
-                    order_a = {
-                        "ticker": kalshi_ticker,
-                        "action": "buy",
-                        "side": "yes",
-                        "count": int(order_size),
-                        "client_order_id": str(uuid.uuid4()),
-                        "yes_price": int(float(kalshi_ask) * 100),
-                        "type": "limit",
-                        "time_in_force": "fill_or_kill"
-                    }
-                    try:
-                        response = self.kalshi_gateway.create_order(order_a)
-                        if response and getattr(response, "status_code", None) == 201:
-                            self.kalshi_balance -= Decimal(kalshi_ask) * Decimal(size)  # Update balance tracking
-                    except Exception as e:
-                        self.logger.error(f"Failed to place order A: {e}")
-                    # Polymarket - Need BUY_SHORT at 1 - bid price to sell at bid price
-                    try:
-                        if poly_id.endswith("-inverse"):
-                            side = "BUY_SHORT"
-                        else:
-                            side = "BUY_LONG"
-                        response = self.polymarket_gateway.create_order(
-                            market_slug=poly_id,
-                            price=float(Decimal(1.0) - poly_bid),
-                            quantity=int(order_size),
-                            side=side,
-                            tif="FILL_OR_KILL",
-                            order_type="LIMIT",
-                        )
-                        if response and getattr(response, "status_code", None) == 201:
-                            self.polymarket_us_balance -= Decimal(Decimal(1.0) - poly_bid) * Decimal(order_size)  # Update balance tracking
-                    except Exception as e:
-                        self.logger.error(f"Failed to place order B: {e}")
-
-        # Ask on Polymarket < Bid on Kalshi
-        # Buy Polymarket, Sell Kalshi
-        if kalshi_bid and poly_ask:
-            # Calculate order size
-            #print(f"Best Ask: {best_ask_size}, Correlated Best Ask: {correlated_best_ask_size}")
-            order_size = int(min(float(poly_ask_size), float(kalshi_bid_size)))
-            
-            # Calculate required balance (cost of both orders)
-            cost_of_single_share = Decimal(kalshi_bid + poly_ask)
-            required_balance = Decimal(cost_of_single_share * order_size)
-                        
-            # Check balance before placing orders
-            if self.cached_balance < 0:
-                self.logger.warning(f"Negative balance detected: ${self.cached_balance:.2f}. Skipping trade.")
-                return
-            if not self.cached_balance > required_balance:
-                #self.logger.warning(f"Insufficient balance. Required: ${required_balance:.2f}, Available: ${self.cached_balance:.2f}")
-                order_size = math.floor(Decimal(str(self.cached_balance)) / cost_of_single_share)
-                
-            if order_size >= 1:
-            
-                # Track profit
-                self.overall_order_count += order_size
-                self.overall_profit += max((Decimal("1.0") - cost_of_single_share) * order_size , 0)
-                
-                # Calculate cost of trade (including fees) and potential profit
-                fees = Decimal(get_taker_fees_kalshi(Decimal(kalshi_bid), order_size) + get_taker_fees_polymarket_us(Decimal(poly_ask), order_size))
-                combined_price = Decimal(kalshi_bid * order_size) - Decimal(poly_ask * order_size) - fees
-                
-                if combined_price > self.min_edge:
-                    size = min(kalshi_bid_size, poly_ask_size, self._get_max_size(self.kalshi_balance, kalshi_bid), self._get_max_size(self.polymarket_us_balance, poly_ask))
-                    self.logger.info({
-                        "type": "same_side",
-                        "direction": "buy_poly_sell_kalshi",
-                        "poly_id": poly_id,
-                        "kalshi_ticker": kalshi_ticker,
-                        "buy_price": poly_ask,
-                        "sell_price": kalshi_bid,
-                        "edge": combined_price,
-                        "size": int(size)
-                    })
-                    # Send orders to gateway for execution
-                    # Polymarket - Need BUY_LONG at ask price to buy at ask price
-                    try:
-                        side = "BUY_SHORT" if poly_id.endswith("-inverse") else "BUY_LONG"
-                        response = self.polymarket_gateway.create_order(
-                            market_slug=poly_id,
-                            price=float(poly_ask),
-                            quantity=int(size),
-                            side=side,
-                            tif="FILL_OR_KILL",
-                            order_type="LIMIT",
-                        )
-                        if response and getattr(response, "status_code", None) == 201:
-                            self.polymarket_us_balance -= Decimal(poly_ask) * Decimal(size)  # Update balance tracking  
-                    except Exception as e:
-                        self.logger.error(f"Failed to place order A: {e}")
-                    # Kalshi - Buy NO ASK at 1 - bid price 
-                    order_b = {
-                        "ticker": kalshi_ticker,
-                        "action": "buy",
-                        "side": "no",
-                        "count": int(size),
-                        "client_order_id": str(uuid.uuid4()),
-                        "no_price": int(float(Decimal(1.0) - kalshi_bid) * 100),
-                        "type": "limit",
-                        "time_in_force": "fill_or_kill"
-                    }
-                    try:
-                        response = self.kalshi_gateway.create_order(order_b)
-                        if response and getattr(response, "status_code", None) == 201:
-                            self.kalshi_balance -= Decimal(Decimal(1.0) - kalshi_bid) * Decimal(size)  # Update balance tracking
-                    except Exception as e:
-                        self.logger.error(f"Failed to place order B: {e}")
-
-    def _double_buy_arb(self, order_A: dict, order_B: dict):
-        # Synthetic arbitrage
-        # If asks for Team 1 + Team 2 < $1
-        # Stategies 5, 6, 9, 10
-        if order_A["ask_price"] and order_B["ask_price"]:
-            # Calculate order size
-            #print(f"Best Ask: {best_ask_size}, Correlated Best Ask: {correlated_best_ask_size}")
-            order_size = int(min(float(order_A["ask_size"]), float(order_B["ask_size"])))
-            
-            # Calculate required balance (cost of both orders)
-            cost_of_single_share = Decimal(order_A["ask_price"]) + Decimal(order_B["ask_price"])
-            required_balance = Decimal(cost_of_single_share * order_size)
-            
-            # Check balance before placing orders
-            if self.cached_balance < 0:
-                self.logger.warning(f"Negative balance detected: ${self.cached_balance:.2f}. Skipping trade.")
-                return
-            if not self.cached_balance > required_balance:
-                #self.logger.warning(f"Insufficient balance. Required: ${required_balance:.2f}, Available: ${self.cached_balance:.2f}")
-                order_size = math.floor(Decimal(str(self.cached_balance)) / cost_of_single_share)
-                
-            if order_size < 1:
-                return
-            
-            # Track profit
-            self.overall_order_count += order_size
-            self.overall_profit += max((Decimal("1.0") - cost_of_single_share) * order_size , 0)
-                        
-            # Calculate cost of trade (including fees) and potential profit
-            for order in [order_A, order_B]:
-                if "Polymarket" in order["ask_market"]:
-                    fee = get_taker_fees_polymarket_us(order["ask_price"], order_size)
-                elif "Kalshi" in order["ask_market"]:
-                    fee = get_taker_fees_kalshi(order["ask_price"], order_size)
-                else:
-                    print(f"Unknown market in order: {order['ask_market']}. Cannot calculate fees.")
-                    return
-                order["fee"] = fee
-                
-            fees = Decimal(order_A["fee"] + order_B["fee"])
-            combined_price = Decimal(order_A["ask_price"]) + Decimal(order_B["ask_price"]) + fees
-            profit = Decimal(Decimal(1) - combined_price)
-            if profit > self.min_edge:
-                self.logger.info({
-                    "type": "double_buy",
-                    "total_cost": combined_price,
-                    "profit": profit,
-                    "market_A": order_A["ask_market"],
-                    "ask_price": order_A["ask_price"],
-                    "ask_size": order_A["ask_size"],
-                    "market_B": order_B["ask_market"],
-                    "ask_B_price": order_B["ask_price"],
-                    "ask_B_size": order_B["ask_size"]
-                })
-                # Need to update order if Polymarket inverse
-                for order in [order_A, order_B]:
-                    try:
-                        if "Polymarket" in order["ask_market"]:
-                            side = "BUY_SHORT" if order["ask_market"].endswith("-inverse") else "BUY_LONG"
-                            response =self.polymarket_gateway.create_order(
-                                market_slug=order["ask_market"].split(": ")[1],
-                                price=float(order["ask_price"]),
-                                quantity=order_size,
-                                side=side,
-                                tif="FILL_OR_KILL",
-                                order_type="LIMIT",
-                            )
-                            if response and getattr(response, "status_code", None) == 201:
-                                self.polymarket_us_balance -= Decimal(order["ask_price"]) * order_size  # Update balance tracking
-                        elif "Kalshi" in order["ask_market"]:
-                            response = self.kalshi_gateway.create_order({
-                                "ticker": order["ask_market"].split(": ")[1],
-                                "action": "buy",
-                                "side": "yes",
-                                "count": order_size,
-                                "client_order_id": str(uuid.uuid4()),
-                                "yes_price": int(float(order["ask_price"]) * 100),
-                                "type": "limit",
-                                "time_in_force": "fill_or_kill"
-                            })
-                            if response and getattr(response, "status_code", None) == 201:
-                                self.kalshi_balance -= Decimal(Decimal(1.0) - Decimal(order["ask_price"])) * order_size  # Update balance tracking
-                    except Exception as e:
-                        self.logger.error(f"Failed to place order: {e}")
-
-
-    def _double_sell_arb(self, order_A: dict, order_B: dict):
-        # Short sell
-        # If we have positions, we can use arbritage to sell out of the position
-        # Strategies 7, 8
-
-        if order_A["bid_price"] and order_B["bid_price"]:
-            # Calculate order size
-            #print(f"Best Ask: {best_ask_size}, Correlated Best Ask: {correlated_best_ask_size}")
-            order_size = int(min(float(order_A["bid_size"]), float(order_B["bid_size"])))
-            
-            # Calculate required balance (cost of both orders)
-            cost_of_single_share = Decimal(order_A["bid_price"]) + Decimal(order_B["bid_price"])
-            required_balance = Decimal(cost_of_single_share * order_size)
-            
-            # Check balance before placing orders
-            if self.cached_balance < 0:
-                self.logger.warning(f"Negative balance detected: ${self.cached_balance:.2f}. Skipping trade.")
-                return
-            if not self.cached_balance > required_balance:
-                #self.logger.warning(f"Insufficient balance. Required: ${required_balance:.2f}, Available: ${self.cached_balance:.2f}")
-                order_size = math.floor(Decimal(str(self.cached_balance)) / cost_of_single_share)
-                
-            if order_size < 1:
-                return
-            
-            # Track profit
-            self.overall_order_count += order_size
-            self.overall_profit += max((Decimal("1.0") - cost_of_single_share) * order_size , 0)
-            
-            # Calculate fees:
-            for order in [order_A, order_B]:
-                if "Polymarket" in order["bid_market"]:
-                    fee = get_taker_fees_polymarket_us(order["bid_price"], Decimal(1))
-                elif "Kalshi" in order["bid_market"]:
-                    fee = get_taker_fees_kalshi(order["bid_price"], Decimal(1))
-                else:
-                    print(f"Unknown market in order: {order['bid_market']}. Cannot calculate fees.")
-                    return
-                order["fee"] = fee
-                
-            fees = Decimal(order_A["fee"] + order_B["fee"])
-            combined_price = Decimal(order_A["bid_price"]) + Decimal(order_B["bid_price"]) - fees
-            profit = Decimal(combined_price - Decimal(1))
-            if profit > self.min_edge:
-                self.logger.info({
-                    "type": "double_sell",
-                    "total_sale": combined_price,
-                    "profit": profit,
-                    "market_A": order_A["bid_market"],
-                    "bid_A_price": order_A["bid_price"],
-                    "bid_A_size": order_A["bid_size"],
-                    "market_B": order_B["bid_market"],
-                    "bid_B_price": order_B["bid_price"],
-                    "bid_B_size": order_B["bid_size"]
-                })
-                
-            # TODO: Need to add logic to send orders
-                
+    def _execute_opportunity(self, allocation: Allocation) -> None:
+        """
+        Execute a single funded opportunity.
+
+        The CapitalAllocator has reserved each leg's capital on its venue for
+        allocation.size shares. Fees are recomputed at that size with the
+        Decimal fee functions and the edge rechecked before both legs are
+        sent; otherwise the reservations are released. Legs are
+        fill-or-kill, so a leg's reservation is committed once it is sent and
+        released if sending fails; the periodic balance reconcile corrects
+        any leg that did not fill.
+        """
+        opp = allocation.opportunity
+        order_size = allocation.size
+
+        leg_fees = [
+            self._fee(KALSHI if leg["venue"] == "Kalshi" else POLYMARKET_US, leg["cost"], order_size)
+            for leg in opp["legs"]
+        ]
+        total_cost = opp["cost_per_share"] * order_size + sum(leg_fees)
+        profit = order_size - total_cost
+        if profit <= self.min_edge:
+            self.capital_allocator.release_all(allocation.reservations)
+            return
+
+        # Track profit
+        self.overall_order_count += order_size
+        self.overall_profit += profit
+
+        self.logger.info({
+            "type": opp["type"],
+            "direction": opp["direction"],
+            "legs": [
+                f"{leg['action']} {leg['venue']}: {leg['ticker']}@{leg['price']}"
+                for leg in opp["legs"]
+            ],
+            "total_cost": total_cost,
+            "profit": profit,
+            "size": order_size,
+        })
+
+        spent = {}
+        for leg, fee in zip(opp["legs"], leg_fees):
+            if self._place_leg(leg, order_size):
+                spent[leg["venue"]] = spent.get(leg["venue"], 0) + leg["cost"] * order_size + fee
+        for venue, reservation in allocation.reservations.items():
+            if venue in spent:
+                self.capital_allocator.commit(reservation, spent[venue])
+            else:
+                self.capital_allocator.release(reservation)
+
     def _sell_out_of_position_arb(self):
         pass
-    
-    # TODO: Why have book_snapshots as an argument when we can access self.kalshi_client.orderbooks directly? To avoid contention on the event loop by snapshotting orderbooks once and passing to all strategies, instead of each strategy accessing orderbooks which may be updated by WS messages during processing
-    def find_opportunities(self, kalshi_book_snapshots: dict | None = None, polymarket_us_book_snapshots: dict | None = None): 
-        # Category: [dicts]
-        for category, mapping_dicts in self.mapping.items():
-            for m in mapping_dicts:
-                polymarket_ticker = m["polymarket_ticker"]
-                kalshi_ticker = m["kalshi_ticker"]
-                other_poly_id = m["other_poly_id"]
-                other_kalshi_ticker = m["other_kalshi_ticker"]
-
-                # Legacy orderbook retrival
-                """
-                poly_A, kalshi_A = self._get_books(polymarket_ticker, kalshi_ticker)
-                poly_B, kalshi_B = self._get_books(other_poly_id, other_kalshi_ticker)
-
-                if not (poly_A and kalshi_A and poly_B and kalshi_B):
-                    self.logger.warning(
-                        f"Orderbook missing for {polymarket_ticker} or {kalshi_ticker} "
-                        f"or {other_poly_id} or {other_kalshi_ticker}. Skipping."
-                    )
-                    continue
-
-                poly_bid_A, poly_bid_A_size, poly_ask_A, poly_ask_A_size = self._best_prices(poly_A)
-                kalshi_bid_A, kalshi_bid_A_size, kalshi_ask_A, kalshi_ask_A_size = self._best_prices(kalshi_A)
-                
-                poly_bid_B, poly_bid_B_size, poly_ask_B, poly_ask_B_size = self._best_prices(poly_B)
-                kalshi_bid_B, kalshi_bid_B_size, kalshi_ask_B, kalshi_ask_B_size = self._best_prices(kalshi_B)
-                """
-
-                poly_bid_A, poly_bid_A_size, poly_ask_A, poly_ask_A_size = polymarket_us_book_snapshots[polymarket_ticker]
-                kalshi_bid_A, kalshi_bid_A_size, kalshi_ask_A, kalshi_ask_A_size = kalshi_book_snapshots[kalshi_ticker]
-                
-                poly_bid_B, poly_bid_B_size, poly_ask_B, poly_ask_B_size = polymarket_us_book_snapshots[other_poly_id]
-                kalshi_bid_B, kalshi_bid_B_size, kalshi_ask_B, kalshi_ask_B_size = kalshi_book_snapshots[other_kalshi_ticker]
-
-                
-                poly_ask_A, poly_bid_A, poly_ask_B, poly_bid_B, kalshi_ask_A, kalshi_bid_A, kalshi_ask_B, kalshi_bid_B = map(lambda x: Decimal(x) if x else None, [poly_ask_A, poly_bid_A, poly_ask_B, poly_bid_B, kalshi_ask_A, kalshi_bid_A, kalshi_ask_B, kalshi_bid_B])
-
-                # ---- SAME SIDE ARBS (A + B independently) ----
-                # Stragies 1, 2, 3, 4
-                self._same_side_arb(
-                    polymarket_ticker, kalshi_ticker,
-                    poly_bid_A, poly_bid_A_size, poly_ask_A, poly_ask_A_size,
-                    kalshi_bid_A, kalshi_bid_A_size, kalshi_ask_A, kalshi_ask_A_size
-                )
-
-                self._same_side_arb(
-                    other_poly_id, other_kalshi_ticker,
-                    poly_bid_B, poly_bid_B_size, poly_ask_B, poly_ask_B_size,
-                    kalshi_bid_B, kalshi_bid_B_size, kalshi_ask_B, kalshi_ask_B_size
-                )
-
-                # ---- DOUBLE BUY (synthetic long event) ----
-                # Strategies 5, 6, 9, 10
-                if poly_ask_A and kalshi_ask_A:
-                    if poly_ask_A <= kalshi_ask_A:
-                        order_A = {
-                            "ask_price": poly_ask_A,
-                            "ask_size": poly_ask_A_size,
-                            "ask_market": f"Polymarket: {polymarket_ticker}"
-                        }
-                    else:
-                        order_A = {
-                            "ask_price": kalshi_ask_A,
-                            "ask_size": kalshi_ask_A_size,
-                            "ask_market": f"Kalshi: {kalshi_ticker}"
-                        }
-                else:
-                    # self.logger.warning(f"Missing ask price for {polymarket_ticker} or {kalshi_ticker}. Skipping double buy arb.")
-                    continue
-                if poly_ask_B and kalshi_ask_B:
-                    if poly_ask_B <= kalshi_ask_B:
-                        order_B = {
-                            "ask_price": poly_ask_B,
-                            "ask_size": poly_ask_B_size,
-                            "ask_market": f"Polymarket: {other_poly_id}"
-                        }
-                    else:
-                        order_B = {
-                            "ask_price": kalshi_ask_B,
-                            "ask_size": kalshi_ask_B_size,
-                            "ask_market": f"Kalshi: {other_kalshi_ticker}"
-                        }
-                else:
-                    # self.logger.warning(f"Missing ask price for {other_poly_id} or {other_kalshi_ticker}. Skipping double buy arb.")
-                    continue
-
-                self._double_buy_arb(order_A, order_B)
-
-                # ---- DOUBLE SELL (synthetic short event) ----
-                """
-                if poly_bid_A and kalshi_bid_A:
-                    if poly_bid_A >= kalshi_bid_A:
-                        best_bid_A = poly_bid_A
-                        best_bid_A_size = poly_bid_A_size
-                        best_bid_A_market = "Polymarket"
-                    else:
-                        best_bid_A = kalshi_bid_A
-                        best_bid_A_size = kalshi_bid_A_size
-                        best_bid_A_market = "Kalshi"
-                else:
-                    self.logger.warning(f"Missing bid price for {poly_id} or {kalshi_ticker}. Skipping double sell arb.")
-                    continue
-                if poly_bid_B and kalshi_bid_B:
-                    if poly_bid_B >= kalshi_bid_B:
-                        best_bid_B = poly_bid_B
-                        best_bid_B_size = poly_bid_B_size
-                        best_bid_B_market = "Polymarket"
-                    else:
-                        best_bid_B = kalshi_bid_B
-                        best_bid_B_size = kalshi_bid_B_size
-                        best_bid_B_market = "Kalshi"
-                else:
-                    self.logger.warning(f"Missing bid price for {other_poly_id} or {other_kalshi_ticker}. Skipping double sell arb.")
-                    continue
-
-                self._double_sell_arb(best_bid_A, best_bid_A_size, best_bid_A_market, best_bid_B, best_bid_B_size, best_bid_B_market)
-                """
-                # Need to create strategies for NO sides
 
+    # ------------------------------------------------------------------ #
+    # Public entry points                                                  #
+    # ------------------------------------------------------------------ #
+
+    def collect_opportunities(self, kalshi_book_snapshots: TopOfBookSnapshot | None = None, polymarket_us_book_snapshots: TopOfBookSnapshot | None = None) -> list:
+        """
+        Collect this cycle's opportunities without executing them, for global
+        ranking by the CapitalAllocator (see main.run_strategy_cycle).
+
+        Args:
+            kalshi_book_snapshots: TopOfBookSnapshot from
+                kalshi_client.snapshot_all_books(). Taken at call time if None.
+            polymarket_us_book_snapshots: TopOfBookSnapshot from
+                polymarket_client.snapshot_all_books(). Taken at call time if
+                None.
+        """
+        if kalshi_book_snapshots is None:
+            kalshi_book_snapshots = self.kalshi_client.snapshot_all_books()
+        if polymarket_us_book_snapshots is None:
+            polymarket_us_book_snapshots = self.polymarket_client.snapshot_all_books()
+        return self._collect_opportunities(kalshi_book_snapshots, polymarket_us_book_snapshots)
+
+    def execute_allocation(self, allocation: Allocation) -> None:
+        """Execute one opportunity funded by CapitalAllocator.allocate."""
+        self._execute_opportunity(allocation)
+
+    def find_opportunities(self, kalshi_book_snapshots: TopOfBookSnapshot | None = None, polymarket_us_book_snapshots: TopOfBookSnapshot | None = None):
+        """
+        Scan every mapped event on both venues, then execute the most
+        profitable opportunities first.
+
+        Args:
+            kalshi_book_snapshots: TopOfBookSnapshot from
+                kalshi_client.snapshot_all_books(). Taken at call time if None.
+            polymarket_us_book_snapshots: TopOfBookSnapshot from
+                polymarket_client.snapshot_all_books(). Taken at call time if
+                None.
+        """
+        all_opps = self.collect_opportunities(kalshi_book_snapshots, polymarket_us_book_snapshots)
+        if not all_opps:
+            return
+
+        self.logger.info(f"Found {len(all_opps)} opportunity(ies) this cycle; executing in profit order.")
+
+        # The allocator funds them by expected profit descending
+        for allocation in self.capital_allocator.allocate(all_opps):
+            self._execute_opportunity(allocation)
 
 
 if __name__ == "__main__":
-    # Example usage
-    """
-    arb_engine = CrossExchangeArbitrage(
-        polymarket_client,
-        kalshi_client,
-        polymarket_kalshi_mapping,
-        min_edge=0.01
-    )
-    
-
-    opps = arb_engine.find_opportunities()
-
-    for o in opps:
-        print(o)
-        
-    """
-    pass
+    # Benchmark: vectorized scan over synthetic snapshots
+    from top_of_book import TopOfBookTable
+
+    class _OfflineGateway:
+        pass
+
+    rng = np.random.default_rng(0)
+    print(f"{'events':>8} {'scan':>9} {'opportunities':>14}")
+    for n in (100, 1_000, 10_000):
+        kalshi_table, poly_table = TopOfBookTable(), TopOfBookTable()
+        mapping = {"sports": []}
+        for i in range(n):
+            row = {
+                "polymarket_ticker": f"bench-{n}-{i}",
+                "kalshi_ticker": f"KXBENCH-{n}-{i}-A",
+                "other_poly_id": f"bench-{n}-{i}-inverse",
+                "other_kalshi_ticker": f"KXBENCH-{n}-{i}-B",
+            }
+            mapping["sports"].append(row)
+            # Both venues quote the same event around a shared mid; team B
+            # is the complement of team A
+            mid = rng.uniform(0.1, 0.9)
+            for table, name, fair in ((poly_table, row["polymarket_ticker"], mid), (kalshi_table, row["kalshi_ticker"], mid),
+                                      (poly_table, row["other_poly_id"], 1 - mid), (kalshi_table, row["other_kalshi_ticker"], 1 - mid)):
+                symbol_id = symbols.intern(name)
+                table.register(symbol_id)
+                quote_mid = fair + rng.normal(0, 0.01)
+                half = rng.choice([0.01, 0.02, 0.03])
+                table.update(symbol_id, round(quote_mid - half, 2), float(rng.integers(1, 500)),
+                             round(quote_mid + half, 2), float(rng.integers(1, 500)))
+
+        allocator = CapitalAllocator()
+        strategy = CrossExchangeArbitrage(None, None, _OfflineGateway(), _OfflineGateway(), None, mapping,
+                                          capital_allocator=allocator)
+        kalshi_snapshot, poly_snapshot = kalshi_table.snapshot(), poly_table.snapshot()
+        start = time.perf_counter()
+        opportunities = strategy._collect_opportunities(kalshi_snapshot, poly_snapshot)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        print(f"{n:>8} {elapsed_ms:>7.2f}ms {len(opportunities):>14}")
@@ -1,88 +1,12 @@
-import requests
-import difflib
 import os
-import re
 import json
-import time
 from collections import defaultdict
 from difflib import SequenceMatcher
 from groq import Groq
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-
-
-PREFIX_PROMPT = f"""
-You are matching prediction markets across two exchanges.
-Do these two markets represent the SAME underlying real-world event?
-Respond ONLY with a number between 0 and 1.
-"""
-
-
-def build_text(events_dict, category):
-    """
-    Combine all useful fields into one text blob
-    """
-    texts = []
-    for series_name, series in events_dict[category].items():
-        for event_name, event in series.items():
-            title = event.get("title", "")
-            subtitle = event.get("subtitle", "")
-            text_dict = {
-                "title": f"{title} {subtitle} {category} {series_name} {event_name}".lower(),
-                "category": category,
-                "series_name": series_name,
-                "event_name": event_name
-            }
-            texts.append(text_dict)
-    return texts
-
-
-def match_events(kalshi_events, poly_events, threshold=0.5):
-
-    kalshi_texts = build_text(kalshi_events)
-    poly_texts = build_text(poly_events)
-    
-    vectorizer = TfidfVectorizer(
-        stop_words="english",
-        ngram_range=(1, 2)  # big improvement over unigram
-    )
-
-    all_texts = kalshi_texts + poly_texts
-    print(all_texts)
-    tfidf_matrix = vectorizer.fit_transform(all_texts)
-
-    kalshi_vecs = tfidf_matrix[:len(kalshi_texts)]
-    poly_vecs = tfidf_matrix[len(kalshi_texts):]
-
-    similarity = cosine_similarity(poly_vecs, kalshi_vecs)
 
-    mappings = []
-
-    for i, row in enumerate(similarity):
-        best_idx = row.argmax()
-        score = row[best_idx]
-
-        if score >= threshold:
-            mappings.append({
-                "polymarket_event": poly_events[i]["slug"],
-                "kalshi_event": kalshi_events[best_idx]["event_ticker"],
-                "score": float(score)
-            })
+from event_matching import CANDIDATES_PER_EVENT, EventIndex, build_text, cheap_similarity, extract_event_date, normalize
+from llm_pair_scorer import GroqBackend, PairScorer, RateLimiter, ScoreCache
 
-    return mappings
-
-# ============================================================
-# Helpers
-# ============================================================
-
-def normalize(text: str) -> str:
-    text = text.lower()
-    text = re.sub(r'[^a-z0-9 ]+', ' ', text)
-    text = re.sub(r'\s+', ' ', text).strip()
-    return text
-
-def cheap_similarity(a: str, b: str) -> float:
-    return difflib.SequenceMatcher(None, a, b).ratio()
 
 # ============================================================
 # Fetch Kalshi Politics Markets (guaranteed non-zero)
@@ -99,6 +23,7 @@ def fetch_kalshi_politics(kalshi_events, category):
             "series_name": text_dict["series_name"],
             "event_name": text_dict["event_name"],
             "norm": normalize(title),
+            "date": extract_event_date(text_dict["event_name"]),
         })
 
     return subset
@@ -118,7 +43,8 @@ def fetch_polymarket_politics(poly_events, category):
             "norm": normalize(title),
             "category": text_dict["category"],
             "series_name": text_dict["series_name"],
-            "event_name": text_dict["event_name"]
+            "event_name": text_dict["event_name"],
+            "date": extract_event_date(text_dict["event_name"]),
         })
     return subset
 
@@ -132,153 +58,44 @@ def fetch_polymarket_politics(poly_events, category):
 with open("GROQ.key", "r") as f:
     LLM_API_KEY = f.read().strip()
 
-# ----------------------------
-# Rate Limiter (30 req/min)
-# ----------------------------
-class RateLimiter:
-    def __init__(self, max_requests_per_minute):
-        self.interval = 60.0 / max_requests_per_minute
-        self.last_call = 0.0
-
-    def wait(self):
-        now = time.time()
-        elapsed = now - self.last_call
-        if elapsed < self.interval:
-            time.sleep(self.interval - elapsed)
-        self.last_call = time.time()
-
-rate_limiter = RateLimiter(30)  # 30 requests per minute
 groq_client = Groq(
     api_key=LLM_API_KEY,
 )
+# 30 requests per minute; scores are cached in statics/.cache across runs
+scorer = PairScorer(GroqBackend(groq_client), ScoreCache(), RateLimiter(30))
 
-def score_pair_llm(k_title: str, p_title: str, max_retries: int = 3) -> float:
-    """Score a pair using Groq with rate limiting + retries."""
-    prompt = f"""
-    Market A: "{k_title}"
-    Market B: "{p_title}"
-    """
-
-    headers = {
-        "Authorization": f"Bearer {LLM_API_KEY}",
-        "Content-Type": "application/json",
-    }
-
-    body = {
-        "model": "llama-3.3-70b-versatile",  # Groq model
-        "messages": [
-            {"role": "system", "content": "You are a precise market-matching assistant."},
-            {"role": "user", "content": prompt},
-        ],
-        "temperature": 0.0,
-    }
-
-    for attempt in range(max_retries):
-        try:
-            # 🔒 Rate limit BEFORE request
-            rate_limiter.wait()
-            #print(f"Attempt {attempt}: Market A: {k_title} | Market B: {p_title}")
-            
-            resp = groq_client.chat.completions.create(
-                model= "llama-3.3-70b-versatile",  # Groq model
-                #model="llama-3.1-8b-instant",  # Cheaper, faster Groq model for testing
-                messages=[
-                    {"role": "system", "content": "You are a precise market-matching assistant."},
-                    {"role": "user", "content": PREFIX_PROMPT + prompt},
-                ],
-                temperature=0.0
-            )
-            #print(resp)
-            #print(resp.choices[0].message.content)
-            #resp = resp.choices[0].message.content
-            """
-            if resp.status_code == 429:
-                retry_after = int(resp.headers.get("Retry-After", 2 ** attempt))
-                print(f"Rate limited. Retrying after {retry_after}s")
-                time.sleep(retry_after)
-                continue
-            """
-            #resp.raise_for_status()
-            content = resp.choices[0].message.content
-
-            try:
-                #obj = json.loads(content)
-                #print(obj)
-                return float(content.strip('```\n').strip('\n```'))
-            except Exception as e:
-                print(f"Error parsing LLM response: {e}")
-                return 0.0
-
-        except requests.exceptions.RequestException as e:
-            if attempt < max_retries - 1:
-                wait_time = 2 ** attempt
-                print(f"Request failed: {e}. Retrying in {wait_time}s...")
-                time.sleep(wait_time)
-            else:
-                print("Max retries reached. Returning 0.0")
-                return 0.0
-
-    return 0.0
+def score_pair_llm(k_title: str, p_title: str) -> float:
+    """Score a pair using Groq, from the score cache when already scored."""
+    return scorer.score_pair(k_title, p_title)
 
 
 # ============================================================
 # Correlate
 # ============================================================
 
-def extract_event_date(event_name):
-    """
-    Extract date from event_name in either Polymarket or Kalshi format.
-    
-    Polymarket: ufc-seddum-jacmcv-2026-04-25 -> 2026-04-25
-    Kalshi:     KXNBAGAME-26APR26SASPOR -> 26APR26
-    
-    Returns date object or None if no date found.
-    """
-    from datetime import datetime
-    
-    # Polymarket format: YYYY-MM-DD
-    m = re.search(r"(\d{4})-(\d{2})-(\d{2})", event_name)
-    if m:
-        try:
-            return datetime.strptime(m.group(1) + m.group(2) + m.group(3), "%Y%m%d").date()
-        except ValueError:
-            pass
-    
-    # Kalshi format: YYMMMDD (e.g., 26APR26)
-    m = re.search(r"(\d{1,2})([A-Z]{3})(\d{2})", event_name)
-    if m:
-        try:
-            return datetime.strptime(m.group(1) + m.group(2) + m.group(3), "%y%b%d").date()
-        except ValueError:
-            pass
-    
-    return None
-
-def correlate_small(kalshi, poly, cheap_threshold=0.45, llm_threshold=0.95):
+def correlate_small(kalshi, poly, cheap_threshold=0.45, llm_threshold=0.95, top_k=CANDIDATES_PER_EVENT, pair_scorer=None):
+    pair_scorer = pair_scorer or scorer
     candidates = []
+    results = []
     try:
+        # Only consider pairs that have the same date for sports category, and
+        # only the top_k nearest Polymarket events per Kalshi event
+        match_dates = bool(poly) and poly[0]["category"].lower() == 'sports'
+        index = EventIndex(poly, match_dates=match_dates)
         for k in kalshi:
-            for p in poly:
-                # Only consider pairs that have the same date for sports category
-                if p["category"].lower() == 'sports':
-                    k_date = extract_event_date(k["event_name"])
-                    p_date = extract_event_date(p["event_name"])
-                    if k_date and p_date and k_date != p_date:
-                        continue
+            for _, j in index.candidates(k, top_k):
+                p = poly[j]
                 s = cheap_similarity(k["norm"], p["norm"])
                 if s >= cheap_threshold:
                     candidates.append((s, k, p))
-        
-        results = []
-        for cheap_score, k, p in candidates:
-            llm_score = score_pair_llm(k["title"], p["title"])
+
+        # Cached pairs are free; the rest are scored in batches by the rate-limited pool
+        llm_scores = pair_scorer.score_pairs([(k["title"], p["title"]) for _, k, p in candidates])
+        print(f"LLM scoring: {pair_scorer.hits} cached, {pair_scorer.misses} scored")
+        for llm_score, (cheap_score, k, p) in zip(llm_scores, candidates):
             if llm_score >= llm_threshold:
                 print(f"Cheap score: {cheap_score:.2f} | LLM score: {llm_score:.2f} | Kalshi: {k['title']} | Polymarket: {p['title']}")
                 results.append((llm_score, cheap_score, k, p))
-                #if len(results) >= 10:  # Limit to top 10 matches for testing
-                #    break
-                continue
-            time.sleep(0.5)  # Increased from 0.2s to 0.5s between calls
     except Exception as e:
         print(f"Error during correlation: {e}")
 
@@ -0,0 +1,596 @@
+import re
+import time
+
+import numpy as np
+
+from capital_allocator import CapitalAllocator
+from cross_exchange_arbitrage import BUY, KALSHI, POLYMARKET_US, SELL, CrossExchangeArbitrage
+from intra_kalshi_spread_total_arbitrage import SCANNERS
+from kalshi_feed import KalshiWebSocket
+from kalshi_http_gateway import KalshiHTTPGateway
+from pair_graph import parse_suffix
+from polymarket_us_feed import PolymarketUSWebSocket
+from polymarket_us_http_gateway import PolymarketUSHTTPGateway
+from position_manager import PositionManager
+from symbol_table import symbols
+from top_of_book import ASK, ASK_SIZE, BID, BID_SIZE, TopOfBookSnapshot
+from utils import PRICE_SCALE, price_ticks
+
+STRATEGY_NAME = "cross_exchange_spread_total"
+
+MARKET_TYPES = ("spread", "total")
+
+# Full-game Kalshi ladders share the moneyline event code under the same
+# series root: KXMLBGAME-26MAY192140SFAZ -> KXMLBSPREAD-26MAY192140SFAZ /
+# KXMLBTOTAL-26MAY192140SFAZ. First-half, F5 and team-total series never match.
+KALSHI_MONEYLINE_SERIES_SUFFIX = "GAME"
+KALSHI_SERIES_SUFFIX = {"spread": "SPREAD", "total": "TOTAL"}
+
+# Polymarket US lines, all x.5: 'asc-mlb-laa-cle-2026-05-12-neg-1pt5' is
+# the first team -1.5, 'tsc-mlb-laa-cle-2026-05-12-8pt5' is over 8.5
+_POLYMARKET_SPREAD_RE = re.compile(r'-(pos|neg)-(\d+)pt5$')
+_POLYMARKET_TOTAL_RE = re.compile(r'-(\d+)pt5$')
+
+# The ladder scan sorts every rung twice (once per partner venue); it beats
+# testing every pair from about this many cross-venue pairs per rung
+# (python cross_exchange_spread_total_arbitrage.py)
+LADDER_SCAN_MIN_PAIRS_PER_RUNG = 12
+
+# Sentinels for a missing YES ask / bid, in ticks
+_NO_ASK = 2 * PRICE_SCALE
+_NO_BID = -1
+
+
+def polymarket_line(slug: str, market_type: str) -> int | None:
+    """
+    Line of a Polymarket US spread/total slug in half points: YES pays when
+    the first team's margin (spread) or the combined score (total) is above
+    line / 2. None for slugs without an x.5 line.
+
+        'asc-nba-min-sa-2026-05-12-pos-2pt5'  -> -5   (MIN +2.5: margin > -2.5)
+        'asc-nhl-ana-veg-2026-05-12-neg-1pt5' -> 3    (ANA -1.5: margin > 1.5)
+        'tsc-mlb-laa-cle-2026-05-12-8pt5'     -> 17   (over 8.5)
+    """
+    if market_type == "spread":
+        m = _POLYMARKET_SPREAD_RE.search(slug)
+        if m is None:
+            return None
+        line = 2 * int(m.group(2)) + 1
+        return -line if m.group(1) == "pos" else line
+    m = _POLYMARKET_TOTAL_RE.search(slug)
+    return 2 * int(m.group(1)) + 1 if m else None
+
+
+def kalshi_line(ticker: str, market_type: str, team_a: str, team_b: str) -> tuple[int, bool] | None:
+    """
+    (line, flipped) of a Kalshi spread/total ticker on the same scale as
+    polymarket_line. A trailing number N means "more than N - 0.5":
+
+        'KXMLBSPREAD-...-DET3'  -> (5, False)    DET (team A) wins by 3+
+        'KXMLBSPREAD-...-KC3'   -> (-5, True)    KC wins by 3+, i.e. NOT
+                                                 (DET margin > -2.5)
+        'KXMLBTOTAL-...-9'      -> (17, False)   over 8.5
+
+    flipped means the market's YES is the NO of "above the line". None for
+    tickers of neither team or a non-standard suffix.
+    """
+    parsed = parse_suffix(ticker)
+    if parsed is None:
+        return None
+    prefix, num = parsed
+    line = 2 * num - 1
+    if market_type == "total":
+        return (line, False) if prefix == "" else None
+    if prefix == team_a:
+        return line, False
+    if prefix == team_b:
+        return -line, True
+    return None
+
+
+def link_games(rows, kalshi_mapping: dict, polymarket_mapping: dict, market_type: str) -> dict:
+    """
+    Members of every game's merged ladder, for games quoted on both venues.
+
+    Games are linked through the cross-exchange moneyline rows: the
+    polymarket_ticker 'aec-mlb-det-kc-2026-05-10' names the Polymarket US
+    game 'mlb-det-kc-2026-05-10' (its long side is the first team, the
+    reference team of the spread lines), and the matching kalshi_ticker
+    'KXMLBGAME-26MAY101920DETKC-DET' gives the Kalshi event code and that
+    team's code; other_kalshi_ticker gives the other team's.
+
+    Args:
+        rows: Moneyline rows as (polymarket_ticker, kalshi_ticker,
+            other_poly_id, other_kalshi_ticker) tuples.
+        kalshi_mapping: CORRELATED_SPREAD/TOTAL_MARKET_MAPPING (ticker ->
+            the other tickers of its event).
+        polymarket_mapping: Polymarket US spread/total event to market
+            mapping ({category: {series: {game: {"market_slugs": [...]}}}}).
+        market_type: 'spread' or 'total'.
+
+    Returns:
+        Dict of game -> list of (venue, name, line, flipped) rungs.
+    """
+    kalshi_events: dict[str, set] = {}
+    for ticker, correlated in kalshi_mapping.items():
+        kalshi_events.setdefault(ticker.rsplit("-", 1)[0], set()).update([ticker, *correlated])
+    polymarket_games = {
+        game: event.get("market_slugs", [])
+        for series in polymarket_mapping.values()
+        for events in series.values()
+        for game, event in events.items()
+    }
+
+    games = {}
+    for poly_a, kalshi_a, _, kalshi_b in rows:
+        game = poly_a.split("-", 1)[-1]
+        event, team_a = kalshi_a.rsplit("-", 1)
+        series, _, code = event.partition("-")
+        if not series.endswith(KALSHI_MONEYLINE_SERIES_SUFFIX) or game not in polymarket_games:
+            continue
+        team_b = kalshi_b.rsplit("-", 1)[-1]
+        kalshi_event = f"{series.removesuffix(KALSHI_MONEYLINE_SERIES_SUFFIX)}{KALSHI_SERIES_SUFFIX[market_type]}-{code}"
+        if kalshi_event not in kalshi_events:
+            continue
+
+        rungs = []
+        for ticker in sorted(kalshi_events[kalshi_event]):
+            parsed = kalshi_line(ticker, market_type, team_a, team_b)
+            if parsed is not None:
+                rungs.append(("Kalshi", ticker, *parsed))
+        n_kalshi = len(rungs)
+        for slug in polymarket_games[game]:
+            line = polymarket_line(slug, market_type)
+            if line is not None:
+                rungs.append(("Polymarket_US", slug, line, False))
+        if 0 < n_kalshi < len(rungs):
+            games[game] = rungs
+    return games
+
+
+class CrossExchangeSpreadTotalArbitrage(CrossExchangeArbitrage):
+    """
+    Detects monotonicity violations across Kalshi and Polymarket US spread
+    and total ladders of the same game.
+
+    --- Merged ladder ---
+    Every spread market of a game is a bet on the first team's margin M
+    (the Polymarket US reference team) being above or below a line, and
+    every total market on the combined score being above a line. Each
+    market becomes a rung "above line" of one merged ladder per game:
+        Polymarket US  pos-X.5 -> M > -X.5,  neg-X.5 -> M > X.5,
+                       X.5 total -> over X.5
+        Kalshi         first team N -> M > N - 0.5
+                       other team N -> NOT (M > -(N - 0.5)), a flipped rung
+                       whose "above line" YES is bought as the market's NO
+                       total N -> over N - 0.5
+    Lines are all x.5, so no outcome lands on one.
+
+    --- Arbitrage structure ---
+    As in IntraKalshiSpreadTotalArbitrage, for an easier rung (lower line)
+    and a harder rung on the other venue:
+        Leg 1: buy easier "above line" YES at its ask
+        Leg 2: buy harder "above line" NO at 1 - its bid
+    pays at least $1 per share. Equal lines on the two venues are the same
+    event, so those pairs are checked in both directions. Only cross-venue
+    pairs are scanned; Kalshi-only pairs are IntraKalshiSpreadTotalArbitrage's.
+    Legs are scored with each venue's taker fees by the inherited
+    _score_legs, and executed by the inherited path (a flipped Kalshi rung
+    trades its NO for leg 1 and its YES for leg 2).
+
+    --- Indexed arrays ---
+    Each game's rungs are compiled once into parallel arrays (venue, symbol
+    id, flipped, line) sorted by line, with its cross-venue pairs as rung
+    index arrays built by broadcasting. Games are kept per merged ladder so
+    update_mappings() and on_markets_changed() only touch the ladders that
+    changed, and are concatenated into one flat set of arrays per market
+    type. A scan gathers every rung's quote from both venue snapshots and
+    either tests every pair ("pairs") or takes a running minimum ask of each
+    partner venue along the ladders and expands only the rungs whose bid
+    beats it ("ladders", see _ladder_candidates). "auto" picks per market
+    type by pairs per rung.
+    """
+
+    strategy_name = STRATEGY_NAME
+    logger_name = "cross_exchange_spread_total_strategy"
+    families = (
+        ("nested_spread", "buy_easier_yes_harder_no"),
+        ("nested_total", "buy_easier_yes_harder_no"),
+    )
+
+    def __init__(
+        self,
+        polymarket_client: PolymarketUSWebSocket,
+        kalshi_client: KalshiWebSocket,
+        polymarket_us_gateway: PolymarketUSHTTPGateway,
+        kalshi_gateway: KalshiHTTPGateway,
+        position_manager: PositionManager,
+        mapping: dict,
+        kalshi_spread_mapping: dict,
+        kalshi_total_mapping: dict,
+        polymarket_spread_mapping: dict,
+        polymarket_total_mapping: dict,
+        min_edge=0.01,
+        capital_allocator: CapitalAllocator | None = None,
+        scanner: str = "auto",
+    ):
+        """
+        Args:
+            mapping: Cross-exchange Moneyline_Events mapping, used to link
+                each Kalshi game to its Polymarket US game.
+            kalshi_spread_mapping / kalshi_total_mapping:
+                CORRELATED_SPREAD/TOTAL_MARKET_MAPPING from statics.json.
+            polymarket_spread_mapping / polymarket_total_mapping: Contents
+                of statics/polymarket_us_{spread,total}_event_to_market_mapping.json.
+            scanner: "ladders", "pairs" or "auto"; see SCANNERS.
+            Other arguments as for CrossExchangeArbitrage.
+        """
+        if scanner not in SCANNERS:
+            raise ValueError(f"Unknown scanner {scanner!r}; expected one of {SCANNERS}")
+        self.scanner = scanner
+        self.ladder_mappings = {
+            "spread": (kalshi_spread_mapping, polymarket_spread_mapping),
+            "total": (kalshi_total_mapping, polymarket_total_mapping),
+        }
+        # Per market type: frozenset of member names -> one game's arrays
+        self._games: dict[str, dict] = {label: {} for label in MARKET_TYPES}
+        self._spread_ladders = self._total_ladders = self._flat_games([])
+        super().__init__(polymarket_client, kalshi_client, polymarket_us_gateway, kalshi_gateway,
+                         position_manager, mapping, min_edge=min_edge, capital_allocator=capital_allocator)
+        self._update_games()
+
+    # ------------------------------------------------------------------ #
+    # Merged ladders                                                       #
+    # ------------------------------------------------------------------ #
+
+    @staticmethod
+    def _game_arrays(rungs: list) -> tuple:
+        """
+        Compile one game's (venue, name, line, flipped) rungs into
+        (venue, ids, flipped, tie_end, easier, harder), sorted by line.
+
+        tie_end[i] is the last rung whose line is <= line[i]; easier and
+        harder are the rung indices of every cross-venue pair with
+        line(easier) <= line(harder).
+        """
+        rungs = sorted(rungs, key=lambda rung: (rung[2], rung[0]))
+        venue = np.array([KALSHI if rung[0] == "Kalshi" else POLYMARKET_US for rung in rungs], dtype=np.int8)
+        ids = symbols.intern_many(rung[1] for rung in rungs)
+        line = np.array([rung[2] for rung in rungs], dtype=np.int64)
+        flipped = np.array([rung[3] for rung in rungs], dtype=bool)
+        tie_end = np.searchsorted(line, line, side="right") - 1
+        easier, harder = np.nonzero((line[:, None] <= line[None, :]) & (venue[:, None] != venue[None, :]))
+        return venue, ids, flipped, tie_end, easier, harder
+
+    @staticmethod
+    def _flat_games(games: list) -> tuple:
+        """
+        Concatenate per-game arrays into the scanned flat arrays
+        (venue, ids, flipped, game, start, tie_end, easier, harder), with
+        rung indices made global and start the first rung of each rung's game.
+        """
+        if not games:
+            empty = np.zeros(0, dtype=np.int64)
+            return (np.zeros(0, dtype=np.int8), np.zeros(0, dtype=np.int32), np.zeros(0, dtype=bool),
+                    empty, empty, empty, empty, empty)
+        lengths = [len(g[0]) for g in games]
+        offsets = np.zeros(len(games), dtype=np.int64)
+        np.cumsum(lengths[:-1], out=offsets[1:])
+        n_pairs = [len(g[4]) for g in games]
+        return (
+            np.concatenate([g[0] for g in games]),
+            np.concatenate([g[1] for g in games]),
+            np.concatenate([g[2] for g in games]),
+            np.repeat(np.arange(len(games), dtype=np.int64), lengths),
+            np.repeat(offsets, lengths),
+            np.concatenate([g[3] for g in games]) + np.repeat(offsets, lengths),
+            np.concatenate([g[4] for g in games]) + np.repeat(offsets, n_pairs),
+            np.concatenate([g[5] for g in games]) + np.repeat(offsets, n_pairs),
+        )
+
+    def _publish_games(self):
+        """Replace each market type's flat arrays in one assignment, so a running scan sees old or new ladders."""
+        for label in MARKET_TYPES:
+            setattr(self, f"_{label}_ladders", self._flat_games(list(self._games[label].values())))
+
+    def _update_games(self):
+        """Compile the merged ladders of new games and drop the ones no longer linked."""
+        for label in MARKET_TYPES:
+            kalshi_mapping, polymarket_mapping = self.ladder_mappings[label]
+            linked = link_games(self._row_ids, kalshi_mapping, polymarket_mapping, label)
+            wanted = {frozenset(name for _, name, _, _ in rungs): rungs for rungs in linked.values()}
+            games = self._games[label]
+            gone = [key for key in games if key not in wanted]
+            for key in gone:
+                del games[key]
+            added = 0
+            for key, rungs in wanted.items():
+                if key not in games:
+                    games[key] = self._game_arrays(rungs)
+                    added += 1
+            n_pairs = sum(len(g[4]) for g in games.values())
+            self.logger.info(f"[{label}] {added} merged ladders added, {len(gone)} removed; "
+                             f"{len(games)} games, {n_pairs} cross-venue pairs")
+        self._publish_games()
+
+    # ------------------------------------------------------------------ #
+    # Runtime market changes                                               #
+    # ------------------------------------------------------------------ #
+
+    def update_mapping(self, mapping: dict):
+        """Follow a refreshed moneyline mapping (and with it the game links)."""
+        super().update_mapping(mapping)
+        self._update_games()
+
+    def update_mappings(self, mapping: dict, kalshi_spread_mapping: dict, kalshi_total_mapping: dict,
+                        polymarket_spread_mapping: dict, polymarket_total_mapping: dict):
+        """Follow refreshed mappings, compiling only the merged ladders that changed."""
+        self.ladder_mappings = {
+            "spread": (kalshi_spread_mapping, polymarket_spread_mapping),
+            "total": (kalshi_total_mapping, polymarket_total_mapping),
+        }
+        self.update_mapping(mapping)
+
+    def on_markets_changed(self, venue: str, added: list, removed: list):
+        """
+        Feed market listener: blank the rungs of *removed* markets out of the
+        ladders (rung distances and game bounds are kept) and drop their pairs.
+        """
+        super().on_markets_changed(venue, added, removed)
+        if not removed:
+            return
+        if venue == self.kalshi_client.venue:
+            code = KALSHI
+        elif venue == self.polymarket_client.venue:
+            code = POLYMARKET_US
+        else:
+            return
+        removed_ids = symbols.intern_many(removed)
+        dropped = 0
+        for games in self._games.values():
+            for key, (venues, ids, flipped, tie_end, easier, harder) in list(games.items()):
+                hole = (venues == code) & np.isin(ids, removed_ids)
+                if not hole.any():
+                    continue
+                keep = ~(hole[easier] | hole[harder])
+                dropped += int((~keep).sum())
+                if keep.any():
+                    games[key] = (venues, np.where(hole, -1, ids).astype(np.int32), flipped, tie_end, easier[keep], harder[keep])
+                else:
+                    del games[key]
+        if dropped:
+            self.logger.info(f"Dropped {dropped} cross-venue pairs for {len(removed)} removed {venue} markets")
+            self._publish_games()
+
+    # ------------------------------------------------------------------ #
+    # Opportunity collection                                               #
+    # ------------------------------------------------------------------ #
+
+    @staticmethod
+    def _rung_quotes(ladders: tuple, kalshi_snapshot: TopOfBookSnapshot, polymarket_snapshot: TopOfBookSnapshot) -> dict:
+        """
+        Gather every rung's book from its venue's snapshot (NaN where
+        missing) and derive the "above line" YES ask / bid in ticks, with
+        _NO_ASK / _NO_BID where that side cannot trade.
+        """
+        venues, ids, flipped = ladders[:3]
+        book = np.full((len(ids), 4), np.nan)
+        for code, snapshot in ((KALSHI, kalshi_snapshot), (POLYMARKET_US, polymarket_snapshot)):
+            quotes = snapshot.quotes
+            on = np.flatnonzero((venues == code) & (ids >= 0) & (ids < len(quotes)))
+            book[on] = quotes[ids[on]]
+
+        bid, ask = price_ticks(book[:, BID]), price_ticks(book[:, ASK])
+        # A flipped rung's YES is the market's NO: bought at 1 - bid, sold at 1 - ask
+        yes_ask = np.where(flipped, PRICE_SCALE - bid, ask)
+        yes_bid = np.where(flipped, PRICE_SCALE - ask, bid)
+        with np.errstate(invalid="ignore"):
+            ask_ok = (yes_ask > 0) & (yes_ask < PRICE_SCALE) & (np.where(flipped, book[:, BID_SIZE], book[:, ASK_SIZE]) >= 1)
+            bid_ok = (yes_bid > 0) & (yes_bid < PRICE_SCALE) & (np.where(flipped, book[:, ASK_SIZE], book[:, BID_SIZE]) >= 1)
+        return {
+            "book": book,
+            "yes_ask": np.where(ask_ok, yes_ask, _NO_ASK),
+            "yes_bid": np.where(bid_ok, yes_bid, _NO_BID),
+        }
+
+    def _pair_candidates(self, ladders: tuple, quotes: dict) -> tuple[np.ndarray, np.ndarray]:
+        """(easier, harder) rung indices of every pair that can trade, crossed only when min_edge >= 0."""
+        easier, harder = ladders[6], ladders[7]
+        ask_e = quotes["yes_ask"][easier]
+        bid_h = quotes["yes_bid"][harder]
+        candidate = (ask_e != _NO_ASK) & (bid_h != _NO_BID)
+        if self.min_edge >= 0:
+            candidate &= bid_h > ask_e
+        return easier[candidate], harder[candidate]
+
+    def _ladder_candidates(self, ladders: tuple, quotes: dict) -> tuple[np.ndarray, np.ndarray]:
+        """
+        The crossed pairs of _pair_candidates without testing every pair.
+
+        A harder rung h has a crossed partner only if its bid beats the
+        lowest ask of the other venue over the rungs with line <= line(h),
+        i.e. up to tie_end[h]. For each partner venue that running minimum
+        is taken over all games at once with the rank trick of
+        IntraKalshiSpreadTotalArbitrage._collect_ladder_opportunities (asks
+        of the other venue masked out, ranks shifted so the minimum
+        restarts at every game); only rungs that pass are expanded to their
+        partners.
+        """
+        venues, _, _, game, start, tie_end = ladders[:6]
+        n = len(venues)
+        asks, bids = quotes["yes_ask"], quotes["yes_bid"]
+
+        best_partner_ask = np.empty(n, dtype=np.int64)
+        for code in (KALSHI, POLYMARKET_US):
+            partner_asks = np.where(venues == code, asks, _NO_ASK)
+            order = np.argsort(partner_asks)
+            rank = np.empty(n, dtype=np.int64)
+            rank[order] = np.arange(n)
+            running = np.minimum.accumulate(rank - game * n)
+            # Rungs of the other venue look up this partner venue's minimum
+            targets = np.flatnonzero(venues != code)
+            upto = tie_end[targets]
+            best_partner_ask[targets] = partner_asks[order[running[upto] + game[upto] * n]]
+
+        crossed = np.flatnonzero(bids > best_partner_ask)
+        if len(crossed) == 0:
+            return crossed, crossed
+
+        # Expand only the crossed rungs over their game's rungs up to tie_end
+        lo = start[crossed]
+        spans = tie_end[crossed] - lo + 1
+        harder = np.repeat(crossed, spans)
+        easier = np.repeat(lo - (np.cumsum(spans) - spans), spans) + np.arange(int(spans.sum()))
+        hit = (venues[easier] != venues[harder]) & (asks[easier] < bids[harder])
+        return easier[hit], harder[hit]
+
+    def _scan(self, ladders: tuple, quotes: dict) -> tuple[np.ndarray, np.ndarray]:
+        """Candidate pairs of one market type with the configured scanner."""
+        use_ladders = self.min_edge >= 0 and (
+            self.scanner == "ladders"
+            or (self.scanner == "auto" and len(ladders[6]) > LADDER_SCAN_MIN_PAIRS_PER_RUNG * len(ladders[0]))
+        )
+        if use_ladders:
+            return self._ladder_candidates(ladders, quotes)
+        return self._pair_candidates(ladders, quotes)
+
+    @staticmethod
+    def _pair_legs(family: int, ladders: tuple, quotes: dict, easier: np.ndarray, harder: np.ndarray) -> dict:
+        """
+        Legs of candidate pairs in the layout of _build_legs. Leg 1 buys the
+        easier rung's YES (a SELL at the bid of a flipped Kalshi market),
+        leg 2 its harder rung's NO (a BUY at the ask of a flipped one).
+        """
+        venues, ids, flipped = ladders[:3]
+        book = quotes["book"]
+        flip_1, flip_2 = flipped[easier], flipped[harder]
+        return {
+            "family": np.full(len(easier), family),
+            "row": easier,
+            "venue_1": venues[easier],
+            "id_1": ids[easier],
+            "action_1": np.where(flip_1, SELL, BUY),
+            "price_1": np.where(flip_1, book[easier, BID], book[easier, ASK]),
+            "size_1": np.where(flip_1, book[easier, BID_SIZE], book[easier, ASK_SIZE]),
+            "venue_2": venues[harder],
+            "id_2": ids[harder],
+            "action_2": np.where(flip_2, BUY, SELL),
+            "price_2": np.where(flip_2, book[harder, ASK], book[harder, BID]),
+            "size_2": np.where(flip_2, book[harder, ASK_SIZE], book[harder, BID_SIZE]),
+        }
+
+    def _collect_opportunities(self, kalshi_snapshot: TopOfBookSnapshot, polymarket_snapshot: TopOfBookSnapshot) -> list:
+        """
+        Scan the merged spread and total ladders and return the profitable
+        cross-venue pairs, in the opportunity format of
+        CrossExchangeArbitrage._collect_opportunities (type 'nested_spread'
+        / 'nested_total').
+        """
+        opportunities = []
+        for family, label in enumerate(MARKET_TYPES):
+            ladders = getattr(self, f"_{label}_ladders")
+            if len(ladders[6]) == 0:
+                continue
+            quotes = self._rung_quotes(ladders, kalshi_snapshot, polymarket_snapshot)
+            easier, harder = self._scan(ladders, quotes)
+            if len(easier):
+                opportunities += self._score_legs(self._pair_legs(family, ladders, quotes, easier, harder))
+        return opportunities
+
+
+if __name__ == "__main__":
+    # Ladder scan vs all-pairs scan on synthetic merged ladders: identical
+    # opportunities (with removed markets), then scan times as ladders deepen
+    from top_of_book import TopOfBookTable
+
+    class _OfflineFeed:
+        def __init__(self, venue):
+            self.venue = venue
+
+    class _OfflineGateway:
+        pass
+
+    rng = np.random.default_rng(0)
+
+    def team(prefix, g):
+        # Letters only, so the trailing number of a ticker stays the strike
+        return prefix + "".join(chr(ord("A") + int(d)) for d in str(g))
+
+    def synthetic_universe(name, n_games, kalshi_strikes, poly_strikes):
+        # Kalshi spreads N = 1..k for both teams, Polymarket US lines
+        # -p.5..p.5 for the first team; totals around 8.5 on both venues
+        rows, kalshi_spread, kalshi_total, poly_spread, poly_total = [], {}, {}, {}, {}
+        for g in range(n_games):
+            team_a, team_b = team("A", g), team("B", g)
+            game = f"{name.lower()}-{team_a.lower()}-{team_b.lower()}-2026-05-12"
+            code = f"26MAY12{team_a}{team_b}"
+            rows.append((f"aec-{game}", f"KX{name}GAME-{code}-{team_a}", f"aec-{game}-inverse", f"KX{name}GAME-{code}-{team_b}"))
+            spread = [f"KX{name}SPREAD-{code}-{t}{k}" for t in (team_a, team_b) for k in range(1, kalshi_strikes + 1)]
+            total = [f"KX{name}TOTAL-{code}-{k}" for k in range(9 - kalshi_strikes // 2, 9 + kalshi_strikes // 2 + 1)]
+            for tickers, mapping in ((spread, kalshi_spread), (total, kalshi_total)):
+                for t in tickers:
+                    mapping[t] = [o for o in tickers if o != t]
+            poly_spread[game] = {"market_slugs": [f"asc-{game}-{sign}-{x}pt5" for sign in ("pos", "neg") for x in range(1, poly_strikes + 1)]}
+            poly_total[game] = {"market_slugs": [f"tsc-{game}-{x}pt5" for x in range(8 - poly_strikes // 2, 8 + poly_strikes // 2 + 1)]}
+        mapping = {"sports": [dict(zip(CrossExchangeArbitrage._MAPPING_KEYS, row)) for row in rows]}
+        return mapping, kalshi_spread, kalshi_total, {"sports": {"s": poly_spread}}, {"sports": {"s": poly_total}}
+
+    def quote(strategy, noise):
+        # Fair "above line" price falls with the line; flipped Kalshi
+        # markets quote the complement. Noise crosses some pairs.
+        tables = {"Kalshi": TopOfBookTable(), "Polymarket_US": TopOfBookTable()}
+        for label in MARKET_TYPES:
+            center = 16 if label == "total" else 0
+            for rungs in link_games(strategy._row_ids, *strategy.ladder_mappings[label], label).values():
+                for venue, name, line, flip in rungs:
+                    fair = 1 / (1 + np.exp(0.25 * (line - center)))
+                    fair = 1 - fair if flip else fair
+                    symbol_id = symbols.intern(name)
+                    tables[venue].register(symbol_id)
+                    if rng.random() < 0.05:
+                        continue  # no quote
+                    mid = min(max(fair + rng.normal(0, noise), 0.02), 0.98)
+                    half = rng.choice([0.01, 0.02, 0.03])
+                    tables[venue].update(symbol_id, round(mid - half, 2), float(rng.integers(0, 300)),
+                                         round(mid + half, 2), float(rng.integers(0, 300)))
+        return tables["Kalshi"].snapshot(), tables["Polymarket_US"].snapshot()
+
+    def make(universe, scanner):
+        mapping, *ladders = universe
+        return CrossExchangeSpreadTotalArbitrage(_OfflineFeed("Polymarket_US"), _OfflineFeed("Kalshi"), _OfflineGateway(), _OfflineGateway(),
+                                                 None, mapping, *ladders, capital_allocator=CapitalAllocator(), scanner=scanner)
+
+    def opportunity_set(opportunities):
+        return sorted((o["type"], tuple((leg["ticker"], leg["action"]) for leg in o["legs"]), o["raw_size"], o["expected_profit"]) for o in opportunities)
+
+    def time_scan(strategy, snapshots, repeat=20):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            result = strategy._collect_opportunities(*snapshots)
+        return result, (time.perf_counter() - start) / repeat * 1000
+
+    for trial in range(30):
+        universe = synthetic_universe(f"EQ{trial}", int(rng.integers(1, 30)), int(rng.integers(1, 12)), int(rng.integers(1, 8)))
+        by_pairs, by_ladders = make(universe, "pairs"), make(universe, "ladders")
+        if trial % 2:
+            removed = list(rng.choice(list(universe[1]), size=len(universe[1]) // 5, replace=False))
+            for strategy in (by_pairs, by_ladders):
+                strategy.on_markets_changed("Kalshi", [], removed)
+        snapshots = quote(by_pairs, noise=0.1)
+        expected = opportunity_set(by_pairs._collect_opportunities(*snapshots))
+        assert expected == opportunity_set(by_ladders._collect_opportunities(*snapshots)), trial
+    print("30 randomized universes: ladder scan == all-pairs scan")
+
+    print(f"{'universe':<34} {'rungs':>6} {'pairs':>7} {'all-pairs':>10} {'ladders':>9} {'opps':>5}")
+    for kalshi_strikes, poly_strikes in ((3, 3), (6, 4), (12, 8), (24, 12)):
+        n_games = 2000 // (kalshi_strikes + poly_strikes)
+        universe = synthetic_universe(f"DEEP{kalshi_strikes}", n_games, kalshi_strikes, poly_strikes)
+        by_pairs, by_ladders = make(universe, "pairs"), make(universe, "ladders")
+        snapshots = quote(by_pairs, noise=0.01)
+        pairs_opps, pairs_ms = time_scan(by_pairs, snapshots)
+        ladder_opps, ladders_ms = time_scan(by_ladders, snapshots)
+        assert opportunity_set(pairs_opps) == opportunity_set(ladder_opps)
+        n_rungs = len(by_pairs._spread_ladders[0]) + len(by_pairs._total_ladders[0])
+        n_pairs = len(by_pairs._spread_ladders[6]) + len(by_pairs._total_ladders[6])
+        name = f"{n_games} games, {kalshi_strikes}+{poly_strikes} strikes/side"
+        print(f"{name:<34} {n_rungs:>6} {n_pairs:>7} {pairs_ms:>8.2f}ms {ladders_ms:>7.2f}ms {len(pairs_opps):>5}")
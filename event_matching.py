@@ -0,0 +1,222 @@
+"""
+Candidate generation for cross-exchange event matching.
+
+Comparing every Kalshi event with every Polymarket US event using
+difflib.SequenceMatcher is O(n*m) expensive ratios. EventIndex narrows that
+to a few candidates per event:
+
+    1. Events are bucketed by the date parsed (once) from their event name;
+       when both sides have a date, only the same date can match.
+    2. An inverted index of character n-grams, weighted by TF-IDF, ranks
+       the remaining events by cosine similarity, touching only the
+       postings of the query's n-grams.
+    3. Only the top-k are scored with the expensive similarity.
+
+Run `python event_matching.py` to benchmark against the full statics
+mappings.
+"""
+import difflib
+import heapq
+import math
+import re
+from collections import defaultdict
+from datetime import datetime
+
+import numpy as np
+
+NGRAM = 3
+CANDIDATES_PER_EVENT = 10
+
+
+def build_text(events_dict, category):
+    """
+    Combine all useful fields into one text blob
+    """
+    texts = []
+    for series_name, series in events_dict[category].items():
+        for event_name, event in series.items():
+            title = event.get("title", "")
+            subtitle = event.get("subtitle", "")
+            text_dict = {
+                "title": f"{title} {subtitle} {category} {series_name} {event_name}".lower(),
+                "category": category,
+                "series_name": series_name,
+                "event_name": event_name
+            }
+            texts.append(text_dict)
+    return texts
+
+
+def build_events(events_dict, category):
+    """build_text entries with the normalized title and parsed date added."""
+    events = build_text(events_dict, category)
+    for event in events:
+        event["norm"] = normalize(event["title"])
+        event["date"] = extract_event_date(event["event_name"])
+    return events
+
+
+def normalize(text: str) -> str:
+    text = text.lower()
+    text = re.sub(r'[^a-z0-9 ]+', ' ', text)
+    text = re.sub(r'\s+', ' ', text).strip()
+    return text
+
+
+def cheap_similarity(a: str, b: str) -> float:
+    return difflib.SequenceMatcher(None, a, b).ratio()
+
+
+def extract_event_date(event_name):
+    """
+    Extract date from event_name in either Polymarket or Kalshi format.
+
+    Polymarket: ufc-seddum-jacmcv-2026-04-25 -> 2026-04-25
+    Kalshi:     KXNBAGAME-26APR26SASPOR -> 26APR26
+
+    Returns date object or None if no date found.
+    """
+    # Polymarket format: YYYY-MM-DD
+    m = re.search(r"(\d{4})-(\d{2})-(\d{2})", event_name)
+    if m:
+        try:
+            return datetime.strptime(m.group(1) + m.group(2) + m.group(3), "%Y%m%d").date()
+        except ValueError:
+            pass
+
+    # Kalshi format: YYMMMDD (e.g., 26APR26)
+    m = re.search(r"(\d{1,2})([A-Z]{3})(\d{2})", event_name)
+    if m:
+        try:
+            return datetime.strptime(m.group(1) + m.group(2) + m.group(3), "%y%b%d").date()
+        except ValueError:
+            pass
+
+    return None
+
+
+def ngrams(text: str, n: int = NGRAM) -> set[str]:
+    """Character n-grams of a normalized title, padded so word edges count."""
+    padded = f" {text} "
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+class EventIndex:
+    """
+    Inverted n-gram index over one exchange's events.
+
+    events are the dicts built by fetch_kalshi_politics /
+    fetch_polymarket_politics: "norm" (normalized title) and "event_name"
+    are read, and a parsed "date" is added if missing. With match_dates,
+    candidates() only returns events on the same date as the query (events
+    without a date match any date), mirroring the sports filter of
+    correlate_small.
+    """
+
+    def __init__(self, events: list[dict], match_dates: bool = True, n: int = NGRAM):
+        self.events = events
+        self.match_dates = match_dates
+        self.n = n
+
+        for event in events:
+            if "date" not in event:
+                event["date"] = extract_event_date(event["event_name"])
+        dates = sorted({event["date"] for event in events if event["date"] is not None})
+        self._date_codes = {date: code for code, date in enumerate(dates, start=1)}
+        # 0 = no date, matches any date
+        self.date_codes = np.fromiter(
+            (self._date_codes.get(event["date"], 0) for event in events), dtype=np.int32, count=len(events)
+        )
+
+        grams = [ngrams(event["norm"], n) for event in events]
+        document_frequency = defaultdict(int)
+        for event_grams in grams:
+            for gram in event_grams:
+                document_frequency[gram] += 1
+        total = len(events)
+        self.idf = {gram: math.log((1 + total) / (1 + df)) + 1.0 for gram, df in document_frequency.items()}
+
+        # gram -> (event indices, normalized weights)
+        postings = defaultdict(list)
+        for index, event_grams in enumerate(grams):
+            norm = math.sqrt(sum(self.idf[gram] ** 2 for gram in event_grams)) or 1.0
+            for gram in event_grams:
+                postings[gram].append((index, self.idf[gram] / norm))
+        self.postings = {
+            gram: (np.fromiter((i for i, _ in entries), dtype=np.int64, count=len(entries)),
+                   np.fromiter((w for _, w in entries), dtype=np.float64, count=len(entries)))
+            for gram, entries in postings.items()
+        }
+
+    def candidates(self, query: dict, top_k: int = CANDIDATES_PER_EVENT) -> list[tuple[float, int]]:
+        """(cosine, event index) of the top_k most similar events to *query*."""
+        query_grams = ngrams(query["norm"], self.n)
+        weights = {gram: self.idf[gram] for gram in query_grams if gram in self.idf}
+        if not weights:
+            return []
+        norm = math.sqrt(sum(w * w for w in weights.values()))
+
+        scores = np.zeros(len(self.events))
+        for gram, weight in weights.items():
+            ids, event_weights = self.postings[gram]
+            scores[ids] += event_weights * (weight / norm)
+
+        if self.match_dates:
+            if "date" not in query:
+                query["date"] = extract_event_date(query["event_name"])
+            if query["date"] is not None:
+                # A dated query only matches its own date or undated events;
+                # -1 (a date the index has never seen) leaves the undated ones
+                code = self._date_codes.get(query["date"], -1)
+                scores[(self.date_codes != code) & (self.date_codes != 0)] = 0.0
+
+        hits = np.flatnonzero(scores > 0)
+        if len(hits) > top_k:
+            hits = hits[np.argpartition(-scores[hits], top_k - 1)[:top_k]]
+        return heapq.nlargest(top_k, ((float(scores[i]), int(i)) for i in hits))
+
+
+if __name__ == "__main__":
+    # Benchmark: brute-force correlate_small candidate generation vs the index
+    import time
+
+    from utils import read_file_data
+
+    kalshi_events = read_file_data("statics/kalshi_event_to_market_mapping.json")
+    poly_events = read_file_data("statics/polymarket_us_event_to_market_mapping.json")
+    cheap_threshold = 0.45
+
+    common = {k.lower() for k in kalshi_events} & {p.lower() for p in poly_events}
+    for category in sorted(common):
+        kalshi = build_events(kalshi_events, category.capitalize())
+        poly = build_events(poly_events, category)
+        sports = category == "sports"
+
+        start = time.perf_counter()
+        brute = set()
+        for i, k in enumerate(kalshi):
+            for j, p in enumerate(poly):
+                if sports:
+                    k_date = extract_event_date(k["event_name"])
+                    p_date = extract_event_date(p["event_name"])
+                    if k_date and p_date and k_date != p_date:
+                        continue
+                if cheap_similarity(k["norm"], p["norm"]) >= cheap_threshold:
+                    brute.add((i, j))
+        brute_s = time.perf_counter() - start
+
+        for top_k in (5, CANDIDATES_PER_EVENT, 25):
+            start = time.perf_counter()
+            index = EventIndex(poly, match_dates=sports)
+            indexed = set()
+            scored = 0
+            for i, k in enumerate(kalshi):
+                for _, j in index.candidates(k, top_k):
+                    scored += 1
+                    if cheap_similarity(k["norm"], poly[j]["norm"]) >= cheap_threshold:
+                        indexed.add((i, j))
+            indexed_s = time.perf_counter() - start
+            recall = len(indexed & brute) / len(brute) if brute else 1.0
+            print(f"{category}: {len(kalshi)} x {len(poly)} events, top_k={top_k}")
+            print(f"  brute force: {brute_s * 1000:8.0f} ms, {len(kalshi) * len(poly)} pairs, {len(brute)} candidates")
+            print(f"  indexed:     {indexed_s * 1000:8.0f} ms, {scored} pairs scored, {len(indexed)} candidates, recall {recall:.3f}")
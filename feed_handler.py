@@ -0,0 +1,533 @@
+"""Common WebSocket feed framework shared by every venue.
+
+A venue adapter subclasses FeedHandler and supplies the venue-specific
+pieces:
+
+    connect_websocket()       open an authenticated connection
+    subscribe_payloads()      messages that subscribe to instruments
+    unsubscribe_payloads()    messages that unsubscribe (optional)
+    decode(raw)               raw frame -> list of messages
+    apply(msg)                apply one message to the books
+    conflation_key(msg)       optional: messages with the same key supersede
+                              earlier ones in a batch (full snapshots)
+    shard_key(msg)            optional: messages with the same key are
+                              applied in order on the same worker thread
+    exchange_ts_ns(msg)       optional: exchange timestamp for latency
+    create_books(instrument)  optional: books for a new instrument
+    free_books(instrument)    optional: drop them again
+
+The framework provides everything else once for all venues: reconnect with
+exponential backoff, subscription management, decode/apply off the event
+loop in batches, a shared book registry keyed by (venue, instrument),
+receive-to-apply latency stamping and feed metrics.
+
+The market set can change at runtime: add_markets() / remove_markets()
+subscribe or unsubscribe incrementally on the live connection, create or
+free the books, and tell every listener registered with
+add_market_listener() which instruments came and went.
+"""
+
+import asyncio
+import logging
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import websockets
+
+from orderbook import InverseOrderBook, OrderBook
+from top_of_book import TopOfBookDelta, TopOfBookSnapshot, TopOfBookTable
+
+BACKOFF_INITIAL_S = 1.0
+BACKOFF_MAX_S = 30.0
+METRICS_INTERVAL_S = 60.0
+MAX_LATENCY_SAMPLES = 100_000
+
+
+class VenueBooks:
+    """The books of one venue: name-keyed dict, id-indexed list and top table."""
+
+    def __init__(self, venue: str):
+        self.venue = venue
+        self.orderbooks: dict[str, OrderBook] = {}
+        self.books_by_id: list[OrderBook | None] = []
+        self.top_table = TopOfBookTable()
+
+    def _index(self, book):
+        self.orderbooks[book.asset_id] = book
+        missing = book.symbol_id + 1 - len(self.books_by_id)
+        if missing > 0:
+            self.books_by_id.extend([None] * missing)
+        self.books_by_id[book.symbol_id] = book
+
+    def add_book(self, instrument: str) -> OrderBook:
+        book = self.orderbooks.get(instrument)
+        if book is None:
+            book = OrderBook(instrument, top_table=self.top_table)
+            self._index(book)
+        return book
+
+    def add_inverse_book(self, primary: OrderBook, instrument: str) -> InverseOrderBook:
+        book = self.orderbooks.get(instrument)
+        if book is None:
+            book = InverseOrderBook(primary, instrument, top_table=self.top_table)
+            self._index(book)
+        return book
+
+    def remove_book(self, instrument: str) -> list[OrderBook]:
+        """
+        Drop the book for *instrument* (and its inverse view, if any) so its
+        levels and history can be freed. Returns the removed books.
+
+        The book is detached from the top table under its own lock, so an
+        update already running on an apply worker cannot republish its row
+        after it was unregistered.
+        """
+        book = self.orderbooks.pop(instrument, None)
+        if book is None:
+            return []
+        removed = [book]
+        with book.lock:
+            book.top_table = None
+            inverse = getattr(book, "inverse", None)
+            if inverse is not None:
+                inverse.top_table = None
+                book.inverse = None
+                removed.append(inverse)
+            primary = getattr(book, "primary", None)
+            if primary is not None and primary.inverse is book:
+                primary.inverse = None
+        for removed_book in removed:
+            self.orderbooks.pop(removed_book.asset_id, None)
+            if self.books_by_id[removed_book.symbol_id] is removed_book:
+                self.books_by_id[removed_book.symbol_id] = None
+            self.top_table.unregister(removed_book.symbol_id)
+        return removed
+
+
+class BookRegistry:
+    """Process-wide registry of every book, keyed by (venue, instrument)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.venues: dict[str, VenueBooks] = {}
+
+    def venue(self, venue: str) -> VenueBooks:
+        with self.lock:
+            books = self.venues.get(venue)
+            if books is None:
+                books = VenueBooks(venue)
+                self.venues[venue] = books
+            return books
+
+    def get(self, venue: str, instrument: str) -> OrderBook | None:
+        books = self.venues.get(venue)
+        return books.orderbooks.get(instrument) if books is not None else None
+
+
+# Shared by every feed in the process
+book_registry = BookRegistry()
+
+
+class FeedMetrics:
+    """Counters and latency samples for one feed."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.frames = 0
+        self.messages = 0
+        self.applied = 0
+        self.conflated = 0
+        self.decode_errors = 0
+        self.apply_errors = 0
+        self.reconnects = 0
+        # receive -> applied, and exchange -> receive, in ns
+        self._recv_to_apply_ns: list[int] = []
+        self._exchange_to_recv_ns: list[int] = []
+
+    @staticmethod
+    def _add_samples(samples: list, values):
+        if len(samples) >= MAX_LATENCY_SAMPLES:
+            del samples[: MAX_LATENCY_SAMPLES // 2]
+        samples.extend(values)
+
+    def record_applied(self, recv_ns: list[int], done_ns: int):
+        with self.lock:
+            self._add_samples(self._recv_to_apply_ns, [done_ns - r for r in recv_ns])
+
+    def record_exchange_lags(self, lags_ns: list[int]):
+        with self.lock:
+            self._add_samples(self._exchange_to_recv_ns, lags_ns)
+
+    def count(self, **increments):
+        with self.lock:
+            for name, value in increments.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def report(self) -> dict:
+        with self.lock:
+            recv_to_apply = np.asarray(self._recv_to_apply_ns, dtype=np.float64) / 1e6
+            exchange_to_recv = np.asarray(self._exchange_to_recv_ns, dtype=np.float64) / 1e6
+            counters = {
+                "frames": self.frames,
+                "messages": self.messages,
+                "applied": self.applied,
+                "conflated": self.conflated,
+                "decode_errors": self.decode_errors,
+                "apply_errors": self.apply_errors,
+                "reconnects": self.reconnects,
+            }
+
+        def percentiles(values):
+            if len(values) == 0:
+                return None
+            p50, p90, p99 = np.percentile(values, [50, 90, 99])
+            return {"p50": float(p50), "p90": float(p90), "p99": float(p99), "n": int(len(values))}
+
+        counters["recv_to_apply_ms"] = percentiles(recv_to_apply)
+        counters["exchange_to_recv_ms"] = percentiles(exchange_to_recv)
+        return counters
+
+
+class FeedHandler:
+    """
+    Base class for venue feeds. See the module docstring for the adapter
+    hooks; subclasses set venue, logger and (optionally) ping_message.
+
+    Frames are only timestamped and buffered on the event loop. A drain
+    task hands everything buffered so far to the apply workers as one
+    batch: it is decoded, conflated (only the latest message per
+    conflation_key is kept), split by shard_key across apply_workers
+    single-thread executors and applied. Frames that arrive meanwhile form
+    the next batch, so bursts conflate automatically and per-shard order is
+    preserved.
+    """
+
+    venue: str = ""
+    ping_message: str | None = None
+    pong_message: str | None = None
+    ping_interval_s: float = 10.0
+
+    def __init__(self, instruments, apply_workers: int = 1, registry: BookRegistry | None = None):
+        self.instruments: list[str] = list(instruments)
+        self.books = (registry or book_registry).venue(self.venue)
+        self.metrics = FeedMetrics()
+        if not hasattr(self, "logger"):
+            self.logger = logging.getLogger(f"{self.venue.lower()}_feed")
+
+        for instrument in self.instruments:
+            self.create_books(instrument)
+
+        # callback(venue, added, removed) after add_markets / remove_markets
+        self._market_listeners = []
+
+        self.ws = None
+        self.connected = asyncio.Event()
+        self._stopping = False
+
+        self.apply_workers = max(apply_workers, 1)
+        self._executors = [
+            ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"{self.venue}_apply_{i}")
+            for i in range(self.apply_workers)
+        ]
+        self._pending: list[tuple[int, str | bytes]] = []
+        self._draining: asyncio.Future | None = None
+
+    # ------------------------------------------------------------------ #
+    # Adapter hooks                                                        #
+    # ------------------------------------------------------------------ #
+
+    async def connect_websocket(self):
+        raise NotImplementedError
+
+    def subscribe_payloads(self, instruments: list[str]) -> list[str]:
+        raise NotImplementedError
+
+    def unsubscribe_payloads(self, instruments: list[str]) -> list[str]:
+        return []
+
+    def decode(self, raw) -> list:
+        raise NotImplementedError
+
+    def apply(self, msg):
+        raise NotImplementedError
+
+    def conflation_key(self, msg):
+        return None
+
+    def shard_key(self, msg):
+        return None
+
+    def exchange_ts_ns(self, msg) -> int | None:
+        return None
+
+    def create_books(self, instrument: str):
+        """Create the book(s) for a newly subscribed instrument."""
+        self.books.add_book(instrument)
+
+    def free_books(self, instrument: str):
+        """Drop the book(s) of an instrument that is no longer subscribed."""
+        self.books.remove_book(instrument)
+
+    def on_connect(self):
+        """Called after every (re)connect, before subscribing."""
+
+    async def on_start(self):
+        """Called once when run() starts (e.g. to start helper tasks)."""
+
+    # ------------------------------------------------------------------ #
+    # Connection management                                                #
+    # ------------------------------------------------------------------ #
+
+    async def run(self):
+        await self.on_start()
+        tasks = [asyncio.create_task(self._metrics_loop())]
+        if self.ping_message is not None:
+            tasks.append(asyncio.create_task(self._ping_loop()))
+
+        backoff = BACKOFF_INITIAL_S
+        try:
+            while not self._stopping:
+                try:
+                    self.logger.info(f"Connecting to {self.venue}")
+                    self.ws = await self.connect_websocket()
+                    self.on_connect()
+                    for payload in self.subscribe_payloads(self.instruments):
+                        await self.ws.send(payload)
+                    self.connected.set()
+                    self.logger.info(f"Connected to {self.venue}; subscribed to {len(self.instruments)} instruments")
+                    backoff = BACKOFF_INITIAL_S
+
+                    async for raw in self.ws:
+                        self._on_frame(raw)
+
+                    if self._stopping:
+                        break
+                    self.logger.warning("Connection closed by server, reconnecting...")
+                except websockets.ConnectionClosedOK:
+                    if self._stopping:
+                        break
+                    self.logger.warning("Connection closed normally, reconnecting...")
+                except Exception as e:
+                    self.logger.error(f"WebSocket error: {e}")
+
+                self.connected.clear()
+                self.metrics.count(reconnects=1)
+                delay = backoff * (0.5 + random.random())
+                self.logger.info(f"Reconnecting in {delay:.1f} seconds...")
+                await asyncio.sleep(delay)
+                backoff = min(backoff * 2, BACKOFF_MAX_S)
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def stop(self):
+        self._stopping = True
+        if self.ws is not None:
+            await self.ws.close()
+
+    async def _ping_loop(self):
+        while True:
+            await self.connected.wait()
+            try:
+                await self.ws.send(self.ping_message)
+            except Exception:
+                pass
+            await asyncio.sleep(self.ping_interval_s)
+
+    async def _metrics_loop(self):
+        while True:
+            await asyncio.sleep(METRICS_INTERVAL_S)
+            self.logger.info(f"Feed metrics: {self.metrics.report()}")
+
+    # ------------------------------------------------------------------ #
+    # Subscription management                                              #
+    # ------------------------------------------------------------------ #
+
+    async def subscribe(self, instruments: list[str]) -> list[str]:
+        """Create books for and subscribe to *instruments*. Returns the new ones."""
+        new = [i for i in dict.fromkeys(instruments) if i not in self.instruments]
+        if not new:
+            return []
+        for instrument in new:
+            self.create_books(instrument)
+        self.instruments.extend(new)
+        if self.connected.is_set():
+            for payload in self.subscribe_payloads(new):
+                await self.ws.send(payload)
+        return new
+
+    async def unsubscribe(self, instruments: list[str]) -> list[str]:
+        """Unsubscribe from *instruments*. Returns the ones that were subscribed."""
+        removed = [i for i in dict.fromkeys(instruments) if i in self.instruments]
+        if not removed:
+            return []
+        removed_set = set(removed)
+        self.instruments = [i for i in self.instruments if i not in removed_set]
+        if self.connected.is_set():
+            for payload in self.unsubscribe_payloads(removed):
+                await self.ws.send(payload)
+        return removed
+
+    def add_market_listener(self, callback):
+        """Call callback(venue, added, removed) whenever the market set changes."""
+        self._market_listeners.append(callback)
+
+    def _notify_markets_changed(self, added: list[str], removed: list[str]):
+        for callback in self._market_listeners:
+            try:
+                callback(self.venue, added, removed)
+            except Exception as e:
+                self.logger.error(f"Market listener {callback} failed: {e}")
+
+    async def add_markets(self, instruments: list[str]) -> list[str]:
+        """Subscribe to *instruments* at runtime and notify listeners. Returns the new ones."""
+        added = await self.subscribe(instruments)
+        if added:
+            self.logger.info(f"Added {len(added)} markets; {len(self.instruments)} subscribed")
+            self._notify_markets_changed(added, [])
+        return added
+
+    async def remove_markets(self, instruments: list[str]) -> list[str]:
+        """
+        Unsubscribe from *instruments* at runtime, free their books and
+        notify listeners. Returns the ones that were subscribed.
+
+        Messages for these instruments still in flight are dropped by the
+        adapters' missing-book checks.
+        """
+        removed = await self.unsubscribe(instruments)
+        if removed:
+            for instrument in removed:
+                self.free_books(instrument)
+            self.logger.info(f"Removed {len(removed)} markets; {len(self.instruments)} subscribed")
+            self._notify_markets_changed([], removed)
+        return removed
+
+    # ------------------------------------------------------------------ #
+    # Dispatch                                                             #
+    # ------------------------------------------------------------------ #
+
+    def _on_frame(self, raw):
+        if self.pong_message is not None and raw == self.pong_message:
+            return
+        self._pending.append((time.time_ns(), raw))
+        if self._draining is None or self._draining.done():
+            self._draining = asyncio.ensure_future(self._drain())
+
+    async def _drain(self):
+        loop = asyncio.get_running_loop()
+        while self._pending:
+            batch, self._pending = self._pending, []
+            try:
+                if self.apply_workers == 1:
+                    await loop.run_in_executor(self._executors[0], self._decode_and_apply, batch)
+                else:
+                    shards = await loop.run_in_executor(self._executors[0], self._decode_batch, batch)
+                    await asyncio.gather(*(
+                        loop.run_in_executor(self._executors[i], self._apply_batch, shard)
+                        for i, shard in enumerate(shards) if shard
+                    ))
+                self.metrics.record_applied([recv_ns for recv_ns, _ in batch], time.time_ns())
+            except Exception as e:
+                self.logger.error(f"Error applying {self.venue} batch: {e}")
+
+    def _decode_batch(self, batch) -> list[list]:
+        """Decode and conflate a batch, then split it into per-worker shards."""
+        messages = []
+        exchange_lags = []
+        decode_errors = 0
+        for recv_ns, raw in batch:
+            try:
+                decoded = self.decode(raw)
+            except Exception as e:
+                decode_errors += 1
+                self.logger.error(f"Undecodable {self.venue} message: {e}")
+                continue
+            for msg in decoded:
+                messages.append(msg)
+                exchange_ns = self.exchange_ts_ns(msg)
+                if exchange_ns:
+                    exchange_lags.append(recv_ns - exchange_ns)
+        received = len(messages)
+        if exchange_lags:
+            self.metrics.record_exchange_lags(exchange_lags)
+
+        # Keep only the latest message per conflation key, in arrival order
+        keys = [self.conflation_key(msg) for msg in messages]
+        latest = {key: index for index, key in enumerate(keys) if key is not None}
+        if latest:
+            keep = set(latest.values())
+            messages = [
+                msg for index, (msg, key) in enumerate(zip(messages, keys))
+                if key is None or index in keep
+            ]
+
+        self.metrics.count(
+            frames=len(batch),
+            messages=received,
+            conflated=received - len(messages),
+            decode_errors=decode_errors,
+        )
+
+        shards = [[] for _ in range(self.apply_workers)]
+        if self.apply_workers == 1:
+            shards[0] = messages
+        else:
+            for msg in messages:
+                key = self.shard_key(msg)
+                shards[0 if key is None else hash(key) % self.apply_workers].append(msg)
+        return shards
+
+    def _apply_batch(self, messages):
+        errors = 0
+        for msg in messages:
+            try:
+                self.apply(msg)
+            except Exception as e:
+                errors += 1
+                self.logger.error(f"Error applying {self.venue} message: {e}")
+        self.metrics.count(applied=len(messages), apply_errors=errors)
+
+    def _decode_and_apply(self, batch):
+        self._apply_batch(self._decode_batch(batch)[0])
+
+    # ------------------------------------------------------------------ #
+    # Book access                                                          #
+    # ------------------------------------------------------------------ #
+
+    @property
+    def orderbooks(self) -> dict[str, OrderBook]:
+        return self.books.orderbooks
+
+    @property
+    def books_by_id(self) -> list[OrderBook | None]:
+        return self.books.books_by_id
+
+    @property
+    def top_table(self) -> TopOfBookTable:
+        return self.books.top_table
+
+    def snapshot_all_books(self) -> TopOfBookSnapshot:
+        """Immutable copy of every book's top of book (see TopOfBookTable)."""
+        return self.books.top_table.snapshot()
+
+    def snapshot_changes(self, since_version: int) -> TopOfBookDelta:
+        """Only the books whose top changed after *since_version*."""
+        return self.books.top_table.changes_since(since_version)
+
+    def get_best_bid(self, instrument):
+        orderbook = self.books.orderbooks.get(instrument)
+        if not orderbook:
+            self.logger.warning(f"Order Book {instrument} not found on get_best_bid")
+            return None, None
+        return orderbook.get_best_bid()
+
+    def get_best_ask(self, instrument):
+        orderbook = self.books.orderbooks.get(instrument)
+        if not orderbook:
+            self.logger.warning(f"Order Book {instrument} not found on get_best_ask")
+            return None, None
+        return orderbook.get_best_ask()
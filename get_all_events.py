@@ -1,18 +1,22 @@
 from collections import defaultdict
-import json
 import time
 import asyncio
-import aiohttp
-import requests
 from datetime import datetime, timedelta, timezone
-from requests.exceptions import ConnectionError, Timeout, HTTPError
+
+from metadata_fetcher import MetadataFetcher
+from record_stream import RecordWriter
+from utils import write_json_atomic
 
 BASE_URL = "https://api.elections.kalshi.com/trade-api/v2/events"
 PAGE_LIMIT = 200
-MAX_RETRIES = 5
-INITIAL_BACKOFF = 1  # seconds
-MAX_CONCURRENT_REQUESTS = 3  # Reduced to avoid rate limiting
-REQUEST_DELAY = 0.5  # Delay between batches of requests
+# Listings and details are streamed as NDJSON records (see record_stream);
+# set to ".ndjson.gz" to compress them
+RECORD_SUFFIX = ".ndjson"
+EVENTS_PATH = "statics/events" + RECORD_SUFFIX
+MUTUALLY_EXCLUSIVE_DETAILS_PATH = "statics/mutually_exclusive_events_detailed" + RECORD_SUFFIX
+TWO_MARKET_EVENTS_PATH = "statics/two_market_events" + RECORD_SUFFIX
+SPREAD_EVENTS_PATH = "statics/kalshi_spread_events" + RECORD_SUFFIX
+TOTAL_EVENTS_PATH = "statics/kalshi_total_events" + RECORD_SUFFIX
 MIN_CLOSE_TS = 2 # Set to 0 for all events
 MAX_CLOSE_TS = 5 # Set to 0 for all events
 
@@ -75,106 +79,58 @@ def get_min_max_close_time():
     return min_close_ts, max_close_ts
 
 
+def _listing_params(status):
+    params = {"limit": PAGE_LIMIT, "status": status}
+    if MIN_CLOSE_TS != 0 or MAX_CLOSE_TS != 0:
+        min_close_ts, max_close_ts = get_min_max_close_time()
+        params["min_close_ts"] = min_close_ts
+        params["max_close_ts"] = max_close_ts
+    return params
+
+
+def event_detail_url(event_ticker):
+    return f"{BASE_URL}/{event_ticker}"
+
+
+async def fetch_event_pages(fetcher, status="open"):
+    """Yield the events of each listing page; the next page is already in flight."""
+    total = 0
+    async for events in fetcher.paginate(BASE_URL, _listing_params(status), "events"):
+        total += len(events)
+        print(f"Fetched {len(events)} events. Total: {total}")
+        yield events
+
+
+async def fetch_all_events_async(status="open", fetcher=None):
+    if fetcher is None:
+        async with MetadataFetcher() as fetcher:
+            return await fetch_all_events_async(status, fetcher)
+    return [event async for events in fetch_event_pages(fetcher, status) for event in events]
+
+
 def fetch_all_events(status="open"):
     """Fetch all events from Kalshi API with pagination support."""
-    all_events = []
-    cursor = None
-
-    while True:
-        params = {"limit": PAGE_LIMIT, "status": status}
-        if cursor:
-            params["cursor"] = cursor
-        if MIN_CLOSE_TS != 0 or MAX_CLOSE_TS != 0:
-            min_close_ts, max_close_ts = get_min_max_close_time()
-            params["min_close_ts"] = min_close_ts
-            params["max_close_ts"] = max_close_ts
-
-        retries = 0
-        backoff = INITIAL_BACKOFF
-
-        while retries < MAX_RETRIES:
-            print(f"Fetching events... (cursor: {cursor})")
-            try:
-                response = requests.get(BASE_URL, params=params, timeout=10)
-                response.raise_for_status()
-                data = response.json()
-                break
-            except (ConnectionError, Timeout, HTTPError) as e:
-                retries += 1
-                print(f"Request failed: {e}. Retrying in {backoff}s ({retries}/{MAX_RETRIES})")
-                time.sleep(backoff)
-                backoff *= 2
-            except HTTPError as e:
-                print(f"HTTP error: {e}. Aborting.")
-                return all_events
-        else:
-            print("Max retries exceeded. Stopping.")
-            return all_events
-
-        events = data.get("events", [])
-        all_events.extend(events)
-        print(f"Fetched {len(events)} events. Total: {len(all_events)}")
-
-        cursor = data.get("cursor")
-        if not cursor:
-            break
-
-    return all_events
-
-
-async def fetch_event_details_async(session, event_ticker, semaphore, counter, total):
-    """Fetch detailed data for a specific event asynchronously."""
-    url = f"https://api.elections.kalshi.com/trade-api/v2/events/{event_ticker}"
-
-    async with semaphore:
-        retries = 0
-        backoff = INITIAL_BACKOFF
-
-        while retries < MAX_RETRIES:
-            try:
-                async with session.get(url, timeout=aiohttp.ClientTimeout(total=10)) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        counter["done"] += 1
-                        print(f"[{counter['done']}/{total}] Fetched: {event_ticker}")
-                        await asyncio.sleep(REQUEST_DELAY)
-                        return result
-                    elif response.status == 429:
-                        retry_after = int(response.headers.get("Retry-After", backoff))
-                        print(f"[{counter['done']}/{total}] Rate limited for {event_ticker}. Waiting {retry_after}s...")
-                        await asyncio.sleep(retry_after)
-                        retries += 1
-                        backoff *= 2
-                    else:
-                        counter["done"] += 1
-                        print(f"[{counter['done']}/{total}] HTTP {response.status} for {event_ticker}. Skipping.")
-                        return None
-            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
-                retries += 1
-                print(f"[{counter['done']}/{total}] Request failed for {event_ticker}: {e}. Retrying in {backoff}s ({retries}/{MAX_RETRIES})")
-                await asyncio.sleep(backoff)
-                backoff *= 2
-
-        counter["done"] += 1
-        print(f"[{counter['done']}/{total}] Max retries exceeded for {event_ticker}. Skipping.")
-        return None
-
-
-async def fetch_event_details_batch_async(events):
-    """Fetch detailed data for a list of events concurrently."""
-    semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    return asyncio.run(fetch_all_events_async(status))
+
+
+async def fetch_event_details_batch_async(events, fetcher=None):
+    """Fetch detailed data for a list of events concurrently, in input order."""
+    if fetcher is None:
+        async with MetadataFetcher() as fetcher:
+            return await fetch_event_details_batch_async(events, fetcher)
+
     event_tickers = [e.get("event_ticker") for e in events if e.get("event_ticker")]
     total = len(event_tickers)
-    counter = {"done": 0}
-
     print(f"Fetching details for {total} events...")
 
-    async with aiohttp.ClientSession() as session:
-        tasks = [
-            fetch_event_details_async(session, ticker, semaphore, counter, total)
-            for ticker in event_tickers
-        ]
-        results = await asyncio.gather(*tasks)
+    results = [None] * total
+    done = 0
+    requests = ((i, event_detail_url(ticker)) for i, ticker in enumerate(event_tickers))
+    async for i, result in fetcher.fetch_many(requests):
+        results[i] = result
+        done += 1
+        if done % 100 == 0 or done == total:
+            print(f"[{done}/{total}] details fetched (concurrency limit {fetcher.limiter.limit:.1f})")
 
     return [r for r in results if r is not None]
 
@@ -214,6 +170,18 @@ def collect_volume(detailed_events, into=None):
     return into
 
 
+def collect_close_time(detailed_events, into=None):
+    """Collect close_time per market ticker from a list of detailed events."""
+    if into is None:
+        into = {}
+    for event_data in detailed_events:
+        for market in event_data.get("markets", []):
+            ticker = market.get("ticker")
+            if ticker and market.get("close_time"):
+                into[ticker] = market["close_time"]
+    return into
+
+
 def print_event_summary(detailed_events, label=""):
     """Pretty-print a small summary of detailed events for sanity-checking."""
     if label:
@@ -234,69 +202,73 @@ def print_event_summary(detailed_events, label=""):
             print(f"  ... and {len(markets) - 5} more markets")
 
 
+async def download_kalshi_statics(status="open"):
+    """
+    Fetch the listing and the moneyline / spread / total details in one
+    pipeline and stream them to the statics files as they arrive: details
+    are requested as soon as the listing page naming the event lands.
+    """
+    volume_per_market = defaultdict(int)
+    close_time_per_market = {}
+    counts = defaultdict(int)
+
+    async with MetadataFetcher() as fetcher:
+
+        async def detail_requests(events_out):
+            async for events in fetch_event_pages(fetcher, status):
+                for event in events:
+                    events_out.write(event)
+                    counts["events"] += 1
+                    ticker = event.get("event_ticker")
+                    if not ticker:
+                        continue
+                    if event.get("mutually_exclusive", False) or is_spread_event(event) or is_total_event(event):
+                        yield event, event_detail_url(ticker)
+
+        with RecordWriter(EVENTS_PATH) as events_out, \
+                RecordWriter(MUTUALLY_EXCLUSIVE_DETAILS_PATH) as me_out, \
+                RecordWriter(TWO_MARKET_EVENTS_PATH) as two_market_out, \
+                RecordWriter(SPREAD_EVENTS_PATH) as spread_out, \
+                RecordWriter(TOTAL_EVENTS_PATH) as total_out:
+            async for brief, detail in fetcher.fetch_many(detail_requests(events_out)):
+                if detail is None:
+                    continue
+                keep = False
+                if brief.get("mutually_exclusive", False):
+                    me_out.write(detail)
+                    if len(detail.get("markets", [])) == 2:
+                        two_market_out.write(detail)
+                        keep = True
+                if is_spread_event(brief):
+                    spread_out.write(detail)
+                    keep = True
+                if is_total_event(brief):
+                    total_out.write(detail)
+                    keep = True
+                if keep:
+                    collect_volume([detail], into=volume_per_market)
+                    collect_close_time([detail], into=close_time_per_market)
+                counts["details"] += 1
+                if counts["details"] % 100 == 0:
+                    print(f"[{counts['details']}] details fetched (concurrency limit {fetcher.limiter.limit:.1f})")
+
+        print(f"\n{'='*50}")
+        print(f"Total events fetched: {counts['events']}")
+        print(f"Mutually exclusive events: {me_out.count}")
+        print(f"Events with exactly 2 markets (moneyline): {two_market_out.count}")
+        print(f"Spread events: {spread_out.count}")
+        print(f"Total events:  {total_out.count}")
+        print(f"Request stats: {fetcher.limiter.stats()}")
+        print(f"{'='*50}\n")
+
+    write_json_atomic("statics/kalshi_volume_per_market.json", volume_per_market, indent=4)
+    write_json_atomic("statics/kalshi_close_time_per_market.json", close_time_per_market, indent=4)
+
+
 if __name__ == "__main__":
     start_time = time.time()
 
-    events = fetch_all_events(status="open")
-
-    print(f"\n{'='*50}")
-    print(f"Total events fetched: {len(events)}")
-    print(f"{'='*50}\n")
-
-    # ------------------------------------------------------------------
-    # Moneyline (existing flow): mutually_exclusive events with 2 markets
-    # ------------------------------------------------------------------
-    mutually_exclusive, non_mutually_exclusive = process_event_data(events)
-    print(f"Mutually exclusive events: {len(mutually_exclusive)}")
-    print(f"Non-mutually exclusive events: {len(non_mutually_exclusive)}")
-
-    print(f"\n{'='*50}\nFetching detailed data for mutually exclusive events...\n{'='*50}\n")
-    detailed_mutually_exclusive = fetch_event_details_batch(mutually_exclusive)
-    print(f"\nSuccessfully fetched details for {len(detailed_mutually_exclusive)} ME events")
-
-    two_market_events = [
-        ed for ed in detailed_mutually_exclusive if len(ed.get("markets", [])) == 2
-    ]
-    print(f"Events with exactly 2 markets (moneyline): {len(two_market_events)}")
-
-    # ------------------------------------------------------------------
-    # Spread / Total (new): identify by competition_scope or series ticker
-    # ------------------------------------------------------------------
-    spread_events_brief = [e for e in events if is_spread_event(e)]
-    total_events_brief = [e for e in events if is_total_event(e)]
-    print(f"\nBrief spread events identified: {len(spread_events_brief)}")
-    print(f"Brief total events identified:  {len(total_events_brief)}")
-
-    print(f"\n{'='*50}\nFetching detailed data for spread events...\n{'='*50}\n")
-    detailed_spread_events = fetch_event_details_batch(spread_events_brief)
-
-    print(f"\n{'='*50}\nFetching detailed data for total events...\n{'='*50}\n")
-    detailed_total_events = fetch_event_details_batch(total_events_brief)
-
-    # ------------------------------------------------------------------
-    # Volume per market (moneyline + spread + total combined)
-    # ------------------------------------------------------------------
-    volume_per_market = defaultdict(int)
-    collect_volume(two_market_events, into=volume_per_market)
-    collect_volume(detailed_spread_events, into=volume_per_market)
-    collect_volume(detailed_total_events, into=volume_per_market)
-
-    print_event_summary(two_market_events, label="Moneyline (2-market) events")
-    print_event_summary(detailed_spread_events, label="Spread events")
-    print_event_summary(detailed_total_events, label="Total events")
-
-    outputs = {
-        "statics/events.json": events,
-        "statics/mutually_exclusive_events_detailed.json": detailed_mutually_exclusive,
-        "statics/two_market_events.json": two_market_events,
-        "statics/kalshi_spread_events.json": detailed_spread_events,
-        "statics/kalshi_total_events.json": detailed_total_events,
-        "statics/kalshi_volume_per_market.json": volume_per_market,
-    }
-    for path, payload in outputs.items():
-        with open(path, "w") as f:
-            json.dump(payload, f, indent=4)
-        print(f"Saved {path}")
+    asyncio.run(download_kalshi_statics(status="open"))
 
     elapsed = time.time() - start_time
     print(f"\n{'='*50}\nTotal time: {elapsed:.2f} seconds\n{'='*50}")
@@ -1,80 +1,51 @@
 from datetime import datetime, timedelta, timezone
+import asyncio
 import json
-import time
-import requests
-from requests.exceptions import ConnectionError, Timeout, HTTPError
+
+from metadata_fetcher import MetadataFetcher
 
 BASE_URL = "https://api.elections.kalshi.com/trade-api/v2/markets"
 PAGE_LIMIT = 500  # Lower page size can reduce server load
-MAX_RETRIES = 5
-INITIAL_BACKOFF = 1  # seconds
 
 # NBA Basketball series ticker: KXNBAGAME
 # NCAA Basketball series ticker: KXNCAAMBGAME
 # UFC series ticker: KXUFCFIGHT
 
-def fetch_all_market_tickers(series_ticker="",min_settle_ts=None,max_settle_ts=None):
-    ticker_map = {}
-    cursor = None
-    counter = 0
-
-    while True:
-        params = {
-            "limit": PAGE_LIMIT,
-            "status": "open",
-        }
-        # Add series_ticker filter to API request
-        if series_ticker:
-            params["series_ticker"] = series_ticker
-        if cursor:
-            params["cursor"] = cursor
-        if min_settle_ts:
-            params["min_settle_ts"] = min_settle_ts
-        if max_settle_ts:
-            params["max_settle_ts"] = max_settle_ts
-
-        retries = 0
-        backoff = INITIAL_BACKOFF
-
-        while retries < MAX_RETRIES:
-            print("Iteration Start")
-            try:
-                response = requests.get(BASE_URL, params=params, timeout=10)
-                response.raise_for_status()
-                data = response.json()
-                break
-            except (ConnectionError, Timeout) as e:
-                retries += 1
-                print(f"Request failed: {e}. Retrying in {backoff}s… ({retries}/{MAX_RETRIES})")
-                time.sleep(backoff)
-                backoff *= 2
-            except HTTPError as e:
-                # If the server returns a 4xx/5xx, stop trying this page
-                print(f"HTTP error: {e}. Aborting.")
-                return ticker_map
+async def fetch_all_market_tickers_async(series_ticker="", min_settle_ts=None, max_settle_ts=None, fetcher=None):
+    if fetcher is None:
+        async with MetadataFetcher() as fetcher:
+            return await fetch_all_market_tickers_async(series_ticker, min_settle_ts, max_settle_ts, fetcher)
 
-        else:
-            # Retries exhausted
-            print("Max retries exceeded. Stopping.")
-            return ticker_map
+    params = {
+        "limit": PAGE_LIMIT,
+        "status": "open",
+    }
+    # Add series_ticker filter to API request
+    if series_ticker:
+        params["series_ticker"] = series_ticker
+    if min_settle_ts:
+        params["min_settle_ts"] = min_settle_ts
+    if max_settle_ts:
+        params["max_settle_ts"] = max_settle_ts
 
+    ticker_map = {}
+    # Pages are pipelined: the next one is requested while this one is processed
+    async for markets in fetcher.paginate(BASE_URL, params, "markets"):
         # Process markets - no client-side filtering needed
-        markets = data.get("markets", [])
         for m in markets:
             ticker = m.get("ticker")
             if ticker and ticker not in ticker_map:
                 #ticker_map[ticker] = ticker.split("-")[-1] + "_" + ticker.split("-")[1][:7] + "_WIN"
                 ticker_map[ticker] = ticker
-                counter += 1
-
-        # Continue pagination
-        cursor = data.get("cursor")
-        if not cursor:
-            break
+        print(f"Fetched {len(markets)} markets. Total: {len(ticker_map)}")
 
     return ticker_map
 
 
+def fetch_all_market_tickers(series_ticker="",min_settle_ts=None,max_settle_ts=None):
+    return asyncio.run(fetch_all_market_tickers_async(series_ticker, min_settle_ts, max_settle_ts))
+
+
 if __name__ == "__main__":
     json_path = 'statics/statics.json'
     with open(json_path, 'r') as f:
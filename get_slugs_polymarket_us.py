@@ -1,17 +1,22 @@
+import asyncio
 import json
 import time
 import base64
 from collections import defaultdict
-import requests
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, List, Optional
 from cryptography.hazmat.primitives.asymmetric import ed25519
 
+from metadata_fetcher import MetadataFetcher
+from record_stream import RecordWriter, iter_records
+from utils import write_json_atomic
+
 # ================================
 # CONFIG
 # ================================
 
 BASE_URL = "https://gateway.polymarket.us"
-EVENTS_FILE = "statics/all_polymarket_us_events.json"
+# NDJSON records (see record_stream); use ".ndjson.gz" to compress
+EVENTS_FILE = "statics/all_polymarket_us_events.ndjson"
 STATICS_FILE = "statics/statics.json"
 
 # Per-market-type mapping output files
@@ -29,8 +34,6 @@ STATICS_ASSET_ID_KEYS = {
 }
 
 PAGE_LIMIT = 1000
-MAX_RETRIES = 5
-INITIAL_BACKOFF = 1
 
 
 # ================================
@@ -64,63 +67,53 @@ def sign_request(method: str, path: str):
 # FETCH ALL EVENTS
 # ================================
 
+EVENTS_PATH = "/v1/events"
+EVENTS_PARAMS = {
+    "limit": PAGE_LIMIT,
+    "active": True,
+    "closed": False,
+    "archived": False,
+}
+
+
+async def fetch_event_pages(fetcher):
+    """Yield the events of each page; the next page is already in flight.
+    Every attempt is signed with a fresh timestamp."""
+    total = 0
+    async for events in fetcher.paginate(
+        f"{BASE_URL}{EVENTS_PATH}",
+        EVENTS_PARAMS,
+        "events",
+        headers=lambda: sign_request("GET", EVENTS_PATH),
+    ):
+        total += len(events)
+        print(f"Fetched {len(events)} events. Total: {total}")
+        yield events
+
+
+async def fetch_all_events_async(fetcher=None) -> List[dict]:
+    if fetcher is None:
+        async with MetadataFetcher() as fetcher:
+            return await fetch_all_events_async(fetcher)
+    return [event async for events in fetch_event_pages(fetcher) for event in events]
+
+
 def fetch_all_events() -> List[dict]:
     """Fetch all Polymarket US events with pagination + retry logic."""
-    all_events = []
-    cursor = None
-
-    while True:
-        path = "/v1/events"
-        params = {
-            "limit": PAGE_LIMIT,
-            "active": True,
-            "closed": False,
-            "archived": False,
-        }
-
-        if cursor:
-            params["cursor"] = cursor
-
-        retries = 0
-        backoff = INITIAL_BACKOFF
-
-        while retries < MAX_RETRIES:
-            try:
-                print(f"Fetching events... (cursor={cursor})")
-                response = requests.get(
-                    f"{BASE_URL}{path}",
-                    headers=sign_request("GET", path),
-                    params=params,
-                    timeout=10,
-                )
-                response.raise_for_status()
-                data = response.json()
-                break
-            except requests.exceptions.RequestException as e:
-                retries += 1
-                print(f"Error: {e} - retrying in {backoff}s ({retries}/{MAX_RETRIES})")
-                time.sleep(backoff)
-                backoff *= 2
-        else:
-            print("Max retries reached. Stopping.")
-            return all_events
-
-        events = data.get("events", [])
-        all_events.extend(events)
-        print(f"Fetched {len(events)} events. Total: {len(all_events)}")
-
-        cursor = data.get("cursor")
-        if not cursor:
-            break
-
-    return all_events
+    return asyncio.run(fetch_all_events_async())
+
+
+async def save_all_events_async():
+    async with MetadataFetcher() as fetcher:
+        with RecordWriter(EVENTS_FILE) as writer:
+            async for events in fetch_event_pages(fetcher):
+                for event in events:
+                    writer.write(event)
+    print(f"\nSaved {writer.count} events to {EVENTS_FILE}")
 
 
 def save_all_events():
-    events = fetch_all_events()
-    with open(EVENTS_FILE, "w") as f:
-        json.dump(events, f, indent=4)
-    print(f"\nSaved {len(events)} events to {EVENTS_FILE}")
+    asyncio.run(save_all_events_async())
 
 
 # ================================
@@ -166,28 +159,12 @@ def get_market_type(market: dict) -> Optional[str]:
 # BUILD EVENT -> MARKET MAPPING (per market type)
 # ================================
 
-def build_event_to_market_mapping(market_type: str):
-    """Build category -> series -> event -> { title, subtitle, market_slugs }
-    for the given market type. Also updates statics.json's ASSET_ID_MAPPING
-    under the appropriate venue key."""
-    if market_type not in EVENT_MARKET_MAPPING_FILES:
-        raise ValueError(
-            "Unknown market_type " + repr(market_type)
-            + "; expected one of " + str(sorted(EVENT_MARKET_MAPPING_FILES))
-        )
-
-    out_path = EVENT_MARKET_MAPPING_FILES[market_type]
-    statics_key = STATICS_ASSET_ID_KEYS[market_type]
-
+def build_polymarket_mapping(events: Iterable[dict], market_type: str):
+    """Return (asset id table, category -> series -> event -> { title,
+    subtitle, market_slugs }) for the given market type."""
     polymarket_us_statics: Dict[str, str] = {}
     mapping = defaultdict(lambda: defaultdict(dict))
 
-    with open(STATICS_FILE, "r") as f:
-        statics = json.load(f)
-
-    with open(EVENTS_FILE, "r") as f:
-        events = json.load(f)
-
     for event in events:
         category = event.get("category", "")
         series = event.get("seriesSlug", "")
@@ -216,15 +193,34 @@ def build_event_to_market_mapping(market_type: str):
                 "market_slugs": market_slugs,
             }
 
+    return polymarket_us_statics, mapping
+
+
+def build_event_to_market_mapping(market_type: str):
+    """Build category -> series -> event -> { title, subtitle, market_slugs }
+    for the given market type. Also updates statics.json's ASSET_ID_MAPPING
+    under the appropriate venue key."""
+    if market_type not in EVENT_MARKET_MAPPING_FILES:
+        raise ValueError(
+            "Unknown market_type " + repr(market_type)
+            + "; expected one of " + str(sorted(EVENT_MARKET_MAPPING_FILES))
+        )
+
+    out_path = EVENT_MARKET_MAPPING_FILES[market_type]
+    statics_key = STATICS_ASSET_ID_KEYS[market_type]
+
+    with open(STATICS_FILE, "r") as f:
+        statics = json.load(f)
+
+    # One pass over the streamed events; only the mapping is kept
+    polymarket_us_statics, mapping = build_polymarket_mapping(iter_records(EVENTS_FILE), market_type)
+
     # Update statics
     statics.setdefault("ASSET_ID_MAPPING", {})
     statics["ASSET_ID_MAPPING"][statics_key] = polymarket_us_statics
 
-    with open(STATICS_FILE, "w") as f:
-        json.dump(statics, f, indent=4)
-
-    with open(out_path, "w") as f:
-        json.dump(mapping, f, indent=4)
+    write_json_atomic(STATICS_FILE, statics, indent=4)
+    write_json_atomic(out_path, mapping, indent=4)
 
     n_events = sum(len(s) for c in mapping.values() for s in c.values())
     print(
@@ -5,54 +5,132 @@ import math
 import time
 import uuid
 
+import numpy as np
+
+from capital_allocator import Allocation, CapitalAllocator
+
 # Position Manager
 from position_manager import PositionManager
+from opportunity_tracker import OpportunityTracker
 
 from kalshi_feed import KalshiWebSocket
 from kalshi_http_gateway import KalshiHTTPGateway, load_private_key
 
-from utils import get_asset_ids, get_maker_fees_kalshi, get_taker_fees_kalshi
+from symbol_table import symbols
+from top_of_book import ASK, ASK_SIZE, BID, BID_SIZE, TopOfBookSnapshot
+from utils import PRICE_SCALE, get_asset_ids, get_maker_fees_kalshi, get_taker_fees_kalshi, get_taker_fees_kalshi_cents, price_ticks
 from collections import defaultdict
 
+STRATEGY_NAME = "intra_kalshi"
+
+# Cents -> 1/PRICE_SCALE dollar ticks
+_TICKS_PER_CENT = PRICE_SCALE // 100
+
+
+def build_event_groups(correlated_market_mapping: dict, mutually_exclusive_events=(), tickers=()) -> list[tuple[list[str], bool]]:
+    """
+    Group Kalshi tickers into mutually exclusive events.
+
+    Returns a list of (tickers, exhaustive). Groups from the correlated
+    market mapping (moneylines: exactly one side wins) are exhaustive.
+    Events from mutually_exclusive_events.json are only known to be
+    mutually exclusive, since none of the listed outcomes may happen, so
+    they are not. Their markets are the *tickers* named
+    "<event_ticker>-<outcome>".
+    """
+    groups = []
+    seen = set()
+    for ticker, correlated in correlated_market_mapping.items():
+        event_key = frozenset([ticker, *correlated])
+        if event_key in seen or len(event_key) < 2:
+            continue
+        seen.add(event_key)
+        groups.append((sorted(event_key), True))
+
+    covered = set().union(*seen) if seen else set()
+    event_tickers = {
+        event["event_ticker"] if isinstance(event, dict) else event
+        for event in mutually_exclusive_events
+    }
+    by_event = defaultdict(list)
+    for ticker in tickers:
+        event_ticker = ticker.rsplit("-", 1)[0]
+        if event_ticker in event_tickers and ticker not in covered:
+            by_event[event_ticker].append(ticker)
+    for event_ticker, markets in by_event.items():
+        if len(markets) >= 2:
+            groups.append((sorted(markets), False))
+    return groups
+
+
 class IntraKalshiArbitrage:
-    def __init__(self, kalshi_client: KalshiWebSocket, kalshi_gateway: KalshiHTTPGateway, position_manager: PositionManager, correlated_market_mapping: dict, profit_threshold=0.01):
+    def __init__(self, kalshi_client: KalshiWebSocket, kalshi_gateway: KalshiHTTPGateway, position_manager: PositionManager, correlated_market_mapping: dict, profit_threshold=0.01, opportunity_tracker: OpportunityTracker | None = None, capital_allocator: CapitalAllocator | None = None, mutually_exclusive_events=()):
         """
-        Detects arbitrage opportunities within Kalshi for 2-outcome moneyline markets.
+        Detects arbitrage opportunities within Kalshi across the markets of
+        one mutually exclusive event, for any number of outcomes.
+
+        Buy every NO: at most one outcome resolves YES, so a set of N NO
+        contracts pays at least N - 1. Profitable when the NO asks
+        (1 - bid) sum to less than N - 1 after fees.
+
+        Buy every YES: pays exactly 1 only when exactly one outcome resolves
+        YES, so it is only checked on exhaustive events (moneylines).
+        Profitable when the asks sum to less than 1 after fees.
+
+        Events are stored as flat arrays of leg symbol ids with group
+        boundaries. Each cycle the legs' quotes are compared with the
+        previous cycle's, and only events with a changed leg (plus events
+        that had an opportunity last cycle, to keep its lifetime tracked)
+        are evaluated, each exactly once, with both baskets summed per event
+        in one vectorized pass. Size is the minimum depth across all legs.
         """
         self.kalshi_client = kalshi_client
         self.kalshi_gateway = kalshi_gateway
         self.position_manager = position_manager
         self.correlated_market_mapping = correlated_market_mapping
-        self.profit_threshold = profit_threshold
+        self.profit_threshold = Decimal(str(profit_threshold))
         self.logger = logging.getLogger("intra_kalshi_strategy")
+        self.opportunity_tracker = opportunity_tracker or OpportunityTracker()
+        self.capital_allocator = capital_allocator or CapitalAllocator.from_gateways(kalshi_gateway=kalshi_gateway)
 
         self.overall_order_count = Decimal(0)
         self.overall_profit = Decimal(0.0)
 
-        self.last_best_ask_price_by_ticker = defaultdict()
-        self.last_best_bid_price_by_ticker = defaultdict()
+        groups = build_event_groups(
+            correlated_market_mapping,
+            mutually_exclusive_events,
+            getattr(kalshi_client, "market_tickers", ()),
+        )
+        self._compile_groups(groups)
+        self._last_leg_quotes: np.ndarray | None = None
+        self._live_groups = np.zeros(len(self.group_starts), dtype=bool)
 
-        # Cached balance to avoid API calls on every order (in dollars)
-        self.cached_balance = Decimal(Decimal(kalshi_gateway.get_balance()) / Decimal(100.0))
-        self.cached_balance = 5000
+        self.logger.info(
+            f"Built {len(self.group_starts)} mutually exclusive events "
+            f"({int(self.exhaustive.sum())} exhaustive) over {len(self.leg_ids)} markets"
+        )
 
-    def check_and_update_balance(self, required_amount: Decimal):
-        """Check if we have sufficient balance for the trade.
+    def _compile_groups(self, groups: list[tuple[list[str], bool]]):
+        """Flatten event groups into leg id / group boundary arrays."""
+        sizes = np.fromiter((len(tickers) for tickers, _ in groups), dtype=np.int64, count=len(groups))
+        self.leg_ids = symbols.intern_many(ticker for tickers, _ in groups for ticker in tickers).astype(np.int64)
+        self.group_starts = np.concatenate(([0], np.cumsum(sizes)[:-1])).astype(np.int64) if len(groups) else np.empty(0, dtype=np.int64)
+        self.group_sizes = sizes
+        self.leg_group = np.repeat(np.arange(len(groups)), sizes)
+        self.exhaustive = np.fromiter((exhaustive for _, exhaustive in groups), dtype=bool, count=len(groups))
 
-        Args:
-            required_amount: Amount needed in dollars
+    def _appeared_ns(self, *symbol_ids):
+        """Latest top-of-book change across the legs, i.e. when the opportunity became visible."""
+        books = self.kalshi_client.books_by_id
+        changes = []
+        for symbol_id in symbol_ids:
+            orderbook = books[symbol_id] if symbol_id < len(books) else None
+            if orderbook is not None:
+                changed = orderbook.last_top_change_ns()
+                if changed is not None:
+                    changes.append(changed)
+        return max(changes) if changes else None
 
-        Returns:
-            bool: True if sufficient balance, False otherwise
-        """
-        try:
-            #balance_response = self.kalshi_gateway.get_balance()
-            #self.cached_balance = balance_response / 100.0 if balance_response != 0 else 0  # Convert dollars to cents
-            return self.cached_balance >= required_amount
-        except Exception as e:
-            self.logger.error(f"Error fetching balance: {e}")
-            return False
-        
     def sell_out_of_position_arb(self, ticker, best_bid: Decimal, best_bid_size: Decimal, best_ask: Decimal, best_ask_size: Decimal,
                                  correlated_ticker, correlated_best_bid: Decimal, correlated_best_bid_size: Decimal, correlated_best_ask: Decimal, correlated_best_ask_size: Decimal):
         ticker_position = int(float(self.position_manager.get_position(ticker)))
@@ -78,8 +156,6 @@ class IntraKalshiArbitrage:
             if combined_price - (order_size + fees) > self.profit_threshold:
                 # Send order
                 self.logger.info(f"Intra-Kalshi Arbitrage Opportunity: Sell YES on {ticker} at {best_ask} and Sell YES on {correlated_ticker} at {correlated_best_ask} of size {order_size} | Combined Price: {combined_price} | Fees: {fees}")
-                self.cached_balance += combined_price
-                self.cached_balance -= fees
 
                 # Sell YES on ticker
                 order_a = {
@@ -120,204 +196,225 @@ class IntraKalshiArbitrage:
         
         
 
-    def find_opportunities(self, kalshi_book_snapshots: dict | None = None, polymarket_us_book_snapshots: dict | None = None):
-        """Identify intra-market arbitrage opportunities within Kalshi markets.
+    def _place_order(self, ticker: str, side: str, price: Decimal, size: int) -> bool:
+        """Buy *size* contracts of *side* on *ticker* with a fill-or-kill limit order."""
+        order = {
+            "ticker": ticker,
+            "action": "buy",
+            "side": side,
+            "count": int(size),
+            "client_order_id": str(uuid.uuid4()),
+            f"{side}_price": int(round(price * 100)),
+            "type": "limit",
+            "time_in_force": "fill_or_kill"
+        }
+        try:
+            response = self.kalshi_gateway.create_order(order)
+        except Exception as e:
+            self.logger.error(f"Failed to place order {side} on {ticker}: {e}")
+            return False
+        # Assumed filled unless the venue reports the order killed
+        if isinstance(response, dict) and int(float(response.get("order", {}).get("fill_count_fp", size))) == 0:
+            self.logger.error(f"Order {side} on {ticker} was killed")
+            return False
+        self.position_manager.update_from_fill(ticker, f"{side.upper()}_BUY", size)
+        return True
 
-        Args:
-            kalshi_book_snapshots: {ticker: (best_bid_price, best_bid_size, best_ask_price, best_ask_size)}
-                            Immutable snapshot taken on the event loop.  When *None*
-                            the method falls back to reading live orderbooks (legacy path).
+    #
+    # Opportunity collection
+    #
+
+    def _leg_quotes(self, snapshot: TopOfBookSnapshot) -> np.ndarray:
+        """(n_legs, 4) top of book for every leg, NaN where the book is missing."""
+        quotes = snapshot.quotes
+        leg_quotes = np.full((len(self.leg_ids), 4), np.nan)
+        in_range = self.leg_ids < len(quotes)
+        leg_quotes[in_range] = quotes[self.leg_ids[in_range]]
+        return leg_quotes
+
+    def _changed_groups(self, leg_quotes: np.ndarray) -> np.ndarray:
+        """Mask of events with at least one leg whose top of book moved since the last cycle."""
+        last = self._last_leg_quotes
+        self._last_leg_quotes = leg_quotes
+        if last is None:
+            return np.ones(len(self.group_starts), dtype=bool)
+        same = (leg_quotes == last) | (np.isnan(leg_quotes) & np.isnan(last))
+        changed = np.zeros(len(self.group_starts), dtype=bool)
+        changed[self.leg_group[~same.all(axis=1)]] = True
+        return changed
+
+    def _score_baskets(self, groups: np.ndarray, leg_quotes: np.ndarray, side: str) -> list:
         """
+        Score the all-YES or all-NO basket of each event in *groups*
+        (ascending event indices) and return the profitable ones.
 
-        if kalshi_book_snapshots is None:
-            # Legacy / fallback: read live (only safe when called on the event loop)
-            kalshi_book_snapshots = {
-                t: ob.snapshot_top()
-                for t, ob in self.kalshi_client.orderbooks.items()
+        Prices are integer ticks of 1/PRICE_SCALE and fees integer cents
+        (see utils), so the per-event sums and profits are exact.
+        """
+        if len(groups) == 0:
+            return []
+        sizes = self.group_sizes[groups]
+        starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+        legs = np.flatnonzero(np.isin(self.leg_group, groups))
+        event_of_leg = np.repeat(np.arange(len(groups)), sizes)
+
+        if side == "yes":
+            ticks = price_ticks(leg_quotes[legs, ASK])
+            depth = leg_quotes[legs, ASK_SIZE]
+            payout = np.full(len(groups), PRICE_SCALE, dtype=np.int64)
+        else:
+            # NO ask = 1 - YES bid, with the YES bid depth
+            bid_ticks = price_ticks(leg_quotes[legs, BID])
+            ticks = np.where(bid_ticks > 0, PRICE_SCALE - bid_ticks, 0)
+            depth = leg_quotes[legs, BID_SIZE]
+            payout = (sizes - 1) * PRICE_SCALE
+
+        depth = np.floor(np.nan_to_num(depth, nan=0.0)).astype(np.int64)
+        leg_ok = (ticks > 0) & (ticks < PRICE_SCALE) & (depth >= 1)
+        ok = np.logical_and.reduceat(leg_ok, starts)
+        size = np.minimum.reduceat(depth, starts)
+        cost = np.add.reduceat(ticks, starts)
+        fees_cents = np.add.reduceat(get_taker_fees_kalshi_cents(ticks, size[event_of_leg]), starts)
+        profit = size * (payout - cost) - fees_cents * _TICKS_PER_CENT
+
+        threshold = int(math.ceil(self.profit_threshold * PRICE_SCALE))
+        opportunities = []
+        for i in np.flatnonzero(ok & (profit >= threshold)).tolist():
+            group = int(groups[i])
+            first = self.group_starts[group]
+            leg_ids = self.leg_ids[first:first + sizes[i]].tolist()
+            prices = [Decimal(int(t)) / PRICE_SCALE for t in ticks[starts[i]:starts[i] + sizes[i]]]
+            raw_size = int(size[i])
+            total_cost = Decimal(int(size[i] * cost[i] + fees_cents[i] * _TICKS_PER_CENT)) / PRICE_SCALE
+            opportunities.append({
+                "group": group,
+                "tickers": symbols.names_of(leg_ids),
+                "leg_ids": leg_ids,
+                "side": side,
+                "prices": prices,
+                "payout_per_share": Decimal(int(payout[i]) // PRICE_SCALE),
+                "raw_size": raw_size,
+                "expected_profit": Decimal(int(profit[i])) / PRICE_SCALE,
+                "capital_per_share": {"Kalshi": total_cost / raw_size},
+                "strategy": STRATEGY_NAME,
+            })
+        return opportunities
+
+    def _execute_opportunity(self, allocation: Allocation):
+        opp = allocation.opportunity
+        reservation = allocation.reservations["Kalshi"]
+        order_size = allocation.size
+        side = opp["side"]
+
+        # Recheck profitability at the funded size
+        fees = sum(get_taker_fees_kalshi(price, order_size) for price in opp["prices"])
+        total_cost = sum(opp["prices"]) * order_size + fees
+        payout = opp["payout_per_share"] * order_size
+        if total_cost > payout - self.profit_threshold:
+            self.capital_allocator.release(reservation)
+            return
+
+        legs = ", ".join(f"{ticker}@{price}" for ticker, price in zip(opp["tickers"], opp["prices"]))
+        self.logger.info(f"Intra-Kalshi Arbitrage Opportunity: Buy {side.upper()} on {len(opp['tickers'])} outcomes ({legs}) of size {order_size} | Combined Price: {total_cost} | Payout: {payout}")
+        self.opportunity_tracker.mark_order_sent(opp["tracker_key"])
+
+        # Legs are fill-or-kill: each one sent has filled. Only what the
+        # filled legs cost is committed (the allocator's reconcile picks up
+        # the unwind proceeds)
+        filled = []
+        spent = Decimal(0)
+        for ticker, price in zip(opp["tickers"], opp["prices"]):
+            if not self._place_order(ticker, side, price, order_size):
+                break
+            filled.append(ticker)
+            spent += price * order_size + get_taker_fees_kalshi(price, order_size)
+
+        if len(filled) < len(opp["tickers"]):
+            self.logger.error(f"Intra-Kalshi basket incomplete: {len(filled)} of {len(opp['tickers'])} {side.upper()} legs filled; unwinding {filled}")
+            self._unwind_legs(filled, side, order_size)
+        else:
+            # Track profit
+            self.overall_order_count += order_size
+            self.overall_profit += payout - total_cost
+
+        if filled:
+            self.capital_allocator.commit(reservation, spent)
+        else:
+            self.capital_allocator.release(reservation)
+
+    def _unwind_legs(self, tickers: list[str], side: str, size: int):
+        """
+        Sell back *size* contracts of *side* on each of *tickers* (the legs
+        of a basket that did not complete) at the current bid, immediate or
+        cancel. Legs without a book, or whose sell fails, are left open and
+        logged for manual handling.
+        """
+        for ticker in tickers:
+            best_bid, best_ask = self.kalshi_client.get_top_of_book(ticker)
+            bid = best_bid if side == "yes" else (None if best_ask is None else 1 - Decimal(str(best_ask)))
+            if bid is None or Decimal(str(bid)) <= 0:
+                self.logger.error(f"Cannot unwind {size} {side.upper()} on {ticker}: no bid; position left open")
+                continue
+            order = {
+                "ticker": ticker,
+                "action": "sell",
+                "side": side,
+                "count": int(size),
+                "client_order_id": str(uuid.uuid4()),
+                f"{side}_price": int(round(Decimal(str(bid)) * 100)),
+                "type": "limit",
+                "time_in_force": "immediate_or_cancel"
             }
+            try:
+                response = self.kalshi_gateway.create_order(order)
+            except Exception as e:
+                self.logger.error(f"Failed to unwind {size} {side.upper()} on {ticker}: {e}; position left open")
+                continue
+            sold = int(float(response.get("order", {}).get("fill_count_fp", size))) if isinstance(response, dict) else size
+            if sold:
+                self.position_manager.update_from_fill(ticker, f"{side.upper()}_SELL", sold)
+            if sold < size:
+                self.logger.error(f"Unwound {sold} of {size} {side.upper()} on {ticker}; rest of the position left open")
 
-        for ticker, (best_bid, best_bid_size, best_ask, best_ask_size) in kalshi_book_snapshots.items():
-            
-            # Get correlated markets
-            correlated_tickers = self.correlated_market_mapping.get(ticker, [])
-            last_best_bid = -1
-            last_correlated_best_bid = -1
-            last_best_ask = -1
-            last_correlated_best_ask = -1
-
-            # Does not work for more than 2 correlated markets yet
-            if correlated_tickers:
-                for correlated_ticker in correlated_tickers:
-                    correlated_snap = kalshi_book_snapshots.get(correlated_ticker)
-                    if correlated_snap:
-                        correlated_best_bid, correlated_best_bid_size, correlated_best_ask, correlated_best_ask_size = correlated_snap
-                        
-                        # Buy Team A yes & Buy Team B yes
-                        if best_ask and correlated_best_ask:
-                            """
-                            if ticker in self.last_best_ask_price_by_ticker:
-                                last_best_ask = self.last_best_ask_price_by_ticker[ticker]
-                            self.last_best_ask_price_by_ticker[ticker] = best_ask
-                            if correlated_ticker in self.last_best_ask_price_by_ticker:
-                                last_correlated_best_ask = self.last_best_ask_price_by_ticker[correlated_ticker]
-                            self.last_best_ask_price_by_ticker[correlated_ticker] = correlated_best_ask
-                            if (last_best_ask != -1 and best_ask != last_best_ask) or (last_correlated_best_ask != -1 and correlated_best_ask != last_correlated_best_ask):
-                                pass
-                            else:
-                                continue
-                            """
-                            # Calculate order size
-                            #print(f"Best Ask: {best_ask_size}, Correlated Best Ask: {correlated_best_ask_size}")
-                            order_size = int(min(float(best_ask_size), float(correlated_best_ask_size)))
-                            
-                            # Calculate required balance (cost of both orders)
-                            cost_of_single_share = Decimal(best_ask + correlated_best_ask)
-                            required_balance = Decimal(cost_of_single_share * order_size)
-                            
-                            # Check balance before placing orders
-                            if self.cached_balance < 0:
-                                self.logger.warning(f"Negative balance detected: ${self.cached_balance:.2f}. Skipping trade.")
-                                continue
-                            if not self.cached_balance > required_balance:
-                                #self.logger.warning(f"Insufficient balance. Required: ${required_balance:.2f}, Available: ${self.cached_balance:.2f}")
-                                order_size = math.floor(Decimal(str(self.cached_balance)) / cost_of_single_share)
-                                
-                            # TODO: Skip if order size is 0 after balance check
-                                
-                                
-                            # Track profit
-                            self.overall_order_count += order_size
-                            self.overall_profit += max((Decimal("1.0") - cost_of_single_share) * order_size , 0)
-
-                            # Calculate cost of trade (including fees) and potential profit
-                            fees = Decimal(get_taker_fees_kalshi(Decimal(best_ask), order_size) + get_taker_fees_kalshi(Decimal(correlated_best_ask), order_size))
-                            combined_price = Decimal(best_ask * order_size) + Decimal(correlated_best_ask * order_size) + fees
-
-                            if combined_price <= (order_size - self.profit_threshold):
-                                self.logger.info(f"Intra-Kalshi Arbitrage Opportunity: Buy YES on {ticker} at {best_ask} and Buy YES on {correlated_ticker} at {correlated_best_ask} of size {order_size} | Combined Price: {combined_price}")
-                                self.cached_balance -= combined_price
-
-                                # Buy YES on ticker
-                                order_a = {
-                                    "ticker": ticker,
-                                    "action": "buy",
-                                    "side": "yes",
-                                    "count": int(order_size),
-                                    "client_order_id": str(uuid.uuid4()),
-                                    "yes_price": int(float(best_ask) * 100),
-                                    "type": "limit",
-                                    "time_in_force": "fill_or_kill"
-                                }
-                                try:
-                                    self.kalshi_gateway.create_order(order_a)
-                                    self.position_manager.update_from_fill(ticker, "YES_BUY", order_size)
-                                except Exception as e:
-                                    self.logger.error(f"Failed to place order A: {e}")
-                                    continue
-                                
-                                # Buy YES on correlated ticker
-                                order_b = {
-                                    "ticker": correlated_ticker,
-                                    "action": "buy",
-                                    "side": "yes",
-                                    "count": int(order_size),
-                                    "client_order_id": str(uuid.uuid4()),
-                                    "yes_price": int(float(correlated_best_ask) * 100),
-                                    "type": "limit",
-                                    "time_in_force": "fill_or_kill"
-                                }
-                                try:
-                                    self.kalshi_gateway.create_order(order_b)
-                                    self.position_manager.update_from_fill(correlated_ticker, "YES_BUY", order_size)
-                                except Exception as e:
-                                    self.logger.error(f"Failed to place order B: {e}")
-                                    continue
-
-                        # Buy Team A no & Buy Team B no
-                        if best_bid and correlated_best_bid:
-                            """
-                            if ticker in self.last_best_bid_price_by_ticker:
-                                last_best_bid = self.last_best_bid_price_by_ticker[ticker]
-                            self.last_best_bid_price_by_ticker[ticker] = best_bid
-                            if correlated_ticker in self.last_best_bid_price_by_ticker:
-                                last_correlated_best_bid = self.last_best_bid_price_by_ticker[correlated_ticker]
-                            self.last_best_bid_price_by_ticker[correlated_ticker] = correlated_best_bid
-                            if (last_best_bid != -1 and best_bid != last_best_bid) or (last_correlated_best_bid != -1 and correlated_best_bid != last_correlated_best_bid):
-                                pass
-                            else:
-                                continue
-                            """
-                            # Get NO Asks
-                            best_no_ask = Decimal("1.0") - Decimal(str(best_bid))
-                            best_correlated_no_ask = Decimal("1.0") - Decimal(str(correlated_best_bid))
-                            
-                            # Calculate order size
-                            #print(f"Best NO Ask: {best_bid_size}, Correlated Best NO Ask: {correlated_best_bid_size}")
-                            order_size = int(min(float(best_bid_size), float(correlated_best_bid_size)))
-                            
-                            # Calculate required balance (cost of both orders)
-                            cost_of_single_share = Decimal(best_no_ask + best_correlated_no_ask)
-                            required_balance = Decimal(cost_of_single_share * order_size)
-                            
-                            # Check balance before placing orders
-                            if self.cached_balance < 0:
-                                self.logger.warning(f"Negative balance detected: ${self.cached_balance:.2f}. Skipping trade.")
-                                continue
-                            if not self.cached_balance > required_balance:
-                                #self.logger.warning(f"Insufficient balance. Required: ${required_balance:.2f}, Available: ${self.cached_balance:.2f}")
-                                order_size = math.floor(Decimal(str(self.cached_balance)) / cost_of_single_share)
-                            
-                            # Track profit
-                            self.overall_order_count += order_size
-                            self.overall_profit += max((Decimal("1.0") - cost_of_single_share) * order_size , 0)
-
-                            # Calculate cost of trade (including fees) and potential profit
-                            fees = Decimal(get_taker_fees_kalshi(Decimal(best_no_ask), order_size) + get_taker_fees_kalshi(Decimal(best_correlated_no_ask), order_size))
-                            combined_price = Decimal(best_no_ask * order_size) + Decimal(best_correlated_no_ask * order_size) + fees
-                            
-                            if combined_price <= order_size - self.profit_threshold:
-                                self.logger.info(f"Intra-Kalshi Arbitrage Opportunity: Buy NO on {ticker} at {best_no_ask} and Buy NO on {correlated_ticker} at {best_correlated_no_ask} of size {order_size} | Combined Price: {combined_price}")
-                                self.cached_balance -= combined_price
-
-                                # Buy NO on ticker
-                                order_a = {
-                                    "ticker": ticker,
-                                    "action": "buy",
-                                    "side": "no",
-                                    "count": int(order_size),
-                                    "client_order_id": str(uuid.uuid4()),
-                                    "no_price": int(best_no_ask * 100),
-                                    "type": "limit",
-                                    "time_in_force": "fill_or_kill"
-                                }
-                                try:
-                                    self.kalshi_gateway.create_order(order_a)
-                                    self.position_manager.update_from_fill(ticker, "NO_BUY", order_size)
-                                except Exception as e:
-                                    self.logger.error(f"Failed to place order A: {e}")
-                                    continue
-                                
-                                # Buy NO on correlated ticker
-                                order_b = {
-                                    "ticker": correlated_ticker,
-                                    "action": "buy",
-                                    "side": "no",
-                                    "count": int(order_size),
-                                    "client_order_id": str(uuid.uuid4()),
-                                    "no_price": int(best_correlated_no_ask * 100),
-                                    "type": "limit",
-                                    "time_in_force": "fill_or_kill"
-                                }
-                                try:
-                                    self.kalshi_gateway.create_order(order_b)
-                                    self.position_manager.update_from_fill(correlated_ticker, "NO_BUY", order_size)
-                                except Exception as e:
-                                    self.logger.error(f"Failed to place order B: {e}")
-                                    continue
-                                
-                        #self.sell_out_of_position_arb(ticker, best_bid, best_bid_size, best_ask, best_ask_size,
-                        #                                correlated_ticker, correlated_best_bid, correlated_best_bid_size, correlated_best_ask, correlated_best_ask_size)
-
-                    #self.logger.info(f"Overall Orders Placed: {self.overall_order_count}, Overall Potential Profit: ${self.overall_profit:.2f}, Balance: ${self.cached_balance:.2f}")
-                        
-            
\ No newline at end of file
+    #
+    # Public entry points
+    #
+
+    def collect_opportunities(self, kalshi_book_snapshots=None, polymarket_us_book_snapshots=None) -> list:
+        """Collect this cycle's N-outcome opportunities for global ranking by the CapitalAllocator."""
+        if kalshi_book_snapshots is None:
+            kalshi_book_snapshots = self.kalshi_client.snapshot_all_books()
+
+        leg_quotes = self._leg_quotes(kalshi_book_snapshots)
+        groups = np.flatnonzero(self._changed_groups(leg_quotes) | self._live_groups)
+
+        opportunities = self._score_baskets(groups[self.exhaustive[groups]], leg_quotes, "yes")
+        opportunities += self._score_baskets(groups, leg_quotes, "no")
+
+        self._live_groups[:] = False
+        for opp in opportunities:
+            self._live_groups[opp["group"]] = True
+            opp["tracker_key"] = self.opportunity_tracker.observe(
+                STRATEGY_NAME, tuple(opp["tickers"]), f"buy_{opp['side']}",
+                edge=opp["expected_profit"], size=opp["raw_size"],
+                appeared_ns=self._appeared_ns(*opp["leg_ids"]),
+            )
+
+        # Resolve opportunities that were not seen again this cycle
+        self.opportunity_tracker.end_cycle(STRATEGY_NAME)
+        return opportunities
+
+    def execute_allocation(self, allocation: Allocation):
+        """Execute one opportunity funded by CapitalAllocator.allocate."""
+        self._execute_opportunity(allocation)
+
+    def find_opportunities(self, kalshi_book_snapshots: dict | None = None, polymarket_us_book_snapshots: dict | None = None):
+        """Identify and execute intra-event arbitrage opportunities within Kalshi markets.
+
+        Args:
+            kalshi_book_snapshots: TopOfBookSnapshot taken on the event loop.
+                When *None* one is taken at call time.
+        """
+        opportunities = self.collect_opportunities(kalshi_book_snapshots, polymarket_us_book_snapshots)
+        for allocation in self.capital_allocator.allocate(opportunities):
+            self._execute_opportunity(allocation)
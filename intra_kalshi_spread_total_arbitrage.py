@@ -1,36 +1,29 @@
 import logging
 import math
-import re
 import time
 import uuid
-from collections import defaultdict
 from decimal import Decimal
-from itertools import combinations
 
+import numpy as np
+
+from capital_allocator import Allocation, CapitalAllocator
 from position_manager import PositionManager
+from opportunity_tracker import OpportunityTracker
 from kalshi_feed import KalshiWebSocket
 from kalshi_http_gateway import KalshiHTTPGateway
+from pair_graph import PairGraph, event_ladders, ladder_pairs
+from symbol_table import symbols
+from top_of_book import ASK, ASK_SIZE, BID, BID_SIZE, TopOfBookSnapshot
 from utils import get_taker_fees_kalshi
 
-# Matches suffixes like 'WHU2', 'CLB14', 'RR191', '3' (optional letters + required digits)
-_SUFFIX_RE = re.compile(r'^([A-Za-z]*)(\d+)$')
-
-
-def _parse_suffix(ticker: str):
-    """
-    Return (team_prefix, trailing_num) from the last '-' segment of a ticker.
-
-    Examples:
-        'KXEPLSPREAD-26MAY24WHULEE-WHU2'       -> ('WHU', 2)
-        'KXEPLTOTAL-26MAY24WHULEE-3'           -> ('', 3)
-        'KXIPLTEAMTOTAL-26MAY17RRDC-RR191'     -> ('RR', 191)
-        'KXUFLSPREAD-26MAY17CLBBHM-CLB21'      -> ('CLB', 21)
+STRATEGY_NAME = "intra_kalshi_spread_total"
 
-    Returns None if the suffix doesn't match the expected pattern.
-    """
-    suffix = ticker.rsplit('-', 1)[-1]
-    m = _SUFFIX_RE.match(suffix)
-    return (m.group(1), int(m.group(2))) if m else None
+# "ladders" finds crossed pairs from per-ladder running minimum asks;
+# "pairs" checks every precomputed pair (see _collect_opportunities);
+# "auto" uses the ladder scan once ladders are deep enough to pay for its
+# sort, i.e. above LADDER_SCAN_MIN_PAIRS_PER_RUNG pairs per rung
+SCANNERS = ("auto", "ladders", "pairs")
+LADDER_SCAN_MIN_PAIRS_PER_RUNG = 3
 
 
 class IntraKalshiSpreadTotalArbitrage:
@@ -66,11 +59,27 @@ class IntraKalshiSpreadTotalArbitrage:
     not just adjacent ones. This catches cross-gap arbitrage (e.g. market 1
     vs market 3) even when intermediate pairs are not individually crossed.
 
+    --- Precompiled pairs ---
+    The statics build writes the pairs as a pair graph (see pair_graph.py)
+    that is memory-mapped at startup; only events missing from the graph
+    are parsed and combined here. max_pair_gap prunes deep ladders to pairs
+    at most that many rungs apart (1 = adjacent only).
+
+    --- Ladder scanning ---
+    A harder rung j can only be crossed with some easier rung if its bid
+    beats the minimum ask over the rungs below it. The "ladders" scanner
+    takes that running minimum along every ladder at once and only
+    enumerates the easier partners of the few rungs that pass, instead of
+    testing every pair. It returns the same opportunities as the "pairs"
+    scanner. "auto" (the default) picks it per market type when ladders
+    are deep, and the pair scan is always used for profit_threshold <= 0
+    (where uncrossed pairs can still qualify).
+
     --- Execution priority ---
-    Each scan cycle collects ALL valid opportunities, sorts them by total
-    expected profit descending, then executes in that order until the
-    available balance is exhausted, ensuring the highest-value trades are
-    captured first.
+    Each scan cycle collects ALL valid opportunities and hands them to the
+    shared CapitalAllocator, which funds them in descending expected profit
+    (pooled with other strategies' opportunities when main ranks them
+    globally), ensuring the highest-value trades are captured first.
     """
 
     def __init__(
@@ -81,6 +90,11 @@ class IntraKalshiSpreadTotalArbitrage:
         spread_correlated_mapping: dict,
         total_correlated_mapping: dict,
         profit_threshold: float = 0.01,
+        opportunity_tracker: OpportunityTracker | None = None,
+        capital_allocator: CapitalAllocator | None = None,
+        pair_graphs: dict[str, PairGraph] | None = None,
+        max_pair_gap: int | None = None,
+        scanner: str = "auto",
     ):
         """
         Initialize the strategy with market mappings and execution parameters.
@@ -95,40 +109,53 @@ class IntraKalshiSpreadTotalArbitrage:
                 tickers in the same event group.
             profit_threshold: Minimum required profit in dollars to execute a
                 trade. Filters out marginal or fee-negative opportunities.
+            opportunity_tracker: Shared registry recording opportunity
+                lifecycles across cycles. A private one is created if None.
+            capital_allocator: Shared per-venue capital allocator. One synced
+                from kalshi_gateway is created if None.
+            pair_graphs: Precompiled pair graphs keyed 'spread' / 'total'
+                (see pair_graph.load_pair_graph). Events they cover are not
+                rebuilt from the mappings.
+            max_pair_gap: Keep only pairs at most this many rungs apart in
+                a ladder; None checks all pairs. Graphs built with a
+                different max_gap are ignored.
+            scanner: "ladders" (running-minimum ladder scan), "pairs"
+                (test every pair) or "auto"; see SCANNERS.
         """
+        if scanner not in SCANNERS:
+            raise ValueError(f"Unknown scanner {scanner!r}; expected one of {SCANNERS}")
         self.kalshi_client = kalshi_client
         self.kalshi_gateway = kalshi_gateway
         self.position_manager = position_manager
         self.profit_threshold = Decimal(str(profit_threshold))
         self.logger = logging.getLogger("intra_kalshi_spread_total_strategy")
-
-        self.cached_balance = Decimal(kalshi_gateway.get_balance()) / Decimal(100)
-        self.cached_balance = Decimal(5000)
-
-        # Pre-build all (easier_ticker, harder_ticker) pairs once at init.
-        # These are static for the lifetime of the strategy object.
-        self._spread_pairs = self._build_nested_pairs(spread_correlated_mapping, "spread")
-        self._total_pairs = self._build_nested_pairs(total_correlated_mapping, "total")
-        
-        """
-        for easier, harder in self._spread_pairs:
-            self.logger.info(f"Spread pair: easier={easier}, harder={harder}")
-        for easier, harder in self._total_pairs:
-            self.logger.info(f"Total pair: easier={easier}, harder={harder}")
-        """
+        self.opportunity_tracker = opportunity_tracker or OpportunityTracker()
+        self.capital_allocator = capital_allocator or CapitalAllocator.from_gateways(kalshi_gateway=kalshi_gateway)
+        self.max_pair_gap = max_pair_gap
+        self.scanner = scanner
+
+        # Pre-build all (easier, harder) pairs as parallel arrays of symbol
+        # ids, plus each event's ladders as flat rung arrays, kept per event
+        # group so update_mappings() and on_markets_changed() only touch the
+        # events that changed.
+        self._event_pairs: dict[str, dict] = {"spread": {}, "total": {}}
+        self._spread_pairs = self._total_pairs = self._pair_ids([])
+        self._spread_ladders = self._total_ladders = self._flat_ladders([])
+        self.update_mappings(spread_correlated_mapping, total_correlated_mapping, pair_graphs)
 
     # ------------------------------------------------------------------ #
     # Initialization helpers                                               #
     # ------------------------------------------------------------------ #
 
-    def _build_nested_pairs(self, correlated_mapping: dict, label: str) -> list:
+    def _build_nested_pairs(self, correlated_mapping: dict, label: str, skip=()) -> dict:
         """
-        Build all (easier, harder) ticker pairs across every event group.
+        Build all (easier, harder) ticker pairs for every event group.
 
         For each event, tickers are grouped by their team prefix (the letters
         before the trailing number). Within each group, tickers are sorted
         ascending by trailing number, and ALL combinations of (lower_N,
-        higher_N) pairs are generated — not just adjacent neighbors.
+        higher_N) pairs are generated — not just adjacent neighbors — unless
+        max_pair_gap limits how many rungs apart a pair may be.
 
         Checking all combinations (rather than only adjacent pairs) is
         important because a cross-gap opportunity such as market 1 vs market 3
@@ -146,52 +173,48 @@ class IntraKalshiSpreadTotalArbitrage:
             correlated_mapping: Maps each ticker to the list of correlated
                 tickers that belong to the same event.
             label: Human-readable label ('spread' or 'total') for log messages.
+            skip: Event keys (frozensets of tickers) whose pairs are already
+                built and are left out.
 
         Returns:
-            List of (easier_ticker, harder_ticker) tuples covering all valid
-            combinations within each event group.
+            Dict of event key -> (pairs, ladders) where pairs lists the
+            (easier_ticker, harder_ticker) tuples covering all valid
+            combinations within that event group and ladders lists each
+            team's tickers, easiest first.
         """
         seen: set = set()
-        pairs: list = []
+        groups: dict = {}
         unparseable_events: list = []
         single_market_skips: int = 0
 
         for ticker, correlated in correlated_mapping.items():
             event_key = frozenset([ticker] + correlated)
-            if event_key in seen:
+            if event_key in seen or event_key in skip:
                 continue
             seen.add(event_key)
 
             event_tickers = list(event_key)
-            by_team: dict = defaultdict(list) # team_prefix -> list of (trailing_num, ticker)
-            bad: list = []
-
-            for t in event_tickers:
-                parsed = _parse_suffix(t)
-                if parsed is None:
-                    bad.append(t)
-                else:
-                    team_prefix, num = parsed
-                    by_team[team_prefix].append((num, t))
-
-            if bad:
+            grouped = event_ladders(event_tickers)
+            if grouped is None:
                 unparseable_events.append(event_tickers[0])
                 continue
 
-            for team, markets in by_team.items():
-                if len(markets) < 2:
-                    single_market_skips += 1
-                    self.logger.debug(
-                        f"[{label}] Single-market team '{team or '(game)'}' "
-                        f"in event containing {markets[0][1]} — skipping"
-                    )
-                    continue
-                sorted_mkts = sorted(markets, key=lambda x: x[0])
-                # All combinations, not just adjacent, to catch cross-gap arbitrage.
-                # Since sorted_mkts is ascending by trailing number, the first
-                # element of each pair is always the easier (lower threshold) market.
-                for (_, easier), (_, harder) in combinations(sorted_mkts, 2):
-                    pairs.append((easier, harder))
+            ladders, single = grouped
+            for team in single:
+                single_market_skips += 1
+                self.logger.debug(
+                    f"[{label}] Single-market team '{team or '(game)'}' "
+                    f"in event containing {event_tickers[0]} — skipping"
+                )
+
+            pairs: list = []
+            for rungs in ladders.values():
+                # Rungs are ascending by trailing number, so the first element
+                # of each pair is always the easier (lower threshold) market.
+                easier, harder = ladder_pairs(len(rungs), self.max_pair_gap)
+                pairs.extend((rungs[i], rungs[j]) for i, j in zip(easier.tolist(), harder.tolist()))
+            if pairs:
+                groups[event_key] = (pairs, list(ladders.values()))
 
         if unparseable_events:
             self.logger.warning(
@@ -204,35 +227,187 @@ class IntraKalshiSpreadTotalArbitrage:
                 f"skipped (partner filtered out by time window)"
             )
 
-        self.logger.info(f"[{label}] Built {len(pairs)} nested pairs from {len(seen)} events")
-        return pairs
+        n_pairs = sum(len(pairs) for pairs, _ in groups.values())
+        self.logger.info(f"[{label}] Built {n_pairs} nested pairs from {len(seen)} events")
+        return groups
 
-    # ------------------------------------------------------------------ #
-    # Shared helpers                                                       #
-    # ------------------------------------------------------------------ #
+    def _load_pair_graph(self, graph: PairGraph, label: str, wanted: set) -> int:
+        """
+        Add the per-event pair arrays and ladders of a precompiled *graph*
+        for the events in *wanted* that are not tracked yet. Returns the
+        number of events added.
+        """
+        if graph.max_gap != self.max_pair_gap:
+            self.logger.warning(
+                f"[{label}] Pair graph built with max_gap={graph.max_gap}, "
+                f"strategy uses {self.max_pair_gap}; rebuilding pairs instead"
+            )
+            return 0
 
-    def _adjusted_size(self, cost_per_share: Decimal, requested: int) -> int:
+        groups = self._event_pairs[label]
+        names = graph.ticker_names()
+        # Graph indices -> this process's symbol ids, gathered once
+        ids = symbols.intern_many(names)
+        easier_ids = ids[graph.easier]
+        harder_ids = ids[graph.harder]
+        members = graph.event_members.tolist()
+        member_offsets = graph.event_offsets.tolist()
+        pair_offsets = graph.event_pair_offsets.tolist()
+        event_ladder_offsets = graph.event_ladder_offsets.tolist()
+        ladder_offsets = graph.ladder_offsets.tolist()
+        rung_ids = ids[graph.ladders]
+
+        added = 0
+        for e in range(len(graph)):
+            lo, hi = pair_offsets[e], pair_offsets[e + 1]
+            if lo == hi:
+                continue
+            event_key = frozenset(names[i] for i in members[member_offsets[e]:member_offsets[e + 1]])
+            if event_key in groups or event_key not in wanted:
+                continue
+            ladders = [
+                rung_ids[ladder_offsets[k]:ladder_offsets[k + 1]]
+                for k in range(event_ladder_offsets[e], event_ladder_offsets[e + 1])
+            ]
+            groups[event_key] = (easier_ids[lo:hi], harder_ids[lo:hi], *self._ladder_arrays(ladders))
+            added += 1
+        self.logger.info(f"[{label}] Loaded {added} event groups from the precompiled pair graph")
+        return added
+
+    @staticmethod
+    def _pair_ids(pairs: list) -> tuple[np.ndarray, np.ndarray]:
+        """Convert (easier_ticker, harder_ticker) tuples to (easier_ids, harder_ids) arrays."""
+        easier_ids = symbols.intern_many(easier for easier, _ in pairs)
+        harder_ids = symbols.intern_many(harder for _, harder in pairs)
+        return easier_ids, harder_ids
+
+    @staticmethod
+    def _ladder_arrays(ladders: list) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Flatten one event's ladders (sequences of symbol ids, easiest first)
+        into (rung_ids, rung_ladder): the rungs back to back and the index of
+        the ladder each belongs to. A removed rung later becomes -1 in place,
+        so rung distances used by max_pair_gap are kept.
         """
-        Cap order size to what the current cached balance can fund.
+        if not ladders:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int64)
+        rung_ids = np.concatenate([np.asarray(ladder, dtype=np.int32) for ladder in ladders])
+        rung_ladder = np.repeat(np.arange(len(ladders), dtype=np.int64), [len(ladder) for ladder in ladders])
+        return rung_ids, rung_ladder
+
+    @staticmethod
+    def _flat_ladders(groups: list) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Concatenate per-event (rung_ids, rung_ladder) into the scanned
+        (rung_ids, rung_ladder, rung_start) arrays, with ladder indices made
+        unique across events and rung_start the position of the first rung
+        of each rung's ladder.
+        """
+        if not groups:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        rung_ids = np.concatenate([ids for ids, _ in groups])
+        offsets = np.cumsum([0] + [int(ladder[-1]) + 1 if len(ladder) else 0 for _, ladder in groups[:-1]])
+        rung_ladder = np.concatenate([ladder + offset for (_, ladder), offset in zip(groups, offsets)])
+        first = np.ones(len(rung_ladder), dtype=bool)
+        first[1:] = rung_ladder[1:] != rung_ladder[:-1]
+        starts = np.flatnonzero(first)
+        rung_start = starts[np.cumsum(first) - 1]
+        return rung_ids, rung_ladder, rung_start
+
+    def _event_arrays(self, pairs: list, ladders: list) -> tuple:
+        """(easier_ids, harder_ids, rung_ids, rung_ladder) for one event from ticker pairs and ladders."""
+        return (*self._pair_ids(pairs), *self._ladder_arrays([symbols.intern_many(ladder) for ladder in ladders]))
 
-        Called at execution time (after sorting) so that earlier, higher-profit
-        trades have first claim on available capital.
+    # ------------------------------------------------------------------ #
+    # Runtime market changes                                               #
+    # ------------------------------------------------------------------ #
 
-        Args:
-            cost_per_share: Total cost in dollars to execute one share of the
-                two-legged trade: ask(easier) + (1 - bid(harder)).
-            requested: Desired order size based on available market liquidity.
+    @staticmethod
+    def _event_keys(correlated_mapping: dict) -> set:
+        return {frozenset([ticker] + correlated) for ticker, correlated in correlated_mapping.items()}
 
-        Returns:
-            Largest integer size fundable within cached_balance, or 0 if the
-            balance cannot cover even a single share.
+    def _publish_pairs(self):
         """
-        if self.cached_balance <= 0:
-            self.logger.warning(f"Non-positive balance: ${self.cached_balance:.2f}")
-            return 0
-        if self.cached_balance >= cost_per_share * requested:
-            return requested
-        return math.floor(self.cached_balance / cost_per_share)
+        Concatenate the per-event arrays into the scanned pair and ladder
+        arrays. Each attribute is replaced in one assignment, so a
+        scan running on the strategy thread sees either the old or the new
+        pairs.
+        """
+        for label in ("spread", "total"):
+            groups = list(self._event_pairs[label].values())
+            if groups:
+                pairs = (np.concatenate([g[0] for g in groups]), np.concatenate([g[1] for g in groups]))
+            else:
+                pairs = self._pair_ids([])
+            ladders = self._flat_ladders([(g[2], g[3]) for g in groups])
+            setattr(self, f"_{label}_pairs", pairs)
+            setattr(self, f"_{label}_ladders", ladders)
+
+    def update_mappings(self, spread_correlated_mapping: dict, total_correlated_mapping: dict, pair_graphs: dict[str, PairGraph] | None = None):
+        """
+        Follow refreshed spread/total correlated mappings: pairs are built
+        only for event groups that are new, and groups that are no longer in
+        the mapping are dropped. New groups are taken from *pair_graphs*
+        (keyed 'spread' / 'total') when they cover them, so a stale graph
+        only costs the events it is missing.
+        """
+        pair_graphs = pair_graphs or {}
+        for label, mapping in (("spread", spread_correlated_mapping), ("total", total_correlated_mapping)):
+            groups = self._event_pairs[label]
+            wanted = self._event_keys(mapping)
+            gone = [key for key in groups if key not in wanted]
+            for key in gone:
+                del groups[key]
+            loaded = 0
+            if label in pair_graphs:
+                loaded = self._load_pair_graph(pair_graphs[label], label, wanted)
+            built = self._build_nested_pairs(mapping, label, skip=groups)
+            for key, (pairs, ladders) in built.items():
+                groups[key] = self._event_arrays(pairs, ladders)
+            if gone or built or loaded:
+                self.logger.info(f"[{label}] {loaded + len(built)} event groups added, {len(gone)} removed; {len(groups)} tracked")
+        self._publish_pairs()
+
+    def on_markets_changed(self, venue: str, added: list, removed: list):
+        """
+        Feed market listener (see FeedHandler.add_market_listener): drop every
+        pair with a leg among the *removed* Kalshi tickers and blank those
+        rungs out of the ladders.
+        """
+        if venue != self.kalshi_client.venue or not removed:
+            return
+        removed_ids = symbols.intern_many(removed)
+        dropped = 0
+        for groups in self._event_pairs.values():
+            for key, (easier_ids, harder_ids, rung_ids, rung_ladder) in list(groups.items()):
+                keep = ~(np.isin(easier_ids, removed_ids) | np.isin(harder_ids, removed_ids))
+                if keep.all():
+                    continue
+                dropped += int((~keep).sum())
+                if keep.any():
+                    rung_ids = np.where(np.isin(rung_ids, removed_ids), -1, rung_ids).astype(np.int32)
+                    groups[key] = (easier_ids[keep], harder_ids[keep], rung_ids, rung_ladder)
+                else:
+                    del groups[key]
+        if dropped:
+            self.logger.info(f"Dropped {dropped} pairs for {len(removed)} removed markets")
+            self._publish_pairs()
+
+    # ------------------------------------------------------------------ #
+    # Shared helpers                                                       #
+    # ------------------------------------------------------------------ #
+
+    def _appeared_ns(self, *symbol_ids) -> int | None:
+        """Latest top-of-book change across the legs, i.e. when the opportunity became visible."""
+        books = self.kalshi_client.books_by_id
+        changes = []
+        for symbol_id in symbol_ids:
+            orderbook = books[symbol_id] if symbol_id < len(books) else None
+            if orderbook is not None:
+                changed = orderbook.last_top_change_ns()
+                if changed is not None:
+                    changes.append(changed)
+        return max(changes) if changes else None
 
     def _place_order(self, ticker: str, action: str, side: str, price: Decimal, size: int) -> bool:
         """
@@ -276,7 +451,7 @@ class IntraKalshiSpreadTotalArbitrage:
     # Opportunity collection and scoring                                   #
     # ------------------------------------------------------------------ #
 
-    def _collect_opportunities(self, pairs: list, snapshots: dict) -> list:
+    def _collect_opportunities(self, pairs: tuple[np.ndarray, np.ndarray], snapshot: TopOfBookSnapshot) -> list:
         """
         Scan all (easier, harder) pairs and return a list of profitable
         arbitrage opportunities, scored at unconstrained market liquidity.
@@ -290,65 +465,148 @@ class IntraKalshiSpreadTotalArbitrage:
         and bid_size_h) without any balance constraint — this allows downstream
         sorting to reflect true market priority before capital is allocated.
 
-        Also logs ordering violations where bid(easier) < ask(harder), which
-        indicate stale or anomalous quotes but do not support a risk-free trade
-        (buying harder YES + easier NO would expose the position to the
-        intermediate scenario where easier resolves YES but harder resolves NO,
-        receiving only $1 on a combined cost > $1).
+        The crossing test runs vectorized over the snapshot arrays for every
+        pair at once; only crossed pairs are re-scored exactly with Decimal
+        prices and fees.
 
         Args:
-            pairs: List of (easier_ticker, harder_ticker) tuples to evaluate.
-            snapshots: Dict mapping ticker -> (bid, bid_size, ask, ask_size).
+            pairs: (easier_ids, harder_ids) arrays of symbol ids.
+            snapshot: Column-wise top of book indexed by symbol id.
 
         Returns:
             List of opportunity dicts. Each dict contains:
                 easier_ticker  (str)      - the lower-threshold market
                 harder_ticker  (str)      - the higher-threshold market
+                easier_id      (int)      - symbol id of the easier market
+                harder_id      (int)      - symbol id of the harder market
                 ask_e          (Decimal)  - ask price on the easier market
                 no_ask_h       (Decimal)  - cost to buy harder NO (1 - bid_h)
                 cost_per_share (Decimal)  - ask_e + no_ask_h
                 raw_size       (int)      - max executable size before balance cap
                 expected_profit (Decimal) - raw_size - total_cost (unconstrained)
+                capital_per_share (dict)  - {"Kalshi": total_cost / raw_size},
+                                            for the CapitalAllocator
+                strategy       (str)      - STRATEGY_NAME
         """
-        opportunities = []
+        easier_ids, harder_ids = pairs
+        if len(easier_ids) == 0:
+            return []
+
+        quotes = snapshot.quotes
+        ask_e = quotes[easier_ids, ASK]
+        ask_size_e = quotes[easier_ids, ASK_SIZE]
+        bid_h = quotes[harder_ids, BID]
+        bid_size_h = quotes[harder_ids, BID_SIZE]
+
+        # NaN (missing quote) compares False, so empty sides drop out here
+        with np.errstate(invalid="ignore"):
+            candidate = (ask_e > 0) & (bid_h > 0) & (ask_size_e >= 1) & (bid_size_h >= 1)
+            if self.profit_threshold > 0:
+                # Fees are non-negative, so a positive profit needs cost_per_share < 1
+                candidate &= bid_h > ask_e
+
+        return self._score_pairs(easier_ids[candidate], harder_ids[candidate], snapshot)
+
+    def _collect_ladder_opportunities(self, ladders: tuple, snapshot: TopOfBookSnapshot) -> list:
+        """
+        Find the crossed (easier, harder) pairs of every ladder without
+        testing each pair, and score them like _collect_opportunities.
+
+        Rung j has a crossed easier partner only if
+            bid(j) > min(ask(i) for i < j in the same ladder)
+        The running minimum restarts at every ladder: asks are replaced by
+        their rank (one argsort, O(n log n) in the rungs) and every ladder's
+        ranks are shifted below all earlier ladders', so one
+        np.minimum.accumulate over the flat rungs never carries a value
+        across ladders. Only rungs passing the test are expanded to their
+        partners (limited to max_pair_gap rungs below). Crossings are rare,
+        so a scan costs the sort plus the crossed spans, instead of every
+        pair. Requires profit_threshold > 0, which is what makes uncrossed
+        pairs unprofitable.
 
-        for easier_ticker, harder_ticker in pairs:
-            snap_e = snapshots.get(easier_ticker)
-            snap_h = snapshots.get(harder_ticker)
-            if not snap_e or not snap_h:
-                continue
+        Args:
+            ladders: (rung_ids, rung_ladder, rung_start) flat arrays from
+                _flat_ladders; rung_ids is -1 for removed rungs.
+            snapshot: Column-wise top of book indexed by symbol id.
 
-            bid_e, bid_size_e, ask_e, ask_size_e = snap_e
-            bid_h, bid_size_h, ask_h, ask_size_h = snap_h
-
-            # Log ordering violations: harder ask priced above easier bid.
-            # This is non-tradeable but may indicate a stale or erroneous quote.
-            if bid_e and ask_h and bid_size_e and ask_size_h:
-                bid_e_d = Decimal(str(bid_e))
-                ask_h_d = Decimal(str(ask_h))
-                if bid_e_d < ask_h_d:
-                    pass
-                    """
-                    print(
-                        f"Ordering violation (non-tradeable): "
-                        f"bid({easier_ticker})={bid_e_d} < ask({harder_ticker})={ask_h_d} — "
-                        f"harder market ask is priced ABOVE easier market bid"
-                    )
-                    """
-                    
-
-            if not (ask_e and bid_h and ask_size_e and bid_size_h):
-                continue
+        Returns:
+            Opportunity dicts as returned by _collect_opportunities.
+        """
+        rung_ids, rung_ladder, rung_start = ladders
+        n = len(rung_ids)
+        if n == 0:
+            return []
+
+        hole = rung_ids < 0
+        ids = np.where(hole, 0, rung_ids)
+        quotes = snapshot.quotes
+        ask = quotes[ids, ASK]
+        bid = quotes[ids, BID]
+        with np.errstate(invalid="ignore"):
+            easier_ok = ~hole & (ask > 0) & (quotes[ids, ASK_SIZE] >= 1)
+            harder_ok = ~hole & (bid > 0) & (quotes[ids, BID_SIZE] >= 1)
+        asks = np.where(easier_ok, ask, np.inf)
+        bids = np.where(harder_ok, bid, -np.inf)
+
+        # Segmented running minimum of the ask ranks (exact, unlike shifting
+        # the float prices themselves)
+        order = np.argsort(asks)
+        rank = np.empty(n, dtype=np.int64)
+        rank[order] = np.arange(n)
+        running = np.minimum.accumulate(rank - rung_ladder * n)
+
+        # Best ask strictly below each rung that has a rung below it
+        best_ask_below = np.full(n, np.inf)
+        inner = np.flatnonzero(rung_start != np.arange(n))
+        best_ask_below[inner] = asks[order[running[inner - 1] + rung_ladder[inner] * n]]
+
+        crossed = np.flatnonzero(bids > best_ask_below)
+        if len(crossed) == 0:
+            return []
+
+        # Expand only the crossed rungs over the rungs below them
+        lo = rung_start[crossed]
+        if self.max_pair_gap is not None:
+            lo = np.maximum(lo, crossed - self.max_pair_gap)
+        spans = crossed - lo
+        harder = np.repeat(crossed, spans)
+        easier = np.repeat(lo - (np.cumsum(spans) - spans), spans) + np.arange(int(spans.sum()))
+        hit = asks[easier] < bids[harder]
+        return self._score_pairs(rung_ids[easier[hit]], rung_ids[harder[hit]], snapshot)
+
+    def _scan(self, pairs: tuple, ladders: tuple, snapshot: TopOfBookSnapshot) -> list:
+        """Collect one market type's opportunities with the configured scanner."""
+        use_ladders = self.profit_threshold > 0 and (
+            self.scanner == "ladders"
+            or (self.scanner == "auto" and len(pairs[0]) > LADDER_SCAN_MIN_PAIRS_PER_RUNG * len(ladders[0]))
+        )
+        if use_ladders:
+            return self._collect_ladder_opportunities(ladders, snapshot)
+        return self._collect_opportunities(pairs, snapshot)
+
+    def _score_pairs(self, easier_ids: np.ndarray, harder_ids: np.ndarray, snapshot: TopOfBookSnapshot) -> list:
+        """
+        Score candidate pairs exactly with Decimal prices and fees and keep
+        the ones clearing profit_threshold. Both sides must already have a
+        positive price and at least one contract.
+        """
+        quotes = snapshot.quotes
+        ask_e = quotes[easier_ids, ASK]
+        ask_size_e = quotes[easier_ids, ASK_SIZE]
+        bid_h = quotes[harder_ids, BID]
+        bid_size_h = quotes[harder_ids, BID_SIZE]
 
-            ask_e_d = Decimal(str(ask_e))
-            bid_h_d = Decimal(str(bid_h))
+        opportunities = []
+        for i in range(len(easier_ids)):
+            ask_e_d = Decimal(str(ask_e[i]))
+            bid_h_d = Decimal(str(bid_h[i]))
             no_ask_h = Decimal("1") - bid_h_d
             cost_per_share = ask_e_d + no_ask_h
 
             if cost_per_share <= 0:
                 continue
 
-            raw_size = int(min(float(ask_size_e), float(bid_size_h)))
+            raw_size = int(min(ask_size_e[i], bid_size_h[i]))
             if raw_size <= 0:
                 continue
 
@@ -358,59 +616,55 @@ class IntraKalshiSpreadTotalArbitrage:
             fees = (get_taker_fees_kalshi(ask_e_d, raw_size)
                     + get_taker_fees_kalshi(no_ask_h, raw_size))
             total_cost = cost_per_share * raw_size + fees
-            """
-            self.logger.info(
-                f"Evaluated pair {easier_ticker} (ask {ask_e_d}, size {ask_size_e}) + "
-                f"{harder_ticker} (bid {bid_h_d}, size {bid_size_h}): "
-                f"cost/share={cost_per_share:.4f} total_cost={total_cost:.4f} "
-                f"fees={fees:.4f} raw_size={raw_size}"
-            )
-            """
             expected_profit = Decimal(raw_size) - total_cost
 
             if expected_profit >= self.profit_threshold:
+                easier_id = int(easier_ids[i])
+                harder_id = int(harder_ids[i])
                 opportunities.append({
-                    "easier_ticker": easier_ticker,
-                    "harder_ticker": harder_ticker,
+                    "easier_ticker": symbols.name_of(easier_id),
+                    "harder_ticker": symbols.name_of(harder_id),
+                    "easier_id": easier_id,
+                    "harder_id": harder_id,
                     "ask_e": ask_e_d,
                     "no_ask_h": no_ask_h,
                     "cost_per_share": cost_per_share,
                     "raw_size": raw_size,
                     "expected_profit": expected_profit,
+                    "capital_per_share": {"Kalshi": total_cost / raw_size},
+                    "strategy": STRATEGY_NAME,
                 })
 
         return opportunities
 
-    def _execute_opportunity(self, opp: dict) -> None:
+    def _execute_opportunity(self, allocation: Allocation) -> None:
         """
-        Execute a single arbitrage opportunity after applying balance constraints.
+        Execute a single funded arbitrage opportunity.
 
-        Re-computes the order size against the current cached_balance (which
-        may have been reduced by earlier executions this cycle), rechecks that
-        the profit threshold is still met at the adjusted size, then submits
-        both legs as fill-or-kill limit orders.
+        The CapitalAllocator has already reserved capital for
+        allocation.size shares (possibly fewer than raw_size if capital ran
+        short). Fees are recomputed at that size and the profit threshold is
+        rechecked before both legs are submitted; otherwise the reservation
+        is released.
 
-        The balance is decremented optimistically before order submission. If
-        either leg fails (e.g. market moved), the position manager will reflect
-        the discrepancy on the next position refresh cycle.
+        Both legs are fill-or-kill, so the reservation is committed once
+        they are sent. If either leg fails (e.g. market moved), the
+        allocator's periodic reconcile against the Kalshi balance and the
+        position manager's next refresh correct the discrepancy.
 
         Args:
-            opp: Opportunity dict as returned by _collect_opportunities.
+            allocation: Funded opportunity from CapitalAllocator.allocate.
         """
+        opp = allocation.opportunity
+        reservation = allocation.reservations["Kalshi"]
         easier_ticker = opp["easier_ticker"]
         harder_ticker = opp["harder_ticker"]
         ask_e_d = opp["ask_e"]
         no_ask_h = opp["no_ask_h"]
         cost_per_share = opp["cost_per_share"]
-        raw_size = opp["raw_size"]
-
-        # Apply current balance constraint — earlier trades this cycle may have
-        # reduced cached_balance below what raw_size requires.
-        order_size = self._adjusted_size(cost_per_share, raw_size)
-        if order_size <= 0:
-            return
+        order_size = allocation.size
 
-        # Recompute fees at the balance-adjusted size and recheck profitability.
+        # Recompute fees at the funded size and recheck profitability.
         # Fees are convex in size, so a smaller size improves the fee-per-share
         # ratio; this check is therefore conservative and may still pass.
         fees = (get_taker_fees_kalshi(ask_e_d, order_size)
@@ -418,6 +672,7 @@ class IntraKalshiSpreadTotalArbitrage:
         total_cost = cost_per_share * order_size + fees
 
         if total_cost > order_size - self.profit_threshold:
+            self.capital_allocator.release(reservation)
             return
 
         self.logger.info(
@@ -426,64 +681,180 @@ class IntraKalshiSpreadTotalArbitrage:
             f"size={order_size} cost={total_cost:.4f} "
             f"profit≥{(order_size - total_cost):.4f}"
         )
-        self.cached_balance -= total_cost
+        self.opportunity_tracker.mark_order_sent(opp["tracker_key"])
         #self._place_order(easier_ticker, "buy", "yes", ask_e_d, order_size)
         #self._place_order(harder_ticker, "buy", "no", no_ask_h, order_size)
+        self.capital_allocator.commit(reservation, total_cost)
 
     # ------------------------------------------------------------------ #
-    # Public entry point                                                   #
+    # Public entry points                                                  #
     # ------------------------------------------------------------------ #
 
-    def find_opportunities(self, kalshi_book_snapshots=None, polymarket_us_book_snapshots=None):
+    def collect_opportunities(self, kalshi_book_snapshots=None, polymarket_us_book_snapshots=None) -> list:
         """
-        Run a full scan across all spread and total market pairs, then execute
-        the most profitable arbitrage opportunities first.
+        Collect this cycle's opportunities across all spread and total market
+        pairs without executing them, for global ranking by the
+        CapitalAllocator (see main.run_strategy_cycle).
 
-        Execution steps:
-            1. Snapshot all Kalshi orderbooks (or use the provided dict).
-            2. Collect all valid opportunities from spread pairs and total pairs.
-               Each opportunity is scored at full unconstrained market liquidity
-               so that sorting reflects true market priority.
-            3. Sort all opportunities by expected_profit descending (primary)
-               and raw_size descending (tiebreaker) to ensure the highest total
-               dollar profit is captured when capital is limited.
-            4. Execute in priority order. Balance constraints are applied at
-               each execution step so that higher-value trades are funded first
-               and any remaining balance funds smaller opportunities.
+        Every opportunity is registered with the opportunity tracker, and
+        the ones that disappeared since the previous scan are resolved.
 
         Args:
-            kalshi_book_snapshots: Optional pre-built snapshot dict mapping
-                ticker -> (bid, bid_size, ask, ask_size). If None, snapshots
-                are taken from kalshi_client.orderbooks at call time.
+            kalshi_book_snapshots: Optional pre-built TopOfBookSnapshot from
+                kalshi_client.snapshot_all_books(). If None, one is taken at
+                call time.
             polymarket_us_book_snapshots: Unused; present to match the shared
                 strategy interface used by other strategy classes.
         """
         start = time.time()
         if kalshi_book_snapshots is None:
-            kalshi_book_snapshots = {
-                t: ob.snapshot_top()
-                for t, ob in self.kalshi_client.orderbooks.items()
-            }
-        
+            kalshi_book_snapshots = self.kalshi_client.snapshot_all_books()
+
         # Collect all valid opportunities across both spread and total markets.
-        all_opps = self._collect_opportunities(self._spread_pairs, kalshi_book_snapshots)
-        all_opps += self._collect_opportunities(self._total_pairs, kalshi_book_snapshots)
+        all_opps = self._scan(self._spread_pairs, self._spread_ladders, kalshi_book_snapshots)
+        all_opps += self._scan(self._total_pairs, self._total_ladders, kalshi_book_snapshots)
         end = time.time()
         print(f"Found {len(all_opps)} total opportunities across spread and total markets")
         print(f"Time taken to find opportunities: {end - start:.2f} seconds")
 
+        # Register every opportunity so lifetimes are tracked across cycles,
+        # then resolve the ones that disappeared since the previous scan.
+        for opp in all_opps:
+            opp["tracker_key"] = self.opportunity_tracker.observe(
+                STRATEGY_NAME,
+                (opp["easier_ticker"], opp["harder_ticker"]),
+                "buy_easier_yes_harder_no",
+                edge=opp["expected_profit"],
+                size=opp["raw_size"],
+                appeared_ns=self._appeared_ns(opp["easier_id"], opp["harder_id"]),
+            )
+        self.opportunity_tracker.end_cycle(STRATEGY_NAME)
+
+        return all_opps
+
+    def execute_allocation(self, allocation: Allocation) -> None:
+        """Execute one opportunity funded by CapitalAllocator.allocate."""
+        self._execute_opportunity(allocation)
+
+    def find_opportunities(self, kalshi_book_snapshots=None, polymarket_us_book_snapshots=None):
+        """
+        Run a full scan across all spread and total market pairs, then execute
+        the most profitable arbitrage opportunities first.
+
+        Execution steps:
+            1. Snapshot all Kalshi orderbooks (or use the provided snapshot).
+            2. Collect all valid opportunities from spread pairs and total pairs.
+               Each opportunity is scored at full unconstrained market liquidity
+               so that ranking reflects true market priority.
+            3. Let the CapitalAllocator rank them by expected_profit descending
+               (raw_size as tiebreaker) and reserve capital for each in that
+               order, so higher-value trades are funded first and any
+               remaining balance funds smaller opportunities.
+            4. Execute the funded opportunities in that order.
+
+        Args:
+            kalshi_book_snapshots: Optional pre-built TopOfBookSnapshot from
+                kalshi_client.snapshot_all_books(). If None, one is taken at
+                call time.
+            polymarket_us_book_snapshots: Unused; present to match the shared
+                strategy interface used by other strategy classes.
+        """
+        all_opps = self.collect_opportunities(kalshi_book_snapshots, polymarket_us_book_snapshots)
         if not all_opps:
             return
 
-        # Sort by total expected profit descending so the most valuable trade
-        # is executed first. Use raw_size as a tiebreaker to prefer more liquid
-        # opportunities when profits are equal.
-        all_opps.sort(key=lambda o: (o["expected_profit"], o["raw_size"]), reverse=True)
-
         self.logger.info(f"Found {len(all_opps)} opportunity(ies) this cycle; executing in profit order.")
 
-        for opp in all_opps:
-            if self.cached_balance <= 0:
-                self.logger.warning("Balance exhausted; skipping remaining opportunities this cycle.")
-                break
-            self._execute_opportunity(opp)
+        for allocation in self.capital_allocator.allocate(all_opps):
+            self._execute_opportunity(allocation)
+
+
+if __name__ == "__main__":
+    # Ladder scanner vs all-pairs scanner: identical opportunities on
+    # randomized ladders, then scan times on the statics universe and on
+    # deep synthetic ladders
+    from pair_graph import parse_suffix
+    from top_of_book import TopOfBookTable
+    from utils import read_file_data
+
+    class _OfflineFeed:
+        venue = "Kalshi"
+
+    rng = np.random.default_rng(0)
+
+    def quote_ladders(table, mapping, noise):
+        # Fair YES prices fall along each ladder; noisy quotes cross some pairs
+        for ticker in mapping:
+            parsed = parse_suffix(ticker)
+            fair = 0.9 * 0.85 ** (parsed[1] % 40) if parsed else 0.5
+            symbol_id = symbols.intern(ticker)
+            table.register(symbol_id)
+            if rng.random() < 0.05:
+                continue  # no quote
+            mid = min(max(fair + rng.normal(0, noise), 0.02), 0.98)
+            half = rng.choice([0.01, 0.02, 0.03])
+            table.update(symbol_id, round(mid - half, 2), float(rng.integers(0, 300)),
+                         round(mid + half, 2), float(rng.integers(0, 300)))
+
+    def synthetic_mapping(n_events, strikes, prefix):
+        mapping = {}
+        for e in range(n_events):
+            tickers = [f"KX{prefix}-{e}-{team}{k}" for team in ("AAA", "BBB") for k in range(1, strikes + 1)]
+            for t in tickers:
+                mapping[t] = [o for o in tickers if o != t]
+        return mapping
+
+    def opportunity_set(opportunities):
+        return sorted((o["easier_id"], o["harder_id"], o["raw_size"], o["expected_profit"]) for o in opportunities)
+
+    def time_scan(fn, *args, repeat=20):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            result = fn(*args)
+        return result, (time.perf_counter() - start) / repeat * 1000
+
+    # Randomized equivalence, with and without pruning and removed markets
+    for trial in range(30):
+        strikes = int(rng.integers(2, 25))
+        mapping = synthetic_mapping(int(rng.integers(1, 40)), strikes, f"EQ{trial}")
+        gap = None if trial % 3 else int(rng.integers(1, 4))
+        table = TopOfBookTable()
+        quote_ladders(table, mapping, noise=0.1)
+        strategy = IntraKalshiSpreadTotalArbitrage(_OfflineFeed(), None, None, mapping, {}, capital_allocator=CapitalAllocator(), max_pair_gap=gap)
+        if trial % 2:
+            strategy.on_markets_changed("Kalshi", [], list(rng.choice(list(mapping), size=len(mapping) // 5, replace=False)))
+        snapshot = table.snapshot()
+        pairs = strategy._collect_opportunities(strategy._spread_pairs, snapshot)
+        ladder = strategy._collect_ladder_opportunities(strategy._spread_ladders, snapshot)
+        assert opportunity_set(pairs) == opportunity_set(ladder), trial
+    print("30 randomized universes: ladder scan == all-pairs scan")
+
+    # Rare crossings, as in live books; both scans score the same pairs,
+    # so the difference is the detection cost
+    statics = read_file_data("statics/statics.json")
+    universes = {"statics spread+total": (statics.get("CORRELATED_SPREAD_MARKET_MAPPING", {}), statics.get("CORRELATED_TOTAL_MARKET_MAPPING", {}))}
+    for strikes in (4, 8, 16, 32):
+        universes[f"{4000 // strikes} events x 2 x {strikes} strikes"] = (synthetic_mapping(4000 // strikes, strikes, f"DEEP{strikes}"), {})
+
+    print(f"{'universe':<26} {'pairs':>7} {'rungs':>6} {'all-pairs':>10} {'ladders':>9} {'opps':>5} {'auto':>8}")
+    for name, (spread, total) in universes.items():
+        table = TopOfBookTable()
+        quote_ladders(table, {**spread, **total}, noise=0.01)
+        strategy = IntraKalshiSpreadTotalArbitrage(None, None, None, spread, total, capital_allocator=CapitalAllocator())
+        snapshot = table.snapshot()
+
+        def scan_pairs():
+            return (strategy._collect_opportunities(strategy._spread_pairs, snapshot)
+                    + strategy._collect_opportunities(strategy._total_pairs, snapshot))
+
+        def scan_ladders():
+            return (strategy._collect_ladder_opportunities(strategy._spread_ladders, snapshot)
+                    + strategy._collect_ladder_opportunities(strategy._total_ladders, snapshot))
+
+        by_pairs, pairs_ms = time_scan(scan_pairs)
+        by_ladders, ladders_ms = time_scan(scan_ladders)
+        assert opportunity_set(by_pairs) == opportunity_set(by_ladders)
+        n_pairs = len(strategy._spread_pairs[0]) + len(strategy._total_pairs[0])
+        n_rungs = int((strategy._spread_ladders[0] >= 0).sum() + (strategy._total_ladders[0] >= 0).sum())
+        auto = "ladders" if n_pairs > LADDER_SCAN_MIN_PAIRS_PER_RUNG * n_rungs else "pairs"
+        print(f"{name:<26} {n_pairs:>7} {n_rungs:>6} {pairs_ms:>8.2f}ms {ladders_ms:>7.2f}ms {len(by_pairs):>5} {auto:>8}")
@@ -5,13 +5,12 @@ import logging
 import time
 import websockets
 from collections import defaultdict
-from concurrent.futures import ThreadPoolExecutor
 from cryptography.hazmat.primitives import serialization, hashes
 from cryptography.hazmat.primitives.asymmetric import padding
 from decimal import Decimal
 from pathlib import Path
 
-from orderbook import OrderBook
+from feed_handler import FeedHandler
 from market_data import MarketData
 from utils import get_asset_ids
 
@@ -68,20 +67,16 @@ class OrderbookDeltaLogger:
         self.logger.info("------------------------------------------------")
         self.latest_delta.clear()
 
-class KalshiWebSocket:
+class KalshiWebSocket(FeedHandler):
+    venue = "Kalshi"
+
     def __init__(self, key_id, private_key_path, market_tickers, ws_url):
         self.key_id = key_id
         self.private_key_path = private_key_path
-        self.market_tickers = market_tickers
         self.ws_url = ws_url
         self.logger = logging.getLogger("kalshi_feed")
         self.subscribed = False
 
-        # OrderBooks
-        self.orderbooks: dict[str, OrderBook] = defaultdict(OrderBook)
-        for market_ticker in self.market_tickers:
-            self.orderbooks[market_ticker] = OrderBook(market_ticker)
-
         # Market Data
         self.market_data = MarketData(market="Kalshi")
 
@@ -92,14 +87,22 @@ class KalshiWebSocket:
         self.snapshot_loaded: set[str] = set()
         self.delta_buffer: dict[str, list[dict]] = defaultdict(list)
 
-        # Async message queue (from WebSocket to workers)
-        self.message_queue: asyncio.Queue[str] = asyncio.Queue()
-        
+        # Subscription ids per channel, needed to add/remove markets on a
+        # live subscription
+        self.sids: dict[str, int] = {}
+        self._command_id = 0
+
         # Async queue for processing fills (to avoid doing too much work in WebSocket thread)
         self.fill_queue: asyncio.Queue[dict] = asyncio.Queue()
+        self.loop: asyncio.AbstractEventLoop | None = None
+
+        # Books live in the shared registry; updates for a ticker are applied
+        # in order on one of NUM_CONSUMERS worker threads
+        super().__init__(market_tickers, apply_workers=NUM_CONSUMERS)
 
-        # Thread pool for CPU-bound work
-        self.executor = ThreadPoolExecutor(max_workers=NUM_CONSUMERS)
+    @property
+    def market_tickers(self):
+        return self.instruments
 
     def sign_pss_text(self, private_key, text: str) -> str:
         message = text.encode("utf-8")
@@ -125,6 +128,100 @@ class KalshiWebSocket:
             "KALSHI-ACCESS-TIMESTAMP": timestamp,
         }
 
+    #
+    # FeedHandler adapter
+    #
+
+    async def on_start(self):
+        self.loop = asyncio.get_running_loop()
+        await self.delta_logger.run()
+
+    async def connect_websocket(self):
+        with open(self.private_key_path, "rb") as f:
+            private_key = serialization.load_pem_private_key(
+                f.read(),
+                password=None,
+            )
+
+        ws_headers = self.create_headers(
+            private_key, "GET", "/trade-api/ws/v2"
+        )
+
+        return await websockets.connect(
+            self.ws_url,
+            additional_headers=ws_headers,
+            ping_interval=30,
+            ping_timeout=60,
+            close_timeout=10,
+            open_timeout=10,
+            max_queue=None,
+        )
+
+    def free_books(self, market_ticker):
+        super().free_books(market_ticker)
+        # A re-added ticker must wait for a fresh snapshot again
+        self.snapshot_loaded.discard(market_ticker)
+        self.delta_buffer.pop(market_ticker, None)
+
+    def on_connect(self):
+        # Subscription ids do not survive a reconnect
+        self.sids.clear()
+
+    def _next_command_id(self):
+        self._command_id += 1
+        return self._command_id
+
+    def subscribe_payloads(self, instruments):
+        if "orderbook_delta" in self.sids:
+            return [json.dumps({
+                "id": self._next_command_id(),
+                "cmd": "update_subscription",
+                "params": {
+                    "sids": [self.sids["orderbook_delta"]],
+                    "market_tickers": instruments,
+                    "action": "add_markets",
+                },
+            })]
+        self.logger.info(f"Subscribing to orderbook for {len(instruments)} markets")
+        return [json.dumps({
+            "id": self._next_command_id(),
+            "cmd": "subscribe",
+            "params": {
+                "channels": ["orderbook_delta", "fill"],
+                "market_tickers": instruments,
+            },
+        })]
+
+    def unsubscribe_payloads(self, instruments):
+        if "orderbook_delta" not in self.sids:
+            return []
+        return [json.dumps({
+            "id": self._next_command_id(),
+            "cmd": "update_subscription",
+            "params": {
+                "sids": [self.sids["orderbook_delta"]],
+                "market_tickers": instruments,
+                "action": "delete_markets",
+            },
+        })]
+
+    def decode(self, raw):
+        return [json.loads(raw)]
+
+    def shard_key(self, data):
+        msg_content = data.get("msg")
+        return msg_content.get("market_ticker") if isinstance(msg_content, dict) else None
+
+    def apply(self, data):
+        self._process_message(data)
+
+    async def orderbook_websocket(self):
+        await self.run()
+
+    #
+    # Message handlers
+    #
+
     def get_top_of_book(self, market_ticker):
         orderbook = self.orderbooks.get(market_ticker, None)
         if not orderbook:
@@ -204,22 +301,23 @@ class KalshiWebSocket:
     def handle_user_fill(self, msg):
         client_order_id = msg.get("client_order_id", "")
         if client_order_id.startswith("WBRSSS"):
-            # This is a fill for one of our orders for wide spread strategy
-            try:
-                self.fill_queue.put_nowait(msg)
-            except asyncio.QueueFull:
-                # TODO: If the queue is full, we need to cancel the associated order to avoid being exposed to adverse selection and send mass cancel for wide spread strategy orders.
-                pass
+            # This is a fill for one of our orders for wide spread strategy.
+            # Fills are applied on a worker thread; hand them to the event
+            # loop, stamped so the strategy can measure fill-to-hedge latency
+            msg["received_ns"] = time.time_ns()
+            self.loop.call_soon_threadsafe(self.fill_queue.put_nowait, msg)
         
 
-    def _process_single_message(self, message: str):
-        data = json.loads(message)
+    def _process_message(self, data: dict):
         msg_type = data.get("type")
         
         msg_content = data["msg"]
         
         if msg_type == "subscribed":
             self.logger.info(f"Subscribed: {data}")
+            channel = msg_content.get("channel")
+            if channel is not None and "sid" in msg_content:
+                self.sids[channel] = msg_content["sid"]
             self.subscribed = True
 
         elif msg_type == "orderbook_snapshot":
@@ -263,92 +361,6 @@ class KalshiWebSocket:
         elif msg_type == "error":
             self.logger.error(f"Error: {data}")
 
-    async def _consumer_loop(self):
-        loop = asyncio.get_running_loop()
-        while True:
-            message = await self.message_queue.get()
-            #print(self.message_queue.qsize())
-            # Offload CPU-heavy work to thread pool
-            await loop.run_in_executor(self.executor, self._process_single_message, message)
-
-    async def orderbook_websocket(self):
-        asyncio.create_task(self.delta_logger.run())
-        for _ in range(NUM_CONSUMERS):
-            asyncio.create_task(self._consumer_loop())
-
-        while True:
-            try:
-                with open(self.private_key_path, "rb") as f:
-                    private_key = serialization.load_pem_private_key(
-                        f.read(),
-                        password=None,
-                    )
-
-                ws_headers = self.create_headers(
-                    private_key, "GET", "/trade-api/ws/v2"
-                )
-
-                async with websockets.connect(
-                    self.ws_url,
-                    additional_headers=ws_headers,
-                    ping_interval=30,
-                    ping_timeout=60,
-                    close_timeout=10,
-                    open_timeout=10,
-                    max_queue=None,
-                ) as websocket:
-                    self.logger.info(
-                        f"Connected! Subscribing to orderbook for {', '.join(self.market_tickers)}"
-                    )
-
-                    subscribe_msg = {
-                        "id": 1,
-                        "cmd": "subscribe",
-                        "params": {
-                            "channels": ["orderbook_delta", "fill"],
-                            "market_tickers": self.market_tickers,
-                        },
-                    }
-
-                    await websocket.send(json.dumps(subscribe_msg))
-
-                    async for message in websocket:
-                        await self.message_queue.put(message)
-
-            except websockets.exceptions.ConnectionClosedError as e:
-                self.logger.error(f"WebSocket connection closed: {e}")
-                self.logger.info("Reconnecting in 5 seconds...")
-                await asyncio.sleep(5)
-            except websockets.exceptions.ConnectionClosedOK:
-                self.logger.info("WebSocket connection closed normally")
-                break
-            except Exception as e:
-                self.logger.error(f"WebSocket error: {e}")
-                print(f"WebSocket error: {e}")
-                self.logger.info("Reconnecting in 5 seconds...")
-                await asyncio.sleep(5)
-
-    def snapshot_all_books(self):
-        return {ticker: ob.snapshot_top() for ticker, ob in self.orderbooks.items()}
-
-    def get_best_bid(self, market_ticker):
-        orderbook = self.orderbooks.get(market_ticker, None)
-        if not orderbook:
-            self.logger.warning(
-                f"Order Book with market ticker {market_ticker} not found on get_best_bid"
-            )
-            return None, None
-        return orderbook.get_best_bid()
-
-    def get_best_ask(self, market_ticker):
-        orderbook = self.orderbooks.get(market_ticker, None)
-        if not orderbook:
-            self.logger.warning(
-                f"Order Book with market ticker {market_ticker} not found on get_best_ask"
-            )
-            return None, None
-        return orderbook.get_best_ask()
-
 
 if __name__ == "__main__":
     from setup_loggers import setup_logging
@@ -182,6 +182,17 @@ class KalshiHTTPGateway:
         self.logger.info(f"Cancelling order {order_id}")
         return self._request("DELETE", f"/portfolio/orders/{order_id}")
 
+    def amend_order(self, order_id: str, amend_data: dict) -> dict:
+        """
+        Amend the price and/or count of an open order in place.
+
+        amend_data holds ticker, side, action, client_order_id,
+        updated_client_order_id, yes_price or no_price (in cents) and count.
+        Returns the old and amended orders.
+        """
+        self.logger.info(f"Amending order {order_id} with data: {amend_data}")
+        return self._request("POST", f"/portfolio/orders/{order_id}/amend", json_body=amend_data)
+
     def batch_cancel_orders(self, orders: dict) -> dict:
         """Batch cancel open orders"""
         self.logger.info(f"Batch cancelling orders")
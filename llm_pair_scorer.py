@@ -0,0 +1,284 @@
+"""
+Cached, batched, concurrent LLM scoring of cross-exchange market pairs.
+
+PairScorer.score_pairs() answers every pair it can from ScoreCache, an
+append-only on-disk cache keyed by a hash of the normalized titles, the
+model, the prompt kind (SINGLE or BATCH) and PROMPT_VERSION, so a re-run
+of the mapping only pays for pairs it has never scored. The remaining pairs are sent batch_size per request from
+a worker pool; every request first takes a slot from the shared
+RateLimiter, so adding workers never exceeds the provider's request rate.
+
+The backend is any object with
+    model                       (str) part of the cache key
+    score(pairs, kind) -> [float]
+                                one score in [0, 1] per (kalshi_title,
+                                poly_title) using the SINGLE or BATCH
+                                prompt, raising on failure
+GroqBackend talks to Groq; StubBackend is a deterministic local stand-in
+for tests and dry runs.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from event_matching import cheap_similarity, normalize
+
+MODEL = "llama-3.3-70b-versatile"
+# Bump whenever a prompt below changes: cached scores are keyed on it
+PROMPT_VERSION = "1"
+CACHE_PATH = "statics/.cache/llm_pair_scores.jsonl"
+
+REQUESTS_PER_MINUTE = 30
+BATCH_SIZE = 20
+WORKERS = 4
+MAX_RETRIES = 3
+
+SYSTEM_PROMPT = "You are a precise market-matching assistant."
+
+# Prompt kinds: one pair per request (PREFIX_PROMPT) or a numbered batch
+# (BATCH_PROMPT). The two can score the same pair differently, so the kind
+# is part of the cache key
+SINGLE = "single"
+BATCH = "batch"
+
+PREFIX_PROMPT = """
+You are matching prediction markets across two exchanges.
+Do these two markets represent the SAME underlying real-world event?
+Respond ONLY with a number between 0 and 1.
+"""
+
+BATCH_PROMPT = """
+You are matching prediction markets across two exchanges.
+For each numbered pair below, do the two markets represent the SAME underlying real-world event?
+Respond ONLY with a JSON array of numbers between 0 and 1, one per pair, in order.
+"""
+
+
+def pair_key(k_title: str, p_title: str, model: str, kind: str, prompt_version: str = PROMPT_VERSION) -> str:
+    """Content address of one scored pair."""
+    payload = json.dumps([normalize(k_title), normalize(p_title), model, kind, prompt_version])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class RateLimiter:
+    """Spaces requests at least 60 / max_requests_per_minute seconds apart, across threads."""
+
+    def __init__(self, max_requests_per_minute):
+        self.interval = 60.0 / max_requests_per_minute
+        self.next_slot = 0.0
+        self.lock = threading.Lock()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class ScoreCache:
+    """
+    Append-only JSONL cache of pair scores, loaded once into a dict.
+
+    Each line is {"key": pair_key, "score": float}; later lines win. Writes
+    are appended and flushed immediately, so an interrupted run keeps every
+    score it paid for.
+    """
+
+    def __init__(self, path: str | None = CACHE_PATH):
+        self.path = path
+        self.scores: dict[str, float] = {}
+        self.lock = threading.Lock()
+        if path is not None and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # torn last line from an interrupted run
+                    self.scores[entry["key"]] = entry["score"]
+
+    def __len__(self):
+        return len(self.scores)
+
+    def get(self, key: str) -> float | None:
+        return self.scores.get(key)
+
+    def put_many(self, entries: dict[str, float]):
+        with self.lock:
+            self.scores.update(entries)
+            if self.path is None:
+                return
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                for key, score in entries.items():
+                    f.write(json.dumps({"key": key, "score": score}) + "\n")
+
+
+def parse_score(content: str) -> float:
+    return float(content.strip().strip('```\n').strip('\n```').strip())
+
+
+def parse_scores(content: str, n: int) -> list[float]:
+    """The JSON array of a batch response; raises ValueError if it is not n numbers."""
+    match = re.search(r"\[.*\]", content, re.DOTALL)
+    if match is None:
+        raise ValueError(f"no JSON array in response: {content[:200]!r}")
+    scores = [float(score) for score in json.loads(match.group(0))]
+    if len(scores) != n:
+        raise ValueError(f"expected {n} scores, got {len(scores)}")
+    return scores
+
+
+class GroqBackend:
+    """Scores pairs with a Groq chat model, one pair or a numbered batch per request."""
+
+    def __init__(self, client, model: str = MODEL):
+        self.client = client
+        self.model = model
+
+    def _complete(self, prompt: str) -> str:
+        resp = self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt},
+            ],
+            temperature=0.0
+        )
+        return resp.choices[0].message.content
+
+    def score(self, pairs: list[tuple[str, str]], kind: str = BATCH) -> list[float]:
+        if kind == SINGLE:
+            return [self._score_one(k_title, p_title) for k_title, p_title in pairs]
+
+        lines = [
+            f'{i}. Market A: "{k_title}" | Market B: "{p_title}"'
+            for i, (k_title, p_title) in enumerate(pairs, start=1)
+        ]
+        return parse_scores(self._complete(BATCH_PROMPT + "\n".join(lines)), len(pairs))
+
+    def _score_one(self, k_title: str, p_title: str) -> float:
+        prompt = f"""
+    Market A: "{k_title}"
+    Market B: "{p_title}"
+    """
+        return parse_score(self._complete(PREFIX_PROMPT + prompt))
+
+
+class StubBackend:
+    """
+    Deterministic local backend: the score is the SequenceMatcher ratio of
+    the normalized titles. latency_s simulates the round trip; calls and
+    pairs count the work done.
+    """
+
+    model = "stub"
+
+    def __init__(self, latency_s: float = 0.0):
+        self.latency_s = latency_s
+        self.calls = 0
+        self.pairs = 0
+        self.lock = threading.Lock()
+
+    def score(self, pairs: list[tuple[str, str]], kind: str = BATCH) -> list[float]:
+        with self.lock:
+            self.calls += 1
+            self.pairs += len(pairs)
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        return [round(cheap_similarity(normalize(k), normalize(p)), 4) for k, p in pairs]
+
+
+class PairScorer:
+    """
+    Cache-first batched scoring through a rate-limited worker pool.
+
+    batch_size 1 sends every pair with the SINGLE prompt; anything larger
+    sends every batch, even a lone leftover pair, with the BATCH prompt, so
+    a pair's cache key is known before it is batched.
+    """
+
+    def __init__(self, backend, cache: ScoreCache | None = None, rate_limiter: RateLimiter | None = None, batch_size: int = BATCH_SIZE, workers: int = WORKERS, max_retries: int = MAX_RETRIES):
+        self.backend = backend
+        self.cache = cache if cache is not None else ScoreCache()
+        self.rate_limiter = rate_limiter or RateLimiter(REQUESTS_PER_MINUTE)
+        self.batch_size = batch_size
+        self.workers = workers
+        self.max_retries = max_retries
+        self.kind = SINGLE if batch_size == 1 else BATCH
+        self.hits = 0
+        self.misses = 0
+
+    def score_pairs(self, pairs: list[tuple[str, str]]) -> list[float]:
+        """Score each (kalshi_title, poly_title); pairs that fail every retry score 0.0."""
+        keys = [pair_key(k_title, p_title, self.backend.model, self.kind) for k_title, p_title in pairs]
+
+        missing: dict[str, tuple[str, str]] = {}
+        for key, pair in zip(keys, pairs):
+            if self.cache.get(key) is None and key not in missing:
+                missing[key] = pair
+        self.hits += len(pairs) - len(missing)
+        self.misses += len(missing)
+
+        batches = [list(missing.items())[i:i + self.batch_size] for i in range(0, len(missing), self.batch_size)]
+        if batches:
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(batches))) as pool:
+                for scored in pool.map(self._score_batch, batches):
+                    self.cache.put_many(scored)
+
+        return [self.cache.get(key) or 0.0 for key in keys]
+
+    def score_pair(self, k_title: str, p_title: str) -> float:
+        return self.score_pairs([(k_title, p_title)])[0]
+
+    def _score_batch(self, batch: list[tuple[str, tuple[str, str]]]) -> dict[str, float]:
+        keys = [key for key, _ in batch]
+        pairs = [pair for _, pair in batch]
+        for attempt in range(self.max_retries):
+            # Rate limit BEFORE request
+            self.rate_limiter.wait()
+            try:
+                return dict(zip(keys, self.backend.score(pairs, self.kind)))
+            except Exception as e:
+                if attempt < self.max_retries - 1:
+                    wait_time = 2 ** attempt
+                    print(f"Scoring {len(pairs)} pairs failed: {e}. Retrying in {wait_time}s...")
+                    time.sleep(wait_time)
+                else:
+                    print(f"Max retries reached for {len(pairs)} pairs; they are not cached")
+        return {}
+
+
+if __name__ == "__main__":
+    # Example: cold vs warm scoring of the statics candidate pairs with the stub backend
+    import tempfile
+
+    from event_matching import EventIndex, build_events
+    from utils import read_file_data
+
+    kalshi = build_events(read_file_data("statics/kalshi_event_to_market_mapping.json"), "Sports")
+    poly = build_events(read_file_data("statics/polymarket_us_event_to_market_mapping.json"), "sports")
+    index = EventIndex(poly, match_dates=False)
+    pairs = [(k["title"], poly[j]["title"]) for k in kalshi for _, j in index.candidates(k, 3)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "scores.jsonl")
+        for run in ("cold", "warm"):
+            backend = StubBackend(latency_s=0.05)
+            scorer = PairScorer(backend, ScoreCache(path), RateLimiter(6000), batch_size=BATCH_SIZE, workers=WORKERS)
+            start = time.perf_counter()
+            scores = scorer.score_pairs(pairs)
+            elapsed = time.perf_counter() - start
+            print(f"{run}: {len(pairs)} pairs in {elapsed:.2f}s, {backend.calls} requests, "
+                  f"{scorer.hits} cache hits, {scorer.misses} misses, {sum(s >= 0.95 for s in scores)} >= 0.95")
+
+        # Unbatched, sequential equivalent of the cold run
+        print(f"unbatched sequential: {len(set(pairs))} requests, ~{len(set(pairs)) * 0.05:.1f}s at the same latency, "
+              f"~{len(set(pairs)) / REQUESTS_PER_MINUTE:.0f} min at {REQUESTS_PER_MINUTE} req/min "
+              f"vs ~{len(set(pairs)) / BATCH_SIZE / REQUESTS_PER_MINUTE:.1f} min batched")
@@ -11,11 +11,15 @@ from decimal import Decimal
 
 # Position Manager
 from position_manager import PositionManager
+from opportunity_tracker import OpportunityTracker
+from capital_allocator import CapitalAllocator
+from pre_trade_risk import PreTradeRisk, RiskCheckedKalshiGateway, RiskCheckedPolymarketUSGateway
 
 # Strategy modules
 from intra_kalshi_arbitrage import IntraKalshiArbitrage
 from intra_kalshi_spread_total_arbitrage import IntraKalshiSpreadTotalArbitrage
 from cross_exchange_arbitrage import CrossExchangeArbitrage
+from cross_exchange_spread_total_arbitrage import CrossExchangeSpreadTotalArbitrage
 from wide_spread_arbitrage import WideSpreadArbitrage
 
 # Market data modules
@@ -26,10 +30,17 @@ from kalshi_feed import KalshiWebSocket
 from polymarket_us_http_gateway import PolymarketUSHTTPGateway
 from kalshi_http_gateway import KalshiHTTPGateway, load_private_key
 
+from pair_graph import load_pair_graph
 from setup_loggers import setup_logging, stop_logging
-from utils import get_asset_ids, get_maker_fees_kalshi, get_taker_fees_kalshi
+from statics_loader import invalidate, load_statics
+from statics_refresh import StaticsWatcher
+from update_kalshi_tickers_with_moneyline_events import MARKET_TYPE_CONFIG, PAIR_GRAPH_MAX_GAP
+from utils import get_asset_ids, get_maker_fees_kalshi, get_taker_fees_kalshi, read_file_data
 from collections import defaultdict
 
+# Used to report process start-to-subscribed time
+PROCESS_START = time.perf_counter()
+
 # WebSocket endpoint for Polymarket CLOB service
 WS_URL_BASE = "wss://ws-subscriptions-clob.polymarket.com"
 
@@ -65,12 +76,24 @@ POLYMARKET_US_PRIVATE_KEY_FILE_PATH = "polymarket.key"
 POLYMARKET_US_BASE_URL = "https://api.polymarket.us"
 POLYMARKET_US_WS_URL_BASE = "wss://api.polymarket.us"
 
+# Log the opportunity lifetime vs latency report every N scan cycles
+OPPORTUNITY_REPORT_EVERY = 60
+
+# Pre-trade risk limits (contracts, dollars)
+MAX_POSITION_PER_TICKER = 500
+MAX_POSITION_PER_EVENT = 1000
+MAX_ORDER_SIZE = 250
+MAX_OPEN_ORDERS_PER_VENUE = 200
+MAX_NOTIONAL_PER_VENUE = Decimal("1000")
+MAX_PRICE_DEVIATION = Decimal("0.10")
+
 def get_static_mapping(filename: str, static_name: str):
-    with open(filename, 'r') as f:
-        statics = json.load(f)
-    return statics[static_name]
+    return load_statics(filename).get_mapping(static_name)
 
-def intra_kalshi_arbitrage(kalshi_client, kalshi_gateway, position_manager, correlated_market_mapping, profit_threshold=0.01):
+def intra_kalshi_arbitrage(kalshi_client, kalshi_gateway, position_manager, correlated_market_mapping, profit_threshold=0.01, opportunity_tracker=None, capital_allocator=None):
+    # N-outcome events, grouped over whichever of their markets the feed carries
+    with open("statics/mutually_exclusive_events.json", "r") as f:
+        mutually_exclusive_events = json.load(f)
 
     # Create object
     intra_kalshi_arb_strategy = IntraKalshiArbitrage(
@@ -78,12 +101,15 @@ def intra_kalshi_arbitrage(kalshi_client, kalshi_gateway, position_manager, corr
         kalshi_gateway,
         position_manager,
         correlated_market_mapping,
-        profit_threshold
+        profit_threshold,
+        opportunity_tracker,
+        capital_allocator,
+        mutually_exclusive_events,
     )
     
     return intra_kalshi_arb_strategy
 
-def crossed_markets(polymarket_client, kalshi_client, kalshi_gateway, polymarket_us_gateway, position_manager, polymarket_kalshi_mapping):
+def crossed_markets(polymarket_client, kalshi_client, kalshi_gateway, polymarket_us_gateway, position_manager, polymarket_kalshi_mapping, capital_allocator=None):
 
     cross_exchange_arb_strategy = CrossExchangeArbitrage(
         polymarket_client,
@@ -92,13 +118,38 @@ def crossed_markets(polymarket_client, kalshi_client, kalshi_gateway, polymarket
         kalshi_gateway,
         position_manager,
         polymarket_kalshi_mapping,
-        min_edge=0.01
+        min_edge=0.01,
+        capital_allocator=capital_allocator
     )
 
     return cross_exchange_arb_strategy
 
+def polymarket_us_ladder_mappings():
+    # Polymarket US spread/total games, as written by get_slugs_polymarket_us.py
+    return tuple(
+        read_file_data(f"statics/polymarket_us_{label}_event_to_market_mapping.json")
+        for label in ("spread", "total")
+    )
 
-def wide_spreads(polymarket_client, kalshi_client, polymarket_us_gateway, kalshi_gateway, position_manager, spread_threshold=Decimal("0.05"), min_edge=Decimal("0.01")):
+def crossed_spread_total_markets(polymarket_client, kalshi_client, kalshi_gateway, polymarket_us_gateway, position_manager, polymarket_kalshi_mapping, capital_allocator=None):
+    # Kalshi and Polymarket US ladders of the same game, linked through the
+    # cross-exchange moneyline rows
+    return CrossExchangeSpreadTotalArbitrage(
+        polymarket_client,
+        kalshi_client,
+        polymarket_us_gateway,
+        kalshi_gateway,
+        position_manager,
+        polymarket_kalshi_mapping,
+        get_static_mapping("statics/statics.json", "CORRELATED_SPREAD_MARKET_MAPPING"),
+        get_static_mapping("statics/statics.json", "CORRELATED_TOTAL_MARKET_MAPPING"),
+        *polymarket_us_ladder_mappings(),
+        min_edge=0.01,
+        capital_allocator=capital_allocator,
+    )
+
+
+def wide_spreads(polymarket_client, kalshi_client, polymarket_us_gateway, kalshi_gateway, position_manager, spread_threshold=Decimal("0.05"), min_edge=Decimal("0.01"), capital_allocator=None):
     wide_spread_arb_strategy = WideSpreadArbitrage(
         polymarket_client,
         kalshi_client,
@@ -106,11 +157,24 @@ def wide_spreads(polymarket_client, kalshi_client, polymarket_us_gateway, kalshi
         kalshi_gateway,
         position_manager,
         spread_threshold=spread_threshold,
-        min_edge=min_edge
+        min_edge=min_edge,
+        capital_allocator=capital_allocator
     )
     return wide_spread_arb_strategy
 
-def intra_kalshi_spread_total(kalshi_client, kalshi_gateway, position_manager, profit_threshold=0.01):
+def load_pair_graphs():
+    # Precompiled spread/total pairs; a missing or unreadable graph just
+    # means the strategy builds those pairs from the mappings
+    graphs = {}
+    for label in ("spread", "total"):
+        path = MARKET_TYPE_CONFIG[label]["pair_graph_path"]
+        try:
+            graphs[label] = load_pair_graph(path)
+        except (OSError, ValueError) as e:
+            print(f"Pair graph {path} not loaded: {e}")
+    return graphs
+
+def intra_kalshi_spread_total(kalshi_client, kalshi_gateway, position_manager, profit_threshold=0.01, opportunity_tracker=None, capital_allocator=None):
     spread_mapping = get_static_mapping("statics/statics.json", "CORRELATED_SPREAD_MARKET_MAPPING")
     total_mapping = get_static_mapping("statics/statics.json", "CORRELATED_TOTAL_MARKET_MAPPING")
     return IntraKalshiSpreadTotalArbitrage(
@@ -120,67 +184,168 @@ def intra_kalshi_spread_total(kalshi_client, kalshi_gateway, position_manager, p
         spread_mapping,
         total_mapping,
         profit_threshold,
+        opportunity_tracker,
+        capital_allocator,
+        pair_graphs=load_pair_graphs(),
+        max_pair_gap=PAIR_GRAPH_MAX_GAP,
     )
 
-async def scan_inefficiencies(polymarket_client, kalshi_client, kalshi_gateway, polymarket_us_gateway):
+def follow_market_changes(strategies, kalshi_client, polymarket_client, statics_watcher):
+    # Strategies drop pairs on markets the feeds remove, and pick up the
+    # refreshed mappings after the watcher reloads the statics
+    for strategy in strategies:
+        if hasattr(strategy, "on_markets_changed"):
+            kalshi_client.add_market_listener(strategy.on_markets_changed)
+            polymarket_client.add_market_listener(strategy.on_markets_changed)
+
+        if isinstance(strategy, IntraKalshiSpreadTotalArbitrage):
+            def reload_spread_total(statics, changes, strategy=strategy):
+                strategy.update_mappings(
+                    statics.get_mapping("CORRELATED_SPREAD_MARKET_MAPPING"),
+                    statics.get_mapping("CORRELATED_TOTAL_MARKET_MAPPING"),
+                    load_pair_graphs(),
+                )
+            statics_watcher.on_reload.append(reload_spread_total)
+        elif isinstance(strategy, CrossExchangeSpreadTotalArbitrage):
+            def reload_cross_spread_total(statics, changes, strategy=strategy):
+                invalidate("statics/cross_exchange_statics.json")
+                mapping = get_static_mapping("statics/cross_exchange_statics.json", "POLYMARKET_KALSHI_MAPPING")
+                strategy.update_mappings(
+                    mapping["Moneyline_Events"],
+                    statics.get_mapping("CORRELATED_SPREAD_MARKET_MAPPING"),
+                    statics.get_mapping("CORRELATED_TOTAL_MARKET_MAPPING"),
+                    *polymarket_us_ladder_mappings(),
+                )
+            statics_watcher.on_reload.append(reload_cross_spread_total)
+        elif isinstance(strategy, CrossExchangeArbitrage):
+            def reload_cross_exchange(statics, changes, strategy=strategy):
+                invalidate("statics/cross_exchange_statics.json")
+                mapping = get_static_mapping("statics/cross_exchange_statics.json", "POLYMARKET_KALSHI_MAPPING")
+                strategy.update_mapping(mapping["Moneyline_Events"])
+            statics_watcher.on_reload.append(reload_cross_exchange)
+
+def run_strategy_cycle(strategies, capital_allocator, kalshi_book_snapshots, polymarket_us_book_snapshots):
+    # Global ranking: pool every strategy's opportunities so the most
+    # profitable ones get funded first, whichever strategy found them
+    opportunities = []
+    owners = {}
+    for strategy in strategies:
+        if not hasattr(strategy, "collect_opportunities"):
+            strategy.find_opportunities(kalshi_book_snapshots, polymarket_us_book_snapshots)
+            continue
+        for opp in strategy.collect_opportunities(kalshi_book_snapshots, polymarket_us_book_snapshots):
+            owners[id(opp)] = strategy
+            opportunities.append(opp)
+
+    for allocation in capital_allocator.allocate(opportunities):
+        owners[id(allocation.opportunity)].execute_allocation(allocation)
+
+async def scan_inefficiencies(polymarket_client, kalshi_client, kalshi_gateway, polymarket_us_gateway, statics_watcher):
     # Wait until feeds are subscribed
     while not kalshi_client.subscribed:
-        await asyncio.sleep(2)
+        await asyncio.sleep(0.1)
+    print(f"Start to subscribed: {time.perf_counter() - PROCESS_START:.3f} seconds")
 
     # Load positions
     positions = kalshi_gateway.get_positions()
     position_manager = PositionManager(positions)
 
+    # Every order from every strategy goes through the same pre-trade checks
+    risk = PreTradeRisk(
+        max_position=MAX_POSITION_PER_TICKER,
+        max_event_position=MAX_POSITION_PER_EVENT,
+        max_order_size=MAX_ORDER_SIZE,
+        max_price_deviation=MAX_PRICE_DEVIATION,
+    )
+    risk.add_venue("Kalshi", MAX_NOTIONAL_PER_VENUE, MAX_OPEN_ORDERS_PER_VENUE, reference=kalshi_client.top_table)
+    risk.add_venue("Polymarket_US", MAX_NOTIONAL_PER_VENUE, MAX_OPEN_ORDERS_PER_VENUE, reference=polymarket_client.top_table)
+    risk.register("Kalshi", kalshi_client.instruments)
+    risk.register("Polymarket_US", polymarket_client.instruments)
+    risk.load_positions("Kalshi", positions)
+    kalshi_client.add_market_listener(risk.on_markets_changed)
+    polymarket_client.add_market_listener(risk.on_markets_changed)
+    kalshi_gateway = RiskCheckedKalshiGateway(kalshi_gateway, risk)
+    polymarket_us_gateway = RiskCheckedPolymarketUSGateway(polymarket_us_gateway, risk)
+
+    # Shared registry of opportunity lifecycles across all strategies
+    opportunity_tracker = OpportunityTracker()
+
+    # Per-venue capital shared by all strategies, reconciled in the background
+    capital_allocator = CapitalAllocator.from_gateways(kalshi_gateway=kalshi_gateway, polymarket_us_gateway=polymarket_us_gateway)
+    reconcile_task = asyncio.create_task(capital_allocator.run())
+
     # Create strategy objects
     strategies = []
     # Intra Kalshi moneyline
     #correlated_market_mapping = get_static_mapping("statics/statics.json", "CORRELATED_MARKET_MAPPING")
-    #strategies.append(intra_kalshi_arbitrage(kalshi_client, kalshi_gateway, position_manager, correlated_market_mapping, profit_threshold=0.01))
+    #strategies.append(intra_kalshi_arbitrage(kalshi_client, kalshi_gateway, position_manager, correlated_market_mapping, profit_threshold=0.01, opportunity_tracker=opportunity_tracker, capital_allocator=capital_allocator))
     # Cross exchange
     #polymarket_kalshi_mapping = get_static_mapping("statics/cross_exchange_statics.json", "POLYMARKET_KALSHI_MAPPING")
-    #strategies.append(crossed_markets(polymarket_client, kalshi_client, kalshi_gateway, polymarket_us_gateway, position_manager, polymarket_kalshi_mapping["Moneyline_Events"]))
+    #strategies.append(crossed_markets(polymarket_client, kalshi_client, kalshi_gateway, polymarket_us_gateway, position_manager, polymarket_kalshi_mapping["Moneyline_Events"], capital_allocator))
+    # Cross exchange spread/total ladders
+    #strategies.append(crossed_spread_total_markets(polymarket_client, kalshi_client, kalshi_gateway, polymarket_us_gateway, position_manager, polymarket_kalshi_mapping["Moneyline_Events"], capital_allocator))
     # Wide spreads
-    #wide_spread_strategy = wide_spreads(polymarket_client, kalshi_client, polymarket_us_gateway, kalshi_gateway, position_manager, spread_threshold=Decimal("0.05"), min_edge=Decimal("0.01"))
+    #wide_spread_strategy = wide_spreads(polymarket_client, kalshi_client, polymarket_us_gateway, kalshi_gateway, position_manager, spread_threshold=Decimal("0.05"), min_edge=Decimal("0.01"), capital_allocator=capital_allocator)
     #strategies.append(wide_spread_strategy)
     # Intra Kalshi spread/total
-    strategies.append(intra_kalshi_spread_total(kalshi_client, kalshi_gateway, position_manager, profit_threshold=0.01))
+    strategies.append(intra_kalshi_spread_total(kalshi_client, kalshi_gateway, position_manager, profit_threshold=0.01, opportunity_tracker=opportunity_tracker, capital_allocator=capital_allocator))
+
+    follow_market_changes(strategies, kalshi_client, polymarket_client, statics_watcher)
 
     # Start user fill processing loop for wide spread strategy
     #asyncio.create_task(wide_spread_strategy.process_user_fills())
 
     # Call find_opportunities() every second and log any opportunities above profit_threshold
-    while True:
-        # Snapshot on the event loop (no contention, single-threaded)
-        kalshi_book_snapshots = kalshi_client.snapshot_all_books()
-        polymarket_us_book_snapshots = polymarket_client.snapshot_all_books()
+    cycle = 0
+    try:
+        while True:
+            # Snapshot on the event loop (no contention, single-threaded)
+            kalshi_book_snapshots = kalshi_client.snapshot_all_books()
+            polymarket_us_book_snapshots = polymarket_client.snapshot_all_books()
 
-        for strategy in strategies:
-            # Run strategy in a worker thread so the event loop stays
+            # Run strategies in a worker thread so the event loop stays
             # free to process incoming WS messages (no sync-over-async)
-            await asyncio.to_thread(strategy.find_opportunities, kalshi_book_snapshots, polymarket_us_book_snapshots)
-        await asyncio.sleep(1)
+            await asyncio.to_thread(run_strategy_cycle, strategies, capital_allocator, kalshi_book_snapshots, polymarket_us_book_snapshots)
+
+            cycle += 1
+            if cycle % OPPORTUNITY_REPORT_EVERY == 0:
+                opportunity_tracker.log_report()
+                risk.log_stats()
+            await asyncio.sleep(1)
+    finally:
+        reconcile_task.cancel()
+        opportunity_tracker.close()
 
 async def main():
-    # TODO: Add deque to best bid/ask and only compare if timestamp is within delta
-    # TODO: Track time span between market opportunity and when it's resolved
-    
     # Initialize HTTP gateway for order execution
     private_key_pem = load_private_key(PRIVATE_KEY_PATH)
     kalshi_gateway = KalshiHTTPGateway(KEY_ID, private_key_pem)
     polymarket_us_gateway = PolymarketUSHTTPGateway(POLYMARKET_US_API_KEY, POLYMARKET_US_PRIVATE_KEY_FILE_PATH, POLYMARKET_US_BASE_URL)
 
-    polymarket_us_client = PolymarketUSWebSocket(POLYMARKET_US_WS_URL_BASE, POLYMARKET_US_CHANNEL_TYPE, get_asset_ids("Polymarket_US"), POLYMARKET_US_API_KEY, POLYMARKET_US_PRIVATE_KEY_FILE_PATH)
+    polymarket_us_slugs = (
+        get_asset_ids("Polymarket_US")
+        + get_asset_ids("Polymarket_US_Spread")
+        + get_asset_ids("Polymarket_US_Total")
+    )
+    polymarket_us_client = PolymarketUSWebSocket(POLYMARKET_US_WS_URL_BASE, POLYMARKET_US_CHANNEL_TYPE, polymarket_us_slugs, POLYMARKET_US_API_KEY, POLYMARKET_US_PRIVATE_KEY_FILE_PATH)
     kalshi_tickers = (
         get_asset_ids("Kalshi")
         + get_asset_ids("Kalshi_Spread")
         + get_asset_ids("Kalshi_Total")
     )
     kalshi_client = KalshiWebSocket(KEY_ID, PRIVATE_KEY_PATH, kalshi_tickers, WS_URL)
+
+    # Follow statics refreshes (python statics_refresh.py) without a restart
+    statics_watcher = StaticsWatcher([
+        (kalshi_client, ["Kalshi", "Kalshi_Spread", "Kalshi_Total"]),
+        (polymarket_us_client, ["Polymarket_US", "Polymarket_US_Spread", "Polymarket_US_Total"]),
+    ])
     
     await asyncio.gather(
         polymarket_us_client.run(),
         kalshi_client.orderbook_websocket(),
-        scan_inefficiencies(polymarket_us_client, kalshi_client, kalshi_gateway, polymarket_us_gateway)
+        statics_watcher.run(),
+        scan_inefficiencies(polymarket_us_client, kalshi_client, kalshi_gateway, polymarket_us_gateway, statics_watcher)
     )
 
 if __name__ == "__main__":
@@ -3,6 +3,8 @@ import json
 import os
 from datetime import datetime, timezone
 
+from statics_loader import load_statics
+
 # TODO: 
 # Create subclasses for Polymarket and Kalshi
 class MarketData:
@@ -12,9 +14,7 @@ class MarketData:
     #Polymarket
     
     def get_csv_filename(self, asset_id):
-        with open("statics/statics.json", "r") as json_file:
-            data = json.load(json_file)
-        mapped = data["ASSET_ID_MAPPING"][self.market].get(asset_id, asset_id[:8])
+        mapped = load_statics().get_display_name(self.market, asset_id, asset_id[:8])
         return f"{self.market}_{mapped}.csv"
     
     # Create new CSV file if one doesn't exist for Asset ID
@@ -0,0 +1,300 @@
+import logging
+import struct
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+LOG_PATH = "logging/opportunity_lifecycles.bin"
+FLUSH_EVERY = 256
+
+# Block layout of the lifecycle log. Each flush appends one block:
+#   magic (4s) | row count (uint32)
+#   one contiguous little-endian array per column in _COLUMNS order
+#   key blob length (uint32) | '\n'-joined utf-8 keys
+_MAGIC = b"OPLC"
+_HEADER = struct.Struct("<4sI")
+_BLOB_LEN = struct.Struct("<I")
+_COLUMNS = (
+    ("appeared_ns", "<i8"),
+    ("first_seen_ns", "<i8"),
+    ("last_seen_ns", "<i8"),
+    ("resolved_ns", "<i8"),
+    ("order_sent_ns", "<i8"),
+    ("peak_edge", "<f8"),
+    ("peak_size", "<f8"),
+    ("cycles", "<i4"),
+)
+
+
+def make_key(strategy: str, legs, direction: str) -> tuple:
+    """Registry key for an opportunity. Legs are sorted so (A, B) and (B, A) collapse."""
+    return (strategy, tuple(sorted(legs)), direction)
+
+
+def format_key(key: tuple) -> str:
+    strategy, legs, direction = key
+    return f"{strategy}|{','.join(legs)}|{direction}"
+
+
+class _Lifecycle:
+    __slots__ = ("appeared_ns", "first_seen_ns", "last_seen_ns", "order_sent_ns",
+                 "peak_edge", "peak_size", "cycles", "seen_this_cycle")
+
+    def __init__(self, appeared_ns, now_ns, edge, size):
+        self.appeared_ns = appeared_ns
+        self.first_seen_ns = now_ns
+        self.last_seen_ns = now_ns
+        self.order_sent_ns = 0
+        self.peak_edge = edge
+        self.peak_size = size
+        self.cycles = 0
+        self.seen_this_cycle = True
+
+
+class OpportunityTracker:
+    """
+    Registry of live arbitrage opportunities across scan cycles.
+
+    Strategies call observe() for every opportunity they detect in a cycle,
+    mark_order_sent() when they act on one, and end_cycle() once the scan is
+    complete. Any opportunity of that strategy that was not observed during
+    the cycle is considered resolved: its lifecycle (first-seen, last-seen,
+    peak edge, peak size, resolution time, order latency) is moved to a
+    buffer that is periodically written to a compact columnar binary log
+    (see read_lifecycle_log).
+
+    All timestamps are wall-clock nanoseconds. appeared_ns is the time the
+    underlying books last changed before the opportunity was first seen
+    (taken from OrderBook.history), so
+        first_seen_ns - appeared_ns   = scan (detection) latency
+        order_sent_ns - appeared_ns   = detection-to-order latency
+        resolved_ns   - appeared_ns   = opportunity lifetime (upper bound)
+    Comparing the lifetime distribution with detection-to-order latency
+    shows how many opportunities disappear before we can act on them.
+    """
+
+    def __init__(self, log_path: str = LOG_PATH, flush_every: int = FLUSH_EVERY):
+        self.log_path = Path(log_path)
+        self.flush_every = flush_every
+        self.logger = logging.getLogger("opportunity_tracker")
+        self.lock = threading.Lock()
+
+        self.open: dict[tuple, _Lifecycle] = {}
+        self.pending: list[tuple] = []   # (key, lifecycle, resolved_ns) awaiting flush
+        self.closed_count = 0
+
+        # In-memory samples for reporting (bounded so long runs don't grow)
+        self._lifetimes_ns: list[int] = []
+        self._detection_ns: list[int] = []
+        self._order_latency_ns: list[int] = []
+        self._max_samples = 100_000
+
+    # ------------------------------------------------------------------ #
+    # Strategy hooks                                                       #
+    # ------------------------------------------------------------------ #
+
+    def observe(self, strategy: str, legs, direction: str, edge, size,
+                appeared_ns: int | None = None, now_ns: int | None = None) -> tuple:
+        """Record that an opportunity is live this cycle. Returns its registry key."""
+        now_ns = time.time_ns() if now_ns is None else now_ns
+        key = make_key(strategy, legs, direction)
+        edge = float(edge)
+        size = float(size)
+
+        with self.lock:
+            lifecycle = self.open.get(key)
+            if lifecycle is None:
+                lifecycle = _Lifecycle(appeared_ns or now_ns, now_ns, edge, size)
+                self.open[key] = lifecycle
+            else:
+                lifecycle.last_seen_ns = now_ns
+                lifecycle.seen_this_cycle = True
+                if edge > lifecycle.peak_edge:
+                    lifecycle.peak_edge = edge
+                if size > lifecycle.peak_size:
+                    lifecycle.peak_size = size
+        return key
+
+    def mark_order_sent(self, key: tuple, sent_ns: int | None = None):
+        """Record the first order sent for an open opportunity."""
+        sent_ns = time.time_ns() if sent_ns is None else sent_ns
+        with self.lock:
+            lifecycle = self.open.get(key)
+            if lifecycle is not None and not lifecycle.order_sent_ns:
+                lifecycle.order_sent_ns = sent_ns
+
+    def end_cycle(self, strategy: str, now_ns: int | None = None):
+        """Close every open opportunity of *strategy* that was not observed this cycle."""
+        now_ns = time.time_ns() if now_ns is None else now_ns
+        with self.lock:
+            resolved = []
+            for key, lifecycle in self.open.items():
+                if key[0] != strategy:
+                    continue
+                if lifecycle.seen_this_cycle:
+                    lifecycle.cycles += 1
+                    lifecycle.seen_this_cycle = False
+                else:
+                    resolved.append(key)
+
+            for key in resolved:
+                lifecycle = self.open.pop(key)
+                self._close_locked(key, lifecycle, now_ns)
+
+            should_flush = len(self.pending) >= self.flush_every
+
+        if should_flush:
+            self.flush()
+
+    def _close_locked(self, key, lifecycle, resolved_ns):
+        self.pending.append((key, lifecycle, resolved_ns))
+        self.closed_count += 1
+
+        if len(self._lifetimes_ns) >= self._max_samples:
+            del self._lifetimes_ns[: self._max_samples // 2]
+            del self._detection_ns[: self._max_samples // 2]
+        self._lifetimes_ns.append(resolved_ns - lifecycle.appeared_ns)
+        self._detection_ns.append(lifecycle.first_seen_ns - lifecycle.appeared_ns)
+        if lifecycle.order_sent_ns:
+            if len(self._order_latency_ns) >= self._max_samples:
+                del self._order_latency_ns[: self._max_samples // 2]
+            self._order_latency_ns.append(lifecycle.order_sent_ns - lifecycle.appeared_ns)
+
+    # ------------------------------------------------------------------ #
+    # Persistence                                                          #
+    # ------------------------------------------------------------------ #
+
+    def flush(self):
+        """Append all resolved lifecycles to the columnar log."""
+        with self.lock:
+            pending, self.pending = self.pending, []
+        if not pending:
+            return
+
+        columns = {
+            "appeared_ns": [lc.appeared_ns for _, lc, _ in pending],
+            "first_seen_ns": [lc.first_seen_ns for _, lc, _ in pending],
+            "last_seen_ns": [lc.last_seen_ns for _, lc, _ in pending],
+            "resolved_ns": [resolved for _, _, resolved in pending],
+            "order_sent_ns": [lc.order_sent_ns for _, lc, _ in pending],
+            "peak_edge": [lc.peak_edge for _, lc, _ in pending],
+            "peak_size": [lc.peak_size for _, lc, _ in pending],
+            "cycles": [lc.cycles for _, lc, _ in pending],
+        }
+        keys = "\n".join(format_key(key) for key, _, _ in pending).encode("utf-8")
+
+        try:
+            self.log_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.log_path, "ab") as f:
+                f.write(_HEADER.pack(_MAGIC, len(pending)))
+                for name, dtype in _COLUMNS:
+                    f.write(np.asarray(columns[name], dtype=dtype).tobytes())
+                f.write(_BLOB_LEN.pack(len(keys)))
+                f.write(keys)
+        except OSError as e:
+            self.logger.error(f"Failed to write opportunity lifecycles to {self.log_path}: {e}")
+
+    def close(self, now_ns: int | None = None):
+        """Resolve every open opportunity and flush. Call once at shutdown."""
+        now_ns = time.time_ns() if now_ns is None else now_ns
+        with self.lock:
+            for key, lifecycle in self.open.items():
+                self._close_locked(key, lifecycle, now_ns)
+            self.open.clear()
+        self.flush()
+
+    # ------------------------------------------------------------------ #
+    # Analytics                                                            #
+    # ------------------------------------------------------------------ #
+
+    def latency_report(self) -> dict:
+        """
+        Summarize opportunity lifetimes against our latencies (all in ms).
+
+        missed_fraction is the share of resolved opportunities whose lifetime
+        was shorter than the median detection-to-order latency, i.e. the
+        opportunities we would typically lose to latency alone.
+        """
+        with self.lock:
+            lifetimes = np.asarray(self._lifetimes_ns, dtype=np.float64) / 1e6
+            detection = np.asarray(self._detection_ns, dtype=np.float64) / 1e6
+            order_latency = np.asarray(self._order_latency_ns, dtype=np.float64) / 1e6
+            open_count = len(self.open)
+            closed_count = self.closed_count
+
+        def percentiles(values):
+            if len(values) == 0:
+                return None
+            p50, p90, p99 = np.percentile(values, [50, 90, 99])
+            return {"p50": float(p50), "p90": float(p90), "p99": float(p99), "n": int(len(values))}
+
+        report = {
+            "open": open_count,
+            "closed": closed_count,
+            "lifetime_ms": percentiles(lifetimes),
+            "detection_latency_ms": percentiles(detection),
+            "order_latency_ms": percentiles(order_latency),
+            "missed_fraction": None,
+        }
+        if len(lifetimes) and len(order_latency):
+            median_latency = float(np.median(order_latency))
+            report["missed_fraction"] = float(np.mean(lifetimes < median_latency))
+        return report
+
+    def log_report(self):
+        self.logger.info(f"Opportunity lifecycle report: {self.latency_report()}")
+
+
+def read_lifecycle_log(path: str = LOG_PATH) -> dict:
+    """
+    Read a lifecycle log written by OpportunityTracker.flush.
+
+    Returns a dict mapping each column name to a numpy array plus "key" to a
+    list of "strategy|leg1,leg2|direction" strings, all aligned by row.
+    """
+    columns = {name: [] for name, _ in _COLUMNS}
+    keys: list[str] = []
+    with open(path, "rb") as f:
+        data = f.read()
+
+    offset = 0
+    while offset < len(data):
+        magic, n = _HEADER.unpack_from(data, offset)
+        if magic != _MAGIC:
+            raise ValueError(f"Corrupt lifecycle log {path} at byte {offset}")
+        offset += _HEADER.size
+        for name, dtype in _COLUMNS:
+            array = np.frombuffer(data, dtype=dtype, count=n, offset=offset)
+            columns[name].append(array)
+            offset += array.nbytes
+        (blob_len,) = _BLOB_LEN.unpack_from(data, offset)
+        offset += _BLOB_LEN.size
+        if n:
+            keys.extend(data[offset:offset + blob_len].decode("utf-8").split("\n"))
+        offset += blob_len
+
+    result = {
+        name: np.concatenate(chunks) if chunks else np.empty(0, dtype=dtype)
+        for (name, dtype), chunks in zip(_COLUMNS, columns.values())
+    }
+    result["key"] = keys
+    return result
+
+
+if __name__ == "__main__":
+    # Summarize an existing lifecycle log
+    import sys
+
+    log = read_lifecycle_log(sys.argv[1] if len(sys.argv) > 1 else LOG_PATH)
+    lifetimes_ms = (log["resolved_ns"] - log["appeared_ns"]) / 1e6
+    sent = log["order_sent_ns"] > 0
+    order_latency_ms = (log["order_sent_ns"][sent] - log["appeared_ns"][sent]) / 1e6
+    print(f"Lifecycles: {len(lifetimes_ms)} ({int(sent.sum())} acted on)")
+    if len(lifetimes_ms):
+        print(f"Lifetime ms p50/p90/p99: {np.percentile(lifetimes_ms, [50, 90, 99])}")
+    if len(order_latency_ms):
+        median_latency = np.median(order_latency_ms)
+        print(f"Detection-to-order ms p50/p90/p99: {np.percentile(order_latency_ms, [50, 90, 99])}")
+        print(f"Missed (lifetime < median order latency): {np.mean(lifetimes_ms < median_latency):.1%}")
@@ -4,26 +4,78 @@ import logging
 from sortedcontainers import SortedDict
 from threading import Lock
 
+from symbol_table import symbols
+from top_of_book_history import TopOfBookHistory, DEFAULT_CAPACITY
+
 class OrderBook:
-    def __init__(self, asset_id):
+    def __init__(self, asset_id, history_capacity=DEFAULT_CAPACITY, top_table=None):
         # Orderbook = Asset ID -> Bids, Asks
         # Bids = Price -> Quantity
         #self.orderbook = defaultdict(lambda: {"bids": {}, "asks": {}})
         
         self.asset_id = asset_id
+        self.symbol_id = symbols.intern(asset_id)
         self.logger = logging.getLogger("orderbook")
         # SortedDict in ascending order
         self.bids = SortedDict()
         self.asks = SortedDict()
         self.lock = Lock()
-        
+
+        # Ring buffer of top-of-book changes (used for opportunity lifetime
+        # tracking, staleness and fill-probability estimates)
+        self.history = TopOfBookHistory(history_capacity)
+        self._last_top = (None, None, None, None)
+
+        # Shared per-feed TopOfBookTable (versioned snapshot view), if any
+        self.top_table = top_table
+        if top_table is not None:
+            top_table.register(self.symbol_id)
+
+        # InverseOrderBook mirroring this book, if any (see InverseOrderBook)
+        self.inverse = None
+
+        # Raw (px, qty) strings of the last Polymarket US snapshot per side,
+        # used to diff the next snapshot. None forces a full rebuild.
+        self._raw_ladders = None
+
+    def _top_locked(self):
+        bb_price, bb_size = (self.bids.peekitem(-1) if self.bids else (None, None))
+        ba_price, ba_size = (self.asks.peekitem(0) if self.asks else (None, None))
+        return (bb_price, bb_size, ba_price, ba_size)
+
+    def _record_top_locked(self):
+        """
+        Publish the current top of book to history (and the feed's top table)
+        if it changed. Caller holds the lock. Returns True if the top changed.
+        """
+        top = self._top_locked()
+        if top == self._last_top:
+            return False
+        self._last_top = top
+        bb_price, bb_size, ba_price, ba_size = top
+        bid = None if bb_price is None else float(bb_price)
+        bid_size = None if bb_size is None else float(bb_size)
+        ask = None if ba_price is None else float(ba_price)
+        ask_size = None if ba_size is None else float(ba_size)
+        self.history.append(bid, bid_size, ask, ask_size)
+        if self.top_table is not None:
+            self.top_table.update(self.symbol_id, bid, bid_size, ask, ask_size)
+        if self.inverse is not None:
+            self.inverse._record_top_locked()
+        return True
+
+    def _set_level_locked(self, side, price, size):
+        book_side = self.bids if side == 0 else self.asks
+        if size <= 0:
+            book_side.pop(price, None)
+        else:
+            book_side[price] = size
+
     def update_order_book(self, side, price, size):
         with self.lock:
-            book_side = self.bids if side == 0 else self.asks
-            if size <= 0 and price in book_side:
-                del book_side[price]
-            else:
-                book_side[price] = size
+            self._raw_ladders = None
+            self._set_level_locked(side, price, size)
+            self._record_top_locked()
 
     def apply_delta(self, side, price, delta):
         """Atomic read-modify-write: add *delta* to current size at *price*.
@@ -31,12 +83,14 @@ class OrderBook:
         Safe without a lock because only the event-loop thread calls this.
         """
         with self.lock:
+            self._raw_ladders = None
             book_side = self.bids if side == 0 else self.asks
             new_size = book_side.get(price, 0) + delta
             if new_size <= 0 and price in book_side:
                 del book_side[price]
             else:
                 book_side[price] = new_size
+            self._record_top_locked()
             
     def get_size_at_price(self, side, price):
         with self.lock:
@@ -69,10 +123,28 @@ class OrderBook:
         Called on the event loop, consumed by the worker thread.
         """
         with self.lock:
-            bb_price, bb_size = (self.bids.peekitem(-1) if self.bids else (None, None))
-            ba_price, ba_size = (self.asks.peekitem(0) if self.asks else (None, None))
-        return (bb_price, bb_size, ba_price, ba_size)
+            return self._top_locked()
     
+    def last_top_change_ns(self):
+        """Wall-clock ns of the last top-of-book change, or None if never quoted."""
+        with self.lock:
+            return self.history.last_change_ns()
+
+    def weighted_mid(self, window_ms):
+        """Depth-weighted mid over the last *window_ms* (see TopOfBookHistory.weighted_mid)."""
+        with self.lock:
+            return self.history.weighted_mid(window_ms)
+
+    def quote_change_rate(self, window_ms):
+        """Top-of-book changes per second over the last *window_ms*."""
+        with self.lock:
+            return self.history.quote_change_rate(window_ms)
+
+    def time_at_or_better(self, side, price, window_ms):
+        """Fraction of the last *window_ms* the top of *side* was at *price* or better."""
+        with self.lock:
+            return self.history.time_at_or_better(side, price, window_ms)
+
     def __repr__(self):
         return f"Asset ID: {self.asset_id} | Best Bid: {self.get_best_bid()} | Best Ask: {self.get_best_ask()}"
         
@@ -92,33 +164,222 @@ class OrderBook:
             self.update_order_book(side=1, price=price, size=size)
             
     def load_polymarket_us_snapshot(self, asset_id, snapshot):
-        self.bids.clear()
-        self.asks.clear()
-        
-        # BIDS
-        for level in snapshot.get("bids", []):
-            price = Decimal(1.0) - Decimal(level["px"]["value"]) if asset_id.endswith("-inverse") else Decimal(level["px"]["value"])
-            size = Decimal(level["qty"])
-            side = 1 if asset_id.endswith("-inverse") else 0
-            #self.logger.info(f"Price: {price}, Size: {size}, Side: {'ASK' if side == 1 else 'BID'}")
-            self.update_order_book(side=side, price=price, size=size)
+        """
+        Apply a Polymarket US full-depth snapshot. Returns True if the top of
+        book changed.
+
+        The incoming ladder is diffed against the previous snapshot's raw
+        (px, qty) strings, so only levels that appeared, disappeared or
+        changed size are parsed and written; unchanged levels cost one dict
+        lookup. The whole update runs under the book lock, so readers see
+        either the old or the new book, never a partially applied one, and
+        history records at most one top-of-book change per snapshot.
 
+        The "-inverse" side is an InverseOrderBook view over this book, so
+        only the primary book is loaded.
+        """
+        bids = {level["px"]["value"]: level["qty"] for level in snapshot.get("bids", [])}
         # ASKS (called "offers" in Polymarket)
-        for level in snapshot.get("offers", []):
-            price = Decimal(1.0) - Decimal(level["px"]["value"]) if asset_id.endswith("-inverse") else Decimal(level["px"]["value"])
-            size = Decimal(level["qty"])
-            side = 0 if asset_id.endswith("-inverse") else 1
-            #self.logger.info(f"Price: {price}, Size: {size}, Side: {'BID' if side == 0 else 'ASK'}")
-            self.update_order_book(side=side, price=price, size=size)
+        offers = {level["px"]["value"]: level["qty"] for level in snapshot.get("offers", [])}
+
+        with self.lock:
+            if self._raw_ladders is None:
+                self.bids.clear()
+                self.asks.clear()
+                previous_bids, previous_offers = {}, {}
+            else:
+                previous_bids, previous_offers = self._raw_ladders
+
+            self._apply_ladder_diff_locked(0, previous_bids, bids)
+            self._apply_ladder_diff_locked(1, previous_offers, offers)
+            self._raw_ladders = (bids, offers)
+
+            return self._record_top_locked()
+
+    def _apply_ladder_diff_locked(self, side, previous, ladder):
+        book_side = self.bids if side == 0 else self.asks
+        for px in previous:
+            if px not in ladder:
+                book_side.pop(Decimal(px), None)
+        for px, qty in ladder.items():
+            if previous.get(px) != qty:
+                self._set_level_locked(side, Decimal(px), Decimal(qty))
+
+    def _rebuild_polymarket_us_snapshot(self, snapshot):
+        """Clear-and-rebuild reference for load_polymarket_us_snapshot (used by the benchmark)."""
+        with self.lock:
+            self._raw_ladders = None
+            self.bids.clear()
+            self.asks.clear()
+            for level in snapshot.get("bids", []):
+                self._set_level_locked(side=0, price=Decimal(level["px"]["value"]), size=Decimal(level["qty"]))
+            for level in snapshot.get("offers", []):
+                self._set_level_locked(side=1, price=Decimal(level["px"]["value"]), size=Decimal(level["qty"]))
+            return self._record_top_locked()
 
     def load_kalshi_snapshot(self, snapshot):
         asset_id = snapshot["market_ticker"]
 
-        # Update bids
-        for price, size in snapshot.get("yes_dollars_fp", []):
-            self.update_order_book(side=0, price=float(price), size=float(size))
-            
-        # Update asks (Use 1 - price to convert from "no" to "ask" price)
-        for price, size in snapshot.get("no_dollars_fp", []):
-            #self.logger.info(f"Price: {Decimal('1.0') - Decimal(price)}, Size: {size}")
-            self.update_order_book(side=1, price=Decimal('1.0') - Decimal(price), size=float(size))
\ No newline at end of file
+        with self.lock:
+            # Update bids
+            for price, size in snapshot.get("yes_dollars_fp", []):
+                self._set_level_locked(side=0, price=float(price), size=float(size))
+
+            # Update asks (Use 1 - price to convert from "no" to "ask" price)
+            for price, size in snapshot.get("no_dollars_fp", []):
+                #self.logger.info(f"Price: {Decimal('1.0') - Decimal(price)}, Size: {size}")
+                self._set_level_locked(side=1, price=Decimal('1.0') - Decimal(price), size=float(size))
+
+            self._record_top_locked()
+
+
+def _invert(price):
+    return None if price is None else 1 - price
+
+
+class InverseOrderBook(OrderBook):
+    """
+    Read-only view of a binary market's book from the other outcome's side.
+
+    Polymarket US quotes one book per market; the short side is the same
+    book with bids and asks swapped and prices mapped to 1 - p. Instead of
+    maintaining a second SortedDict pair, this view reads the primary book
+    under the primary's lock and inverts on read:
+
+        inverse bid = 1 - primary ask   (size of the primary ask)
+        inverse ask = 1 - primary bid   (size of the primary bid)
+
+    The view has its own symbol id, history and top-table row; the primary
+    book refreshes them from _record_top_locked whenever its top changes,
+    which costs O(1) per change rather than O(levels) per message.
+    Mutating methods raise TypeError.
+    """
+
+    def __init__(self, primary: OrderBook, asset_id=None, history_capacity=DEFAULT_CAPACITY, top_table=None):
+        # Deliberately does not call OrderBook.__init__: there are no levels
+        # of our own, only the primary's.
+        self.primary = primary
+        self.asset_id = asset_id or primary.asset_id + "-inverse"
+        self.symbol_id = symbols.intern(self.asset_id)
+        self.logger = primary.logger
+        self.lock = primary.lock
+
+        self.history = TopOfBookHistory(history_capacity)
+        self._last_top = (None, None, None, None)
+        self.top_table = top_table
+        if top_table is not None:
+            top_table.register(self.symbol_id)
+        self.inverse = None
+
+        with primary.lock:
+            primary.inverse = self
+            self._record_top_locked()
+
+    # Levels are materialized on demand (O(levels)); the hot paths below
+    # only touch the primary's top.
+
+    @property
+    def bids(self):
+        return SortedDict({_invert(price): size for price, size in self.primary.asks.items()})
+
+    @property
+    def asks(self):
+        return SortedDict({_invert(price): size for price, size in self.primary.bids.items()})
+
+    def _top_locked(self):
+        bb_price, bb_size, ba_price, ba_size = self.primary._top_locked()
+        return (_invert(ba_price), ba_size, _invert(bb_price), bb_size)
+
+    def get_size_at_price(self, side, price):
+        with self.lock:
+            book = self.primary.asks if side == 0 else self.primary.bids
+            return book.get(_invert(price), 0)
+
+    def get_best_bid(self):
+        with self.lock:
+            price, size, _, _ = self._top_locked()
+        return price, size
+
+    def get_best_ask(self):
+        with self.lock:
+            _, _, price, size = self._top_locked()
+        return price, size
+
+    def _read_only(self, *args, **kwargs):
+        raise TypeError(f"{self.asset_id} is a read-only inverse view of {self.primary.asset_id}")
+
+    _set_level_locked = _read_only
+    update_order_book = _read_only
+    apply_delta = _read_only
+    load_polymarket_snapshot = _read_only
+    load_polymarket_us_snapshot = _read_only
+    _rebuild_polymarket_us_snapshot = _read_only
+    load_kalshi_snapshot = _read_only
+
+
+if __name__ == "__main__":
+    # Benchmark diff-based vs clear-and-rebuild Polymarket US snapshot
+    # application. Pass an NDJSON file of recorded marketData payloads (see
+    # PolymarketUSWebSocket(record_path=...)); without one a synthetic stream
+    # of realistic depth (40-60 levels per side, 1-3 level changes per
+    # message) is generated.
+    import json
+    import random
+    import sys
+    import time
+
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], "r") as f:
+            payloads = [json.loads(line) for line in f if line.strip()]
+        source = sys.argv[1]
+    else:
+        rng = random.Random(0)
+        ladders = {}
+        for i in range(20):
+            mid = rng.randint(20, 80)
+            ladders[f"bench-slug-{i}"] = (
+                {f"0.{p:02d}0": str(rng.randint(1, 5000)) for p in range(max(mid - 45, 1), mid)},
+                {f"0.{p:02d}0": str(rng.randint(1, 5000)) for p in range(mid + 1, min(mid + 55, 100))},
+            )
+        payloads = []
+        for _ in range(5000):
+            slug = rng.choice(list(ladders))
+            bids, offers = ladders[slug]
+            for _ in range(rng.randint(1, 3)):
+                side = bids if rng.random() < 0.5 else offers
+                px = rng.choice(list(side))
+                side[px] = str(rng.randint(1, 5000))
+            payloads.append({
+                "marketSlug": slug,
+                "bids": [{"px": {"value": px}, "qty": qty} for px, qty in bids.items()],
+                "offers": [{"px": {"value": px}, "qty": qty} for px, qty in offers.items()],
+            })
+        source = "synthetic"
+
+    diff_books, rebuild_books = {}, {}
+    for payload in payloads:
+        slug = payload["marketSlug"]
+        if slug not in diff_books:
+            diff_books[slug] = OrderBook(slug)
+            rebuild_books[slug] = OrderBook(slug)
+
+    start = time.perf_counter()
+    for payload in payloads:
+        rebuild_books[payload["marketSlug"]]._rebuild_polymarket_us_snapshot(payload)
+    rebuild_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    top_changes = 0
+    for payload in payloads:
+        top_changes += diff_books[payload["marketSlug"]].load_polymarket_us_snapshot(payload["marketSlug"], payload)
+    diff_s = time.perf_counter() - start
+
+    for slug, book in diff_books.items():
+        assert dict(book.bids) == dict(rebuild_books[slug].bids)
+        assert dict(book.asks) == dict(rebuild_books[slug].asks)
+
+    levels = sum(len(p.get("bids", [])) + len(p.get("offers", [])) for p in payloads) / len(payloads)
+    print(f"payloads: {len(payloads)} ({source}), avg levels/payload: {levels:.0f}")
+    print(f"clear-and-rebuild: {rebuild_s / len(payloads) * 1e6:.1f} us/payload")
+    print(f"diff-based:        {diff_s / len(payloads) * 1e6:.1f} us/payload")
+    print(f"top-of-book changed on {top_changes / len(payloads):.1%} of payloads")
@@ -0,0 +1,307 @@
+"""
+Precompiled (easier, harder) pair graph for Kalshi spread/total ladders.
+
+IntraKalshiSpreadTotalArbitrage checks every (easier, harder) pair inside
+each event's ladders. Deriving those from CORRELATED_SPREAD_MARKET_MAPPING /
+CORRELATED_TOTAL_MARKET_MAPPING means parsing every ticker suffix and
+enumerating combinations on every start. build_pair_graph() does that once
+when the statics are rebuilt and save() writes the result as one flat file
+that load_pair_graph() memory-maps:
+
+    header      magic, version, max_gap and section lengths (64 bytes)
+    tickers     fixed-width ASCII names; every index below points here
+    events      event_offsets -> event_members: every ticker of the event
+    ladders     event_ladder_offsets -> ladder_offsets -> ladders: ticker
+                indices of one team/direction, easiest first
+    pairs       event_pair_offsets -> easier / harder ticker indices
+
+All sections after the names are int32. Pairs are grouped by event in the
+same order as the events, so one event's pairs are
+easier[event_pair_offsets[e]:event_pair_offsets[e + 1]].
+
+max_gap bounds the pair count on deep ladders: only pairs at most max_gap
+rungs apart are kept (1 = adjacent only, None = all pairs).
+
+Run `python pair_graph.py` to compare building the pairs from statics.json
+with loading the precompiled graph.
+"""
+import os
+import re
+from collections import defaultdict
+
+import numpy as np
+
+MAGIC = b"KXPAIRG1"
+VERSION = 1
+HEADER_WORDS = 14  # int32 words after the magic: 8 + 14 * 4 = 64 bytes
+ALL_PAIRS = -1     # max_gap as stored for "no pruning"
+
+# Matches suffixes like 'WHU2', 'CLB14', 'RR191', '3' (optional letters + required digits)
+_SUFFIX_RE = re.compile(r'^([A-Za-z]*)(\d+)$')
+
+
+def parse_suffix(ticker: str):
+    """
+    Return (team_prefix, trailing_num) from the last '-' segment of a ticker.
+
+    Examples:
+        'KXEPLSPREAD-26MAY24WHULEE-WHU2'       -> ('WHU', 2)
+        'KXEPLTOTAL-26MAY24WHULEE-3'           -> ('', 3)
+        'KXIPLTEAMTOTAL-26MAY17RRDC-RR191'     -> ('RR', 191)
+        'KXUFLSPREAD-26MAY17CLBBHM-CLB21'      -> ('CLB', 21)
+
+    Returns None if the suffix doesn't match the expected pattern.
+    """
+    suffix = ticker.rsplit('-', 1)[-1]
+    m = _SUFFIX_RE.match(suffix)
+    return (m.group(1), int(m.group(2))) if m else None
+
+
+def event_ladders(event_tickers):
+    """
+    Group one event's tickers by team prefix, each group sorted ascending by
+    trailing number (easiest first).
+
+    Returns (ladders, single_market_teams) where ladders maps team prefix ->
+    list of tickers with at least two rungs, or None if a ticker has a
+    non-standard suffix.
+    """
+    by_team = defaultdict(list)  # team_prefix -> list of (trailing_num, ticker)
+    for ticker in event_tickers:
+        parsed = parse_suffix(ticker)
+        if parsed is None:
+            return None
+        team_prefix, num = parsed
+        by_team[team_prefix].append((num, ticker))
+
+    ladders = {}
+    single = []
+    for team, markets in by_team.items():
+        if len(markets) < 2:
+            single.append(team)
+            continue
+        ladders[team] = [ticker for _, ticker in sorted(markets)]
+    return ladders, single
+
+
+def ladder_pairs(n: int, max_gap: int | None = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Rung indices (easier, harder) of every pair in a ladder of *n* markets,
+    at most *max_gap* rungs apart (all pairs if None).
+    """
+    easier, harder = np.triu_indices(n, k=1)
+    if max_gap is not None:
+        keep = harder - easier <= max_gap
+        easier, harder = easier[keep], harder[keep]
+    return easier.astype(np.int32), harder.astype(np.int32)
+
+
+def _offsets(lengths) -> np.ndarray:
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int32)
+    np.cumsum(lengths, out=offsets[1:])
+    return offsets
+
+
+class PairGraph:
+    """
+    Pair graph arrays, either built in memory or memory-mapped from a file.
+
+    Indices in event_members, ladders, easier and harder are positions in
+    tickers; use ticker_names() once to resolve them.
+    """
+
+    _INT_SECTIONS = (
+        "event_offsets", "event_members",
+        "event_ladder_offsets", "ladder_offsets", "ladders",
+        "event_pair_offsets", "easier", "harder",
+    )
+
+    def __init__(self, tickers: np.ndarray, max_gap: int | None, **sections):
+        self.tickers = tickers
+        self.max_gap = max_gap
+        for name in self._INT_SECTIONS:
+            setattr(self, name, sections[name])
+
+    def __len__(self):
+        return len(self.event_offsets) - 1
+
+    @property
+    def n_pairs(self) -> int:
+        return len(self.easier)
+
+    def ticker_names(self) -> list[str]:
+        return [name.decode("ascii") for name in self.tickers.tolist()]
+
+    def to_bytes(self) -> bytes:
+        tickers = np.ascontiguousarray(self.tickers)
+        names = tickers.tobytes()
+        names += b"\0" * (-len(names) % 4)
+        header = np.array([
+            VERSION,
+            ALL_PAIRS if self.max_gap is None else self.max_gap,
+            tickers.dtype.itemsize,
+            len(tickers),
+            len(self.event_members),
+            len(self.ladder_offsets) - 1,
+            len(self.ladders),
+            len(self.easier),
+            len(self),
+        ] + [0] * (HEADER_WORDS - 9), dtype=np.int32)
+        sections = b"".join(np.ascontiguousarray(getattr(self, name), dtype=np.int32).tobytes() for name in self._INT_SECTIONS)
+        return MAGIC + header.tobytes() + names + sections
+
+    def save(self, path: str):
+        """Write the graph to *path* atomically (temp file + rename)."""
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(self.to_bytes())
+        # A process still mapping the old file keeps reading the old inode
+        os.replace(tmp_path, path)
+
+
+def build_pair_graph(correlated_mapping: dict, max_gap: int | None = None) -> tuple[PairGraph, dict]:
+    """
+    Build the pair graph of a CORRELATED_SPREAD/TOTAL_MARKET_MAPPING (ticker
+    -> the other tickers of its event).
+
+    Events with a non-standard suffix are left out; teams with a single
+    market keep their ticker in the event members but get no ladder.
+
+    Returns (graph, counts) where counts holds the unparseable event tickers
+    and the number of single-market teams, for logging.
+    """
+    index: dict[str, int] = {}
+    event_members, member_counts = [], []
+    ladders, ladder_counts, event_ladder_counts = [], [], []
+    easier_parts, harder_parts, event_pair_counts = [], [], []
+    unparseable, single_market = [], 0
+    seen = set()
+
+    for ticker, correlated in correlated_mapping.items():
+        event_key = frozenset([ticker] + correlated)
+        if event_key in seen:
+            continue
+        seen.add(event_key)
+
+        event_tickers = sorted(event_key)
+        grouped = event_ladders(event_tickers)
+        if grouped is None:
+            unparseable.append(event_tickers[0])
+            continue
+        team_ladders, single = grouped
+        single_market += len(single)
+
+        member_ids = [index.setdefault(t, len(index)) for t in event_tickers]
+        event_members.extend(member_ids)
+        member_counts.append(len(member_ids))
+
+        n_pairs = 0
+        for rungs in team_ladders.values():
+            rung_ids = np.fromiter((index[t] for t in rungs), dtype=np.int32, count=len(rungs))
+            ladders.append(rung_ids)
+            ladder_counts.append(len(rungs))
+            easier, harder = ladder_pairs(len(rungs), max_gap)
+            easier_parts.append(rung_ids[easier])
+            harder_parts.append(rung_ids[harder])
+            n_pairs += len(easier)
+        event_ladder_counts.append(len(team_ladders))
+        event_pair_counts.append(n_pairs)
+
+    empty = np.zeros(0, dtype=np.int32)
+    width = max((len(t) for t in index), default=1)
+    graph = PairGraph(
+        np.array(list(index), dtype=f"S{width}"),
+        max_gap,
+        event_offsets=_offsets(member_counts),
+        event_members=np.array(event_members, dtype=np.int32),
+        event_ladder_offsets=_offsets(event_ladder_counts),
+        ladder_offsets=_offsets(ladder_counts),
+        ladders=np.concatenate(ladders) if ladders else empty,
+        event_pair_offsets=_offsets(event_pair_counts),
+        easier=np.concatenate(easier_parts) if easier_parts else empty,
+        harder=np.concatenate(harder_parts) if harder_parts else empty,
+    )
+    return graph, {"unparseable": unparseable, "single_market": single_market}
+
+
+def load_pair_graph(path: str) -> PairGraph:
+    """Memory-map a graph written by PairGraph.save(). Raises ValueError on a foreign or truncated file."""
+    data = np.memmap(path, dtype=np.uint8, mode="r")
+    if data[:len(MAGIC)].tobytes() != MAGIC:
+        raise ValueError(f"{path} is not a pair graph")
+    header = data[len(MAGIC):len(MAGIC) + HEADER_WORDS * 4].view(np.int32)
+    version, max_gap, width, n_tickers, n_members, n_ladders, n_rungs, n_pairs, n_events = header[:9].tolist()
+    if version != VERSION:
+        raise ValueError(f"{path} has pair graph version {version}, expected {VERSION}")
+
+    offset = len(MAGIC) + HEADER_WORDS * 4
+    tickers = data[offset:offset + n_tickers * width].view(f"S{width}")
+    offset += n_tickers * width + (-n_tickers * width % 4)
+
+    lengths = {
+        "event_offsets": n_events + 1,
+        "event_members": n_members,
+        "event_ladder_offsets": n_events + 1,
+        "ladder_offsets": n_ladders + 1,
+        "ladders": n_rungs,
+        "event_pair_offsets": n_events + 1,
+        "easier": n_pairs,
+        "harder": n_pairs,
+    }
+    sections = {}
+    for name in PairGraph._INT_SECTIONS:
+        end = offset + lengths[name] * 4
+        if end > len(data):
+            raise ValueError(f"{path} is truncated")
+        sections[name] = data[offset:end].view(np.int32)
+        offset = end
+    return PairGraph(tickers, None if max_gap == ALL_PAIRS else max_gap, **sections)
+
+
+if __name__ == "__main__":
+    # Benchmark: pairs from the spread/total mappings in statics.json, built
+    # per start as before vs memory-mapped from the precompiled graph
+    import tempfile
+    import time
+
+    from utils import read_file_data
+
+    statics = read_file_data("statics/statics.json")
+
+    def build_per_start(mapping):
+        # What the strategy did on every start: parse, group, combine
+        pairs = []
+        seen = set()
+        for ticker, correlated in mapping.items():
+            key = frozenset([ticker] + correlated)
+            if key in seen:
+                continue
+            seen.add(key)
+            grouped = event_ladders(list(key))
+            if grouped is None:
+                continue
+            for rungs in grouped[0].values():
+                pairs.extend((rungs[i], rungs[j]) for i, j in zip(*ladder_pairs(len(rungs))))
+        return pairs
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for key in ("CORRELATED_SPREAD_MARKET_MAPPING", "CORRELATED_TOTAL_MARKET_MAPPING"):
+            mapping = statics.get(key, {})
+            start = time.perf_counter()
+            pairs = build_per_start(mapping)
+            build_s = time.perf_counter() - start
+
+            path = os.path.join(tmp, "graph.bin")
+            graph, _ = build_pair_graph(mapping)
+            graph.save(path)
+            start = time.perf_counter()
+            loaded = load_pair_graph(path)
+            names = loaded.ticker_names()
+            loaded_pairs = list(zip((names[i] for i in loaded.easier.tolist()), (names[i] for i in loaded.harder.tolist())))
+            load_s = time.perf_counter() - start
+            assert sorted(loaded_pairs) == sorted(pairs)
+
+            pruned, _ = build_pair_graph(mapping, max_gap=2)
+            print(f"{key}: {len(loaded)} events, {loaded.n_pairs} pairs ({pruned.n_pairs} with max_gap=2), "
+                  f"{os.path.getsize(path) / 1024:.0f} KB; build {build_s * 1000:.1f}ms, load {load_s * 1000:.1f}ms")
@@ -1,11 +1,10 @@
-from orderbook import OrderBook
+from feed_handler import FeedHandler
 from market_data import MarketData
 from utils import get_asset_ids
 
 import asyncio
 import json
 import websockets
-from collections import defaultdict
 
 # WebSocket endpoint for Polymarket CLOB service
 WS_URL_BASE = "wss://ws-subscriptions-clob.polymarket.com"
@@ -22,90 +21,60 @@ ASSET_IDS = [
 
 CHANNEL_TYPE = "market"  # use market for public price/book updates
 
-class PolymarketWebSocket:
+class PolymarketWebSocket(FeedHandler):
+    venue = "Polymarket"
+    ping_message = "PING"
+    pong_message = "PONG"
+
     def __init__(self, url_base, channel_type, asset_ids):
         self.url = f"{url_base}/ws/{channel_type}"
         self.channel_type = channel_type
-        self.asset_ids = asset_ids
-        
-        # Initialize OrderBooks
-        self.orderbooks = defaultdict(OrderBook)
-        for asset_id in self.asset_ids:
-            self.orderbooks[asset_id] = OrderBook(asset_id)
         
         # Initialize Market Data
         self.market_data = MarketData(market="Polymarket")
         
-        # Initialize Websocket
-        self.ws = None
-        self.connected = asyncio.Event()
-        
-    async def connect(self):
-        #Connect and subscribe
-        while True:
-            try:
-                print(f"Connecting to {self.url}")
-                self.ws = await websockets.connect(self.url, ping_interval=None)
-                await self.send_subscribe()
-                self.connected.set()
-                print(f"Connected to {self.url}")
-                return
-            except Exception as e:
-                print(f"Connection failed: {e}")
-                asyncio.sleep(2)
+        # Price changes are incremental, so messages for one asset stay
+        # ordered on one worker and are never conflated
+        super().__init__(asset_ids)
+
+    @property
+    def asset_ids(self):
+        return self.instruments
+
+    #
+    # FeedHandler adapter
+    #
+
+    async def connect_websocket(self):
+        return await websockets.connect(self.url, ping_interval=None)
                 
-    async def send_subscribe(self):
+    def subscribe_payloads(self, asset_ids):
         # Subscribe to assets
-        subscribe_payload = {
-            "assets_ids": self.asset_ids,
+        return [json.dumps({
+            "assets_ids": asset_ids,
             "type": self.channel_type
-        }
-        await self.ws.send(json.dumps(subscribe_payload))
-
-    async def recv_loop(self):
-        #Listen for messages
-        while True:
-            try:
-                msg = await self.ws.recv()
-                
-                if msg == "PONG":
-                    continue
-                
-                msgs = json.loads(msg)
-
-                # Ensure msgs is always a list
-                if isinstance(msgs, dict):
-                    msgs = [msgs]
-                    
-                #print(msgs)
-                #print(len(msgs))
-                
-                for m in msgs:
-                    await self.handle_message(m)
-
-            except websockets.ConnectionClosed:
-                print("Connection closed, reconnecting...")
-                self.connected.clear()
-                await self.connect()
-
-            except Exception as e:
-                print("Error in recv_loop:", e)
-
-    async def ping_loop(self):
-        #Send periodic pings.
-        while True:
-            await self.connected.wait()
-            try:
-                await self.ws.send("PING")
-            except Exception:
-                pass
-            await asyncio.sleep(10)
+        })]
+
+    def decode(self, raw):
+        msgs = json.loads(raw)
+
+        # Ensure msgs is always a list
+        if isinstance(msgs, dict):
+            msgs = [msgs]
+        return msgs
+
+    def exchange_ts_ns(self, msg):
+        timestamp = msg.get("timestamp")
+        return int(timestamp) * 1_000_000 if timestamp else None
+
+    def apply(self, msg):
+        self.handle_message(msg)
 
     #
     # Message handlers (same logic as before)
     #
 
-    async def handle_message(self, msg):
+    def handle_message(self, msg):
         event_type = msg.get("event_type")
 
         if event_type == "book":
@@ -126,7 +95,7 @@ class PolymarketWebSocket:
         asset_id = msg["asset_id"]
         orderbook = self.orderbooks.get(asset_id)
         if orderbook is None:
-            print(f"Orderbook not found for {asset_id}")
+            self.logger.warning(f"Orderbook not found for {asset_id}")
             return
         orderbook.load_polymarket_snapshot(msg)
 
@@ -140,31 +109,6 @@ class PolymarketWebSocket:
             orderbook = self.orderbooks.get(asset_id)
             if orderbook:
                 orderbook.update_order_book(side, price, size)
-
-    #
-    # Public API
-    #
-
-    async def run(self):
-        #Start the websocket and all loops.
-        await self.connect()
-
-        await asyncio.gather(
-            self.recv_loop(),
-            self.ping_loop(),
-        )
-        
-    def get_best_bid(self, asset_id):
-        orderbook = self.orderbooks.get(asset_id)
-        if orderbook:
-            return orderbook.get_best_bid()
-        return None, None
-    
-    def get_best_ask(self, asset_id):
-        orderbook = self.orderbooks.get(asset_id)
-        if orderbook:
-            return orderbook.get_best_ask()
-        return None, None
         
 if __name__ == "__main__":
     polymarket_client = PolymarketWebSocket(WS_URL_BASE, CHANNEL_TYPE, get_asset_ids("Polymarket"))
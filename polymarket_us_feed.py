@@ -1,4 +1,4 @@
-from orderbook import OrderBook
+from feed_handler import FeedHandler
 from market_data import MarketData
 from utils import get_asset_ids
 
@@ -8,15 +8,17 @@ import json
 import logging
 import time
 import websockets
-from collections import defaultdict
 from cryptography.hazmat.primitives.asymmetric import ed25519
 
 
-class PolymarketUSWebSocket:
-    def __init__(self, url_base, channel_type, slugs, api_key_id, key_file_path):
+class PolymarketUSWebSocket(FeedHandler):
+    venue = "Polymarket_US"
+    ping_message = "PING"
+    pong_message = "PONG"
+
+    def __init__(self, url_base, channel_type, slugs, api_key_id, key_file_path, record_path=None):
         self.url = f"{url_base}/v1/ws/{channel_type}"
         self.channel_type = channel_type
-        self.slugs = slugs
         self.api_key_id = api_key_id
         self.key_file_path = key_file_path
         self.logger = logging.getLogger("polymarket_us_feed")
@@ -29,19 +31,23 @@ class PolymarketUSWebSocket:
             base64.b64decode(private_key_base64)[:32]
         )
 
-        # Initialize OrderBooks
-        self.orderbooks = defaultdict(OrderBook)
-        for slug in self.slugs:
-            self.orderbooks[slug] = OrderBook(slug)
-            self.orderbooks[slug + "-inverse"] = OrderBook(slug + "-inverse")
-
         # Initialize Market Data
         self.market_data = MarketData(market="PolymarketUS")
 
-        # WebSocket state
-        self.ws = None
-        self.connected = asyncio.Event()
-        
+        # Optional NDJSON recording of raw marketData payloads (for replaying
+        # through the OrderBook snapshot benchmark)
+        self.record_file = open(record_path, "a") if record_path else None
+
+        self._request_id = 0
+
+        # Every message is a full snapshot, so one apply thread with per-slug
+        # conflation keeps up with bursts without stalling the event loop
+        super().__init__(slugs, apply_workers=1)
+
+    @property
+    def slugs(self):
+        return self.instruments
+
     #
     # Authentication
     #
@@ -64,94 +70,77 @@ class PolymarketUSWebSocket:
         }
 
     #
-    # Connection
+    # FeedHandler adapter
     #
 
-    async def connect(self):
-        while True:
-            try:
-                self.logger.info(f"Connecting to {self.url}")
-
-                headers = self._build_auth_headers()
-                
-                
-                self.ws = await websockets.connect(
-                    self.url,
-                    ping_interval=None,
-                    max_size=None,
-                    additional_headers=headers
-                )
-
-                await self.send_subscribe()
-                self.connected.set()
-
-                self.logger.info(f"Connected to {self.url}")
-                return
-
-            except Exception as e:
-                self.logger.error(f"Connection failed: {e}")
-                await asyncio.sleep(2)
-
-    async def send_subscribe(self):
-        subscribe_payload = {
-            "subscribe": {
-                "request_id": "md-sub-1",
+    def create_books(self, slug):
+        """Create the book for *slug* and its "-inverse" view."""
+        orderbook = self.books.add_book(slug)
+        self.books.add_inverse_book(orderbook, slug + "-inverse")
+        # The default free_books() drops the "-inverse" view with the book
+
+    async def connect_websocket(self):
+        self.logger.info(f"Connecting to {self.url}")
+        return await websockets.connect(
+            self.url,
+            ping_interval=None,
+            max_size=None,
+            additional_headers=self._build_auth_headers()
+        )
+
+    def _subscription_payload(self, action, slugs):
+        self._request_id += 1
+        return json.dumps({
+            action: {
+                "request_id": f"md-{action}-{self._request_id}",
                 "subscription_type": 1, # MARKET_DATA
-                "market_slugs": self.slugs
+                "market_slugs": slugs
             }
-        }
-
-        await self.ws.send(json.dumps(subscribe_payload))
-
-    #
-    # Loops
-    #
-
-    async def recv_loop(self):
-        while True:
-            try:
-                msg = await self.ws.recv()
+        })
 
-                if msg == "PONG":
-                    continue
+    def subscribe_payloads(self, slugs):
+        return [self._subscription_payload("subscribe", slugs)]
 
-                msgs = json.loads(msg)
+    def unsubscribe_payloads(self, slugs):
+        return [self._subscription_payload("unsubscribe", slugs)]
 
-                # Normalize to list
-                if isinstance(msgs, dict):
-                    msgs = [msgs]
+    def decode(self, raw):
+        """Return the marketData payloads in a frame."""
+        msgs = json.loads(raw)
 
-                for m in msgs:
-                    await self.handle_message(m)
+        # Normalize to list
+        if isinstance(msgs, dict):
+            msgs = [msgs]
 
-            except websockets.ConnectionClosed:
-                self.logger.warning("Connection closed, reconnecting...")
-                self.connected.clear()
-                await self.connect()
+        payloads = []
+        for m in msgs:
+            marketData = self.handle_message(m)
+            if marketData is not None:
+                payloads.append(marketData)
+        return payloads
 
-            except Exception as e:
-                self.logger.error(f"Error in recv_loop: {e}")
+    def conflation_key(self, marketData):
+        # Each payload is a full snapshot, so only the latest per slug matters
+        return marketData.get("marketSlug")
 
-    async def ping_loop(self):
-        while True:
-            await self.connected.wait()
-            try:
-                await self.ws.send("PING")
-            except Exception:
-                pass
-            await asyncio.sleep(10)
+    def apply(self, marketData):
+        self.handle_snapshot(marketData)
 
     #
     # Message Handlers
     #
 
-    async def handle_message(self, msg):
+    def handle_message(self, msg):
+        """Return the marketData payload of a market-data message, or None."""
         #self.logger.info(f"Received message: {msg}")
         subscription_type = msg.get("subscriptionType")
 
         if subscription_type == "SUBSCRIPTION_TYPE_MARKET_DATA":
             #self.market_data.persist_book_event(msg)
-            self.handle_snapshot(msg["marketData"])
+            if self.record_file is not None:
+                self.record_file.write(json.dumps(msg["marketData"]) + "\n")
+            return msg["marketData"]
+        return None
 
     def handle_snapshot(self, marketData):
         #for asset in marketData:
@@ -167,48 +156,9 @@ class PolymarketUSWebSocket:
             self.logger.warning(f"Orderbook not found for {asset_id}")
             return
 
-        #self.logger.info(f"Loading snapshot for {asset_id}")
-        #self.logger.info(f"Market Data: {marketData}")
+        # Short side: the "-inverse" book is a view over this one and is
+        # refreshed by the same load
         orderbook.load_polymarket_us_snapshot(asset_id, marketData)
-        #self.logger.info(f"Loaded snapshot for {orderbook}")
-
-        # Short Side
-        orderbook = self.orderbooks.get(asset_id + "-inverse")
-        if not orderbook:
-            self.logger.warning(f"Orderbook not found for {asset_id + '-inverse'}")
-            return
-
-        #self.logger.info(f"Loading snapshot for {asset_id + '-inverse'}")
-        orderbook.load_polymarket_us_snapshot(asset_id + "-inverse", marketData)
-        #self.logger.info(f"Market Data: {marketData}")
-        #self.logger.info(f"Loaded snapshot for {orderbook}")
-
-    #
-    # Public API
-    #
-
-    async def run(self):
-        await self.connect()
-
-        await asyncio.gather(
-            self.recv_loop(),
-            self.ping_loop(),
-        )
-
-    def snapshot_all_books(self):
-        return {ticker: ob.snapshot_top() for ticker, ob in self.orderbooks.items()}
-
-    def get_best_bid(self, asset_id):
-        orderbook = self.orderbooks.get(asset_id)
-        if orderbook:
-            return orderbook.get_best_bid()
-        return None, None
-
-    def get_best_ask(self, asset_id):
-        orderbook = self.orderbooks.get(asset_id)
-        if orderbook:
-            return orderbook.get_best_ask()
-        return None, None
 
 
 #
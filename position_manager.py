@@ -1,14 +1,41 @@
 import threading
 from collections import defaultdict
 
+import numpy as np
+
+from symbol_table import symbols
+
+# Signed position change per contract for each fill side (positive = long YES)
+_FILL_SIGNS = {
+    "YES_BUY": 1,
+    "YES_SELL": -1,
+    "NO_BUY": -1,
+    "NO_SELL": 1,
+}
+
+
 class PositionManager:
     def __init__(self, positions:defaultdict, open_orders: defaultdict = defaultdict(dict)):
-        self.positions = positions
+        # Net positions are stored in an array indexed by symbol id; tickers
+        # are only translated at the API boundary.
+        self._positions = np.zeros(max(len(symbols), 1), dtype=np.float64)
+        for ticker, position in positions.items():
+            symbol_id = symbols.intern(ticker)
+            self._positions_slot(symbol_id)
+            self._positions[symbol_id] = float(position)
+
         self.open_orders = open_orders # Map of cleint_order_id to order details
-        self.open_orders_by_ticker = defaultdict(set)  # Map ticker to set of client_order_id
+        self.open_orders_by_ticker = defaultdict(set)  # Map symbol id to set of client_order_id
         self.associated_orders = defaultdict(set)  # Map ticker to set of associated client_order_ids
         self.lock = threading.Lock()
-        
+
+    def _positions_slot(self, symbol_id):
+        """Grow the position array so *symbol_id* is addressable."""
+        if symbol_id >= len(self._positions):
+            grown = np.zeros(max(symbol_id + 1, 2 * len(self._positions)), dtype=np.float64)
+            grown[:len(self._positions)] = self._positions
+            self._positions = grown
+
     # ---------------------------------------------------------
     # Local Update From Trade Fill
     # ---------------------------------------------------------
@@ -22,35 +49,51 @@ class PositionManager:
             "NO_BUY"
             "NO_SELL"
         """
-        with self.lock:
-            if side == "YES_BUY":
-                self.positions[ticker] += quantity
+        self.update_from_fill_by_id(symbols.intern(ticker), side, quantity)
 
-            elif side == "YES_SELL":
-                self.positions[ticker] -= quantity
-
-            elif side == "NO_BUY":
-                self.positions[ticker] -= quantity
-
-            elif side == "NO_SELL":
-                self.positions[ticker] += quantity
-
-            else:
-                raise ValueError(f"Unknown side {side}")
+    def update_from_fill_by_id(self, symbol_id, side, quantity):
+        sign = _FILL_SIGNS.get(side)
+        if sign is None:
+            raise ValueError(f"Unknown side {side}")
+        with self.lock:
+            self._positions_slot(symbol_id)
+            self._positions[symbol_id] += sign * quantity
 
     # ---------------------------------------------------------
     # Get Position
     # ---------------------------------------------------------
     def get_position(self, ticker):
+        symbol_id = symbols.id_of(ticker)
+        if symbol_id is None:
+            return 0
+        return self.get_position_by_id(symbol_id)
+
+    def get_position_by_id(self, symbol_id):
+        with self.lock:
+            if symbol_id >= len(self._positions):
+                return 0
+            return float(self._positions[symbol_id])
+
+    def get_positions_by_id(self, symbol_ids):
+        """Vectorized lookup: positions for an array of symbol ids."""
+        symbol_ids = np.asarray(symbol_ids, dtype=np.int64)
         with self.lock:
-            return self.positions.get(ticker, 0)
+            result = np.zeros(len(symbol_ids), dtype=np.float64)
+            in_range = symbol_ids < len(self._positions)
+            result[in_range] = self._positions[symbol_ids[in_range]]
+            return result
 
     # ---------------------------------------------------------
     # Get All Positions
     # ---------------------------------------------------------
     def get_all_positions(self):
         with self.lock:
-            return dict(self.positions)
+            held = np.flatnonzero(self._positions)
+            return dict(zip(symbols.names_of(held.tolist()), self._positions[held].tolist()))
+
+    @property
+    def positions(self):
+        return self.get_all_positions()
 
     # ---------------------------------------------------------
     # Update Open Orders
@@ -58,7 +101,7 @@ class PositionManager:
     def add_open_order(self, ticker, order):
         with self.lock:
             self.open_orders[order["client_order_id"]] = order
-            self.open_orders_by_ticker[ticker].add(order["client_order_id"])
+            self.open_orders_by_ticker[symbols.intern(ticker)].add(order["client_order_id"])
             
     def get_open_order(self,client_order_id):
         with self.lock:
@@ -67,7 +110,7 @@ class PositionManager:
     def remove_open_order(self, ticker, order):
         with self.lock:
             del self.open_orders[order["client_order_id"]]
-            self.open_orders_by_ticker[ticker].discard(order["client_order_id"])
+            self.open_orders_by_ticker[symbols.intern(ticker)].discard(order["client_order_id"])
             
     # ---------------------------------------------------------
     # Created Associated Orders
@@ -90,11 +133,11 @@ class PositionManager:
             
     def remove_client_order_id_from_associated_orders(self, client_order_id):
         with self.lock:
-            del self.associated_orders[client_order_id]
+            self.associated_orders.pop(client_order_id, None)
 
     # ---------------------------------------------------------
     # Retrieve Open Orders
     # ---------------------------------------------------------
     def get_open_orders_for_ticker(self, ticker):
         with self.lock:
-            return self.open_orders_by_ticker[ticker]
\ No newline at end of file
+            return self.open_orders_by_ticker[symbols.intern(ticker)]
\ No newline at end of file
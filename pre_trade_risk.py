@@ -0,0 +1,857 @@
+"""
+Pre-trade risk checks between the strategies and the HTTP gateways.
+
+Strategies keep calling create_order / batch_create_orders / amend_order on
+their gateway; main.py hands them RiskCheckedKalshiGateway and
+RiskCheckedPolymarketUSGateway, which pass every order through
+PreTradeRisk first: submit() for orders that rest, execute() for orders
+that do not (fill-or-kill, IOC, market), which are counted as filled
+straight away and taken back with unfill() if the venue fills less. An
+order that fails a check is not sent and OrderRejected is raised, which
+the strategies' existing error handling logs like any other gateway
+error. Checks, in order:
+
+    size              quantity outside 1..max_order_size
+    price_range       limit price outside 1c..99c
+    duplicate         client order id already live
+    open_orders       venue already has max_open_orders live orders
+    notional          open notional on the venue would exceed its limit
+    position          filled + open position on the ticker would exceed
+                      its limit in the order's direction
+    event_position    gross position across the ticker's event would
+                      exceed the event limit
+    price_deviation   buying above the ask / selling below the bid by more
+                      than max_price_deviation (fat finger), when the
+                      feed has a quote
+    duplicate         same price and quantity as the last limit order in
+                      the same direction on the ticker, within
+                      duplicate_window_s (a strategy re-firing an order);
+                      market orders are never suppressed, so back-to-back
+                      hedges both go out
+
+Limits are precomputed into slotted per-ticker records (position, open
+quantity, limit, event, last order per direction) when main.py registers
+the subscribed markets, and per-venue accounts hold open orders and open
+notional, all in integer ticks of 1/PRICE_SCALE. A check is a fixed
+handful of attribute lookups and comparisons whatever the number of
+markets or orders, and takes the lock once. Reference prices are read
+straight from the feed's TopOfBookTable row. Counters are updated
+incrementally: fill() moves quantity from open to position, done()
+releases what was not filled.
+
+Positions are signed in YES terms like PositionManager: buying YES or
+selling NO (Kalshi), BUY_LONG or SELL_SHORT (Polymarket US) are positive.
+
+Run `python pre_trade_risk.py` to time the checks.
+"""
+import itertools
+import logging
+import threading
+import time
+import uuid
+from decimal import Decimal
+
+from symbol_table import symbols
+from top_of_book_history import ASK, BID
+from utils import PRICE_SCALE
+
+CENT_TICKS = PRICE_SCALE // 100
+DOLLARS_PER_TICK = 1 / PRICE_SCALE
+MIN_PRICE = CENT_TICKS                 # 1c
+MAX_PRICE = PRICE_SCALE - CENT_TICKS   # 99c
+
+DEFAULT_MAX_POSITION = 500
+DEFAULT_MAX_EVENT_POSITION = 1000
+DEFAULT_MAX_ORDER_SIZE = 250
+DEFAULT_MAX_OPEN_ORDERS = 200
+DEFAULT_MAX_NOTIONAL = Decimal("1000")
+DEFAULT_MAX_PRICE_DEVIATION = Decimal("0.10")
+DEFAULT_DUPLICATE_WINDOW_S = 2.0
+
+SIZE = "size"
+PRICE_RANGE = "price_range"
+DUPLICATE = "duplicate"
+OPEN_ORDERS = "open_orders"
+POSITION = "position"
+EVENT_POSITION = "event_position"
+NOTIONAL = "notional"
+PRICE_DEVIATION = "price_deviation"
+REASONS = (SIZE, PRICE_RANGE, DUPLICATE, OPEN_ORDERS, POSITION, EVENT_POSITION, NOTIONAL, PRICE_DEVIATION)
+
+# Time in force / order types that never rest on the book
+_monotonic_ns = time.monotonic_ns
+
+_KALSHI_IMMEDIATE = {"fill_or_kill", "immediate_or_cancel"}
+_POLYMARKET_IMMEDIATE = {"FILL_OR_KILL", "IMMEDIATE_OR_CANCEL"}
+_POLYMARKET_SIGNS = {"BUY_LONG": 1, "SELL_SHORT": 1, "BUY_SHORT": -1, "SELL_LONG": -1}
+
+
+def _ticks(dollars) -> int:
+    return int(Decimal(str(dollars)) * PRICE_SCALE)
+
+
+def default_event_key(venue: str, ticker: str) -> str:
+    """Kalshi tickers share their event ticker (everything before the last '-'); other venues default to one event per market."""
+    if venue == "Kalshi":
+        return ticker.rsplit("-", 1)[0]
+    return ticker
+
+
+class OrderRejected(Exception):
+    """An order failed a pre-trade check and was not sent."""
+
+    def __init__(self, reason: str, message: str):
+        super().__init__(f"{reason}: {message}")
+        self.reason = reason
+
+
+class SymbolRisk:
+    """Limit and counters of one ticker, in contracts."""
+
+    __slots__ = ("symbol_id", "event", "limit", "position", "open_long", "open_short", "last_long", "last_long_ns", "last_short", "last_short_ns")
+
+    def __init__(self, symbol_id: int, event, limit: int):
+        self.symbol_id = symbol_id
+        self.event = event          # EventRisk
+        self.limit = limit          # max |position| including open orders
+        self.position = 0           # filled, signed in YES terms
+        self.open_long = 0          # open contracts that would add to the position
+        self.open_short = 0         # open contracts that would subtract from it
+        self.last_long = None       # duplicate key and accept time (ns) of the
+        self.last_long_ns = 0       # last limit order in each direction
+        self.last_short = None
+        self.last_short_ns = 0
+
+
+class EventRisk:
+    """Limit and counters of one event: gross contracts across its tickers."""
+
+    __slots__ = ("event", "limit", "gross", "open")
+
+    def __init__(self, event: str, limit: int):
+        self.event = event
+        self.limit = limit
+        self.gross = 0              # sum of |position| over the event's tickers
+        self.open = 0               # open contracts that would grow gross
+
+
+class RiskOrder:
+    """One accepted order still counted against the limits, keyed by client order id."""
+
+    __slots__ = ("account", "symbol", "sign", "remaining", "cost", "held")
+
+    def __init__(self, account, symbol: SymbolRisk, sign: int, quantity: int, cost: int, held: int):
+        self.account = account      # VenueRisk
+        self.symbol = symbol
+        self.sign = sign
+        self.remaining = quantity   # contracts not yet filled
+        self.cost = cost            # ticks tied up per contract
+        self.held = held            # contracts counted in symbol.event.open
+
+    def __repr__(self):
+        return f"RiskOrder({self.account.venue}, {symbols.name_of(self.symbol.symbol_id)}, {self.sign:+d} x {self.remaining})"
+
+
+class VenueRisk:
+    """Per-venue limits and counters."""
+
+    __slots__ = ("venue", "max_notional", "max_open_orders", "reference", "notional", "open_orders")
+
+    def __init__(self, venue: str, max_notional: int, max_open_orders: int, reference=None):
+        self.venue = venue
+        self.max_notional = max_notional
+        self.max_open_orders = max_open_orders
+        self.reference = reference  # TopOfBookTable of the venue's feed, or None
+        self.notional = 0           # ticks held by open orders
+        self.open_orders = 0
+
+    def stats(self) -> dict:
+        return {
+            "open_orders": self.open_orders,
+            "open_notional": str(Decimal(self.notional) / PRICE_SCALE),
+            "max_notional": str(Decimal(self.max_notional) / PRICE_SCALE),
+        }
+
+
+class PreTradeRisk:
+    """
+    Pre-trade limits shared by every strategy and venue.
+
+        submit(venue, ticker, sign, price, quantity, cost, client_order_id)
+            check an order and count it as open, or raise OrderRejected
+        fill(client_order_id, quantity)   move filled quantity into the position
+        done(client_order_id)             release an order's unfilled quantity
+                                          (cancelled, expired, rejected)
+
+        execute(venue, ticker, sign, price, quantity, cost, client_order_id)
+            check an order that does not rest (fill-or-kill, IOC, market)
+            and count it as filled straight away
+        unfill(symbol, sign, quantity)    take back what such an order did not fill
+
+    Prices and costs are ticks of 1/PRICE_SCALE dollars: price is the YES
+    price (None for market orders), cost what one contract ties up (the
+    price paid when buying, one minus the price when selling).
+    """
+
+    def __init__(
+        self,
+        max_position: int = DEFAULT_MAX_POSITION,
+        max_event_position: int = DEFAULT_MAX_EVENT_POSITION,
+        max_order_size: int = DEFAULT_MAX_ORDER_SIZE,
+        max_price_deviation: Decimal = DEFAULT_MAX_PRICE_DEVIATION,
+        duplicate_window_s: float = DEFAULT_DUPLICATE_WINDOW_S,
+        event_key=default_event_key,
+    ):
+        self.logger = logging.getLogger("pre_trade_risk")
+        self.lock = threading.Lock()
+        self.max_position = max_position
+        self.max_event_position = max_event_position
+        self.max_order_size = max_order_size
+        self.max_price_deviation = float(max_price_deviation)  # dollars, like the feed's quotes
+        self.duplicate_window_ns = int(duplicate_window_s * 1e9)
+        self.event_key = event_key
+        self.venues: dict[str, VenueRisk] = {}
+
+        self._symbols: dict[str, SymbolRisk] = {}    # by ticker, created on first sight
+        self._events: dict[str, EventRisk] = {}
+        self._position_limits: dict[str, int] = {}   # overrides, by ticker
+        self._event_limits: dict[str, int] = {}      # overrides, by event
+
+        self._orders: dict[str, RiskOrder] = {}
+
+        self.accepted = 0
+        self.rejected = dict.fromkeys(REASONS, 0)
+
+    # ------------------------------------------------------------------ #
+    # Limits                                                               #
+    # ------------------------------------------------------------------ #
+
+    def add_venue(self, venue: str, max_notional: Decimal = DEFAULT_MAX_NOTIONAL, max_open_orders: int = DEFAULT_MAX_OPEN_ORDERS, reference=None) -> VenueRisk:
+        """Register *venue*; *reference* is its feed's TopOfBookTable for fat-finger checks."""
+        account = VenueRisk(venue, _ticks(max_notional), max_open_orders, reference)
+        self.venues[venue] = account
+        return account
+
+    def set_position_limit(self, ticker: str, limit: int):
+        """Override max_position for one ticker."""
+        with self.lock:
+            self._position_limits[ticker] = limit
+            if ticker in self._symbols:
+                self._symbols[ticker].limit = limit
+
+    def set_event_limit(self, event: str, limit: int):
+        """Override max_event_position for one event."""
+        with self.lock:
+            self._event_limits[event] = limit
+            if event in self._events:
+                self._events[event].limit = limit
+
+    def register(self, venue: str, tickers):
+        """Precompute the limit and event of each of *tickers* so their first order pays no setup."""
+        with self.lock:
+            for ticker in tickers:
+                if ticker not in self._symbols:
+                    self._register(venue, ticker)
+
+    def on_markets_changed(self, venue: str, added: list[str], removed: list[str]):
+        """
+        Feed market listener (see FeedHandler.add_market_listener): register
+        newly subscribed markets. Removed ones keep their records, as their
+        positions still count.
+        """
+        if venue in self.venues:
+            self.register(venue, added)
+
+    def _register(self, venue: str, ticker: str) -> SymbolRisk:
+        """Precompute a ticker's limit and event (lazily for tickers not registered up front)."""
+        event_name = self.event_key(venue, ticker)
+        event = self._events.get(event_name)
+        if event is None:
+            event = self._events[event_name] = EventRisk(event_name, self._event_limits.get(event_name, self.max_event_position))
+        symbol = self._symbols[ticker] = SymbolRisk(symbols.intern(ticker), event, self._position_limits.get(ticker, self.max_position))
+        return symbol
+
+    def load_positions(self, venue: str, positions: dict):
+        """Seed net positions ({ticker: signed contracts}), e.g. from get_positions() at startup."""
+        with self.lock:
+            for ticker, position in positions.items():
+                symbol = self._symbols.get(ticker) or self._register(venue, ticker)
+                # position_fp comes back as a string like "10.00"
+                self._set_position(symbol, int(float(position)))
+
+    @staticmethod
+    def _set_position(symbol: SymbolRisk, position: int):
+        symbol.event.gross += abs(position) - abs(symbol.position)
+        symbol.position = position
+
+    # ------------------------------------------------------------------ #
+    # Checks                                                               #
+    # ------------------------------------------------------------------ #
+
+    def submit(self, venue: str, ticker: str, sign: int, price: int | None, quantity: int, cost: int, client_order_id: str, check_duplicate: bool = True) -> RiskOrder:
+        """Check an order and count it as open. Raises OrderRejected if any check fails."""
+        with self.lock:
+            account = self.venues[venue]
+            symbol = self._symbols.get(ticker)
+            if symbol is None:
+                symbol = self._register(venue, ticker)
+            reason, held = self._check(account, symbol, sign, price, quantity, cost, client_order_id, check_duplicate)
+            if reason is None:
+                order = self._orders[client_order_id] = RiskOrder(account, symbol, sign, quantity, cost, held)
+                account.open_orders += 1
+                account.notional += cost * quantity
+                if sign > 0:
+                    symbol.open_long += quantity
+                else:
+                    symbol.open_short += quantity
+                symbol.event.open += held
+                self.accepted += 1
+                return order
+            self.rejected[reason] += 1
+        self._reject(reason, f"{venue} {ticker} {'+' if sign > 0 else '-'}{quantity} @ {price} ticks ({client_order_id})")
+
+    def execute(self, venue: str, ticker: str, sign: int, price: int | None, quantity: int, cost: int, client_order_id: str, check_duplicate: bool = True) -> SymbolRisk:
+        """
+        Check an order that does not rest (fill-or-kill, IOC, market) and
+        count it as filled straight away, so the happy path books nothing
+        and takes the lock once. If the venue fills less, or the call
+        fails, hand the rest to unfill(). Returns the ticker's record for
+        that. Raises OrderRejected if any check fails.
+        """
+        with self.lock:
+            account = self.venues[venue]
+            symbol = self._symbols.get(ticker)
+            if symbol is None:
+                symbol = self._register(venue, ticker)
+            reason, held = self._check(account, symbol, sign, price, quantity, cost, client_order_id, check_duplicate)
+            if reason is None:
+                symbol.position += sign * quantity
+                # held contracts grow |position|, the rest shrink it
+                symbol.event.gross += 2 * held - quantity
+                self.accepted += 1
+                return symbol
+            self.rejected[reason] += 1
+        self._reject(reason, f"{venue} {ticker} {'+' if sign > 0 else '-'}{quantity} @ {price} ticks ({client_order_id})")
+
+    def unfill(self, symbol: SymbolRisk, sign: int, quantity: int):
+        """Take back *quantity* contracts counted as filled by execute()."""
+        with self.lock:
+            self._set_position(symbol, symbol.position - sign * quantity)
+
+    def _reject(self, reason: str, message: str):
+        self.logger.warning(f"Rejected {reason}: {message}")
+        raise OrderRejected(reason, message)
+
+    def _check(self, account: VenueRisk, symbol: SymbolRisk, sign: int, price: int | None, quantity: int, cost: int, client_order_id: str, check_duplicate: bool):
+        """
+        (reason, None) if the order breaks a limit, else (None, contracts
+        held against the event). Records the duplicate key of an order that
+        passes, so callers must accept it.
+        """
+        if not 0 < quantity <= self.max_order_size:
+            return SIZE, None
+        if price is not None and not MIN_PRICE <= price <= MAX_PRICE:
+            return PRICE_RANGE, None
+        if client_order_id in self._orders:
+            return DUPLICATE, None
+        if account.open_orders >= account.max_open_orders:
+            return OPEN_ORDERS, None
+        if account.notional + cost * quantity > account.max_notional:
+            return NOTIONAL, None
+
+        # One branch per direction; held is the part of the order that
+        # grows |position|, the only part that counts against the event
+        position = symbol.position
+        if sign > 0:
+            if position + symbol.open_long + quantity > symbol.limit:
+                return POSITION, None
+            held = quantity if position >= 0 else (quantity + position if quantity > -position else 0)
+        else:
+            if position - symbol.open_short - quantity < -symbol.limit:
+                return POSITION, None
+            held = quantity if position <= 0 else (quantity - position if quantity > position else 0)
+        if held:
+            event = symbol.event
+            if event.gross + event.open + held > event.limit:
+                return EVENT_POSITION, None
+
+        # Market orders have no price: no reference check, and never
+        # suppressed as duplicates (repeated hedges must all go out)
+        if price is None:
+            return None, held
+        reference = account.reference
+        if reference is not None:
+            quotes = reference.quotes
+            symbol_id = symbol.symbol_id
+            if symbol_id < len(quotes):
+                # Compared in dollars, as the feed stores them; a missing
+                # side is NaN, and NaN comparisons are False
+                if sign > 0:
+                    if price * DOLLARS_PER_TICK - self.max_price_deviation > quotes.item(symbol_id, ASK):
+                        return PRICE_DEVIATION, None
+                elif price * DOLLARS_PER_TICK + self.max_price_deviation < quotes.item(symbol_id, BID):
+                    return PRICE_DEVIATION, None
+        if check_duplicate:
+            # Same price and quantity as the last order in the same
+            # direction on the ticker, packed into one int
+            key = price << 32 | quantity
+            now = _monotonic_ns()
+            if sign > 0:
+                if key == symbol.last_long and now - symbol.last_long_ns < self.duplicate_window_ns:
+                    return DUPLICATE, None
+                symbol.last_long = key
+                symbol.last_long_ns = now
+            else:
+                if key == symbol.last_short and now - symbol.last_short_ns < self.duplicate_window_ns:
+                    return DUPLICATE, None
+                symbol.last_short = key
+                symbol.last_short_ns = now
+        return None, held
+
+    def _book(self, client_order_id: str, order: RiskOrder):
+        self._orders[client_order_id] = order
+        account, symbol = order.account, order.symbol
+        account.open_orders += 1
+        account.notional += order.cost * order.remaining
+        if order.sign > 0:
+            symbol.open_long += order.remaining
+        else:
+            symbol.open_short += order.remaining
+        symbol.event.open += order.held
+
+    def _unbook(self, client_order_id: str) -> RiskOrder | None:
+        order = self._orders.pop(client_order_id, None)
+        if order is not None:
+            account, symbol = order.account, order.symbol
+            account.open_orders -= 1
+            account.notional -= order.cost * order.remaining
+            if order.sign > 0:
+                symbol.open_long -= order.remaining
+            else:
+                symbol.open_short -= order.remaining
+            symbol.event.open -= order.held
+        return order
+
+    # ------------------------------------------------------------------ #
+    # Order lifecycle                                                      #
+    # ------------------------------------------------------------------ #
+
+    def fill(self, client_order_id: str, quantity: int):
+        """Move *quantity* filled contracts of an open order into the position."""
+        with self.lock:
+            order = self._orders.get(client_order_id)
+            if order is None:
+                return
+            filled = quantity if quantity < order.remaining else order.remaining
+            symbol = order.symbol
+            order.account.notional -= order.cost * filled
+            if order.sign > 0:
+                symbol.open_long -= filled
+            else:
+                symbol.open_short -= filled
+            released = filled if filled < order.held else order.held
+            symbol.event.open -= released
+            order.held -= released
+            order.remaining -= filled
+            self._set_position(symbol, symbol.position + order.sign * filled)
+            if order.remaining == 0:
+                self._unbook(client_order_id)
+
+    def done(self, client_order_id: str):
+        """Release whatever is left of an order (cancelled, expired, rejected or never sent)."""
+        with self.lock:
+            self._unbook(client_order_id)
+
+    def replace(self, client_order_id: str, new_client_order_id: str, price: int | None, quantity: int, cost: int) -> RiskOrder:
+        """
+        Check an amend of an open order to a new price and quantity. The old
+        order's quantity is released first, so an amend is only rejected if
+        the amended order would break a limit on its own. Duplicate
+        suppression does not apply to amends. Returns the old order, for
+        restore() if the venue rejects the amend. Raises OrderRejected and
+        leaves the old order in place if a check fails; KeyError if it is
+        not open.
+        """
+        with self.lock:
+            old = self._unbook(client_order_id)
+            if old is None:
+                raise KeyError(client_order_id)
+            reason, held = self._check(old.account, old.symbol, old.sign, price, quantity, cost, new_client_order_id, False)
+            if reason is None:
+                self._book(new_client_order_id, RiskOrder(old.account, old.symbol, old.sign, quantity, cost, held))
+                self.accepted += 1
+                return old
+            self._book(client_order_id, old)
+            self.rejected[reason] += 1
+        self._reject(reason, f"amend {client_order_id} -> {quantity} @ {price} ticks")
+
+    def restore(self, new_client_order_id: str, client_order_id: str, old: RiskOrder | None):
+        """Undo a replace() (or an amend checked as a new order if *old* is None)."""
+        with self.lock:
+            self._unbook(new_client_order_id)
+            if old is not None:
+                self._book(client_order_id, old)
+
+    def rekey(self, client_order_id: str, order_id: str):
+        """Track an open order under the id the venue assigned to it."""
+        with self.lock:
+            order = self._orders.pop(client_order_id, None)
+            if order is not None:
+                self._orders[order_id] = order
+
+    # ------------------------------------------------------------------ #
+    # Reporting                                                            #
+    # ------------------------------------------------------------------ #
+
+    def position(self, ticker: str) -> int:
+        symbol = self._symbols.get(ticker)
+        return 0 if symbol is None else symbol.position
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "accepted": self.accepted,
+                "rejected": dict(self.rejected),
+                "venues": {venue: account.stats() for venue, account in self.venues.items()},
+            }
+
+    def log_stats(self):
+        self.logger.info(f"Pre-trade risk: {self.stats()}")
+
+
+class _RiskCheckedGateway:
+    """Forwards everything it does not check to the wrapped gateway."""
+
+    def __init__(self, gateway, risk: PreTradeRisk):
+        self.gateway = gateway
+        self.risk = risk
+
+    def __getattr__(self, name):
+        return getattr(self.gateway, name)
+
+
+def kalshi_order_terms(order: dict) -> tuple[int, int | None, int]:
+    """(sign, YES price, cost per contract) in ticks for a Kalshi order dict."""
+    yes = order["side"] == "yes"
+    buy = order["action"] == "buy"
+    sign = 1 if yes == buy else -1
+    side_price = order.get("yes_price" if yes else "no_price")
+    if side_price is None:
+        # Market order: no price to check, assume the worst cost
+        return sign, None, PRICE_SCALE
+    side_ticks = int(side_price) * CENT_TICKS
+    return sign, (side_ticks if yes else PRICE_SCALE - side_ticks), (side_ticks if buy else PRICE_SCALE - side_ticks)
+
+
+def _kalshi_filled(response, count: int) -> int:
+    # Fill-or-kill orders are assumed filled unless the venue says otherwise,
+    # as the strategies already do for the position manager
+    order = response.get("order") if isinstance(response, dict) else None
+    if isinstance(order, dict) and "fill_count_fp" in order:
+        return int(float(order["fill_count_fp"]))
+    return count
+
+
+class RiskCheckedKalshiGateway(_RiskCheckedGateway):
+    """KalshiHTTPGateway with every order passed through PreTradeRisk first."""
+
+    venue = "Kalshi"
+
+    def _submit(self, order: dict, check_duplicate: bool = True) -> RiskOrder:
+        sign, price, cost = kalshi_order_terms(order)
+        return self.risk.submit(self.venue, order["ticker"], sign, price, int(order["count"]), cost, order["client_order_id"], check_duplicate)
+
+    def create_order(self, order_data: dict):
+        if "client_order_id" not in order_data:
+            order_data["client_order_id"] = str(uuid.uuid4())
+        client_order_id = order_data["client_order_id"]
+        if order_data.get("type") != "market" and order_data.get("time_in_force") not in _KALSHI_IMMEDIATE:
+            self._submit(order_data)
+            try:
+                return self.gateway.create_order(order_data)
+            except Exception:
+                self.risk.done(client_order_id)
+                raise
+
+        sign, price, cost = kalshi_order_terms(order_data)
+        count = int(order_data["count"])
+        symbol = self.risk.execute(self.venue, order_data["ticker"], sign, price, count, cost, client_order_id)
+        try:
+            response = self.gateway.create_order(order_data)
+        except Exception:
+            self.risk.unfill(symbol, sign, count)
+            raise
+        filled = _kalshi_filled(response, count)
+        if filled < count:
+            self.risk.unfill(symbol, sign, count - filled)
+        return response
+
+    def batch_create_orders(self, orders: dict):
+        """All or nothing: if one order fails its checks, none are sent."""
+        accepted = []
+        try:
+            for order in orders["orders"]:
+                if "client_order_id" not in order:
+                    order["client_order_id"] = str(uuid.uuid4())
+                self._submit(order)
+                accepted.append(order["client_order_id"])
+            return self.gateway.batch_create_orders(orders)
+        except Exception:
+            for client_order_id in accepted:
+                self.risk.done(client_order_id)
+            raise
+
+    def amend_order(self, order_id: str, amend_data: dict):
+        sign, price, cost = kalshi_order_terms(amend_data)
+        count = int(amend_data["count"])
+        new_id = amend_data.get("updated_client_order_id", order_id)
+        try:
+            replaced = self.risk.replace(order_id, new_id, price, count, cost)
+        except KeyError:
+            # Not placed through this gateway (e.g. before a restart): check it as a new order
+            replaced = None
+            self.risk.submit(self.venue, amend_data["ticker"], sign, price, count, cost, new_id, check_duplicate=False)
+        try:
+            return self.gateway.amend_order(order_id, amend_data)
+        except Exception:
+            # The old order is still resting on its old terms
+            self.risk.restore(new_id, order_id, replaced)
+            raise
+
+    def cancel_order(self, order_id: str):
+        response = self.gateway.cancel_order(order_id)
+        self.risk.done(order_id)
+        return response
+
+    def batch_cancel_orders(self, orders: dict):
+        response = self.gateway.batch_cancel_orders(orders)
+        for order in orders["orders"]:
+            self.risk.done(order["order_id"])
+        return response
+
+    def record_fill(self, client_order_id: str, count: int):
+        """Fill of a resting order, from the user fill feed."""
+        self.risk.fill(client_order_id, count)
+
+
+class RiskCheckedPolymarketUSGateway(_RiskCheckedGateway):
+    """PolymarketUSHTTPGateway with every order passed through PreTradeRisk first."""
+
+    venue = "Polymarket_US"
+
+    def __init__(self, gateway, risk: PreTradeRisk):
+        super().__init__(gateway, risk)
+        self._local_ids = itertools.count()
+
+    def create_order(self, market_slug: str, price: float, quantity: int, side: str = "BUY_LONG", tif: str = "GOOD_TILL_CANCEL", order_type: str = "LIMIT"):
+        # Long and short books of a slug net into one position
+        ticks = round(price * PRICE_SCALE)
+        long_price = ticks if side.endswith("LONG") else PRICE_SCALE - ticks
+        cost = ticks if side.startswith("BUY") else PRICE_SCALE - ticks
+        sign = _POLYMARKET_SIGNS[side]
+        client_order_id = f"{self.venue}-{next(self._local_ids)}"
+        if order_type == "MARKET" or tif in _POLYMARKET_IMMEDIATE:
+            symbol = self.risk.execute(self.venue, market_slug, sign, long_price, int(quantity), cost, client_order_id)
+            try:
+                return self.gateway.create_order(market_slug, price, quantity, side, tif, order_type)
+            except Exception:
+                self.risk.unfill(symbol, sign, int(quantity))
+                raise
+
+        self.risk.submit(self.venue, market_slug, sign, long_price, int(quantity), cost, client_order_id)
+        try:
+            response = self.gateway.create_order(market_slug, price, quantity, side, tif, order_type)
+        except Exception:
+            self.risk.done(client_order_id)
+            raise
+        if isinstance(response, dict) and "id" in response:
+            self.risk.rekey(client_order_id, response["id"])
+        return response
+
+    def cancel_order(self, order_id: str, market_slug: str = None):
+        response = self.gateway.cancel_order(order_id, market_slug)
+        self.risk.done(order_id)
+        return response
+
+
+if __name__ == "__main__":
+    # Benchmark: per-order cost of the checks with many markets, live orders
+    # and a populated reference table, then one scenario per rejection reason
+    import random
+    from collections import deque
+
+    import numpy as np
+
+    from top_of_book import TopOfBookTable
+
+    N_MARKETS = 20_000
+    N_ORDERS = 100_000
+    MAX_RESTING = 200
+    ROUNDS = 3
+    logging.getLogger("pre_trade_risk").disabled = True
+
+    class NullGateway:
+        def create_order(self, order_data):
+            return None
+
+        def batch_create_orders(self, orders):
+            return None
+
+        def amend_order(self, order_id, amend_data):
+            return None
+
+        def cancel_order(self, order_id):
+            return None
+
+    tickers = [f"KXBENCH-{i // 4}-T{i % 4}" for i in range(N_MARKETS)]
+    table = TopOfBookTable()
+    for ticker in tickers:
+        symbol_id = symbols.intern(ticker)
+        table.register(symbol_id)
+        table.update(symbol_id, 0.45, 100.0, 0.47, 100.0)
+
+    def engine(**limits):
+        venue_limits = {name: limits.pop(name) for name in ("max_notional", "max_open_orders") if name in limits}
+        risk = PreTradeRisk(**limits)
+        risk.add_venue("Kalshi", reference=table, **venue_limits)
+        risk.register("Kalshi", tickers)   # as main.py does for the subscribed markets
+        return risk, RiskCheckedKalshiGateway(NullGateway(), risk)
+
+    def make_specs(n_markets):
+        rng = random.Random(7)
+        return [
+            (rng.choice(tickers[:n_markets]), rng.choice(("buy", "sell")), rng.choice(("yes", "no")), rng.randint(1, 50), rng.randint(44, 48),
+             "fill_or_kill" if rng.random() < 0.8 else "good_till_canceled")
+            for _ in range(N_ORDERS)
+        ]
+
+    def run(specs, send, cancel=None):
+        # Each order is built just before it is sent, as the strategies do;
+        # resting orders are cancelled (untimed) once MAX_RESTING are live
+        elapsed = np.empty(N_ORDERS, dtype=np.int64)
+        resting = deque()
+        for i, (ticker, action, side, count, yes_price, tif) in enumerate(specs):
+            order = {
+                "ticker": ticker,
+                "action": action,
+                "side": side,
+                "count": count,
+                "client_order_id": str(uuid.uuid4()),
+                f"{side}_price": yes_price if side == "yes" else 100 - yes_price,
+                "type": "limit",
+                "time_in_force": tif,
+            }
+            start = time.perf_counter_ns()
+            try:
+                send(order)
+            except OrderRejected:
+                pass
+            elapsed[i] = time.perf_counter_ns() - start
+            if tif == "good_till_canceled":
+                resting.append(order["client_order_id"])
+                if len(resting) > MAX_RESTING and cancel is not None:
+                    cancel(resting.popleft())
+        return elapsed / 1000
+
+    unlimited = dict(max_position=10**9, max_event_position=10**9, max_notional=Decimal(10**9), max_open_orders=10**9, duplicate_window_s=0.05)
+
+    def check(order):
+        # What the wrapper adds: execute for orders that do not rest, else submit
+        sign, price, cost = kalshi_order_terms(order)
+        if order["time_in_force"] == "fill_or_kill":
+            risk.execute("Kalshi", order["ticker"], sign, price, order["count"], cost, order["client_order_id"])
+        else:
+            risk.submit("Kalshi", order["ticker"], sign, price, order["count"], cost, order["client_order_id"])
+
+    def best_of(specs, setup):
+        # Quietest of ROUNDS runs, as timeit does, so a noisy neighbour on a
+        # shared machine does not decide the result
+        rounds = []
+        for _ in range(ROUNDS):
+            send, cancel = setup()
+            rounds.append(run(specs, send, cancel))
+        return min(rounds, key=np.mean)
+
+    def checks_only():
+        global risk
+        risk, _ = engine(**unlimited)
+        return check, risk.done
+
+    def wrapper():
+        global risk
+        risk, gateway = engine(**unlimited)
+        return gateway.create_order, gateway.cancel_order
+
+    # Per-order times net of the timing loop and the bare gateway call
+    for n_markets in (200, N_MARKETS):
+        specs = make_specs(n_markets)
+        baseline = best_of(specs, lambda: (NullGateway().create_order, None))
+        checked = best_of(specs, checks_only)
+        wrapped = best_of(specs, wrapper)
+        print(f"{n_markets} markets, {N_ORDERS} orders (80% fill-or-kill, up to {MAX_RESTING} resting), {risk.stats()['rejected'][DUPLICATE]} duplicates")
+        for label, elapsed in (("checks", checked - baseline.mean()), ("create_order() wrapper", wrapped - baseline.mean())):
+            p50, p99 = np.percentile(elapsed, [50, 99])
+            print(f"  {label:<24} mean {elapsed.mean():.2f}us  p50 {p50:.2f}us  p99 {p99:.2f}us")
+
+    def send(gateway, ticker, side, action, count, price, tif="good_till_canceled", client_order_id=None):
+        order = {"ticker": ticker, "action": action, "side": side, "count": count, f"{side}_price": price, "type": "limit", "time_in_force": tif}
+        if client_order_id is not None:
+            order["client_order_id"] = client_order_id
+        try:
+            gateway.create_order(order)
+            return None
+        except OrderRejected as e:
+            return e.reason
+
+    a, b, c = tickers[0], tickers[1], tickers[4]   # a and b share an event
+
+    risk, gateway = engine(max_order_size=20)
+    assert send(gateway, a, "yes", "buy", 21, 46) == SIZE
+    assert send(gateway, a, "yes", "buy", 1, 100) == PRICE_RANGE
+    assert send(gateway, a, "yes", "buy", 5, 46) is None
+    assert send(gateway, a, "yes", "buy", 5, 46) == DUPLICATE
+    assert send(gateway, a, "yes", "buy", 5, 80) == PRICE_DEVIATION       # ask 47c + 10c
+    assert send(gateway, a, "yes", "sell", 5, 30) == PRICE_DEVIATION      # bid 45c - 10c
+    assert send(gateway, a, "no", "buy", 5, 70) == PRICE_DEVIATION        # selling YES at 30c
+
+    hedge = {"ticker": a, "action": "buy", "side": "no", "count": 5, "type": "market"}
+    gateway.create_order(dict(hedge))
+    gateway.create_order(dict(hedge))                                     # the next partial fill's hedge
+    assert risk.position(a) == -10
+
+    risk, gateway = engine(max_position=10)
+    assert send(gateway, a, "yes", "buy", 8, 46, client_order_id="rest") is None
+    assert send(gateway, a, "yes", "buy", 3, 47, tif="fill_or_kill") == POSITION   # 8 open + 3
+    gateway.amend_order("rest", {"ticker": a, "side": "yes", "action": "buy", "updated_client_order_id": "rest2", "yes_price": 47, "count": 10})
+    try:
+        gateway.amend_order("rest2", {"ticker": a, "side": "yes", "action": "buy", "updated_client_order_id": "rest3", "yes_price": 47, "count": 11})
+        raise AssertionError("amend past the position limit was accepted")
+    except OrderRejected as e:
+        assert e.reason == POSITION
+    assert risk.venues["Kalshi"].open_orders == 1 and "rest2" in risk._orders
+    gateway.cancel_order("rest2")
+    assert send(gateway, a, "yes", "buy", 10, 47, tif="fill_or_kill") is None
+    assert risk.position(a) == 10
+
+    risk, gateway = engine(max_event_position=15)
+    assert send(gateway, a, "yes", "buy", 10, 47, tif="fill_or_kill") is None
+    assert send(gateway, b, "no", "buy", 6, 55, tif="fill_or_kill") == EVENT_POSITION
+    assert send(gateway, a, "yes", "sell", 10, 45, tif="fill_or_kill") is None    # reducing is always allowed
+    assert send(gateway, b, "no", "buy", 6, 55, tif="fill_or_kill") is None
+    assert risk.position(a) == 0 and risk.position(b) == -6
+
+    risk, gateway = engine(max_notional=Decimal("5"), max_open_orders=2)
+    assert send(gateway, a, "yes", "buy", 10, 47, client_order_id="big") is None   # $4.70
+    assert send(gateway, c, "yes", "buy", 1, 46) == NOTIONAL
+    gateway.cancel_order("big")
+    assert send(gateway, c, "yes", "buy", 1, 46) is None
+    assert send(gateway, b, "yes", "buy", 1, 46) is None
+    assert send(gateway, a, "yes", "buy", 1, 46) == OPEN_ORDERS
+    batch = {"orders": [{"ticker": t, "action": "buy", "side": "yes", "count": 1, "yes_price": 45, "type": "limit"} for t in tickers[8:10]]}
+    try:
+        gateway.batch_create_orders(batch)
+        raise AssertionError("batch past the open order limit was accepted")
+    except OrderRejected as e:
+        assert e.reason == OPEN_ORDERS
+    assert risk.venues["Kalshi"].open_orders == 2
+    print("limit checks ok")
@@ -0,0 +1,307 @@
+import logging
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from capital_allocator import CapitalAllocator, Reservation
+
+# Kalshi accepts at most this many orders per batch create / batch cancel
+BATCH_LIMIT = 20
+
+KEEP = "keep"
+AMEND = "amend"
+CANCEL = "cancel"
+CREATE = "create"
+
+SIDES = ("yes", "no")
+
+
+def quote_price(order: dict) -> int:
+    """Limit price of a resting quote, in cents, on its own side."""
+    return order["yes_price"] if order["side"] == "yes" else order["no_price"]
+
+
+def plan_quotes(resting: dict[str, dict], target: dict[str, int] | None) -> dict[str, str]:
+    """
+    Decide what to do with one ticker's quotes.
+
+    resting   side -> resting order
+    target    side -> desired price in cents, or None to stop quoting
+
+    Returns side -> KEEP / AMEND / CANCEL / CREATE. A pair is only created
+    when nothing rests on either side; a lone resting side is being hedged
+    and is left alone.
+    """
+    if target is None:
+        return {side: CANCEL for side in resting}
+    if not resting:
+        return {side: CREATE for side in target}
+    return {
+        side: KEEP if quote_price(order) == target.get(side, quote_price(order)) else AMEND
+        for side, order in resting.items()
+    }
+
+
+class QuoteManager:
+    """
+    Keeps resting quotes in line with a desired price per ticker and side.
+
+    Each cycle the strategy passes the quotes it wants; sync() diffs them
+    against what is resting and issues the minimum set of calls: batched
+    cancels first (freeing capital), one amend per repriced quote, then
+    batched creates for new pairs. Quotes already at their target are kept,
+    so they keep their queue position and cost no API call.
+
+    Capital for every resting quote is reserved on the shared allocator:
+    released on cancel or a failed create, re-reserved at the new price on
+    amend and committed on fill, in proportion to the contracts filled. A
+    partially filled quote keeps resting (and stays tracked) until its last
+    contract fills.
+    """
+
+    def __init__(self, kalshi_gateway, position_manager, capital_allocator: CapitalAllocator, strategy: str, order_prefix: str, maker_fee=None, executor: ThreadPoolExecutor | None = None):
+        self.kalshi_gateway = kalshi_gateway
+        self.position_manager = position_manager
+        self.capital_allocator = capital_allocator
+        self.strategy = strategy
+        self.order_prefix = order_prefix
+        self.maker_fee = maker_fee or (lambda order: Decimal(0))
+        self.executor = executor or ThreadPoolExecutor(max_workers=4)
+        self.logger = logging.getLogger("quote_manager")
+        self.reservations: dict[str, Reservation] = {}  # client_order_id -> reservation
+        self.filled: dict[str, int] = {}  # client_order_id -> contracts filled so far, while partially filled
+        self.counts = {KEEP: 0, AMEND: 0, CANCEL: 0, CREATE: 0, "api_calls": 0, "errors": 0}
+
+    # ------------------------------------------------------------------ #
+    # Capital                                                              #
+    # ------------------------------------------------------------------ #
+
+    def reserve(self, order: dict) -> bool:
+        remaining = order["count"] - self.filled.get(order["client_order_id"], 0)
+        amount = Decimal(remaining) * Decimal(quote_price(order)) / Decimal(100) + self.maker_fee(dict(order, count=remaining))
+        reservations = self.capital_allocator.reserve({"Kalshi": amount}, self.strategy)
+        if reservations is None:
+            return False
+        self.reservations[order["client_order_id"]] = reservations["Kalshi"]
+        return True
+
+    def release(self, client_order_id: str):
+        # Order rejected or cancelled: return its capital
+        self.filled.pop(client_order_id, None)
+        reservation = self.reservations.pop(client_order_id, None)
+        if reservation is not None:
+            self.capital_allocator.release(reservation)
+
+    def commit(self, client_order_id: str):
+        # Order filled: the reserved capital has been spent
+        self.filled.pop(client_order_id, None)
+        reservation = self.reservations.pop(client_order_id, None)
+        if reservation is not None:
+            self.capital_allocator.commit(reservation)
+
+    def fill(self, client_order_id: str, count: int) -> int:
+        """
+        Record *count* contracts filled on a quote and commit their share of
+        its reservation. Once the last contract has filled the quote is
+        removed, with its associations. Returns the contracts still resting.
+        """
+        order = self.position_manager.get_open_order(client_order_id)
+        if order is None:
+            return 0
+        filled = self.filled.get(client_order_id, 0)
+        remaining = order["count"] - filled - count
+        if remaining <= 0:
+            self.commit(client_order_id)
+            self.position_manager.remove_open_order(order["ticker"], order)
+            self.position_manager.remove_client_order_id_from_associated_orders(client_order_id)
+            return 0
+        reservation = self.reservations.get(client_order_id)
+        if reservation is not None:
+            # The filled share of what is still reserved has been spent
+            self.capital_allocator.commit_partial(reservation, reservation.amount * count / (order["count"] - filled))
+        self.filled[client_order_id] = filled + count
+        return remaining
+
+    def mark_open(self, client_order_id: str):
+        reservation = self.reservations.get(client_order_id)
+        if reservation is not None:
+            self.capital_allocator.mark_open(reservation)
+
+    # ------------------------------------------------------------------ #
+    # Resting quotes                                                       #
+    # ------------------------------------------------------------------ #
+
+    def resting_quotes(self, ticker: str) -> dict[str, dict]:
+        """side -> resting quote for *ticker*."""
+        resting = {}
+        for client_order_id in list(self.position_manager.get_open_orders_for_ticker(ticker)):
+            if client_order_id.startswith(self.order_prefix):
+                order = self.position_manager.get_open_order(client_order_id)
+                if order is not None:
+                    resting[order["side"]] = order
+        return resting
+
+    def quoted_tickers(self) -> set[str]:
+        """Tickers with at least one resting quote."""
+        with self.position_manager.lock:
+            return {
+                order["ticker"]
+                for client_order_id, order in self.position_manager.open_orders.items()
+                if client_order_id.startswith(self.order_prefix)
+            }
+
+    def new_order(self, ticker: str, side: str, price: int, count: int) -> dict:
+        return {
+            "ticker": ticker,
+            "action": "buy",
+            "side": side,
+            "count": count,
+            "client_order_id": self.order_prefix + str(uuid.uuid4()),
+            f"{side}_price": price,
+            "type": "limit",
+            "time_in_force": "good_till_canceled"
+        }
+
+    # ------------------------------------------------------------------ #
+    # Sync                                                                 #
+    # ------------------------------------------------------------------ #
+
+    def sync(self, desired: dict[str, dict[str, int] | None], count: int) -> dict:
+        """
+        Bring resting quotes in line with *desired* (ticker -> side -> price
+        in cents, or None to pull the ticker's quotes). New pairs are quoted
+        at *count* contracts. Returns the number of quotes per action.
+        """
+        cancels: list[dict] = []
+        amends: list[tuple[dict, int]] = []
+        creates: list[dict] = []
+        actions = {KEEP: 0, AMEND: 0, CANCEL: 0, CREATE: 0}
+
+        for ticker, target in desired.items():
+            resting = self.resting_quotes(ticker)
+            plan = plan_quotes(resting, target)
+            for side, action in plan.items():
+                actions[action] += 1
+                if action == CANCEL:
+                    cancels.append(resting[side])
+                elif action == AMEND:
+                    amends.append((resting[side], target[side]))
+            if plan and all(action == CREATE for action in plan.values()):
+                creates.extend(self._stage_pair(ticker, target, count))
+
+        self._cancel(cancels)
+        self._amend(amends)
+        self._create(creates)
+
+        for action, n in actions.items():
+            self.counts[action] += n
+        if cancels or amends or creates:
+            self.logger.info(f"Quote sync: {actions}, totals {self.counts}")
+        return actions
+
+    def _stage_pair(self, ticker: str, target: dict[str, int], count: int) -> list[dict]:
+        # Reserve capital for both quotes (both or neither)
+        orders = [self.new_order(ticker, side, target[side], count) for side in SIDES]
+        funded = []
+        for order in orders:
+            if not self.reserve(order):
+                for staged in funded:
+                    self.release(staged["client_order_id"])
+                return []
+            funded.append(order)
+
+        for order in orders:
+            self.mark_open(order["client_order_id"])
+            self.position_manager.add_open_order(ticker, order)
+        bid_order, ask_order = orders
+        self.position_manager.add_associated_order(client_order_id=bid_order["client_order_id"], associated_order_id=ask_order["client_order_id"])
+        self.position_manager.add_associated_order(client_order_id=ask_order["client_order_id"], associated_order_id=bid_order["client_order_id"])
+        return orders
+
+    def _cancel(self, orders: list[dict]):
+        for order in orders:
+            self.position_manager.remove_open_order(order["ticker"], order)
+            self.position_manager.remove_client_order_id_from_associated_orders(order["client_order_id"])
+            self.release(order["client_order_id"])
+        for start in range(0, len(orders), BATCH_LIMIT):
+            chunk = orders[start:start + BATCH_LIMIT]
+            self.counts["api_calls"] += 1
+            try:
+                self.kalshi_gateway.batch_cancel_orders({"orders": [{"order_id": o["client_order_id"]} for o in chunk]})
+            except Exception as e:
+                self.counts["errors"] += 1
+                self.logger.error(f"Batch cancel of {len(chunk)} quotes failed: {e}")
+
+    def _create(self, orders: list[dict]):
+        for start in range(0, len(orders), BATCH_LIMIT):
+            chunk = orders[start:start + BATCH_LIMIT]
+            self.counts["api_calls"] += 1
+            try:
+                self.kalshi_gateway.batch_create_orders({"orders": chunk})
+            except Exception as e:
+                self.counts["errors"] += 1
+                self.logger.error(f"Batch create of {len(chunk)} quotes failed: {e}")
+                # Nothing rests: untrack the chunk and free its capital
+                # (BATCH_LIMIT is even, so both quotes of a pair are in it)
+                for order in chunk:
+                    self.position_manager.remove_open_order(order["ticker"], order)
+                    self.position_manager.remove_client_order_id_from_associated_orders(order["client_order_id"])
+                    self.release(order["client_order_id"])
+
+    def _amend(self, amends: list[tuple[dict, int]]):
+        if not amends:
+            return
+        # Kalshi has no batch amend; send the amends concurrently and apply
+        # the bookkeeping once each is acknowledged
+        self.counts["api_calls"] += len(amends)
+        for (order, price), result in zip(amends, self.executor.map(self._send_amend, amends)):
+            if isinstance(result, Exception):
+                self.counts["errors"] += 1
+                self.logger.error(f"Amend of {order['client_order_id']} to {price} failed: {result}")
+            else:
+                self._rekey(order, result)
+
+    def _send_amend(self, amend: tuple[dict, int]):
+        order, price = amend
+        amended = dict(order, client_order_id=self.order_prefix + str(uuid.uuid4()))
+        amended[f"{order['side']}_price"] = price
+        try:
+            self.kalshi_gateway.amend_order(order["client_order_id"], {
+                "ticker": order["ticker"],
+                "side": order["side"],
+                "action": order["action"],
+                "client_order_id": order["client_order_id"],
+                "updated_client_order_id": amended["client_order_id"],
+                f"{order['side']}_price": price,
+                "count": order["count"],
+            })
+        except Exception as e:
+            return e
+        return amended
+
+    def _rekey(self, order: dict, amended: dict):
+        """Move an amended quote's bookkeeping to its new client order id."""
+        old_id, new_id = order["client_order_id"], amended["client_order_id"]
+        if self.position_manager.get_open_order(old_id) is None:
+            # Filled and hedged while the amend was in flight
+            return
+        ticker = order["ticker"]
+        associated = set(self.position_manager.get_associated_orders(old_id))
+        self.position_manager.remove_open_order(ticker, order)
+        self.position_manager.remove_client_order_id_from_associated_orders(old_id)
+        self.position_manager.add_open_order(ticker, amended)
+        if associated:
+            self.position_manager.add_associated_order(new_id, associated)
+        for other_id in associated:
+            self.position_manager.remove_associated_order(other_id, old_id)
+            self.position_manager.add_associated_order(other_id, new_id)
+
+        # The venue now holds funds for the unfilled part at the new price
+        filled = self.filled.pop(old_id, 0)
+        self.release(old_id)
+        if filled:
+            self.filled[new_id] = filled
+        if self.reserve(amended):
+            self.mark_open(new_id)
+        else:
+            self.logger.warning(f"No capital to re-reserve amended quote {new_id}; reconcile will pick it up")
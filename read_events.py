@@ -1,21 +1,30 @@
-import json
-from collections import defaultdict
-def read_and_display_markets(file_path="statics/two_market_events.json"):
-    """Read events from JSON file and display all markets.
+from collections import defaultdict, deque
+
+from record_stream import iter_records
+
+SHOW_LAST = 20
+
+
+def read_and_display_markets(file_path="statics/two_market_events.ndjson"):
+    """Read events from an NDJSON (or legacy JSON) file and display all markets.
     
     Args:
-        file_path: Path to the JSON file containing event data
+        file_path: Path to the file containing event data
     """
-    with open(file_path, "r") as f:
-        events = json.load(f)
+    # Stream the events; only the last SHOW_LAST are kept
+    n_events = 0
+    last_events = deque(maxlen=SHOW_LAST)
+    for event_data in iter_records(file_path):
+        n_events += 1
+        last_events.append(event_data)
     
-    print(f"Total events: {len(events)}\n")
+    print(f"Total events: {n_events}\n")
     print("="*80)
     
     total_markets = 0
     complimentary_markets = defaultdict(list)   
     namr_market = defaultdict(str)
-    for event_data in events[::-1][:20]:
+    for event_data in reversed(last_events):
         event = event_data.get("event", {})
         event_ticker = event.get("event_ticker", "N/A")
         title = event.get("title", "N/A")
@@ -0,0 +1,192 @@
+"""
+Newline-delimited JSON records for the large statics artifacts.
+
+The event listings and event details written by get_all_events.py and
+get_slugs_polymarket_us.py are lists of independent records. RecordWriter
+streams them one compact JSON object per line, gzip-compressed when the
+path ends in ".gz", into a temp file that replaces the target on a clean
+close. iter_records() reads them back lazily, one record at a time, so
+consumers hold one event in memory instead of the whole file.
+
+Paths name an artifact rather than one exact file: records_path() accepts
+any of RECORD_SUFFIXES for the same stem and returns whichever exists
+("statics/kalshi_spread_events.ndjson" finds a compressed ".ndjson.gz" or a
+legacy ".json" array). Legacy arrays are also streamed, item by item.
+
+Run `python record_stream.py` to compare json.dump / json.load of
+statics/events.json with NDJSON and compressed NDJSON.
+"""
+import gzip
+import json
+import os
+
+RECORD_SUFFIXES = (".ndjson", ".ndjson.gz", ".json")
+GZIP_LEVEL = 1  # fast; listings still compress about 10x
+READ_CHUNK = 1 << 16
+
+
+def _stem(path: str) -> str:
+    for suffix in RECORD_SUFFIXES:
+        if path.endswith(suffix):
+            return path[: -len(suffix)]
+    return path
+
+
+def records_path(path: str) -> str:
+    """The existing file for *path*'s artifact, trying each record suffix."""
+    if os.path.exists(path):
+        return path
+    stem = _stem(path)
+    for suffix in RECORD_SUFFIXES:
+        if os.path.exists(stem + suffix):
+            return stem + suffix
+    raise FileNotFoundError(path)
+
+
+def _open_text(path: str, mode: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8", compresslevel=GZIP_LEVEL)
+    return open(path, mode, encoding="utf-8")
+
+
+class RecordWriter:
+    """
+    Streams records to *path* as NDJSON (gzip if it ends in ".gz").
+
+    Records go to a temp file that replaces *path* on a clean close; if the
+    block raises, the temp file is removed and *path* is left untouched.
+    Other files of the same artifact (e.g. a legacy ".json") are removed on
+    close, so readers never pick up a stale copy.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.count = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        # The temp name keeps the ".gz" so _open_text compresses it
+        self._tmp_path = path + ".tmp" + (".gz" if path.endswith(".gz") else "")
+        self._file = _open_text(self._tmp_path, "w")
+
+    def write(self, record):
+        self._file.write(json.dumps(record, separators=(",", ":")) + "\n")
+        self.count += 1
+
+    def write_many(self, records):
+        for record in records:
+            self.write(record)
+
+    def close(self):
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+        stem = _stem(self.path)
+        for suffix in RECORD_SUFFIXES:
+            if stem + suffix != self.path and os.path.exists(stem + suffix):
+                os.remove(stem + suffix)
+
+    def abort(self):
+        self._file.close()
+        os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+def _iter_json_array(f):
+    """Yield the items of a JSON array file without loading it whole."""
+    decoder = json.JSONDecoder()
+    buf = f.read(READ_CHUNK).lstrip()
+    if not buf.startswith("["):
+        raise ValueError("expected a JSON array")
+    buf = buf[1:]
+    eof = False
+    while True:
+        buf = buf.lstrip().lstrip(",").lstrip()
+        if buf.startswith("]"):
+            return
+        try:
+            item, end = decoder.raw_decode(buf)
+        except json.JSONDecodeError:
+            item = end = None
+        # An item that ends the buffer may be cut short (e.g. a number)
+        if item is None or (end == len(buf) and not eof):
+            chunk = f.read(READ_CHUNK)
+            if not chunk:
+                if eof:
+                    raise ValueError("truncated JSON array")
+                eof = True
+            buf += chunk
+            continue
+        yield item
+        buf = buf[end:]
+
+
+def iter_records(path: str):
+    """Lazily yield the records of *path*'s artifact (NDJSON, gzip NDJSON or a JSON array)."""
+    path = records_path(path)
+    with _open_text(path, "r") as f:
+        if path.endswith(".json"):
+            yield from _iter_json_array(f)
+            return
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+if __name__ == "__main__":
+    # Benchmark: statics/events.json written and read back as an indented
+    # JSON array (the old json.dump / json.load), NDJSON and gzip NDJSON
+    import tempfile
+    import time
+    import tracemalloc
+
+    source = "statics/events.json"
+    records = list(iter_records(source))
+
+    def measure(fn):
+        # Timed untraced, then run again under tracemalloc for the peak
+        start = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - start
+        tracemalloc.start()
+        fn()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return result, elapsed, peak / 1e6
+
+    def consume(iterable):
+        # What the statics builders do: one pass over every event's markets
+        return sum(len(r.get("markets", ())) + 1 for r in iterable)
+
+    def load_all(path):
+        with open(path) as f:
+            return consume(json.load(f))
+
+    def dump_all(path):
+        with open(path, "w") as f:
+            json.dump(records, f, indent=4)
+
+    def write_stream(path):
+        with RecordWriter(path) as writer:
+            writer.write_many(records)
+
+    print(f"{len(records)} records from {source}")
+    print(f"{'format':<16} {'size':>8} {'write':>8} {'read':>8} {'read peak':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for label, name, write, read in (
+            ("json indent=4", "events.json", dump_all, load_all),
+            ("json streamed", "events.json", dump_all, lambda p: consume(iter_records(p))),
+            ("ndjson", "events.ndjson", write_stream, lambda p: consume(iter_records(p))),
+            ("ndjson.gz", "events.ndjson.gz", write_stream, lambda p: consume(iter_records(p))),
+        ):
+            path = os.path.join(tmp, name)
+            _, write_s, _ = measure(lambda: write(path))
+            count, read_s, read_mb = measure(lambda: read(path))
+            size_mb = os.path.getsize(path) / 1e6
+            print(f"{label:<16} {size_mb:>6.2f}MB {write_s * 1000:>6.0f}ms {read_s * 1000:>6.0f}ms {read_mb:>8.2f}MB")
+            assert count == consume(records)
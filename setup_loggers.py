@@ -59,6 +59,9 @@ def setup_logging():
     # Cross-exchange strategy log
     setup_logger("cross_exchange_strategy", "cross_exchange_strategy")
 
+    # Cross-exchange spread/total strategy log
+    setup_logger("cross_exchange_spread_total_strategy", "cross_exchange_spread_total_strategy")
+
     # Intra Kalshi strategy log
     setup_logger("intra_kalshi_strategy", "intra_kalshi_strategy")
 
@@ -68,6 +71,22 @@ def setup_logging():
     # Wide Spread strategy log
     setup_logger("wide_spread_strategy", "wide_spread_strategy")
 
+    # Wide Spread resting quote management log
+    setup_logger("quote_manager", "quote_manager")
+
+    # Opportunity lifecycle tracker log
+    setup_logger("opportunity_tracker", "opportunity_tracker")
+
+    # Capital allocator log
+    setup_logger("capital_allocator", "capital_allocator")
+    setup_logger("pre_trade_risk", "pre_trade_risk")
+
+    # Statics hot reload log
+    setup_logger("statics_refresh", "statics_refresh")
+
+    # Metadata fetcher (statics refresh requests) log
+    setup_logger("metadata_fetcher", "metadata_fetcher")
+
     # === 2️⃣ Feed log files ===
     # Kalshi feed log
     setup_logger("kalshi_feed", "kalshi_feed")
@@ -0,0 +1,180 @@
+"""Parse-once loader for statics JSON files with a persisted binary cache.
+
+statics/statics.json is read by several modules at startup (asset ids per
+venue, correlated market mappings, CSV names). load_statics() parses each
+file at most once per process and compiles it into a Statics object:
+
+    - every ticker and display name is interned, so the tickers shared by
+      ASSET_ID_MAPPING and the *_MARKET_MAPPING tables (ticker ->
+      [correlated tickers]) are stored once
+    - everything else is kept as parsed
+
+The compiled object is pickled to statics/.cache/ keyed by the source file's
+mtime and size, so a cold start with an unchanged statics file skips JSON
+parsing entirely.
+"""
+
+import json
+import logging
+import os
+import pickle
+import sys
+import threading
+import time
+from pathlib import Path
+
+STATICS_PATH = "statics/statics.json"
+CACHE_DIR = "statics/.cache"
+CACHE_VERSION = 2
+
+logger = logging.getLogger("statics_loader")
+
+_loaded: dict[str, "Statics"] = {}
+_loaded_lock = threading.Lock()
+
+
+class Statics:
+    """Compiled, read-only view of a statics JSON file."""
+
+    def __init__(self, raw: dict):
+        # ASSET_ID_MAPPING: market -> {ticker: display name}
+        self.asset_id_mapping: dict[str, dict[str, str]] = {}
+        for market, mapping in raw.get("ASSET_ID_MAPPING", {}).items():
+            self.asset_id_mapping[market] = {
+                sys.intern(ticker): sys.intern(name) for ticker, name in mapping.items()
+            }
+
+        # *_MARKET_MAPPING: ticker -> [tickers], with every ticker interned
+        self.correlated: dict[str, dict[str, list[str]]] = {}
+        self.other: dict = {}
+        for key, value in raw.items():
+            if key == "ASSET_ID_MAPPING":
+                continue
+            if key.endswith("MARKET_MAPPING") and _is_ticker_list_mapping(value):
+                self.correlated[key] = {
+                    sys.intern(ticker): [sys.intern(other) for other in correlated]
+                    for ticker, correlated in value.items()
+                }
+            else:
+                self.other[key] = value
+
+    # ------------------------------------------------------------------ #
+    # Lookups                                                              #
+    # ------------------------------------------------------------------ #
+
+    def get_asset_ids(self, market: str) -> list[str]:
+        mapping = self.asset_id_mapping.get(market)
+        return list(mapping.keys()) if mapping else []
+
+    def get_display_name(self, market: str, asset_id: str, default: str | None = None) -> str | None:
+        return self.asset_id_mapping.get(market, {}).get(asset_id, default)
+
+    def get_mapping(self, name: str):
+        """Return the value stored under *name*, in its JSON shape."""
+        if name == "ASSET_ID_MAPPING":
+            return self.asset_id_mapping
+        if name in self.correlated:
+            return self.correlated[name]
+        return self.other[name]
+
+    def __contains__(self, name):
+        return name == "ASSET_ID_MAPPING" or name in self.correlated or name in self.other
+
+
+def _is_ticker_list_mapping(value) -> bool:
+    if not isinstance(value, dict):
+        return False
+    for ticker, correlated in value.items():
+        return isinstance(ticker, str) and isinstance(correlated, list) and all(
+            isinstance(other, str) for other in correlated
+        )
+    return True
+
+
+# ---------------------------------------------------------------------- #
+# Cache                                                                    #
+# ---------------------------------------------------------------------- #
+
+def _cache_path(path: str) -> Path:
+    name = Path(path).name.replace(os.sep, "_")
+    return Path(CACHE_DIR) / f"{name}.pickle"
+
+
+def _source_key(path: str) -> tuple:
+    stat = os.stat(path)
+    return (CACHE_VERSION, os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+
+def _read_cache(path: str, key: tuple):
+    cache_path = _cache_path(path)
+    try:
+        with open(cache_path, "rb") as f:
+            cached_key, statics = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, ValueError, AttributeError):
+        return None
+    return statics if cached_key == key else None
+
+
+def _write_cache(path: str, key: tuple, statics: Statics):
+    cache_path = _cache_path(path)
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = cache_path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            pickle.dump((key, statics), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        logger.warning(f"Could not write statics cache {cache_path}: {e}")
+
+
+def load_statics(path: str = STATICS_PATH, use_cache: bool = True) -> Statics:
+    """Return the compiled statics for *path*, parsing at most once per process."""
+    with _loaded_lock:
+        statics = _loaded.get(path)
+        if statics is not None:
+            return statics
+
+        key = _source_key(path)
+        statics = _read_cache(path, key) if use_cache else None
+        if statics is None:
+            with open(path, "r") as f:
+                statics = Statics(json.load(f))
+            if use_cache:
+                _write_cache(path, key, statics)
+
+        _loaded[path] = statics
+        return statics
+
+
+def invalidate(path: str | None = None):
+    """Forget the in-process copy so the next load_statics() re-reads from disk."""
+    with _loaded_lock:
+        if path is None:
+            _loaded.clear()
+        else:
+            _loaded.pop(path, None)
+
+
+if __name__ == "__main__":
+    # Compare cold-start costs: raw JSON parse vs compile vs cached load
+    path = sys.argv[1] if len(sys.argv) > 1 else STATICS_PATH
+
+    start = time.perf_counter()
+    with open(path, "r") as f:
+        raw = json.load(f)
+    parse_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    compiled = Statics(raw)
+    compile_s = time.perf_counter() - start
+    _write_cache(path, _source_key(path), compiled)
+
+    start = time.perf_counter()
+    cached = _read_cache(path, _source_key(path))
+    cache_s = time.perf_counter() - start
+
+    print(f"json.load:         {parse_s * 1000:.1f} ms")
+    print(f"compile:           {compile_s * 1000:.1f} ms")
+    print(f"cached load:       {cache_s * 1000:.1f} ms")
+    print(f"tickers:           {sum(len(m) for m in cached.asset_id_mapping.values())}")
+    print(f"cache file:        {_cache_path(path)} ({_cache_path(path).stat().st_size / 1e6:.2f} MB)")
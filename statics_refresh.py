@@ -0,0 +1,445 @@
+"""Incremental statics refresh and hot reload of feed subscriptions.
+
+The offline builders (get_all_events.py, get_slugs_polymarket_us.py,
+update_kalshi_tickers_with_moneyline_events.py) refetch every event, every
+event's details, and rewrite every statics file on each run. This module
+keeps a local EventStore per venue instead:
+
+    - each listing is fingerprinted per event ticker / slug, with the time
+      the event was first seen, last seen and last changed
+    - Kalshi event details are only fetched for new or changed events, or
+      when the stored details are older than DETAIL_MAX_AGE_S (volume and
+      close times drift)
+    - events that drop out of the listing are dropped from the store; a
+      listing cut short by a failed page (IncompleteListing) is discarded
+      and that venue's statics are left as they are
+
+The statics are then rebuilt from the store with the same builders, diffed
+against statics/statics.json, and written only if something changed: every
+file goes through a temp file and a rename, and the per-key delta is saved
+to statics/statics_delta.json.
+
+StaticsWatcher runs inside the trading process. When statics.json changes
+on disk it reloads it and adds / removes feed markets to match (see
+FeedHandler.add_markets / remove_markets), so new markets are picked up
+and settled ones freed without a restart. A reload that would unsubscribe
+more than MAX_RELOAD_REMOVED_FRACTION of a feed's instruments is refused
+unless forced.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+
+import get_all_events
+from metadata_fetcher import IncompleteListing
+from pair_graph import PairGraph, build_pair_graph
+from record_stream import iter_records
+from statics_loader import STATICS_PATH, invalidate, load_statics
+from update_kalshi_tickers_with_moneyline_events import MARKET_TYPE_CONFIG, PAIR_GRAPH_MAX_GAP, build_market_type_statics
+from utils import read_file_data, write_json_atomic
+
+KALSHI_STORE_PATH = "statics/.cache/kalshi_event_store.json"
+POLYMARKET_US_STORE_PATH = "statics/.cache/polymarket_us_event_store.json"
+DELTA_PATH = "statics/statics_delta.json"
+VOLUME_PATH = "statics/kalshi_volume_per_market.json"
+CLOSE_TIME_PATH = "statics/kalshi_close_time_per_market.json"
+
+# Refetch details of unchanged Kalshi events at least this often
+DETAIL_MAX_AGE_S = 6 * 60 * 60
+
+RELOAD_INTERVAL_S = 30.0
+
+# A reload may unsubscribe at most this fraction of a feed's instruments
+# (feeds with fewer than RELOAD_GUARD_MIN_INSTRUMENTS are not guarded)
+MAX_RELOAD_REMOVED_FRACTION = 0.5
+RELOAD_GUARD_MIN_INSTRUMENTS = 20
+
+# Venue key in ASSET_ID_MAPPING -> event -> market mapping file
+POLYMARKET_US_MARKET_TYPES = {
+    "moneyline": ("Polymarket_US", "statics/polymarket_us_event_to_market_mapping.json"),
+    "spread": ("Polymarket_US_Spread", "statics/polymarket_us_spread_event_to_market_mapping.json"),
+    "total": ("Polymarket_US_Total", "statics/polymarket_us_total_event_to_market_mapping.json"),
+}
+
+# The Polymarket listing carries prices and volumes; only these fields
+# feed the statics, so only they decide whether an event changed
+POLYMARKET_US_EVENT_FIELDS = ("slug", "category", "seriesSlug", "title", "subtitle")
+POLYMARKET_US_MARKET_FIELDS = ("slug", "marketType", "sportsMarketTypeV2")
+
+logger = logging.getLogger("statics_refresh")
+
+
+def fingerprint(payload) -> str:
+    return hashlib.sha1(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def polymarket_us_fingerprint(event: dict) -> str:
+    return fingerprint({
+        **{field: event.get(field) for field in POLYMARKET_US_EVENT_FIELDS},
+        "markets": [
+            {field: market.get(field) for field in POLYMARKET_US_MARKET_FIELDS}
+            for market in event.get("markets", [])
+        ],
+    })
+
+
+class EventStore:
+    """
+    Events of one venue keyed by event ticker / slug, persisted as JSON.
+
+    Each record holds the latest listing entry ("event"), its fingerprint,
+    first_seen / last_seen / last_changed timestamps and, where the venue
+    needs a second call, the fetched "detail" with detail_fetched.
+    """
+
+    def __init__(self, path: str | None):
+        self.path = path
+        self.records: dict[str, dict] = {}
+        if path is not None and os.path.exists(path):
+            self.records = read_file_data(path)
+
+    def __len__(self):
+        return len(self.records)
+
+    def observe(self, listing: dict[str, dict], now: float, fingerprint_of=fingerprint) -> dict[str, list[str]]:
+        """Fold a full listing (key -> event) into the store; returns the new, changed and gone keys."""
+        new, changed = [], []
+        for key, event in listing.items():
+            digest = fingerprint_of(event)
+            record = self.records.get(key)
+            if record is None:
+                self.records[key] = {"event": event, "fingerprint": digest, "first_seen": now, "last_seen": now, "last_changed": now, "detail": None, "detail_fetched": None}
+                new.append(key)
+                continue
+            record["last_seen"] = now
+            record["event"] = event
+            if record["fingerprint"] != digest:
+                record["fingerprint"] = digest
+                record["last_changed"] = now
+                record["detail"] = None
+                changed.append(key)
+
+        gone = [key for key in self.records if key not in listing]
+        for key in gone:
+            del self.records[key]
+        return {"new": new, "changed": changed, "gone": gone}
+
+    def needs_detail(self, now: float, max_age_s: float = DETAIL_MAX_AGE_S, wanted=None) -> list[str]:
+        """Keys (filtered by *wanted(event)*) without details or with details older than max_age_s."""
+        return [
+            key for key, record in self.records.items()
+            if (wanted is None or wanted(record["event"]))
+            and (record["detail"] is None or now - record["detail_fetched"] > max_age_s)
+        ]
+
+    def set_detail(self, key: str, detail: dict, now: float):
+        record = self.records.get(key)
+        if record is not None:
+            record["detail"] = detail
+            record["detail_fetched"] = now
+
+    def events(self) -> list[dict]:
+        return [record["event"] for record in self.records.values()]
+
+    def save(self):
+        if self.path is not None:
+            write_json_atomic(self.path, self.records)
+
+
+# ---------------------------------------------------------------------- #
+# Fetch                                                                    #
+# ---------------------------------------------------------------------- #
+
+def is_kalshi_statics_event(event: dict) -> bool:
+    """Kalshi events the statics are built from (moneyline, spread, total)."""
+    return event.get("mutually_exclusive", False) or get_all_events.is_spread_event(event) or get_all_events.is_total_event(event)
+
+
+def refresh_kalshi(store: EventStore, fetch_events=get_all_events.fetch_all_events, fetch_details=get_all_events.fetch_event_details_batch, now: float | None = None) -> dict:
+    """List open Kalshi events and fetch details only where needed."""
+    now = time.time() if now is None else now
+    listing = {event["event_ticker"]: event for event in fetch_events(status="open") if event.get("event_ticker")}
+    changes = store.observe(listing, now)
+
+    stale = store.needs_detail(now, wanted=is_kalshi_statics_event)
+    for detail in fetch_details([listing[key] for key in stale]):
+        store.set_detail(detail.get("event", {}).get("event_ticker"), detail, now)
+
+    changes["details_fetched"] = len(stale)
+    return changes
+
+
+def refresh_polymarket_us(store: EventStore, fetch_events=None, now: float | None = None) -> dict:
+    """List Polymarket US events (markets included, so no detail calls)."""
+    if fetch_events is None:
+        # Imported here: get_slugs_polymarket_us loads the signing key on import
+        from get_slugs_polymarket_us import fetch_all_events as fetch_events
+    now = time.time() if now is None else now
+    listing = {event["slug"]: event for event in fetch_events() if event.get("slug")}
+    return store.observe(listing, now, fingerprint_of=polymarket_us_fingerprint)
+
+
+# ---------------------------------------------------------------------- #
+# Build and apply                                                          #
+# ---------------------------------------------------------------------- #
+
+def build_statics(kalshi_store: EventStore | None, polymarket_us_store: EventStore | None) -> tuple[dict, dict]:
+    """
+    Statics entries and side files rebuilt from the stores.
+
+    Returns (statics updates, side files) where statics updates maps
+    ASSET_ID_MAPPING venue keys and correlated mapping keys to their new
+    tables, and side files maps output path -> payload (JSON, or a
+    PairGraph for the spread/total pair graphs).
+    """
+    asset_ids, updates, files = {}, {}, {}
+
+    if kalshi_store is not None:
+        details = {key: record["detail"] for key, record in kalshi_store.records.items() if record["detail"] is not None}
+        briefs = {key: record["event"] for key, record in kalshi_store.records.items()}
+        events_by_type = {
+            "moneyline": [d for key, d in details.items() if briefs[key].get("mutually_exclusive", False) and len(d.get("markets", [])) == 2],
+            "spread": [d for key, d in details.items() if get_all_events.is_spread_event(briefs[key])],
+            "total": [d for key, d in details.items() if get_all_events.is_total_event(briefs[key])],
+        }
+        for market_type, events in events_by_type.items():
+            cfg = MARKET_TYPE_CONFIG[market_type]
+            built = build_market_type_statics(market_type, events)
+            asset_ids[cfg["asset_id_key"]] = built["asset_id_mapping"]
+            updates[cfg["correlated_key"]] = built["correlated_mapping"]
+            files[cfg["mapping_path"]] = built["mapping"]
+            if "pair_graph_path" in cfg:
+                files[cfg["pair_graph_path"]] = build_pair_graph(built["correlated_mapping"], PAIR_GRAPH_MAX_GAP)[0]
+
+        statics_events = [details[key] for key in details if is_kalshi_statics_event(briefs[key])]
+        files[VOLUME_PATH] = dict(get_all_events.collect_volume(statics_events))
+        files[CLOSE_TIME_PATH] = get_all_events.collect_close_time(statics_events)
+
+    if polymarket_us_store is not None:
+        from get_slugs_polymarket_us import build_polymarket_mapping
+        events = polymarket_us_store.events()
+        for market_type, (asset_id_key, mapping_path) in POLYMARKET_US_MARKET_TYPES.items():
+            asset_ids[asset_id_key], files[mapping_path] = build_polymarket_mapping(events, market_type)
+
+    if asset_ids:
+        updates["ASSET_ID_MAPPING"] = asset_ids
+    return updates, files
+
+
+def statics_delta(old: dict, updates: dict) -> dict:
+    """
+    Per-key difference between the current statics and *updates*:
+    ASSET_ID_MAPPING venues list their added / removed tickers, other keys
+    the number of tickers whose correlated list changed.
+    """
+    delta = {}
+    old_asset_ids = old.get("ASSET_ID_MAPPING", {})
+    for venue, tickers in updates.get("ASSET_ID_MAPPING", {}).items():
+        previous = old_asset_ids.get(venue, {})
+        added = [t for t in tickers if t not in previous]
+        removed = [t for t in previous if t not in tickers]
+        if added or removed:
+            delta.setdefault("ASSET_ID_MAPPING", {})[venue] = {"added": added, "removed": removed}
+    for key, mapping in updates.items():
+        if key == "ASSET_ID_MAPPING":
+            continue
+        previous = old.get(key, {})
+        changed = sum(1 for t in mapping.keys() | previous.keys() if mapping.get(t) != previous.get(t))
+        if changed:
+            delta[key] = {"changed": changed}
+    return delta
+
+
+def apply_refresh(updates: dict, files: dict, statics_path: str = STATICS_PATH, delta_path: str = DELTA_PATH) -> dict:
+    """Write the side files that changed and, if the statics changed, the new statics and delta."""
+    for path, payload in files.items():
+        if isinstance(payload, PairGraph):
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    if f.read() == payload.to_bytes():
+                        continue
+            payload.save(path)
+            continue
+        # Round-trip so defaultdicts and tuples compare like the JSON on disk
+        payload = json.loads(json.dumps(payload))
+        if not os.path.exists(path) or read_file_data(path) != payload:
+            write_json_atomic(path, payload)
+
+    statics = read_file_data(statics_path) if os.path.exists(statics_path) else {}
+    delta = statics_delta(statics, updates)
+    if not delta:
+        return delta
+
+    for key, value in updates.items():
+        if key == "ASSET_ID_MAPPING":
+            statics.setdefault("ASSET_ID_MAPPING", {}).update(value)
+        else:
+            statics[key] = value
+    write_json_atomic(statics_path, statics)
+    write_json_atomic(delta_path, {"generated_at": time.time(), "delta": delta})
+    invalidate(statics_path)
+    return delta
+
+
+def refresh(kalshi: bool = True, polymarket_us: bool = True) -> dict:
+    kalshi_store = EventStore(KALSHI_STORE_PATH) if kalshi else None
+    polymarket_us_store = EventStore(POLYMARKET_US_STORE_PATH) if polymarket_us else None
+
+    # An incomplete listing would drop every unlisted event from the store
+    # (and its markets from the statics); skip the venue instead
+    if kalshi_store is not None:
+        try:
+            print(f"[Kalshi] {summarize(refresh_kalshi(kalshi_store))}")
+            kalshi_store.save()
+        except IncompleteListing as e:
+            logger.error(f"Kalshi refresh skipped, statics left unchanged: {e}")
+            kalshi_store = None
+    if polymarket_us_store is not None:
+        try:
+            print(f"[Polymarket_US] {summarize(refresh_polymarket_us(polymarket_us_store))}")
+            polymarket_us_store.save()
+        except IncompleteListing as e:
+            logger.error(f"Polymarket_US refresh skipped, statics left unchanged: {e}")
+            polymarket_us_store = None
+
+    delta = apply_refresh(*build_statics(kalshi_store, polymarket_us_store))
+    print(f"Statics delta: {summarize_delta(delta)}")
+    return delta
+
+
+def summarize(changes: dict) -> str:
+    return ", ".join(f"{len(v) if isinstance(v, list) else v} {k}" for k, v in changes.items())
+
+
+def summarize_delta(delta: dict) -> str:
+    if not delta:
+        return "unchanged"
+    parts = [
+        f"{venue} +{len(d['added'])}/-{len(d['removed'])}"
+        for venue, d in delta.get("ASSET_ID_MAPPING", {}).items()
+    ]
+    parts += [f"{key} {d['changed']} changed" for key, d in delta.items() if key != "ASSET_ID_MAPPING"]
+    return ", ".join(parts)
+
+
+# ---------------------------------------------------------------------- #
+# Hot reload                                                               #
+# ---------------------------------------------------------------------- #
+
+class StaticsWatcher:
+    """
+    Polls statics.json and, when it changes, re-subscribes the feeds.
+
+    feeds is a list of (feed, [ASSET_ID_MAPPING venue keys]); each feed
+    adds the union of its keys' tickers and removes (freeing the books of)
+    tickers no longer listed, which also notifies the feed's market
+    listeners. on_reload callbacks then receive the reloaded Statics and
+    {feed venue: (added, removed)}.
+
+    If any feed would lose more than max_removed_fraction of its
+    instruments, the reload is refused as a whole (no feed is touched, no
+    callback runs) until reload(force=True) is called.
+    """
+
+    def __init__(self, feeds, path: str = STATICS_PATH, interval_s: float = RELOAD_INTERVAL_S, on_reload=(), max_removed_fraction: float = MAX_RELOAD_REMOVED_FRACTION):
+        self.feeds = feeds
+        self.path = path
+        self.interval_s = interval_s
+        self.on_reload = list(on_reload)
+        self.max_removed_fraction = max_removed_fraction
+        self._mtime_ns = self._stat()
+
+    def _stat(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.interval_s)
+            mtime_ns = self._stat()
+            if mtime_ns is None or mtime_ns == self._mtime_ns:
+                continue
+            self._mtime_ns = mtime_ns
+            try:
+                await self.reload()
+            except Exception as e:
+                logger.error(f"Statics reload failed: {e}")
+
+    async def reload(self, force: bool = False) -> dict:
+        invalidate(self.path)
+        statics = await asyncio.to_thread(load_statics, self.path)
+
+        plans = []
+        for feed, keys in self.feeds:
+            wanted = list(dict.fromkeys(ticker for key in keys for ticker in statics.get_asset_ids(key)))
+            wanted_set = set(wanted)
+            plans.append((feed, wanted, [i for i in feed.instruments if i not in wanted_set]))
+
+        if not force:
+            for feed, _, gone in plans:
+                subscribed = len(feed.instruments)
+                if subscribed >= RELOAD_GUARD_MIN_INSTRUMENTS and len(gone) > self.max_removed_fraction * subscribed:
+                    logger.error(f"Statics reload refused: {feed.venue} would drop {len(gone)} of {subscribed} instruments; "
+                                 f"check {self.path} and call reload(force=True) to apply it")
+                    return {}
+
+        changes = {}
+        for feed, wanted, gone in plans:
+            removed = await feed.remove_markets(gone)
+            added = await feed.add_markets(wanted)
+            changes[feed.venue] = (added, removed)
+            if added or removed:
+                logger.info(f"{feed.venue} subscriptions reloaded: +{len(added)} -{len(removed)}, {len(feed.instruments)} instruments")
+
+        for callback in self.on_reload:
+            callback(statics, changes)
+        return changes
+
+
+if __name__ == "__main__":
+    import sys
+
+    if "--demo" not in sys.argv:
+        refresh(kalshi="--polymarket-only" not in sys.argv, polymarket_us="--kalshi-only" not in sys.argv)
+        sys.exit(0)
+
+    # Demo: two refreshes of the saved Kalshi spread events through stub fetchers
+    import update_kalshi_tickers_with_moneyline_events
+
+    # The saved events may have closed already; keep them all
+    update_kalshi_tickers_with_moneyline_events.MIN_CLOSE_TS = 0
+    update_kalshi_tickers_with_moneyline_events.MAX_CLOSE_TS = 0
+
+    details = list(iter_records("statics/kalshi_spread_events.ndjson"))
+    briefs = [dict(d["event"], product_metadata={"competition_scope": "Spread"}) for d in details]
+    by_ticker = {d["event"]["event_ticker"]: d for d in details}
+    calls = []
+
+    def fetch_events(status="open", listing=briefs):
+        return listing
+
+    def fetch_details(events):
+        calls.append(len(events))
+        return [by_ticker[e["event_ticker"]] for e in events]
+
+    store = EventStore(None)
+    start = time.perf_counter()
+    first = refresh_kalshi(store, fetch_events, fetch_details, now=0.0)
+    updates, _ = build_statics(store, None)
+    print(f"cold: {summarize(first)} in {time.perf_counter() - start:.2f}s, "
+          f"{len(updates['ASSET_ID_MAPPING']['Kalshi_Spread'])} spread markets")
+
+    # One event renamed, one closed; everything else unchanged
+    changed = [dict(briefs[0], title=briefs[0].get("title", "") + " (updated)")] + briefs[2:]
+    start = time.perf_counter()
+    second = refresh_kalshi(store, lambda status="open": changed, fetch_details, now=60.0)
+    new_updates, _ = build_statics(store, None)
+    delta = statics_delta(updates, new_updates)
+    print(f"warm: {summarize(second)} in {time.perf_counter() - start:.2f}s, detail calls per refresh {calls}")
+    print(f"delta: {summarize_delta(delta)}")
@@ -0,0 +1,54 @@
+import threading
+
+import numpy as np
+
+
+class SymbolTable:
+    """
+    Process-wide mapping between instrument names and dense integer ids.
+
+    Kalshi tickers, Polymarket US slugs and their "-inverse" mirrors are all
+    interned into one id space at startup, so books, snapshots, pair lists
+    and positions can be stored in arrays indexed by id. String names are
+    only needed at the I/O boundaries (WebSocket messages, REST orders,
+    logs).
+
+    Ids are never reused; interning is thread-safe and lookups are lock-free.
+    """
+
+    def __init__(self):
+        self.names: list[str] = []
+        self.ids: dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.names)
+
+    def intern(self, name: str) -> int:
+        symbol_id = self.ids.get(name)
+        if symbol_id is not None:
+            return symbol_id
+        with self.lock:
+            symbol_id = self.ids.get(name)
+            if symbol_id is None:
+                symbol_id = len(self.names)
+                self.names.append(name)
+                self.ids[name] = symbol_id
+            return symbol_id
+
+    def intern_many(self, names) -> np.ndarray:
+        return np.fromiter((self.intern(name) for name in names), dtype=np.int32)
+
+    def id_of(self, name: str) -> int | None:
+        return self.ids.get(name)
+
+    def name_of(self, symbol_id: int) -> str:
+        return self.names[symbol_id]
+
+    def names_of(self, symbol_ids) -> list[str]:
+        names = self.names
+        return [names[i] for i in symbol_ids]
+
+
+# Shared by every feed, strategy and manager in the process
+symbols = SymbolTable()
@@ -0,0 +1,238 @@
+import logging
+import math
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+
+from symbol_table import symbols as default_symbols
+from top_of_book_history import ASK, BID
+from utils import read_file_data
+
+DEFAULT_TOP_K = 50
+REFRESH_INTERVAL_S = 5.0
+
+# Weight of the newest observation in the spread / quote-change averages
+EWMA_ALPHA = 0.05
+
+# Markets closing sooner than this are not worth starting to quote
+MIN_TIME_TO_CLOSE_S = 15 * 60
+# Time-to-close score halves every this many seconds
+TIME_TO_CLOSE_HALF_LIFE_S = 24 * 60 * 60
+
+WEIGHTS = {
+    "volume": 1.0,
+    "spread": 1.0,
+    "stability": 0.5,
+    "close": 1.0,
+}
+
+
+def parse_close_time(value) -> float:
+    """Epoch seconds from an ISO-8601 close_time (or a number), NaN if unknown."""
+    if value is None or value == "":
+        return math.nan
+    if isinstance(value, (int, float)):
+        return float(value)
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+
+class TickerRanker:
+    """
+    Ranks candidate tickers for quoting and keeps a bounded top-K set.
+
+    Every ticker is scored from four components, each in [0, 1]:
+        volume     24h volume inside the volume band, log-scaled
+                   (outside the band the ticker is ineligible)
+        spread     average spread relative to the spread band: wide enough
+                   to earn the edge, not so wide the book is empty
+        stability  1 - fraction of cycles in which the top of book moved;
+                   churning books overtake our quotes and cost amends
+        close      decays with time to close, so markets ending soon rank
+                   first; markets closing within MIN_TIME_TO_CLOSE_S are
+                   ineligible
+
+    State lives in arrays indexed by symbol id. observe() folds each cycle's
+    snapshot into the spread and quote-change averages in one vectorized
+    pass; set_volume() / set_close_time() update single tickers as live data
+    arrives. top_k() re-scores and re-selects with argpartition at most
+    every refresh_interval_s, so the strategy loops over K tickers instead
+    of every book.
+    """
+
+    def __init__(self, top_k: int = DEFAULT_TOP_K, volume_band=(1000, 10000), spread_band=(0.05, 0.15), refresh_interval_s: float = REFRESH_INTERVAL_S, symbol_table=None):
+        self.k = top_k
+        self.volume_band = volume_band
+        self.spread_band = spread_band
+        self.refresh_interval_s = refresh_interval_s
+        self.symbols = symbol_table or default_symbols
+        self.logger = logging.getLogger("wide_spread_strategy")
+
+        self.volume = np.full(0, np.nan)
+        self.close_ts = np.full(0, np.nan)
+        self.spread_ewma = np.full(0, np.nan)
+        self.change_ewma = np.zeros(0)
+        self._previous_quotes: np.ndarray | None = None
+
+        self._top = np.empty(0, dtype=np.int64)
+        self._top_names: set[str] = set()
+        self._last_refresh = -math.inf
+
+    def _ensure_capacity(self, n: int):
+        if n <= len(self.volume):
+            return
+        size = max(n, 2 * len(self.volume))
+
+        def grown(values, fill):
+            out = np.full(size, fill, dtype=np.float64)
+            out[:len(values)] = values
+            return out
+
+        self.volume = grown(self.volume, np.nan)
+        self.close_ts = grown(self.close_ts, np.nan)
+        self.spread_ewma = grown(self.spread_ewma, np.nan)
+        self.change_ewma = grown(self.change_ewma, 0.0)
+
+    # ------------------------------------------------------------------ #
+    # Inputs                                                               #
+    # ------------------------------------------------------------------ #
+
+    def set_volume(self, ticker: str, volume):
+        symbol_id = self.symbols.intern(ticker)
+        self._ensure_capacity(symbol_id + 1)
+        self.volume[symbol_id] = float(volume)
+
+    def set_close_time(self, ticker: str, close_time):
+        symbol_id = self.symbols.intern(ticker)
+        self._ensure_capacity(symbol_id + 1)
+        self.close_ts[symbol_id] = parse_close_time(close_time)
+
+    def load_statics(self, volume_path: str = "statics/kalshi_volume_per_market.json", close_time_path: str = "statics/kalshi_close_time_per_market.json"):
+        for ticker, volume in read_file_data(volume_path).items():
+            self.set_volume(ticker, volume)
+        if os.path.exists(close_time_path):
+            for ticker, close_time in read_file_data(close_time_path).items():
+                self.set_close_time(ticker, close_time)
+        else:
+            self.logger.warning(f"{close_time_path} not found; ranking without time to close")
+
+    def observe(self, snapshot):
+        """Fold one cycle's TopOfBookSnapshot into the spread and quote-change averages."""
+        quotes = snapshot.quotes
+        n = len(quotes)
+        self._ensure_capacity(n)
+
+        spread = quotes[:, ASK] - quotes[:, BID]
+        quoted = ~np.isnan(spread)
+        averages = self.spread_ewma[:n]
+        first = quoted & np.isnan(averages)
+        averages[first] = spread[first]
+        seen = quoted & ~first
+        averages[seen] += EWMA_ALPHA * (spread[seen] - averages[seen])
+
+        previous = self._previous_quotes
+        if previous is not None:
+            m = min(len(previous), n)
+            current = quotes[:m]
+            unchanged = (current == previous[:m]) | (np.isnan(current) & np.isnan(previous[:m]))
+            changed = ~unchanged.all(axis=1)
+            self.change_ewma[:m] += EWMA_ALPHA * (changed - self.change_ewma[:m])
+        self._previous_quotes = quotes.copy()
+
+    # ------------------------------------------------------------------ #
+    # Ranking                                                              #
+    # ------------------------------------------------------------------ #
+
+    def scores(self, now: float | None = None) -> np.ndarray:
+        """Score per symbol id; -inf where the ticker is ineligible."""
+        now = time.time() if now is None else now
+        low_volume, high_volume = self.volume_band
+        low_spread, high_spread = self.spread_band
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            volume = self.volume
+            volume_ok = (volume > low_volume) & (volume < high_volume)
+            volume_score = np.log(volume / low_volume) / math.log(high_volume / low_volume)
+
+            spread = self.spread_ewma
+            spread_ok = spread <= high_spread
+            spread_score = np.clip(spread / low_spread, 0.0, 1.0)
+
+            stability_score = 1.0 - self.change_ewma
+
+            time_to_close = self.close_ts - now
+            close_known = ~np.isnan(time_to_close)
+            close_ok = ~close_known | (time_to_close >= MIN_TIME_TO_CLOSE_S)
+            close_score = np.where(close_known, np.exp2(-time_to_close / TIME_TO_CLOSE_HALF_LIFE_S), 0.0)
+
+        score = (
+            WEIGHTS["volume"] * volume_score
+            + WEIGHTS["spread"] * spread_score
+            + WEIGHTS["stability"] * stability_score
+            + WEIGHTS["close"] * close_score
+        )
+        eligible = volume_ok & spread_ok & close_ok & ~np.isnan(score)
+        return np.where(eligible, score, -np.inf)
+
+    def top_k(self, now: float | None = None, force: bool = False) -> np.ndarray:
+        """Symbol ids of the K best-scoring eligible tickers, best first."""
+        clock = time.monotonic()
+        if not force and clock - self._last_refresh < self.refresh_interval_s:
+            return self._top
+        self._last_refresh = clock
+
+        scores = self.scores(now)
+        eligible = np.flatnonzero(scores > -np.inf)
+        if len(eligible) > self.k:
+            eligible = eligible[np.argpartition(-scores[eligible], self.k - 1)[:self.k]]
+        top = eligible[np.argsort(-scores[eligible], kind="stable")]
+
+        if not np.array_equal(top, self._top):
+            self.logger.info(f"Quote universe refreshed: {len(top)} tickers, best {self.symbols.names_of(top[:5].tolist())}")
+        self._top = top
+        self._top_names = set(self.symbols.names_of(top.tolist()))
+        return top
+
+    def __contains__(self, ticker: str) -> bool:
+        return ticker in self._top_names
+
+
+if __name__ == "__main__":
+    # Benchmark: rank the statics volume universe under random live books
+    from top_of_book import TopOfBookSnapshot
+
+    ranker = TickerRanker(top_k=DEFAULT_TOP_K)
+    ranker.load_statics()
+    n = len(ranker.symbols)
+    rng = np.random.default_rng(0)
+    ids = np.arange(n)
+    mid = rng.uniform(0.1, 0.9, n)
+    half = rng.uniform(0.005, 0.1, n)
+    now = time.time()
+    for ticker_id in range(n):
+        ranker.close_ts[ticker_id] = now + rng.uniform(0, 7 * 24 * 3600)
+
+    def cycle():
+        moved = rng.random(n) < rng.uniform(0.0, 0.5, n)
+        mid[moved] = np.clip(mid[moved] + rng.normal(0, 0.01, moved.sum()), 0.05, 0.95)
+        quotes = np.column_stack([mid - half, np.full(n, 100.0), mid + half, np.full(n, 100.0)])
+        return TopOfBookSnapshot(ids, quotes)
+
+    snapshots = [cycle() for _ in range(200)]
+    start = time.perf_counter()
+    for snapshot in snapshots:
+        ranker.observe(snapshot)
+    observe_us = (time.perf_counter() - start) / len(snapshots) * 1e6
+
+    start = time.perf_counter()
+    for _ in range(50):
+        top = ranker.top_k(force=True)
+    rank_us = (time.perf_counter() - start) / 50 * 1e6
+
+    print(f"{n} tickers, {int(np.isfinite(ranker.scores()).sum())} eligible, top {len(top)}")
+    print(f"  observe(): {observe_us:.0f} us/cycle, top_k(): {rank_us:.0f} us/refresh")
+    for ticker_id in top[:10]:
+        print(f"  {ranker.symbols.name_of(ticker_id):45s} volume {ranker.volume[ticker_id]:8.0f}  "
+              f"spread {ranker.spread_ewma[ticker_id]:.3f}  moves {ranker.change_ewma[ticker_id]:.2f}  "
+              f"closes in {(ranker.close_ts[ticker_id] - now) / 3600:5.1f}h")
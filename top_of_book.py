@@ -0,0 +1,257 @@
+import threading
+import time
+from array import array
+from collections.abc import Mapping
+
+import numpy as np
+
+from symbol_table import symbols as default_symbols
+from top_of_book_history import ASK, ASK_SIZE, BID, BID_SIZE, NUM_COLUMNS
+
+# Change-log entries kept by TopOfBookTable before the oldest half is dropped
+DEFAULT_MAX_LOG = 1 << 20
+
+
+def _none_if_nan(row):
+    return tuple(None if value != value else value for value in row)
+
+
+class TopOfBookSnapshot(Mapping):
+    """
+    Immutable top-of-book snapshot for one venue, stored column-wise.
+
+    quotes is an (n_symbols, 4) float64 array indexed by symbol id with
+    columns BID, BID_SIZE, ASK, ASK_SIZE; rows without a quote (or for
+    symbols not on this venue) are NaN. ids lists the symbol ids of the
+    books on this venue.
+
+    Vectorized strategies index quotes directly by id. For strategies that
+    still work with names it also behaves as a read-only mapping
+        ticker -> (bid, bid_size, ask, ask_size)
+    with None for missing values, matching the old snapshot_all_books()
+    dict.
+    """
+
+    def __init__(self, ids: np.ndarray, quotes: np.ndarray, symbol_table=None, present: np.ndarray | None = None):
+        self.ids = ids
+        self.quotes = quotes
+        self.symbols = symbol_table or default_symbols
+        if present is None:
+            present = np.zeros(len(quotes), dtype=bool)
+            present[ids] = True
+        self._present = present
+
+    def has(self, symbol_id: int) -> bool:
+        return 0 <= symbol_id < len(self._present) and bool(self._present[symbol_id])
+
+    def top(self, symbol_id: int):
+        """(bid, bid_size, ask, ask_size) for *symbol_id*, None for missing values."""
+        return _none_if_nan(self.quotes[symbol_id].tolist())
+
+    def column(self, column: int, symbol_ids) -> np.ndarray:
+        """Gather one column for many ids (NaN where missing)."""
+        return self.quotes[symbol_ids, column]
+
+    # Mapping interface (ticker -> tuple) for name-based strategies
+
+    def __getitem__(self, name):
+        symbol_id = self.symbols.id_of(name)
+        if symbol_id is None or not self.has(symbol_id):
+            raise KeyError(name)
+        return self.top(symbol_id)
+
+    def __iter__(self):
+        return iter(self.symbols.names_of(self.ids.tolist()))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __contains__(self, name):
+        symbol_id = self.symbols.id_of(name)
+        return symbol_id is not None and self.has(symbol_id)
+
+    def items(self):
+        names = self.symbols.names_of(self.ids.tolist())
+        rows = self.quotes[self.ids].tolist()
+        return [(name, _none_if_nan(row)) for name, row in zip(names, rows)]
+
+
+class TopOfBookDelta:
+    """
+    Books whose top of book changed since a caller-supplied version.
+
+    ids are unique symbol ids (ascending) and quotes the matching (k, 4) rows
+    as of *version*. full is True when the caller's version was too old (or
+    invalid) for the change log, in which case every book is included and
+    the caller should treat this as a resync.
+    """
+
+    __slots__ = ("version", "ids", "quotes", "full", "symbols")
+
+    def __init__(self, version: int, ids: np.ndarray, quotes: np.ndarray, full: bool, symbol_table=None):
+        self.version = version
+        self.ids = ids
+        self.quotes = quotes
+        self.full = full
+        self.symbols = symbol_table or default_symbols
+
+    def __len__(self):
+        return len(self.ids)
+
+    def items(self):
+        names = self.symbols.names_of(self.ids.tolist())
+        return [(name, _none_if_nan(row)) for name, row in zip(names, self.quotes.tolist())]
+
+
+class TopOfBookTable:
+    """
+    Versioned top-of-book table for every book of one feed.
+
+    Books publish their top of book here whenever it changes (from
+    OrderBook._record_top_locked, under the book's own lock), so the table
+    is maintained in place at O(1) per change instead of being rebuilt from
+    every book each scan cycle.
+
+    Each update bumps a monotonically increasing version and appends the
+    symbol id to a bounded change log. Consumers keep the version of the
+    last delta they processed and call changes_since(version) to get only
+    the books that moved since then, doing O(changes) work per cycle:
+
+        delta = table.changes_since(last_version)
+        last_version = delta.version
+        for symbol_id, row in zip(delta.ids, delta.quotes): ...
+
+    snapshot() returns an immutable copy for consumers that need a
+    consistent full view (one memcpy, no per-book locking); view() returns a
+    live TopOfBookSnapshot over the table's own arrays.
+    """
+
+    def __init__(self, symbol_table=None, max_log: int = DEFAULT_MAX_LOG):
+        self.symbols = symbol_table or default_symbols
+        self.max_log = max_log
+        self.lock = threading.Lock()
+
+        capacity = max(len(self.symbols), 1)
+        self.quotes = np.full((capacity, NUM_COLUMNS), np.nan, dtype=np.float64)
+        self.present = np.zeros(capacity, dtype=bool)
+        self._ids: list[int] = []
+        self._ids_array = np.empty(0, dtype=np.int32)
+
+        # Change log: entry i records the symbol id updated at version
+        # _log_base + i + 1. Trimmed from the front once it exceeds max_log.
+        self.version = 0
+        self._log_base = 0
+        self._log = array("i")
+
+    def _ensure_capacity_locked(self, symbol_id: int):
+        capacity = len(self.quotes)
+        if symbol_id < capacity:
+            return
+        new_capacity = max(symbol_id + 1, 2 * capacity)
+        quotes = np.full((new_capacity, NUM_COLUMNS), np.nan, dtype=np.float64)
+        quotes[:capacity] = self.quotes
+        present = np.zeros(new_capacity, dtype=bool)
+        present[:capacity] = self.present
+        self.quotes = quotes
+        self.present = present
+
+    def register(self, symbol_id: int):
+        """Add a book to the table. Views taken before a register() may be stale."""
+        with self.lock:
+            self._ensure_capacity_locked(symbol_id)
+            if not self.present[symbol_id]:
+                self.present[symbol_id] = True
+                self._ids.append(symbol_id)
+                self._ids_array = np.asarray(self._ids, dtype=np.int32)
+
+    def unregister(self, symbol_id: int):
+        """
+        Drop a book from the table. Its row is reset to NaN and logged as a
+        change, so delta consumers see the quote disappear.
+        """
+        with self.lock:
+            if symbol_id >= len(self.present) or not self.present[symbol_id]:
+                return
+            self.present[symbol_id] = False
+            self._ids.remove(symbol_id)
+            self._ids_array = np.asarray(self._ids, dtype=np.int32)
+            self.quotes[symbol_id] = np.nan
+            self._log_change_locked(symbol_id)
+
+    def _log_change_locked(self, symbol_id: int):
+        self.version += 1
+        self._log.append(symbol_id)
+        if len(self._log) > self.max_log:
+            trim = len(self._log) // 2
+            del self._log[:trim]
+            self._log_base += trim
+
+    def update(self, symbol_id: int, bid, bid_size, ask, ask_size):
+        """Publish a new top of book for *symbol_id* (None for an empty side)."""
+        with self.lock:
+            row = self.quotes[symbol_id]
+            row[BID] = np.nan if bid is None else bid
+            row[BID_SIZE] = np.nan if bid_size is None else bid_size
+            row[ASK] = np.nan if ask is None else ask
+            row[ASK_SIZE] = np.nan if ask_size is None else ask_size
+            self._log_change_locked(symbol_id)
+
+    def changes_since(self, version: int) -> TopOfBookDelta:
+        """Books whose top changed after *version* (pass -1 for a full resync)."""
+        with self.lock:
+            current = self.version
+            if self._log_base <= version <= current:
+                changed = self._log[version - self._log_base:]
+                ids = np.unique(np.frombuffer(changed, dtype=np.int32)) if changed else self._ids_array[:0]
+                full = False
+            else:
+                ids = self._ids_array
+                full = True
+            quotes = self.quotes[ids]
+        return TopOfBookDelta(current, ids, quotes, full, self.symbols)
+
+    def snapshot(self) -> TopOfBookSnapshot:
+        """Immutable copy of every book's top of book."""
+        with self.lock:
+            return TopOfBookSnapshot(self._ids_array, self.quotes.copy(), self.symbols, self.present.copy())
+
+    def view(self) -> TopOfBookSnapshot:
+        """Live view over the table's arrays; rows change as books update."""
+        with self.lock:
+            return TopOfBookSnapshot(self._ids_array, self.quotes, self.symbols, self.present)
+
+
+if __name__ == "__main__":
+    # Benchmark: legacy per-book snapshot dict vs table copy vs 1% delta
+    from orderbook import OrderBook
+
+    def best_of(fn, reps=7):
+        times = []
+        for _ in range(reps):
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+        return min(times) * 1000
+
+    rng = np.random.default_rng(0)
+    print(f"{'tickers':>8} {'legacy dict':>12} {'table copy':>11} {'1% delta':>9} {'update':>9}")
+    for n in (1_000, 10_000, 50_000):
+        table = TopOfBookTable()
+        books = [OrderBook(f"BENCH-{n}-{i}", top_table=table) for i in range(n)]
+        for book in books:
+            book.update_order_book(0, 0.40, 10)
+            book.update_order_book(1, 0.60, 10)
+
+        legacy_ms = best_of(lambda: {book.asset_id: book.snapshot_top() for book in books})
+        copy_ms = best_of(table.snapshot)
+
+        churn = rng.choice(n, size=max(n // 100, 1), replace=False)
+        version = table.version
+        start = time.perf_counter()
+        for i in churn:
+            books[i].update_order_book(0, 0.41, 5)
+        update_us = (time.perf_counter() - start) / len(churn) * 1e6
+        delta_ms = best_of(lambda: table.changes_since(version))
+        assert len(table.changes_since(version)) == len(churn)
+
+        print(f"{n:>8} {legacy_ms:>10.2f}ms {copy_ms:>9.3f}ms {delta_ms:>7.3f}ms {update_us:>7.2f}us")
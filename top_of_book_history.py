@@ -0,0 +1,173 @@
+import time
+
+import numpy as np
+
+# Column layout of the ring buffer rows
+BID = 0
+BID_SIZE = 1
+ASK = 2
+ASK_SIZE = 3
+NUM_COLUMNS = 4
+
+DEFAULT_CAPACITY = 128
+
+
+class TopOfBookHistory:
+    """
+    Fixed-memory ring buffer of top-of-book changes for a single order book.
+
+    Each entry is (timestamp_ns, bid, bid_size, ask, ask_size). Storage is
+    preallocated numpy arrays, so append() is O(1) and never allocates; once
+    the buffer is full the oldest entry is overwritten. Missing prices/sizes
+    (empty side of the book) are stored as NaN.
+
+    Timestamps are wall-clock nanoseconds (time.time_ns()) so they can be
+    compared across books and against exchange timestamps.
+
+    Not thread-safe on its own: the owning OrderBook appends under its lock,
+    and readers should go through OrderBook helpers or accept that a
+    concurrent append may race with a windowed query.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        if capacity <= 0:
+            raise ValueError(f"capacity must be positive, got {capacity}")
+        self.capacity = capacity
+        self.timestamps = np.zeros(capacity, dtype=np.int64)
+        self.quotes = np.full((capacity, NUM_COLUMNS), np.nan, dtype=np.float64)
+        self.count = 0       # number of valid entries (<= capacity)
+        self.head = 0        # index of the next slot to write
+        self.total_appends = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, bid, bid_size, ask, ask_size, ts_ns: int | None = None):
+        """Record a new top of book. None values are stored as NaN."""
+        i = self.head
+        self.timestamps[i] = time.time_ns() if ts_ns is None else ts_ns
+        row = self.quotes[i]
+        row[BID] = np.nan if bid is None else bid
+        row[BID_SIZE] = np.nan if bid_size is None else bid_size
+        row[ASK] = np.nan if ask is None else ask
+        row[ASK_SIZE] = np.nan if ask_size is None else ask_size
+
+        self.head = (i + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+        self.total_appends += 1
+
+    def clear(self):
+        self.count = 0
+        self.head = 0
+
+    # ------------------------------------------------------------------ #
+    # Point queries                                                        #
+    # ------------------------------------------------------------------ #
+
+    def latest(self):
+        """Return the newest (timestamp_ns, bid, bid_size, ask, ask_size) or None."""
+        if self.count == 0:
+            return None
+        i = (self.head - 1) % self.capacity
+        bid, bid_size, ask, ask_size = self.quotes[i].tolist()
+        return int(self.timestamps[i]), bid, bid_size, ask, ask_size
+
+    def last_change_ns(self) -> int | None:
+        """Timestamp of the most recent top-of-book change."""
+        if self.count == 0:
+            return None
+        return int(self.timestamps[(self.head - 1) % self.capacity])
+
+    def age_ms(self, now_ns: int | None = None) -> float | None:
+        """Milliseconds since the top of book last changed."""
+        last = self.last_change_ns()
+        if last is None:
+            return None
+        now_ns = time.time_ns() if now_ns is None else now_ns
+        return (now_ns - last) / 1e6
+
+    # ------------------------------------------------------------------ #
+    # Windowed queries                                                     #
+    # ------------------------------------------------------------------ #
+
+    def _ordered_indices(self):
+        """Slot indices ordered oldest -> newest."""
+        start = (self.head - self.count) % self.capacity
+        return (start + np.arange(self.count)) % self.capacity
+
+    def window(self, window_ms: float, now_ns: int | None = None):
+        """
+        Return (timestamps, quotes) for entries newer than now - window_ms,
+        ordered oldest -> newest. quotes is an (n, 4) array with columns
+        BID, BID_SIZE, ASK, ASK_SIZE. Returned arrays are copies.
+        """
+        if self.count == 0:
+            return np.empty(0, dtype=np.int64), np.empty((0, NUM_COLUMNS))
+        now_ns = time.time_ns() if now_ns is None else now_ns
+        cutoff = now_ns - int(window_ms * 1_000_000)
+
+        idx = self._ordered_indices()
+        ts = self.timestamps[idx]
+        # Timestamps are appended in non-decreasing order, so the window is a
+        # suffix of the ordered view and can be found with a binary search.
+        first = int(np.searchsorted(ts, cutoff, side="right"))
+        idx = idx[first:]
+        return self.timestamps[idx], self.quotes[idx]
+
+    def weighted_mid(self, window_ms: float, now_ns: int | None = None) -> float | None:
+        """
+        Depth-weighted mid over the window.
+
+        Each entry contributes its microprice
+            (bid * ask_size + ask * bid_size) / (bid_size + ask_size)
+        weighted by its top-of-book depth (bid_size + ask_size). Entries with
+        an empty side are ignored. Returns None if nothing usable is in the
+        window.
+        """
+        _, quotes = self.window(window_ms, now_ns)
+        if len(quotes) == 0:
+            return None
+        bid, bid_size, ask, ask_size = quotes.T
+        depth = bid_size + ask_size
+        valid = ~np.isnan(bid) & ~np.isnan(ask) & (depth > 0)
+        if not valid.any():
+            return None
+        micro = (bid[valid] * ask_size[valid] + ask[valid] * bid_size[valid]) / depth[valid]
+        return float(np.average(micro, weights=depth[valid]))
+
+    def quote_change_rate(self, window_ms: float, now_ns: int | None = None) -> float:
+        """Number of top-of-book changes per second over the window."""
+        if window_ms <= 0:
+            return 0.0
+        ts, _ = self.window(window_ms, now_ns)
+        return len(ts) / (window_ms / 1000.0)
+
+    def time_at_or_better(self, side: int, price: float, window_ms: float, now_ns: int | None = None) -> float:
+        """
+        Fraction of the window (0..1) during which the top of *side* was at
+        *price* or better for a taker (bid >= price for side 0, ask <= price
+        for side 1). Useful as a cheap fill-probability signal for a quote
+        resting at *price*.
+        """
+        if self.count == 0 or window_ms <= 0:
+            return 0.0
+        now_ns = time.time_ns() if now_ns is None else now_ns
+        start_ns = now_ns - int(window_ms * 1_000_000)
+        ts, quotes = self.window(window_ms, now_ns)
+
+        # The quote live at the start of the window is the last entry before it
+        prior = None
+        if len(ts) < self.count:
+            idx = self._ordered_indices()
+            prior = self.quotes[idx[self.count - len(ts) - 1]]
+
+        starts = np.concatenate(([start_ns], ts)) if prior is not None else ts
+        if len(starts) == 0:
+            return 0.0
+        levels = quotes[:, BID if side == 0 else ASK]
+        if prior is not None:
+            levels = np.concatenate(([prior[BID if side == 0 else ASK]], levels))
+        durations = np.diff(np.append(starts, now_ns))
+        hit = levels >= price if side == 0 else levels <= price
+        return float(durations[hit].sum() / (now_ns - start_ns))
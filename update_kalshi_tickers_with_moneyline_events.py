@@ -12,38 +12,50 @@ two-market pairing used by the existing arbitrage code. Spread and total
 events have many strike-bucket markets per event, so we instead store an
 intra-event correlation under CORRELATED_SPREAD_MARKET_MAPPING and
 CORRELATED_TOTAL_MARKET_MAPPING (each market ticker -> all other tickers
-in the same Kalshi event).
+in the same Kalshi event). Those two mappings are also precompiled into
+the pair graphs (pair_graph.py) that IntraKalshiSpreadTotalArbitrage
+memory-maps at startup.
 """
 
 from collections import defaultdict
 from datetime import datetime, timedelta, timezone
 import json
 
+from pair_graph import build_pair_graph
+from record_stream import iter_records
+from utils import write_json_atomic
+
 MIN_CLOSE_TS = 1   # days from now (set to 0 to disable lower bound)
 MAX_CLOSE_TS = 30  # days from now (set to 0 to disable upper bound)
 
 STATICS_PATH = "statics/statics.json"
 
+# Pair graphs keep pairs at most this many rungs apart (None = all pairs);
+# main passes the same value to IntraKalshiSpreadTotalArbitrage
+PAIR_GRAPH_MAX_GAP = None
+
 MARKET_TYPE_CONFIG = {
     "moneyline": {
-        "events_path": "statics/two_market_events.json",
+        "events_path": "statics/two_market_events.ndjson",
         "mapping_path": "statics/kalshi_event_to_market_mapping.json",
         "asset_id_key": "Kalshi",
         "correlated_key": "CORRELATED_MARKET_MAPPING",
         "expected_market_count": 2,
     },
     "spread": {
-        "events_path": "statics/kalshi_spread_events.json",
+        "events_path": "statics/kalshi_spread_events.ndjson",
         "mapping_path": "statics/kalshi_spread_event_to_market_mapping.json",
         "asset_id_key": "Kalshi_Spread",
         "correlated_key": "CORRELATED_SPREAD_MARKET_MAPPING",
+        "pair_graph_path": "statics/kalshi_spread_pair_graph.bin",
         "expected_market_count": None,
     },
     "total": {
-        "events_path": "statics/kalshi_total_events.json",
+        "events_path": "statics/kalshi_total_events.ndjson",
         "mapping_path": "statics/kalshi_total_event_to_market_mapping.json",
         "asset_id_key": "Kalshi_Total",
         "correlated_key": "CORRELATED_TOTAL_MARKET_MAPPING",
+        "pair_graph_path": "statics/kalshi_total_pair_graph.bin",
         "expected_market_count": None,
     },
 }
@@ -62,8 +74,7 @@ def _load_json(path):
 
 
 def _save_json(path, payload):
-    with open(path, "w") as f:
-        json.dump(payload, f, indent=4)
+    write_json_atomic(path, payload, indent=4)
 
 
 def _normalize_event_envelope(item):
@@ -74,32 +85,26 @@ def _normalize_event_envelope(item):
     return item, item.get("markets", []) or []
 
 
-def update_statics_for_market_type(market_type):
-    """Build mapping + asset id table + correlated mapping for one
-    Kalshi market type and persist to statics + per-type JSON file."""
+def build_market_type_statics(market_type, events):
+    """Build the asset id table, correlated mapping and event -> market
+    mapping for one Kalshi market type from detailed *events* (any
+    iterable; it is consumed in one pass).
+
+    Returns a dict with asset_id_mapping, correlated_mapping, mapping and
+    the skipped_window / skipped_count filter counts."""
     if market_type not in MARKET_TYPE_CONFIG:
         raise ValueError(
             "Unknown market_type " + repr(market_type)
             + "; expected one of " + str(sorted(MARKET_TYPE_CONFIG))
         )
 
-    cfg = MARKET_TYPE_CONFIG[market_type]
-    events_path = cfg["events_path"]
-    mapping_path = cfg["mapping_path"]
-    asset_id_key = cfg["asset_id_key"]
-    correlated_key = cfg["correlated_key"]
-    expected_count = cfg["expected_market_count"]
-
-    events = _load_json(events_path)
-    statics = _load_json(STATICS_PATH)
+    expected_count = MARKET_TYPE_CONFIG[market_type]["expected_market_count"]
 
     asset_id_mapping = {}
     correlated_mapping = {}
     mapping = defaultdict(lambda: defaultdict(dict))
 
     min_time, max_time = get_min_max_close_time()
-    print("[" + market_type + "] Min Close Time: " + str(min_time))
-    print("[" + market_type + "] Max Close Time: " + str(max_time))
 
     skipped_window = 0
     skipped_count = 0
@@ -162,13 +167,58 @@ def update_statics_for_market_type(market_type):
             "market_slugs": tickers,
         }
 
+    return {
+        "asset_id_mapping": asset_id_mapping,
+        "correlated_mapping": correlated_mapping,
+        "mapping": mapping,
+        "skipped_window": skipped_window,
+        "skipped_count": skipped_count,
+    }
+
+
+def update_statics_for_market_type(market_type):
+    """Build mapping + asset id table + correlated mapping for one
+    Kalshi market type and persist to statics + per-type JSON file
+    (+ pair graph for spread and total)."""
+    if market_type not in MARKET_TYPE_CONFIG:
+        raise ValueError(
+            "Unknown market_type " + repr(market_type)
+            + "; expected one of " + str(sorted(MARKET_TYPE_CONFIG))
+        )
+
+    cfg = MARKET_TYPE_CONFIG[market_type]
+    events_path = cfg["events_path"]
+    mapping_path = cfg["mapping_path"]
+    asset_id_key = cfg["asset_id_key"]
+    correlated_key = cfg["correlated_key"]
+
+    # Streamed one event at a time (NDJSON, gzip NDJSON or a legacy array)
+    events = iter_records(events_path)
+    statics = _load_json(STATICS_PATH)
+
+    min_time, max_time = get_min_max_close_time()
+    print("[" + market_type + "] Min Close Time: " + str(min_time))
+    print("[" + market_type + "] Max Close Time: " + str(max_time))
+
+    built = build_market_type_statics(market_type, events)
+    asset_id_mapping = built["asset_id_mapping"]
+    mapping = built["mapping"]
+    skipped_window = built["skipped_window"]
+    skipped_count = built["skipped_count"]
+
     statics.setdefault("ASSET_ID_MAPPING", {})
     statics["ASSET_ID_MAPPING"][asset_id_key] = asset_id_mapping
-    statics[correlated_key] = correlated_mapping
+    statics[correlated_key] = built["correlated_mapping"]
 
     _save_json(STATICS_PATH, statics)
     _save_json(mapping_path, mapping)
 
+    if "pair_graph_path" in cfg:
+        graph, _ = build_pair_graph(built["correlated_mapping"], PAIR_GRAPH_MAX_GAP)
+        graph.save(cfg["pair_graph_path"])
+        print("[" + market_type + "] Saved " + str(graph.n_pairs)
+              + " pairs across " + str(len(graph)) + " events to " + cfg["pair_graph_path"])
+
     n_events = sum(len(s) for c in mapping.values() for s in c.values())
     print(
         "[" + market_type + "] Saved " + str(len(asset_id_mapping))
@@ -186,7 +236,7 @@ def update_statics_with_kalshi_events(events_path, statics_path, event_to_market
     """Legacy entry point preserved for callers that still pass paths
     explicitly. Behaves like the moneyline path of
     update_statics_for_market_type but honors the supplied paths."""
-    events = _load_json(events_path)
+    events = iter_records(events_path)
     statics = _load_json(statics_path)
 
     asset_id_mapping = {}
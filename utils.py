@@ -1,15 +1,32 @@
 import json
+import os
 from decimal import ROUND_HALF_UP, Decimal, ROUND_CEILING
 
+import numpy as np
+
+from statics_loader import load_statics
+
+# Vectorized fee helpers work on integer prices in 1/10000 of a dollar so
+# that the cent rounding of the Decimal versions is reproduced exactly
+PRICE_SCALE = 10_000
+
 def read_file_data(file_path):
     with open(file_path, "r") as f:
         data = json.load(f)
     return data
 
+def write_json_atomic(file_path, payload, indent=None):
+    """Write JSON to a temp file next to *file_path* and rename it into place,
+    so readers never see a half-written file."""
+    directory = os.path.dirname(file_path) or "."
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{file_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(payload, f, indent=indent, separators=None if indent else (",", ":"))
+    os.replace(tmp_path, file_path)
+
 def get_asset_ids(market):
-    with open("statics/statics.json", "r") as json_file:
-        data = json.load(json_file)
-    return list(data["ASSET_ID_MAPPING"][market].keys()) if market in data["ASSET_ID_MAPPING"] else []
+    return load_statics().get_asset_ids(market)
 
 def get_maker_fees_kalshi(price, size):
     """
@@ -84,4 +101,37 @@ def get_maker_rebate_polymarket_us(price, size):
     fee = maker_fee_rate * size * price * (Decimal("1.0") - price)
     # Round up to 3 decimal places
     fee_ceiling = fee.quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
-    return fee_ceiling
\ No newline at end of file
+    return fee_ceiling
+
+def price_ticks(prices):
+    """
+    Convert an array of dollar prices to integer ticks of 1/PRICE_SCALE.
+
+    Missing prices (NaN) become 0, which callers treat as "no quote".
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    return np.rint(np.nan_to_num(prices, nan=0.0) * PRICE_SCALE).astype(np.int64)
+
+def get_taker_fees_kalshi_cents(price_ticks, sizes):
+    """
+    Vectorized get_taker_fees_kalshi: fees in integer cents, rounded up.
+
+    Args:
+        price_ticks: Prices in 1/PRICE_SCALE dollars (int64 array)
+        sizes: Order sizes in contracts (int64 array)
+    """
+    # 0.07 * size * p * (1 - p) dollars, in units of 1e-10 dollars
+    fee = 7 * sizes * price_ticks * (PRICE_SCALE - price_ticks)
+    return -(-fee // 10**8)
+
+def get_taker_fees_polymarket_us_cents(price_ticks, sizes):
+    """
+    Vectorized get_taker_fees_polymarket_us: fees in integer cents, rounded half up.
+
+    Args:
+        price_ticks: Prices in 1/PRICE_SCALE dollars (int64 array)
+        sizes: Order sizes in contracts (int64 array)
+    """
+    # 0.05 * size * p * (1 - p) dollars, in units of 1e-10 dollars
+    fee = 5 * sizes * price_ticks * (PRICE_SCALE - price_ticks)
+    return (2 * fee + 10**8) // (2 * 10**8)
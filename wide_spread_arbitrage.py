@@ -1,33 +1,90 @@
+import asyncio
 from concurrent.futures import ThreadPoolExecutor
 import json
 import logging
 import math
+import time
 import uuid
 from decimal import Decimal
 
+import numpy as np
+
+from capital_allocator import CapitalAllocator
 from polymarket_us_feed import PolymarketUSWebSocket
 from polymarket_us_http_gateway import PolymarketUSHTTPGateway
 from kalshi_feed import KalshiWebSocket
 from kalshi_http_gateway import KalshiHTTPGateway, load_private_key
 from position_manager import PositionManager
-from utils import get_maker_fees_kalshi, get_taker_fees_kalshi, get_taker_fees_polymarket_us, get_maker_rebate_polymarket_us, read_file_data
+from quote_manager import QuoteManager, quote_price
+from ticker_ranker import DEFAULT_TOP_K, TickerRanker
+from utils import get_maker_fees_kalshi, get_taker_fees_kalshi, get_taker_fees_polymarket_us, get_maker_rebate_polymarket_us
 from collections import defaultdict
 
+STRATEGY_NAME = "wide_spread"
+ORDER_PREFIX = "WBRSSS"
+QUOTE_COUNT = 5
+MAX_SPREAD = Decimal("0.15")
+
+# Concurrent gateway calls while hedging a burst of fills
+HEDGE_HTTP_WORKERS = 16
+HEDGE_REPORT_EVERY = 100
+MAX_LATENCY_SAMPLES = 100_000
+
+
+class HedgeMetrics:
+    """Fill-to-cancel and fill-to-hedge latencies, in ns, and hedge counters."""
+
+    def __init__(self):
+        self.fills = 0
+        self.errors = 0
+        self.over_hedged = 0
+        self._fill_to_cancel_ns: list[int] = []
+        self._fill_to_hedge_ns: list[int] = []
+
+    def record(self, fill_to_cancel_ns: int | None, fill_to_hedge_ns: int):
+        # Only touched from the event loop, no lock needed. Later partial
+        # fills of a quote have nothing left to cancel (None)
+        if len(self._fill_to_hedge_ns) >= MAX_LATENCY_SAMPLES:
+            del self._fill_to_cancel_ns[: MAX_LATENCY_SAMPLES // 2]
+            del self._fill_to_hedge_ns[: MAX_LATENCY_SAMPLES // 2]
+        if fill_to_cancel_ns is not None:
+            self._fill_to_cancel_ns.append(fill_to_cancel_ns)
+        self._fill_to_hedge_ns.append(fill_to_hedge_ns)
+
+    def count(self, **increments):
+        for name, value in increments.items():
+            setattr(self, name, getattr(self, name) + value)
+
+    def report(self) -> dict:
+        def percentiles(values):
+            if not values:
+                return None
+            p50, p90, p99, worst = np.percentile(np.asarray(values, dtype=np.float64) / 1e6, [50, 90, 99, 100])
+            return {"p50": float(p50), "p90": float(p90), "p99": float(p99), "max": float(worst), "n": len(values)}
+
+        return {
+            "fills": self.fills,
+            "errors": self.errors,
+            "over_hedged": self.over_hedged,
+            "fill_to_cancel_ms": percentiles(self._fill_to_cancel_ns),
+            "fill_to_hedge_ms": percentiles(self._fill_to_hedge_ns),
+        }
+
+
 class WideSpreadArbitrage:
-    def __init__(self, polymarket_client: PolymarketUSWebSocket, kalshi_client: KalshiWebSocket, polymarket_us_gateway: PolymarketUSHTTPGateway, kalshi_gateway: KalshiHTTPGateway, position_manager: PositionManager, spread_threshold: Decimal = Decimal(0.05), min_edge: Decimal = Decimal(0.01)):
+    def __init__(self, polymarket_client: PolymarketUSWebSocket, kalshi_client: KalshiWebSocket, polymarket_us_gateway: PolymarketUSHTTPGateway, kalshi_gateway: KalshiHTTPGateway, position_manager: PositionManager, spread_threshold: Decimal = Decimal(0.05), min_edge: Decimal = Decimal(0.01), capital_allocator: CapitalAllocator | None = None, top_k: int = DEFAULT_TOP_K):
         self.polymarket_client = polymarket_client
         self.polymarket_us_gateway = polymarket_us_gateway
         self.kalshi_client = kalshi_client
         self.kalshi_gateway = kalshi_gateway
         self.position_manager = position_manager
         self.spread_threshold = Decimal(spread_threshold)
-        self.allowed_tickers = set()
-        self.store_volume_data()
-
-        #Temporary balance tracking
-        self.polymarket_us_balance = Decimal(self.polymarket_us_gateway.get_balance())
-        self.kalshi_balance = Decimal(self.kalshi_gateway.get_balance())
         
+        # Bounded quote universe: the top-K tickers by volume, spread
+        # history, quote stability and time to close
+        self.ranker = TickerRanker(top_k=top_k, spread_band=(float(self.spread_threshold), float(MAX_SPREAD)))
+        self.ranker.load_statics()
+
         # Tracking overall performance
         # TODO: Track profit for wide spread strategy
         self.overall_order_count = Decimal(0)
@@ -36,28 +93,33 @@ class WideSpreadArbitrage:
         self.min_edge = Decimal(min_edge)  # buffer for fees/slippage
         self.logger = logging.getLogger("wide_spread_strategy")
         
-        # Cached balance to avoid API calls on every order (in dollars)
-        self.cached_balance = Decimal(Decimal(kalshi_gateway.get_balance()) / Decimal(100.0))
-        self.cached_balance = Decimal("5000")  # Start with $5000 for testing
-        
         # Cosume from user fill queue to track fills for wide spread strategy
         self.running = True
-        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.executor = ThreadPoolExecutor(max_workers=HEDGE_HTTP_WORKERS)
+        self.hedge_tails: dict[str, asyncio.Task] = {}  # ticker -> last queued hedge
+        self.hedge_metrics = HedgeMetrics()
         
-    def update_cached_balance_before_create_order(self, order, fees):
-        # Update the cached balance before creating the order to ensure we are accounting for the new order when finding opportunities
-        if order["side"] == "yes":
-            self.cached_balance -= (Decimal(order["count"]) * Decimal(order.get("yes_price", 0) / Decimal(100.0)) + fees)
-        else:
-            self.cached_balance -= (Decimal(order["count"]) * Decimal(order.get("no_price", 0) / Decimal(100.0)) + fees)
-
-    def update_cached_balance_from_create_order(self, order_response):
-        # Only update cached balance for market orders since limit orders may not fill immediately
-        if order_response["type"] == "market":
-            if order_response["side"] == "yes":
-                self.cached_balance -= (Decimal(order_response["fill_count_fp"]) * Decimal(order_response.get("yes_price_dollars", 0)) + Decimal(order_response.get("taker_fees_dollars", 0)))
-            else:
-                self.cached_balance -= (Decimal(order_response["fill_count_fp"]) * Decimal(order_response.get("no_price_dollars", 0)) + Decimal(order_response.get("taker_fees_dollars", 0)))
+        # Resting quotes are kept at the top of book by the quote manager,
+        # which also holds their capital reservations on the shared allocator
+        self.capital_allocator = capital_allocator or CapitalAllocator.from_gateways(kalshi_gateway=kalshi_gateway)
+        self.quote_manager = QuoteManager(
+            kalshi_gateway,
+            position_manager,
+            self.capital_allocator,
+            STRATEGY_NAME,
+            ORDER_PREFIX,
+            maker_fee=lambda order: get_maker_fees_kalshi(Decimal(quote_price(order)) / Decimal(100), order["count"]),
+            executor=self.executor,
+        )
+        
+    def release_order(self, client_order_id):
+        # Order rejected or cancelled: return its capital
+        self.quote_manager.release(client_order_id)
+
+    def fill_order(self, client_order_id, count):
+        # Order (partially) filled: its share of the reserved capital has
+        # been spent. Returns the contracts still resting
+        return self.quote_manager.fill(client_order_id, count)
 
     async def process_user_fills(self):
         # Logging to verify process_user_fills is working correctly and we are consuming fills from the queue
@@ -65,137 +127,325 @@ class WideSpreadArbitrage:
         
         while self.running:
             fill_msg = await self.kalshi_client.fill_queue.get()
+            fill_msg.setdefault("received_ns", time.time_ns())
             ticker = fill_msg.get("market_ticker", "")
-            client_order_id = fill_msg.get("client_order_id", "")
-            count= fill_msg.get("count_fp", 0)
-            associated_order_ids = self.position_manager.get_associated_orders(client_order_id)
-            
-            # Log trade details
-            self.logger.info(f"Processing fill message: {client_order_id} | Ticker: {ticker} | Count: {count}")
-            
-            # Cancel other side of the order
-            for associated_order_id in associated_order_ids:
-                response = self.kalshi_gateway.cancel_order(associated_order_id)
-                
-                # Verify we were able to cancel and that the other side was not filled already
-                if not response.get("order") or not int(float(response["order"].get("remaining_count_fp", 0))) == 0:
-                    self.logger.error(f"Failed to cancel associated order {associated_order_id} for fill {client_order_id}. Response: {response}")
-                else: 
-                    associated_order = self.position_manager.get_open_order(associated_order_id)
-                    side = associated_order["side"]
-                    # Send market order on the associated side
-                    order = {
-                        "ticker": associated_order_id,
-                        "action": "buy",
-                        "side": side,
-                        "count": count,
-                        "client_order_id": str(uuid.uuid4()),
-                        "type": "market",
-                        "time_in_force": "good_till_canceled"
-                    }
-                    create_order_reponse = self.kalshi_gateway.create_order(order)
-                    
-                    # Update position manager on associated side of the trade
-                    self.position_manager.remove_open_order(ticker, associated_order_id)
-                    self.position_manager.remove_client_order_id_from_associated_orders(associated_order_id)
-                    
-                    # Update balance tracking
-                    # self.update_cached_balance_from_create_order(create_order_reponse)
             
-            
-            # Update position manager on filled side of the trade
-            self.position_manager.remove_open_order(ticker, client_order_id)
-            self.position_manager.remove_client_order_id_from_associated_orders(client_order_id)
-            
-            # Update balance tracking
-            # self.update_cached_balance_from_create_order(fill_msg)
+            # Fills for one ticker are hedged in arrival order by chaining each
+            # onto the previous one; different tickers hedge in parallel
+            previous = self.hedge_tails.get(ticker)
+            task = asyncio.create_task(self._hedge_after(previous, fill_msg))
+            self.hedge_tails[ticker] = task
+            task.add_done_callback(lambda done, ticker=ticker: self._drop_hedge_tail(ticker, done))
+
+    def _drop_hedge_tail(self, ticker, task):
+        if self.hedge_tails.get(ticker) is task:
+            del self.hedge_tails[ticker]
+
+    async def _hedge_after(self, previous, fill_msg):
+        if previous is not None:
+            await previous
+        try:
+            await self._handle_fill(fill_msg)
+        except Exception as e:
+            self.hedge_metrics.count(errors=1)
+            self.logger.error(f"Failed to process fill {fill_msg}: {e}")
 
+    async def _call_gateway(self, method, *args):
+        # Gateway calls are blocking requests; run them on the HTTP pool so the
+        # event loop keeps reading the feeds. Returns (response or exception, done time)
+        loop = asyncio.get_running_loop()
+        try:
+            response = await loop.run_in_executor(self.executor, method, *args)
+        except Exception as e:
+            response = e
+        return response, time.time_ns()
+
+    async def _handle_fill(self, fill_msg):
+        ticker = fill_msg.get("market_ticker", "")
+        client_order_id = fill_msg.get("client_order_id", "")
+        count = int(float(fill_msg.get("count_fp", 0)))
+        received_ns = fill_msg["received_ns"]
+        filled_order = self.position_manager.get_open_order(client_order_id)
+        
+        # Log trade details
+        self.logger.info(f"Processing fill message: {client_order_id} | Ticker: {ticker} | Count: {count}")
         
-    def store_volume_data(self):
-        self.volume_data = read_file_data("statics/kalshi_volume_per_market.json")
-        for ticker, volume in self.volume_data.items():
-            volume = int(float(volume))
-            if volume > 1000 and volume < 10000:
-                self.allowed_tickers.add(ticker)
+        # Every fill of a quote, partial or not, is hedged on the other side
+        # of its pair. The first one also cancels the other side's quote;
+        # later partial fills find it gone and only send the hedge
+        if filled_order is not None and count > 0:
+            hedge_side = "no" if filled_order["side"] == "yes" else "yes"
+            associated_order_ids = list(self.position_manager.get_associated_orders(client_order_id))
+            await self._hedge(ticker, client_order_id, hedge_side, count, received_ns, associated_order_ids)
+        
+        # Move the filled quantity from open to position in the pre-trade risk counters
+        record_fill = getattr(self.kalshi_gateway, "record_fill", None)
+        if record_fill is not None:
+            record_fill(client_order_id, count)
 
-    def find_opportunities(self, kalshi_book_snapshots: dict | None = None, polymarket_us_book_snapshots: dict | None = None):
-        # Iterate over all polymarket/kalshi books
-        batch_create_orders = {
-            "orders": []
+        # Commit the filled share of the quote's capital; the quote stays
+        # tracked until its last contract fills
+        remaining = self.fill_order(client_order_id, count)
+        if remaining:
+            self.logger.info(f"Quote {client_order_id} partially filled, {remaining} still resting")
+        self.hedge_metrics.count(fills=1)
+        if self.hedge_metrics.fills % HEDGE_REPORT_EVERY == 0:
+            self.logger.info(f"Hedge metrics: {self.hedge_metrics.report()}")
+
+    async def _hedge(self, ticker, client_order_id, side, count, received_ns, associated_order_ids):
+        # Send market order on the associated side
+        hedge_order = {
+            "ticker": ticker,
+            "action": "buy",
+            "side": side,
+            "count": count,
+            "client_order_id": str(uuid.uuid4()),
+            "type": "market",
+            "time_in_force": "good_till_canceled"
         }
-        batch_cancel_orders = {
-            "orders": []
+        
+        # Cancel the still-resting quotes of the pair and send the hedge at
+        # the same time rather than waiting a round trip for the cancel to
+        # be confirmed
+        associated_orders = []
+        for associated_order_id in associated_order_ids:
+            associated_order = self.position_manager.get_open_order(associated_order_id)
+            self.position_manager.remove_associated_order(client_order_id, associated_order_id)
+            if associated_order is not None:
+                associated_orders.append(associated_order)
+        *cancels, (hedge_response, hedge_ns) = await asyncio.gather(
+            *(self._call_gateway(self.kalshi_gateway.cancel_order, order["client_order_id"]) for order in associated_orders),
+            self._call_gateway(self.kalshi_gateway.create_order, hedge_order),
+        )
+        cancel_ns = max((done_ns for _, done_ns in cancels), default=None)
+        self.hedge_metrics.record(None if cancel_ns is None else cancel_ns - received_ns, hedge_ns - received_ns)
+        
+        if isinstance(hedge_response, Exception):
+            self.hedge_metrics.count(errors=1)
+            self.logger.error(f"Failed to send hedge {hedge_order['client_order_id']} for fill {client_order_id}: {hedge_response}")
+        
+        for associated_order, (cancel_response, _) in zip(associated_orders, cancels):
+            associated_order_id = associated_order["client_order_id"]
+            # Update position manager on associated side of the trade
+            if self.position_manager.get_open_order(associated_order_id) is not None:
+                self.position_manager.remove_open_order(ticker, associated_order)
+            self.position_manager.remove_client_order_id_from_associated_orders(associated_order_id)
+            
+            # The resting quote was cancelled; the market order's cost is
+            # picked up by the allocator's next balance reconcile
+            self.release_order(associated_order_id)
+            
+            # Verify the cancel went through. If the quote filled before it was
+            # cancelled, the pair is already complete and the hedge doubled it,
+            # so sell the over-hedged contracts back
+            if isinstance(cancel_response, Exception) or not cancel_response.get("order"):
+                self.hedge_metrics.count(errors=1)
+                self.logger.error(f"Failed to cancel associated order {associated_order_id} for fill {client_order_id}. Response: {cancel_response}")
+                continue
+            over_hedged = min(count, int(float(cancel_response["order"].get("fill_count_fp", 0))))
+            if over_hedged > 0 and not isinstance(hedge_response, Exception):
+                self.hedge_metrics.count(over_hedged=1)
+                self.logger.warning(f"Associated order {associated_order_id} filled {over_hedged} before cancel; unwinding hedge")
+                unwind_order = dict(hedge_order, action="sell", count=over_hedged, client_order_id=str(uuid.uuid4()))
+                await self._call_gateway(self.kalshi_gateway.create_order, unwind_order)
+
+    def quote_targets(self, ticker, best_bid, best_ask, resting):
+        """
+        Desired yes/no prices in cents for *ticker*, or None to pull its quotes.
+
+        A quote that is still the best on its side keeps its price (and its
+        queue position). One that has been overtaken is moved one cent inside
+        the new best. Where our own quote is the top of book, the competing
+        level is taken to be the one cent below it that we improved on.
+        """
+        bid_cents = int(round(float(best_bid) * 100))
+        ask_cents = int(round(float(best_ask) * 100))
+        yes_order = resting.get("yes")
+        no_order = resting.get("no")
+        yes_on_top = yes_order is not None and yes_order["yes_price"] >= bid_cents
+        no_on_top = no_order is not None and 100 - no_order["no_price"] <= ask_cents
+
+        market_bid = bid_cents - 1 if yes_on_top else bid_cents
+        market_ask = ask_cents + 1 if no_on_top else ask_cents
+        spread = Decimal(market_ask - market_bid) / Decimal(100)
+
+        # If spread is below threshold, cancel any resting orders
+        if spread < self.spread_threshold:
+            return None
+        # Quotes only on ranked tickers, and new ones only where the spread is wide but not too wide
+        if ticker not in self.ranker or (not resting and spread > MAX_SPREAD):
+            return None
+        return {
+            "yes": yes_order["yes_price"] if yes_on_top else market_bid + 1,
+            "no": no_order["no_price"] if no_on_top else 100 - market_ask + 1,
         }
-        for ticker, (best_bid, best_bid_size, best_ask, best_ask_size) in kalshi_book_snapshots.items():
-            # If the spread is above threshold, place bid and ask at top of book 
+
+    def find_opportunities(self, kalshi_book_snapshots: dict | None = None, polymarket_us_book_snapshots: dict | None = None):
+        # Work out where every quote should be, then let the quote manager
+        # keep, amend, cancel or create them with the fewest API calls.
+        # Only the ranked top-K tickers are visited, plus any that still
+        # have quotes resting (which are pulled once they drop out)
+        # TODO: Set size based on market volume and spread
+        self.ranker.observe(kalshi_book_snapshots)
+        candidates = set(self.ranker.symbols.names_of(self.ranker.top_k().tolist()))
+        candidates |= self.quote_manager.quoted_tickers()
+
+        desired = {}
+        for ticker in candidates:
+            symbol_id = self.ranker.symbols.id_of(ticker)
+            if symbol_id is None or not kalshi_book_snapshots.has(symbol_id):
+                continue
+            best_bid, best_bid_size, best_ask, best_ask_size = kalshi_book_snapshots.top(symbol_id)
             if not best_bid or not best_ask:
                 continue
-            spread = Decimal(Decimal(best_ask) - Decimal(best_bid))
-            ticker_open_orders = self.position_manager.get_open_orders_for_ticker(ticker)
-            # Need to check if no open orders 
-            if ticker in self.allowed_tickers and spread >= self.spread_threshold and spread <= Decimal(0.15) and not ticker_open_orders:
-                #print(f"Ticker {ticker} has spread {spread}. Best bid: {best_bid}, best ask: {best_ask}")
-                # TODO: We want to prioritize tickers which end soon, have some volume (not too much)
-                # Set size based on market volume and spread
-                # Bid Order
-                bid_order = {
-                    "ticker": ticker,
-                    "action": "buy",
-                    "side": "yes",
-                    "count": 5,
-                    "client_order_id": "WBRSSS" + str(uuid.uuid4()),
-                    "yes_price": int(float(best_bid) * 100) + 1,
-                    "type": "limit",
-                    "time_in_force": "good_till_canceled"
-                }
-
-                #Ask Order
-                ask_order = {
-                    "ticker": ticker,
-                    "action": "buy",
-                    "side": "no",
-                    "count": 5,
-                    "client_order_id": "WBRSSS" + str(uuid.uuid4()),
-                    "no_price": int(float(Decimal("1.0") - Decimal(best_ask)) * 100) + 1,
-                    "type": "limit",
-                    "time_in_force": "good_till_canceled"
-                }
-                
-                # Calculate maker fees
-                maker_fee_bid = get_maker_fees_kalshi(best_bid, bid_order["count"])
-                maker_fee_ask = get_maker_fees_kalshi(best_ask, ask_order["count"])
-
-                # Update cached balance for both orders
-                self.update_cached_balance_before_create_order(bid_order, maker_fee_bid)
-                self.update_cached_balance_before_create_order(ask_order, maker_fee_ask)
-                
-                if not self.cached_balance < Decimal(0):
-                    batch_create_orders["orders"].extend([bid_order, ask_order])
-
-                    # TODO: Move to outside for loop and add method in position manager to bulk update open orders
-                    self.position_manager.add_open_order(ticker, bid_order)
-                    self.position_manager.add_open_order(ticker, ask_order)
-                    
-                    self.position_manager.add_associated_order(client_order_id=bid_order["client_order_id"], associated_order_id=ask_order["client_order_id"])
-                    self.position_manager.add_associated_order(client_order_id=ask_order["client_order_id"], associated_order_id=bid_order["client_order_id"])
-
-                self.logger.info(bid_order)
-                self.logger.info(ask_order)
-
-            # If spread is below threshold, cancel any resting orders
-            # Or if current orders are not at top of book, cancel resting orders
-            # TODO: We want to cancel orders before adding new orders
-            # TODO: We probably want to separate out the logic for canceling orders so we don't block the thread from finding opportunities
-            # TODO: If it's just that the orders are not at the top of the book, we can just update those orders instead of canceling and creating new ones
-            if ticker_open_orders and spread < self.spread_threshold:
-                for open_order_id in ticker_open_orders:
-                    if open_order_id.startswith("WBRSSS"):
-                        batch_cancel_orders["orders"].append({"order_id": open_order_id})
-                        
-
-        # Also need to listen for trades with wide spread clOrdIds 
-        # When we get a trade wide spread clOrdId, we need to cancel corresponding 
-        pass
+            resting = self.quote_manager.resting_quotes(ticker)
+            target = self.quote_targets(ticker, best_bid, best_ask, resting)
+            if target is not None or resting:
+                desired[ticker] = target
+
+        return self.quote_manager.sync(desired, QUOTE_COUNT)
 
 if __name__ == "__main__":
-    pass
\ No newline at end of file
+    # Simulator: quote management over moving books, then a burst of fills,
+    # against a gateway with exchange-like round trips
+    import random
+    from collections import defaultdict
+
+    from symbol_table import symbols
+    from top_of_book import TopOfBookTable
+
+    ROUND_TRIP_S = 0.05
+    NUM_TICKERS = 40
+    NUM_CYCLES = 200
+    NUM_FILLS = 100
+
+    class SimulatedGateway:
+        def __init__(self):
+            self.calls = defaultdict(int)
+            self.created = []
+            self.cancelled = []
+
+        def _round_trip(self, name):
+            self.calls[name] += 1
+            time.sleep(ROUND_TRIP_S * random.uniform(0.8, 1.2))
+
+        def batch_create_orders(self, orders):
+            self.calls["batch_create_orders"] += 1
+
+        def batch_cancel_orders(self, orders):
+            self.calls["batch_cancel_orders"] += 1
+
+        def amend_order(self, order_id, amend_data):
+            self.calls["amend_order"] += 1
+            return {"order": amend_data}
+
+        def cancel_order(self, order_id):
+            self._round_trip("cancel_order")
+            self.cancelled.append(order_id)
+            return {"order": {"order_id": order_id, "remaining_count_fp": "0", "fill_count_fp": "0"}}
+
+        def create_order(self, order):
+            self._round_trip("create_order")
+            self.created.append(order)
+            return {"order": {"client_order_id": order["client_order_id"], "status": "executed"}}
+
+    class SimulatedFeed:
+        def __init__(self):
+            self.fill_queue = asyncio.Queue()
+
+    tickers = [f"KXSIM-{i}" for i in range(NUM_TICKERS)]
+
+    strategy = WideSpreadArbitrage.__new__(WideSpreadArbitrage)
+    strategy.kalshi_client = SimulatedFeed()
+    strategy.kalshi_gateway = SimulatedGateway()
+    strategy.position_manager = PositionManager(defaultdict(int), defaultdict(dict))
+    strategy.logger = logging.getLogger("wide_spread_strategy")
+    strategy.spread_threshold = Decimal("0.05")
+    strategy.ranker = TickerRanker(top_k=NUM_TICKERS, refresh_interval_s=0.0)
+    for ticker in tickers:
+        strategy.ranker.set_volume(ticker, 5000)
+    books = TopOfBookTable()
+    for ticker in tickers:
+        books.register(symbols.intern(ticker))
+    strategy.capital_allocator = CapitalAllocator()
+    strategy.capital_allocator.add_venue("Kalshi", initial_balance=Decimal(10_000))
+    strategy.running = True
+    strategy.executor = ThreadPoolExecutor(max_workers=HEDGE_HTTP_WORKERS)
+    strategy.hedge_tails = {}
+    strategy.hedge_metrics = HedgeMetrics()
+    strategy.quote_manager = QuoteManager(
+        strategy.kalshi_gateway, strategy.position_manager, strategy.capital_allocator,
+        STRATEGY_NAME, ORDER_PREFIX, executor=strategy.executor,
+    )
+
+    # Quote management: competitors occasionally step in front of our quotes
+    # or the spread collapses. The book shows our own quote while it is best.
+    random.seed(7)
+    market = {ticker: [40, 48] for ticker in tickers}  # competitor bid / ask in cents
+    naive_writes = 0
+    for cycle in range(NUM_CYCLES):
+        overtaken = 0
+        for ticker in tickers:
+            competitor = market[ticker]
+            move = random.random()
+            if move < 0.05:
+                competitor[0] += 1
+            elif move < 0.10:
+                competitor[1] -= 1
+            elif move < 0.12:
+                market[ticker] = competitor = [40, 48]
+            resting = strategy.quote_manager.resting_quotes(ticker)
+            bid, ask = competitor
+            if "yes" in resting:
+                bid = max(bid, resting["yes"]["yes_price"])
+            if "no" in resting:
+                ask = min(ask, 100 - resting["no"]["no_price"])
+            overtaken += ("yes" in resting and competitor[0] > resting["yes"]["yes_price"]) or (
+                "no" in resting and competitor[1] < 100 - resting["no"]["no_price"])
+            books.update(symbols.id_of(ticker), bid / 100, 100, ask / 100, 100)
+        # Cancel-and-recreate pulls and re-places both quotes of every overtaken pair
+        naive_writes += 4 * overtaken
+        strategy.find_opportunities(books.snapshot(), {})
+
+    counts = strategy.quote_manager.counts
+    print(f"Quote management, {NUM_TICKERS} tickers x {NUM_CYCLES} cycles")
+    print(f"  quotes kept {counts['keep']}, amended {counts['amend']}, cancelled {counts['cancel']}, created {counts['create']}")
+    print(f"  gateway calls: {dict(strategy.kalshi_gateway.calls)} ({counts['api_calls']} total)")
+    print(f"  order writes: {counts['amend'] + counts['cancel'] + counts['create']} "
+          f"(cancel-and-recreate on overtake: {naive_writes + counts['cancel'] + counts['create']})")
+    print(f"  Kalshi capital: {strategy.capital_allocator.venues['Kalshi'].stats()}")
+
+    async def fill_burst():
+        quotes = [
+            strategy.quote_manager.resting_quotes(ticker)["yes"]
+            for ticker in tickers if "yes" in strategy.quote_manager.resting_quotes(ticker)
+        ]
+        consumer = asyncio.create_task(strategy.process_user_fills())
+        started = time.perf_counter()
+        for i in range(NUM_FILLS):
+            # Every fill is hedged; repeats are further partial fills of the
+            # same quote, hedged after its pair's other side was cancelled
+            order = quotes[i % len(quotes)]
+            strategy.kalshi_client.fill_queue.put_nowait({
+                "market_ticker": order["ticker"],
+                "client_order_id": order["client_order_id"],
+                "count_fp": "1.00",
+                "received_ns": time.time_ns(),
+            })
+        while strategy.hedge_metrics.fills < NUM_FILLS:
+            await asyncio.sleep(0.001)
+        elapsed = time.perf_counter() - started
+        consumer.cancel()
+        strategy.executor.shutdown()
+
+        report = strategy.hedge_metrics.report()
+        print(f"{NUM_FILLS} fills over {len(quotes)} tickers, {ROUND_TRIP_S * 1000:.0f} ms round trips")
+        print(f"  hedges sent: {len(strategy.kalshi_gateway.created)}, quotes cancelled: {len(strategy.kalshi_gateway.cancelled)}, "
+              f"quotes still partially filled: {len(strategy.quote_manager.filled)}")
+        print(f"  burst drained in {elapsed * 1000:.0f} ms (sequential cancel-then-hedge: ~{len(quotes) * 2 * ROUND_TRIP_S * 1000:.0f} ms)")
+        print(f"  fill -> cancel ms: {report['fill_to_cancel_ms']}")
+        print(f"  fill -> hedge  ms: {report['fill_to_hedge_ms']}")
+        print(f"  Kalshi capital: {strategy.capital_allocator.venues['Kalshi'].stats()}")
+        assert len(strategy.kalshi_gateway.created) == NUM_FILLS, "a fill went unhedged"
+
+    asyncio.run(fill_burst())